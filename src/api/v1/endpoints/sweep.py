@@ -3,11 +3,11 @@ from sqlalchemy.orm import Session
 try:
     from core.database.db_service import get_db  # type: ignore
     from core.database.models import Seller, Invoice  # type: ignore
-    from core.services.gas_station import prepare_for_sweep  # type: ignore
+    from core.services.gas_station import prepare_batch_for_sweep  # type: ignore
 except ImportError:  # pragma: no cover
     from src.core.database.db_service import get_db  # type: ignore
     from src.core.database.models import Seller, Invoice  # type: ignore
-    from src.core.services.gas_station import prepare_for_sweep  # type: ignore
+    from src.core.services.gas_station import prepare_batch_for_sweep  # type: ignore
 
 router = APIRouter()
 
@@ -33,13 +33,12 @@ def sweep_prepare(
     # Списать стоимость услуги
     seller.gas_deposit_balance -= estimated_cost_trx
     db.commit()
-    # Вызов сервиса Gas Station для подготовки адресов к свипу
-    for inv in paid_invoices:
-        try:
-            prepare_for_sweep(inv.address)
-        except Exception as e:
-            # Логируем ошибку, но продолжаем обработку остальных адресов
-            print(f"Error preparing sweep for {inv.address}: {e}")
+    # Вызов сервиса Gas Station: все адреса готовятся одним пакетом
+    prepared = prepare_batch_for_sweep([inv.address for inv in paid_invoices])
+    for address, ok in prepared.items():
+        if not ok:
+            # Логируем ошибку; остальные адреса уже обработаны
+            print(f"Error preparing sweep for {address}")
     return {
         "status": "processing",
         "message": f"Preparing {len(paid_invoices)} invoices for sweep. You will be notified.",
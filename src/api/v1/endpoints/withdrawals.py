@@ -5,14 +5,18 @@ from typing import List, Optional, Tuple
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 try:
-    from core.database.db_service import get_db, get_transactions_by_invoice  # type: ignore
+    from core.database.db_service import get_db  # type: ignore
     from core.database.models import Seller, Invoice  # type: ignore
     from core.config import config  # type: ignore
+    from core.tron.transport import get_transport  # type: ignore
+    from core.tron.ref_block import build_tronpy  # type: ignore
     from core.security.telegram_webapp import verify_webapp_init_data  # type: ignore
 except ImportError:  # pragma: no cover
-    from src.core.database.db_service import get_db, get_transactions_by_invoice  # type: ignore
+    from src.core.database.db_service import get_db  # type: ignore
     from src.core.database.models import Seller, Invoice  # type: ignore
     from src.core.config import config  # type: ignore
+    from src.core.tron.transport import get_transport  # type: ignore
+    from src.core.tron.ref_block import build_tronpy  # type: ignore
     def verify_webapp_init_data(init_data: str, bot_token: str, max_age: int = 600):  # type: ignore
         # Minimal stub for environments without telegram_webapp utility during tests
         return {"ok": False}
@@ -90,18 +94,17 @@ def _broadcast_signed_hex(hexstr: str) -> dict:
         base = config.tron.get_tron_client_config().get("full_node") or config.tron.get_fallback_client_config().get("full_node")
         headers = {"Content-Type": "application/json"}
         payload = {"transaction": hexstr}
-        resp = requests.post(f"{base}/wallet/broadcasthex", json=payload, headers=headers, timeout=20)
+        resp = get_transport().post(f"{base}/wallet/broadcasthex", json=payload, headers=headers, timeout=20)
         return resp.json() if resp.ok else {"result": False, "error": resp.text}
     except requests.RequestException as e:
         return {"result": False, "error": str(e)}
 
 
 def _calc_invoice_available_usdt(db: Session, inv: Invoice) -> float:
-    # Sum received from transactions table if available
+    # Running total maintained by the keeper as transfers are recorded
     try:
-        txs = get_transactions_by_invoice(db, inv.id)
-        total_received = sum(float(getattr(t, "amount_received", 0) or 0) for t in txs)
-    except (SQLAlchemyError, AttributeError, TypeError):
+        total_received = float(getattr(inv, "received_amount", 0) or 0)
+    except (AttributeError, TypeError, ValueError):
         total_received = 0.0
     try:
         amount_required = float(getattr(inv, "amount", 0) or 0)
@@ -223,11 +226,11 @@ def prepare_withdrawal(
         if amount_usdt <= 0:
             raise HTTPException(status_code=400, detail="No funds available for this invoice")
         amount_6 = int(round(amount_usdt * 1_000_000))
-        txn = (
+        # Cached block reference instead of a node round trip when tronpy can build offline
+        txn = build_tronpy(
             contract.functions.transfer(req.to_address, amount_6)
             .with_owner(inv.address)
             .fee_limit(10_000_000)
-            .build()
         )
         try:
             raw_tx = txn.to_json()
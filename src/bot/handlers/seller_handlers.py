@@ -23,10 +23,11 @@ try:
         create_buyer_group,
         get_wallets_by_seller,
         get_wallet_by_group,
-        get_transactions_by_invoice,
         record_free_gas_address,
         reset_free_gas_usage_today,
     get_free_gas_usage,
+        claim_warm_address,
+        release_warm_address,
     )
 except ImportError:
     from src.core.database.db_service import (
@@ -40,10 +41,11 @@ except ImportError:
         create_buyer_group,
         get_wallets_by_seller,
         get_wallet_by_group,
-        get_transactions_by_invoice,
         record_free_gas_address,
         reset_free_gas_usage_today,
     get_free_gas_usage,
+        claim_warm_address,
+        release_warm_address,
     )
 try:
     import core.database.db_service as db_service  # used by tests' mocks
@@ -54,15 +56,19 @@ try:
     from core.crypto.xpub_validation import is_valid_xpub
 except ImportError:
     from src.core.crypto.xpub_validation import is_valid_xpub
+try:
+    from core.tron.transport import get_transport
+except ImportError:
+    from src.core.tron.transport import get_transport
 try:
     from core.services.gas_station import (
         get_or_create_tron_deposit_address,
-        prepare_for_sweep,
+        prepare_batch_for_sweep,
     )
 except ImportError:
     from src.core.services.gas_station import (
         get_or_create_tron_deposit_address,
-        prepare_for_sweep,
+        prepare_batch_for_sweep,
     )
 
 # Import new gas station module
@@ -326,11 +332,7 @@ async def handle_myaccount(message: types.Message):
         partial_outstanding_total = 0.0
         try:
             for inv in [i for i in invoices if i.status == 'partial']:
-                try:
-                    txs = get_transactions_by_invoice(db, inv.id)
-                    received = sum(float(t.amount_received or 0) for t in txs)
-                except Exception:
-                    received = 0.0
+                received = float(getattr(inv, 'received_amount', 0) or 0)
                 outstanding = max(0.0, float(inv.amount) - received)
                 partial_received_total += received
                 partial_outstanding_total += outstanding
@@ -350,11 +352,7 @@ async def handle_myaccount(message: types.Message):
         if partial_invoices:
             user_info.append("\n🟡 <b>Частично оплаченные инвойсы:</b>")
             for inv in [i for i in invoices if i.status == 'partial']:
-                try:
-                    txs = get_transactions_by_invoice(db, inv.id)
-                    total_received = sum(float(t.amount_received or 0) for t in txs)
-                except Exception:
-                    total_received = 0.0
+                total_received = float(getattr(inv, 'received_amount', 0) or 0)
                 remaining = max(0.0, float(inv.amount) - total_received)
                 addr_short = html.escape(inv.address[:8] + '...' + inv.address[-6:]) if inv.address and len(inv.address) > 15 else html.escape(getattr(inv, 'address', ''))
                 user_info.append(
@@ -632,10 +630,9 @@ async def handle_balance(message: types.Message):
         deposit_address = get_or_create_tron_deposit_address(db, seller_id=telegram_id)
         # Query TRX balance on-chain via direct RPC
         try:
-            import requests  # local import to avoid global dependency
             base = config.tron.get_tron_client_config().get("full_node")
             headers = {"Content-Type": "application/json"}
-            r = requests.post(f"{base}/wallet/getaccount", json={"address": deposit_address, "visible": True}, headers=headers, timeout=5)
+            r = get_transport().post(f"{base}/wallet/getaccount", json={"address": deposit_address, "visible": True}, headers=headers, timeout=5)
             if r.ok:
                 data = r.json() or {}
                 sun = int((data or {}).get('balance', 0) or 0)
@@ -836,9 +833,17 @@ async def process_invoice_group(message: types.Message, state: FSMContext):
         if inv.derivation_index is not None
         and getattr(inv, "buyer_group_id", None) == buyer_group.id
     )
+    # Prefer an address the warm pool already activated (see services/warm_pool.py)
+    used_indexes = {
+        inv.derivation_index
+        for inv in existing_invoices
+        if inv.derivation_index is not None
+        and getattr(inv, "buyer_group_id", None) == buyer_group.id
+    }
+    warm = claim_warm_address(db, buyer_group.id, used_indexes)
     # Find the first unused address index for this account (buyer group)
     next_address_index = 0
-    while True:
+    while warm is None:
         # In tests, group_xpub can be a MagicMock or a non-plausible xpub string; avoid bip-utils call then
         xpub_val = group_xpub
         try:
@@ -855,17 +860,28 @@ async def process_invoice_group(message: types.Message, state: FSMContext):
             derived_address = candidate_address
             break
         next_address_index += 1
+    if warm is not None:
+        next_address_index = warm.derivation_index
+        derived_address = warm.address
+        logger.info(f"User {telegram_id} invoice uses pre-activated address {derived_address}")
     # Log full derivation path
     derivation_path = f"m/44'/195'/{invoices_group}'/0/{next_address_index}"
-    invoice = create_invoice(
-        db=db,
-        seller_id=telegram_id,
-        buyer_group_id=buyer_group.id,
-        derivation_index=next_address_index,
-        address=derived_address,
-        amount=float(data["amount"]),
-        status="pending",
-    )
+    try:
+        invoice = create_invoice(
+            db=db,
+            seller_id=telegram_id,
+            buyer_group_id=buyer_group.id,
+            derivation_index=next_address_index,
+            address=derived_address,
+            amount=float(data["amount"]),
+            status="pending",
+        )
+    except Exception:
+        if warm is not None:
+            # Hand the already activated address back to the pool instead of stranding it
+            db.rollback()
+            release_warm_address(db, warm.address)
+        raise
     logger.info(
         f"User {telegram_id} created invoice: address={invoice.address}, amount={data['amount']}, group={buyer_id}, derivation_index={next_address_index}, derivation_path={derivation_path}"
     )
@@ -1311,11 +1327,7 @@ async def handle_sweep(message: types.Message, state: FSMContext = None):
     paid_invoices: list = []
     partial_invoices: list = []
     for inv in invoices:
-        try:
-            txs = get_transactions_by_invoice(db, inv.id)
-            total_received = sum(float(t.amount_received or 0) for t in txs)
-        except Exception:
-            total_received = 0.0
+        total_received = float(getattr(inv, 'received_amount', 0) or 0)
         try:
             amount_required = float(getattr(inv, "amount", 0) or 0)
         except Exception:
@@ -1340,24 +1352,19 @@ async def handle_sweep(message: types.Message, state: FSMContext = None):
 
     total_partial_received = 0.0
     for inv in partial_invoices:
-        try:
-            txs = get_transactions_by_invoice(db, inv.id)
-            total_partial_received += sum(float(t.amount_received or 0) for t in txs)
-        except Exception:
-            pass
+        total_partial_received += float(getattr(inv, 'received_amount', 0) or 0)
 
     # Helper: fetch technical state for an address (best effort)
     def _fetch_invoice_tech_state(addr: str) -> dict:
         try:
             _cfg = config
-            import requests  # local import
             from datetime import datetime, timezone
             base = _cfg.tron.get_tron_client_config().get("full_node")
             headers = {"Content-Type": "application/json"}
 
             def _post(path: str, payload: dict):
                 try:
-                    r = requests.post(f"{base}{path}", json=payload, headers=headers, timeout=5)
+                    r = get_transport().post(f"{base}{path}", json=payload, headers=headers, timeout=5)
                     if r.ok:
                         return r.json() or {}
                 except Exception:
@@ -1501,19 +1508,21 @@ async def process_sweep_mode_choice(message: types.Message, state: FSMContext):
 
     success_count = 0
     failed_ids = []
-    for inv in get_invoices_by_seller(db, telegram_id):
-        if inv.id in to_sweep_ids:
-            try:
-                ok = prepare_for_sweep(inv.address)
-                if ok:
-                    update_invoice(db=db, invoice_id=inv.id, status="swept")
-                    success_count += 1
-                else:
-                    failed_ids.append(inv.id)
-                    logger.warning(f"Sweep preparation returned False for invoice {inv.id} (address {inv.address})")
-            except Exception as e:
+    selected = [inv for inv in get_invoices_by_seller(db, telegram_id) if inv.id in to_sweep_ids]
+    # All addresses are prepared in one pipeline (activations/delegations broadcast and confirmed together)
+    import asyncio as _asyncio
+    prepared = await _asyncio.to_thread(prepare_batch_for_sweep, [inv.address for inv in selected])
+    for inv in selected:
+        try:
+            if prepared.get(inv.address):
+                update_invoice(db=db, invoice_id=inv.id, status="swept")
+                success_count += 1
+            else:
                 failed_ids.append(inv.id)
-                logger.warning(f"Sweep failed for invoice {inv.id}: {e}")
+                logger.warning(f"Sweep preparation returned False for invoice {inv.id} (address {inv.address})")
+        except Exception as e:
+            failed_ids.append(inv.id)
+            logger.warning(f"Sweep failed for invoice {inv.id}: {e}")
 
     from aiogram.types import ReplyKeyboardRemove
     details = ""
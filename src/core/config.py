@@ -1,6 +1,7 @@
 # Загрузка конфигурации из .env
 
 import os
+import socket
 from dotenv import load_dotenv
 import logging
 import requests
@@ -121,6 +122,45 @@ class TronConfig:
         self.activation_wallet_private_key = os.getenv("ACTIVATION_WALLET_PRIVATE_KEY", "")
         self.activation_wallet_address = os.getenv("ACTIVATION_WALLET_ADDRESS", "")
 
+        # Per-endpoint request budget (token bucket) shared by concurrent callers; 0 disables limiting
+        self.rpc_rate_per_sec = float(os.getenv("TRON_RPC_RATE_PER_SEC", "20"))
+        self.rpc_burst = float(os.getenv("TRON_RPC_BURST", "20"))
+        # Shared keep-alive HTTP transport for direct RPC calls (connections kept per host)
+        self.http_pool_size = int(os.getenv("TRON_HTTP_POOL_SIZE", "10"))
+        self.http_connect_timeout = float(os.getenv("TRON_HTTP_CONNECT_TIMEOUT", "3"))
+        self.http_read_timeout = float(os.getenv("TRON_HTTP_READ_TIMEOUT", "10"))
+        # Endpoint router: latency/error EWMA per node, circuit opens after N consecutive failures
+        # and closes once a background probe (every PROBE_INTERVAL, after OPEN_SEC) succeeds
+        self.router_ewma_alpha = float(os.getenv("TRON_ROUTER_EWMA_ALPHA", "0.3"))
+        self.router_failure_threshold = int(os.getenv("TRON_ROUTER_FAILURE_THRESHOLD", "3"))
+        self.router_open_sec = float(os.getenv("TRON_ROUTER_OPEN_SEC", "30"))
+        self.router_probe_interval_sec = float(os.getenv("TRON_ROUTER_PROBE_INTERVAL_SEC", "10"))
+        # Confirmation watcher: follow blocks once for all pending txids instead of polling each txid
+        self.confirm_watcher_enabled = os.getenv("TRON_CONFIRM_WATCHER_ENABLED", "false").lower() == "true"
+        self.confirm_watcher_poll_sec = float(os.getenv("TRON_CONFIRM_WATCHER_POLL_SEC", "1.0"))
+        self.confirm_watcher_lookback_blocks = int(os.getenv("TRON_CONFIRM_WATCHER_LOOKBACK_BLOCKS", "10"))
+        # Direct confirmation lookups: shared worker pool and lookups in flight per waited txid
+        self.confirm_pool_workers = int(os.getenv("TRON_CONFIRM_POOL_WORKERS", "16"))
+        self.confirm_probes_per_wait = int(os.getenv("TRON_CONFIRM_PROBES_PER_WAIT", "3"))
+        # Chain parameters / global resource totals are cached this long (they change per maintenance period)
+        self.chain_params_ttl_sec = float(os.getenv("TRON_CHAIN_PARAMS_TTL_SEC", "300"))
+        # Per-address getaccount + getaccountresource snapshot lifetime (dropped on broadcast)
+        self.account_snapshot_ttl_sec = float(os.getenv("TRON_ACCOUNT_SNAPSHOT_TTL_SEC", "3"))
+        # Build delegate/undelegate/freeze/create-account/transfer transactions locally (node-built fallback)
+        self.offline_tx_enabled = os.getenv("TRON_OFFLINE_TX_ENABLED", "true").lower() == "true"
+        # Latest block header for local builds: refreshed in the background, refetched inline past the staleness bound
+        self.ref_block_refresh_sec = float(os.getenv("TRON_REF_BLOCK_REFRESH_SEC", "10"))
+        self.ref_block_max_stale_sec = float(os.getenv("TRON_REF_BLOCK_MAX_STALE_SEC", "60"))
+        # Simulated USDT transfer energy reused per recipient-holds-USDT class / per known recipient
+        self.usdt_energy_cache_ttl_sec = float(os.getenv("TRON_USDT_ENERGY_CACHE_TTL_SEC", "3600"))
+        # Delegation leases: reclaimable this long after the receiver swept, or after being held this long (0 = no limit)
+        self.lease_swept_grace_sec = float(os.getenv("TRON_LEASE_SWEPT_GRACE_SEC", "600"))
+        self.lease_max_hold_sec = float(os.getenv("TRON_LEASE_MAX_HOLD_SEC", "86400"))
+        # Reclaim also undelegates from receivers with no lease record (delegations made outside this app)
+        self.reclaim_untracked = os.getenv("TRON_RECLAIM_UNTRACKED", "false").lower() == "true"
+        # Free Gas plan inputs (PrepareSnapshot) reused by a dry run's follow-up execution within this window
+        self.prepare_snapshot_ttl_sec = float(os.getenv("TRON_PREPARE_SNAPSHOT_TTL_SEC", "30"))
+
         self._validate_config()
 
     def _parse_multisig_keys(self) -> list:
@@ -237,6 +277,15 @@ class KeeperConfig:
     """Keeper bot configuration (activation queue behavior, etc.)"""
 
     def __init__(self):
+        # Run mode: 'loop' (single blocking loop) or 'async' (independent asyncio tasks)
+        self.run_mode = os.getenv("KEEPER_RUN_MODE", "loop").lower()
+        if self.run_mode not in {"loop", "async"}:
+            logger.warning("Invalid KEEPER_RUN_MODE=%s, falling back to 'loop'", self.run_mode)
+            self.run_mode = "loop"
+        # Seconds between invoice checks; async mode also has separate forwarding/health intervals
+        self.check_interval = float(os.getenv("KEEPER_CHECK_INTERVAL", "60"))
+        self.forward_interval = float(os.getenv("KEEPER_FORWARD_INTERVAL", str(self.check_interval)))
+        self.health_interval = float(os.getenv("KEEPER_HEALTH_INTERVAL", "60"))
         # Number of background workers processing activation jobs
         self.activation_queue_workers = int(os.getenv("KEEPER_ACTIVATION_QUEUE_WORKERS", "1"))
         # When true, activation jobs run synchronously (useful in tests/integration)
@@ -245,6 +294,50 @@ class KeeperConfig:
         self.activation_queue_retries = int(os.getenv("KEEPER_ACTIVATION_QUEUE_RETRIES", "3"))
         # Default backoff seconds between retries
         self.activation_queue_backoff_sec = float(os.getenv("KEEPER_ACTIVATION_QUEUE_BACKOFF_SEC", "5.0"))
+        # A 'running' job not finished within this many seconds is treated as abandoned and re-claimed
+        self.activation_job_stale_sec = float(os.getenv("KEEPER_ACTIVATION_JOB_STALE_SEC", "300"))
+        # Payment detection: 'poll' (balanceOf per open invoice) or 'indexer' (block Transfer logs)
+        self.invoice_detection = os.getenv("KEEPER_INVOICE_DETECTION", "poll").lower()
+        if self.invoice_detection not in {"poll", "indexer"}:
+            logger.warning("Invalid KEEPER_INVOICE_DETECTION=%s, falling back to 'poll'", self.invoice_detection)
+            self.invoice_detection = "poll"
+        # Indexer: blocks to stay behind head, and max blocks scanned per cycle (catch-up bound)
+        self.indexer_confirmations = int(os.getenv("KEEPER_INDEXER_CONFIRMATIONS", "0"))
+        self.indexer_max_blocks_per_cycle = int(os.getenv("KEEPER_INDEXER_MAX_BLOCKS_PER_CYCLE", "200"))
+        # Parallel balance reads per invoice-check pass (results are still applied serially)
+        self.balance_scan_concurrency = int(os.getenv("KEEPER_BALANCE_SCAN_CONCURRENCY", "8"))
+        # Adaptive polling (poll mode): fresh invoices every BASE sec, unchanged ones back off by FACTOR
+        # up to MAX sec; 'partial' invoices every PARTIAL sec. KEEPER_CHECK_INTERVAL becomes the tick.
+        self.scheduler_enabled = os.getenv("KEEPER_SCHEDULER_ENABLED", "false").lower() == "true"
+        self.scheduler_base_sec = float(os.getenv("KEEPER_SCHEDULER_BASE_SEC", "15"))
+        self.scheduler_max_sec = float(os.getenv("KEEPER_SCHEDULER_MAX_SEC", "900"))
+        self.scheduler_partial_sec = float(os.getenv("KEEPER_SCHEDULER_PARTIAL_SEC", "60"))
+        self.scheduler_backoff_factor = float(os.getenv("KEEPER_SCHEDULER_BACKOFF_FACTOR", "2.0"))
+        # Sharding: several keepers split sellers into hash partitions claimed via DB leases
+        self.sharding_enabled = os.getenv("KEEPER_SHARDING_ENABLED", "false").lower() == "true"
+        self.shard_partitions = int(os.getenv("KEEPER_SHARD_PARTITIONS", "16"))
+        self.lease_ttl_sec = float(os.getenv("KEEPER_LEASE_TTL_SEC", "30"))
+        # Unique per keeper and stable across restarts (names its lease rows and indexer checkpoint);
+        # required with sharding, otherwise defaults to hostname:pid
+        self.instance_id = os.getenv("KEEPER_INSTANCE_ID", "")
+        if self.sharding_enabled and not self.instance_id:
+            raise ValueError("KEEPER_INSTANCE_ID is required when KEEPER_SHARDING_ENABLED=true "
+                             "(a stable id per keeper, e.g. keeper-1)")
+        self.instance_id = self.instance_id or f"{socket.gethostname()}:{os.getpid()}"
+        # Concurrent sign+broadcast workers when forwarding TRX deposits
+        self.forward_concurrency = int(os.getenv("KEEPER_FORWARD_CONCURRENCY", "4"))
+        # Max BIP44 account nodes kept in the deposit key derivation cache (LRU)
+        self.key_cache_size = int(os.getenv("KEEPER_KEY_CACHE_SIZE", "512"))
+        # Background reclaim of idle gas station delegations every N sec (0 = disabled); one keeper when sharded
+        self.reclaim_interval_sec = float(os.getenv("KEEPER_RECLAIM_INTERVAL_SEC", "0"))
+        # Warm pool: keep the next N unused invoice indexes of every buyer group activated (0 = disabled),
+        # refilled every INTERVAL sec while the activation queue is idle, within a rolling 24h TRX budget
+        self.warm_pool_size = int(os.getenv("KEEPER_WARM_POOL_SIZE", "0"))
+        self.warm_pool_interval_sec = float(os.getenv("KEEPER_WARM_POOL_INTERVAL_SEC", "300"))
+        self.warm_pool_daily_budget_trx = float(os.getenv("KEEPER_WARM_POOL_DAILY_BUDGET_TRX", "20"))
+        self.warm_pool_max_per_pass = int(os.getenv("KEEPER_WARM_POOL_MAX_PER_PASS", "10"))
+        # Slots still 'activating' after this long belong to a refill that died and are planned again
+        self.warm_pool_stale_sec = float(os.getenv("KEEPER_WARM_POOL_STALE_SEC", "900"))
 
 class Config:
     """Main configuration class"""
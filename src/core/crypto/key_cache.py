@@ -0,0 +1,78 @@
+# Кэш BIP39 seed и BIP44 account-узлов для горячих путей деривации ключей
+
+import logging
+import threading
+from collections import OrderedDict
+
+from bip_utils import Bip44, Bip44Coins, Bip44Changes, Bip39SeedGenerator
+
+logger = logging.getLogger("key_cache")
+
+
+class Bip44KeyCache:
+    """Derives BIP44 keys from one mnemonic without repeating PBKDF2 seed stretching.
+
+    - The BIP39 seed is generated once per process (lazily, on first use)
+    - Account-level nodes m/44'/coin'/account' are memoized in a bounded LRU,
+      so hardened derivation also happens once per account
+    - wipe() zeroes the cached seed and drops all derived nodes; call it on shutdown
+
+    Note: bip_utils keeps its own internal copies of key bytes, so wiping is best
+    effort — it removes every reference this cache holds.
+    """
+
+    def __init__(self, mnemonic: str, coin=Bip44Coins.TRON, max_accounts: int = 512):
+        self._mnemonic = mnemonic
+        self._coin = coin
+        self._max_accounts = max(1, int(max_accounts))
+        self._seed: bytearray | None = None
+        self._coin_ctx = None
+        self._accounts: OrderedDict[int, Bip44] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_coin_ctx(self):
+        if self._coin_ctx is None:
+            if not self._mnemonic:
+                raise ValueError("Mnemonic is not available (cache wiped or not configured)")
+            self._seed = bytearray(Bip39SeedGenerator(self._mnemonic).Generate())
+            self._coin_ctx = Bip44.FromSeed(bytes(self._seed), self._coin).Purpose().Coin()
+        return self._coin_ctx
+
+    def account(self, index: int):
+        """Return the account-level node m/44'/coin'/index' (cached)."""
+        index = int(index)
+        with self._lock:
+            node = self._accounts.get(index)
+            if node is not None:
+                self._accounts.move_to_end(index)
+                return node
+            node = self._get_coin_ctx().Account(index)
+            self._accounts[index] = node
+            if len(self._accounts) > self._max_accounts:
+                self._accounts.popitem(last=False)
+            return node
+
+    def private_key_hex(self, account: int, address_index: int = 0) -> str:
+        """Private key (hex) for m/44'/coin'/account'/0/address_index."""
+        node = self.account(account).Change(Bip44Changes.CHAIN_EXT).AddressIndex(int(address_index))
+        return node.PrivateKey().Raw().ToHex()
+
+    def address(self, account: int, address_index: int = 0) -> str:
+        """Address for m/44'/coin'/account'/0/address_index."""
+        node = self.account(account).Change(Bip44Changes.CHAIN_EXT).AddressIndex(int(address_index))
+        return node.PublicKey().ToAddress()
+
+    def cached_accounts(self) -> int:
+        return len(self._accounts)
+
+    def wipe(self):
+        """Zero the cached seed and forget all derived nodes and the mnemonic."""
+        with self._lock:
+            if self._seed is not None:
+                for i in range(len(self._seed)):
+                    self._seed[i] = 0
+            self._seed = None
+            self._coin_ctx = None
+            self._accounts.clear()
+            self._mnemonic = ""
+        logger.info("Key derivation cache wiped")
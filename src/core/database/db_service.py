@@ -1,4 +1,5 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, or_, and_, func, inspect, text
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import sessionmaker
 try:
     from core.database.models import (
@@ -11,6 +12,12 @@ try:
         FreeGasUsage,
         Base,
         FreeGasAddress,
+        KeeperCheckpoint,
+        KeeperLease,
+        KeeperInstance,
+        ActivationJobRecord,
+        DelegationLease,
+        WarmAddress,
     )
 except ImportError:
     from src.core.database.models import (
@@ -23,11 +30,17 @@ except ImportError:
     FreeGasUsage,
     Base,
     FreeGasAddress,
+    KeeperCheckpoint,
+    KeeperLease,
+    KeeperInstance,
+    ActivationJobRecord,
+    DelegationLease,
+    WarmAddress,
     )
 import os
 import logging
 from typing import Optional
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
 
 
 logger = logging.getLogger(__name__)
@@ -56,6 +69,7 @@ def init_db() -> Optional[str]:
             os.makedirs(data_dir, exist_ok=True)
             logger.info("Created data directory: %s", data_dir)
         Base.metadata.create_all(bind=engine)
+        migrate_schema(engine)
         logger.info("Database initialized (tables ensured)")
         return DB_PATH
     except Exception as e:
@@ -63,6 +77,34 @@ def init_db() -> Optional[str]:
         return None
 
 
+def migrate_schema(bind):
+    """Bring tables created by older versions up to the current models (SQLite).
+    - invoices.received_amount: added and backfilled from the largest recorded
+      amount (legacy rows were whole-balance snapshots, so summing them overcounts)
+    - transactions: rebuilt once to replace UNIQUE(tx_hash) with UNIQUE(tx_hash, log_index)
+    """
+    insp = inspect(bind)
+    tables = set(insp.get_table_names())
+    if "invoices" in tables and "received_amount" not in {c["name"] for c in insp.get_columns("invoices")}:
+        with bind.begin() as conn:
+            conn.execute(text("ALTER TABLE invoices ADD COLUMN received_amount FLOAT NOT NULL DEFAULT 0"))
+            conn.execute(text(
+                "UPDATE invoices SET received_amount = COALESCE("
+                "(SELECT MAX(amount_received) FROM transactions WHERE transactions.invoice_id = invoices.id), 0)"
+            ))
+        logger.info("Migrated invoices: added received_amount")
+    if "transactions" in tables and "log_index" not in {c["name"] for c in insp.get_columns("transactions")}:
+        with bind.begin() as conn:
+            conn.execute(text("ALTER TABLE transactions RENAME TO transactions_legacy"))
+            Transaction.__table__.create(conn)
+            conn.execute(text(
+                "INSERT INTO transactions (id, invoice_id, tx_hash, log_index, sender_address, amount_received, received_at) "
+                "SELECT id, invoice_id, tx_hash, NULL, sender_address, amount_received, received_at FROM transactions_legacy"
+            ))
+            conn.execute(text("DROP TABLE transactions_legacy"))
+        logger.info("Migrated transactions: unique key is now (tx_hash, log_index)")
+
+
 # Ensure DB exists when this module is imported
 init_db()
 
@@ -129,6 +171,26 @@ def update_seller(db, telegram_id, **kwargs):
     return seller
 
 
+def credit_seller_gas_deposits(db, credits: dict) -> dict:
+    """Add TRX amounts to several sellers' gas_deposit_balance in one DB transaction.
+    credits: {telegram_id: amount_trx}. Returns {telegram_id: new_balance}.
+    Rolls back (nothing credited) if any update fails.
+    """
+    result = {}
+    try:
+        for telegram_id, amount in credits.items():
+            seller = get_seller(db, telegram_id)
+            if seller is None:
+                raise ValueError(f"Seller {telegram_id} not found")
+            seller.gas_deposit_balance = float(seller.gas_deposit_balance or 0) + float(amount)
+            result[telegram_id] = seller.gas_deposit_balance
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return result
+
+
 def delete_seller(db, telegram_id):
     seller = get_seller(db, telegram_id)
     db.delete(seller)
@@ -176,6 +238,33 @@ def create_transaction(db, **kwargs):
     return tx
 
 
+def record_invoice_transfer(db, invoice_id, txid: str, log_index: int, sender_address: str,
+                            amount: float, received_at=None, credit: Optional[float] = None) -> bool:
+    """Record one incoming transfer and add it to Invoice.received_amount in a single commit.
+    credit overrides how much of amount goes into the running total (default: all of it).
+    Returns False (nothing changed) if (txid, log_index) is already recorded; a duplicate only
+    rolls back its own savepoint, leaving the caller's pending changes in the session."""
+    credit = float(amount) if credit is None else float(credit)
+    try:
+        with db.begin_nested():
+            db.add(Transaction(
+                invoice_id=invoice_id,
+                tx_hash=txid,
+                log_index=int(log_index),
+                sender_address=sender_address or "unknown",
+                amount_received=float(amount),
+                received_at=received_at or datetime.now(timezone.utc),
+            ))
+    except IntegrityError:
+        return False
+    db.query(Invoice).filter(Invoice.id == invoice_id).update(
+        {"received_amount": func.coalesce(Invoice.received_amount, 0) + credit},
+        synchronize_session=False,
+    )
+    db.commit()
+    return True
+
+
 def get_transaction(db, tx_id):
     return db.query(Transaction).filter(Transaction.id == tx_id).first()
 
@@ -402,3 +491,405 @@ def record_free_gas_address(db, telegram_id: int, address: str):
 
 def list_free_gas_addresses(db, telegram_id: int):
     return db.query(FreeGasAddress).filter(FreeGasAddress.telegram_id == telegram_id).all()
+
+
+# --- KEEPER CHECKPOINTS ---
+def get_checkpoint(db, name: str) -> Optional[int]:
+    """Return the stored block height for a named keeper checkpoint, or None."""
+    rec = db.query(KeeperCheckpoint).filter(KeeperCheckpoint.name == name).first()
+    return int(rec.block_number) if rec else None
+
+
+def set_checkpoint(db, name: str, block_number: int) -> int:
+    """Insert or update a named keeper checkpoint and return the stored height."""
+    rec = db.query(KeeperCheckpoint).filter(KeeperCheckpoint.name == name).first()
+    now = datetime.now(timezone.utc)
+    if not rec:
+        rec = KeeperCheckpoint(name=name, block_number=int(block_number), updated_at=now)
+        db.add(rec)
+    else:
+        rec.block_number = int(block_number)
+        rec.updated_at = now
+    db.commit()
+    return int(rec.block_number)
+
+
+# --- KEEPER LEASES (sharding) ---
+def _utcnow_naive():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def ensure_lease_partitions(db, partitions: int):
+    """Create missing keeper_leases rows for partitions [0, partitions)."""
+    existing = {row.partition for row in db.query(KeeperLease.partition).all()}
+    missing = [p for p in range(int(partitions)) if p not in existing]
+    if not missing:
+        return
+    for p in missing:
+        db.add(KeeperLease(partition=p))
+    try:
+        db.commit()
+    except Exception:
+        # Another keeper inserted the same rows concurrently
+        db.rollback()
+
+
+def try_claim_lease(db, partition: int, owner: str, ttl_sec: float) -> bool:
+    """Atomically claim or renew a partition lease.
+    Succeeds if the lease is free, expired, or already held by owner."""
+    now = _utcnow_naive()
+    updated = (
+        db.query(KeeperLease)
+        .filter(
+            KeeperLease.partition == int(partition),
+            or_(
+                KeeperLease.owner.is_(None),
+                KeeperLease.owner == owner,
+                KeeperLease.expires_at.is_(None),
+                KeeperLease.expires_at < now,
+            ),
+        )
+        .update(
+            {"owner": owner, "expires_at": now + timedelta(seconds=ttl_sec), "heartbeat_at": now},
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+    return updated == 1
+
+
+def release_lease(db, partition: int, owner: str) -> bool:
+    """Release a partition lease if held by owner."""
+    updated = (
+        db.query(KeeperLease)
+        .filter(KeeperLease.partition == int(partition), KeeperLease.owner == owner)
+        .update({"owner": None, "expires_at": None}, synchronize_session=False)
+    )
+    db.commit()
+    return updated == 1
+
+
+def list_leases(db):
+    return db.query(KeeperLease).order_by(KeeperLease.partition).all()
+
+
+def touch_keeper_instance(db, instance_id: str, ttl_sec: float):
+    """Record a keeper heartbeat so others count it when computing fair shares."""
+    now = _utcnow_naive()
+    rec = db.query(KeeperInstance).filter(KeeperInstance.instance_id == instance_id).first()
+    if not rec:
+        rec = KeeperInstance(instance_id=instance_id)
+        db.add(rec)
+    rec.heartbeat_at = now
+    rec.expires_at = now + timedelta(seconds=ttl_sec)
+    db.commit()
+
+
+def remove_keeper_instance(db, instance_id: str):
+    db.query(KeeperInstance).filter(KeeperInstance.instance_id == instance_id).delete(synchronize_session=False)
+    db.commit()
+
+
+def list_live_keeper_instances(db) -> list:
+    """Instance ids whose heartbeat has not expired."""
+    now = _utcnow_naive()
+    return [row.instance_id for row in db.query(KeeperInstance.instance_id).filter(KeeperInstance.expires_at > now).all()]
+
+
+# --- ACTIVATION JOBS (persistent keeper queue) ---
+def enqueue_activation_job(db, invoice_id: int, address: str, retries: int, backoff_sec: float) -> bool:
+    """Queue an activation job due now. Returns False if the invoice already has a live job."""
+    now = _utcnow_naive()
+    db.add(ActivationJobRecord(
+        invoice_id=int(invoice_id), address=address, retries_left=int(retries),
+        backoff_sec=float(backoff_sec), status="queued", not_before=now, created_at=now,
+    ))
+    try:
+        db.commit()
+        return True
+    except IntegrityError:
+        db.rollback()
+        return False
+
+
+def claim_activation_job(db, worker_id: str, stale_after_sec: float, candidates: int = 5):
+    """Atomically claim one due job for worker_id, or return None.
+
+    Due means queued with not_before <= now, or 'running' with a claim older than
+    stale_after_sec (its worker died). The conditional UPDATE guarantees that
+    concurrent workers never claim the same job.
+    """
+    now = _utcnow_naive()
+    stale_before = now - timedelta(seconds=stale_after_sec)
+    due = or_(
+        and_(ActivationJobRecord.status == "queued", ActivationJobRecord.not_before <= now),
+        and_(ActivationJobRecord.status == "running", ActivationJobRecord.claimed_at < stale_before),
+    )
+    rows = (
+        db.query(ActivationJobRecord.id, ActivationJobRecord.status, ActivationJobRecord.claimed_at)
+        .filter(due)
+        .order_by(ActivationJobRecord.not_before)
+        .limit(int(candidates))
+        .all()
+    )
+    for job_id, status, claimed_at in rows:
+        cond = [ActivationJobRecord.id == job_id, ActivationJobRecord.status == status]
+        cond.append(ActivationJobRecord.claimed_at == claimed_at if claimed_at is not None
+                    else ActivationJobRecord.claimed_at.is_(None))
+        updated = (
+            db.query(ActivationJobRecord)
+            .filter(*cond)
+            .update(
+                {"status": "running", "claimed_by": worker_id, "claimed_at": now,
+                 "attempts": ActivationJobRecord.attempts + 1},
+                synchronize_session=False,
+            )
+        )
+        db.commit()
+        if updated == 1:
+            return db.query(ActivationJobRecord).filter(ActivationJobRecord.id == job_id).first()
+    return None
+
+
+def reschedule_activation_job(db, job_id: int, worker_id: str, delay_sec: float, error: Optional[str] = None) -> bool:
+    """Put a claimed job back in the queue, due after delay_sec, with one retry used."""
+    updated = (
+        db.query(ActivationJobRecord)
+        .filter(ActivationJobRecord.id == int(job_id), ActivationJobRecord.claimed_by == worker_id)
+        .update(
+            {"status": "queued", "claimed_by": None, "claimed_at": None,
+             "retries_left": ActivationJobRecord.retries_left - 1,
+             "not_before": _utcnow_naive() + timedelta(seconds=max(0.0, delay_sec)),
+             "last_error": error},
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+    return updated == 1
+
+
+def complete_activation_job(db, job_id: int, worker_id: str) -> bool:
+    """Remove a finished (succeeded or given up) job claimed by worker_id."""
+    deleted = (
+        db.query(ActivationJobRecord)
+        .filter(ActivationJobRecord.id == int(job_id), ActivationJobRecord.claimed_by == worker_id)
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+    return deleted == 1
+
+
+def activation_queue_stats(db) -> dict:
+    """Queue depth and age: total/due/running job counts and the oldest job's age in seconds."""
+    now = _utcnow_naive()
+    total = db.query(func.count(ActivationJobRecord.id)).scalar() or 0
+    due = (
+        db.query(func.count(ActivationJobRecord.id))
+        .filter(ActivationJobRecord.status == "queued", ActivationJobRecord.not_before <= now)
+        .scalar() or 0
+    )
+    running = db.query(func.count(ActivationJobRecord.id)).filter(ActivationJobRecord.status == "running").scalar() or 0
+    oldest = db.query(func.min(ActivationJobRecord.created_at)).scalar()
+    return {
+        "depth": int(total),
+        "due": int(due),
+        "running": int(running),
+        "oldest_age_sec": (now - oldest).total_seconds() if oldest else 0.0,
+    }
+
+
+# --- DELEGATION LEASES (gas station stake inventory) ---
+def record_delegation_lease(db, receiver: str, resource: str, amount_sun: int, purpose: str,
+                            txid: Optional[str] = None, lock_sec: float = 0.0):
+    """Record an active delegation owner -> receiver. Other active leases of the receiver are
+    renewed (swept_at cleared): the receiver is being prepared again and keeps using them."""
+    now = _utcnow_naive()
+    db.query(DelegationLease).filter(
+        DelegationLease.receiver == receiver, DelegationLease.status == "active",
+    ).update({"swept_at": None}, synchronize_session=False)
+    lease = DelegationLease(
+        receiver=receiver, resource=resource.upper(), amount_sun=int(amount_sun), purpose=purpose,
+        txid=txid, status="active", started_at=now,
+        lock_until=now + timedelta(seconds=max(0.0, float(lock_sec))),
+    )
+    db.add(lease)
+    db.commit()
+    return lease
+
+
+def list_active_leases(db, receiver: Optional[str] = None):
+    q = db.query(DelegationLease).filter(DelegationLease.status == "active")
+    if receiver is not None:
+        q = q.filter(DelegationLease.receiver == receiver)
+    return q.order_by(DelegationLease.started_at).all()
+
+
+def renew_leases(db, receiver: str) -> int:
+    """Keep a receiver's active leases (it needs the resources again). Returns rows updated."""
+    updated = (
+        db.query(DelegationLease)
+        .filter(DelegationLease.receiver == receiver, DelegationLease.status == "active")
+        .update({"swept_at": None}, synchronize_session=False)
+    )
+    db.commit()
+    return updated
+
+
+def mark_leases_swept(db, receiver: str) -> int:
+    """Mark a receiver's active sweep leases as no longer needed (first mark wins).
+    Free Gas leases are not tied to a sweep and keep their hold limit."""
+    updated = (
+        db.query(DelegationLease)
+        .filter(DelegationLease.receiver == receiver, DelegationLease.status == "active",
+                DelegationLease.purpose == "sweep", DelegationLease.swept_at.is_(None))
+        .update({"swept_at": _utcnow_naive()}, synchronize_session=False)
+    )
+    db.commit()
+    return updated
+
+
+def release_leases(db, receiver: str, resource: Optional[str] = None) -> int:
+    """Close a receiver's active leases (all, or one resource type) after undelegation."""
+    q = db.query(DelegationLease).filter(DelegationLease.receiver == receiver, DelegationLease.status == "active")
+    if resource is not None:
+        q = q.filter(DelegationLease.resource == resource.upper())
+    updated = q.update({"status": "released", "released_at": _utcnow_naive()}, synchronize_session=False)
+    db.commit()
+    return updated
+
+
+def leased_totals(db) -> dict:
+    """SUN currently leased out per resource type: {"ENERGY": int, "BANDWIDTH": int}."""
+    totals = {"ENERGY": 0, "BANDWIDTH": 0}
+    rows = (
+        db.query(DelegationLease.resource, func.sum(DelegationLease.amount_sun))
+        .filter(DelegationLease.status == "active")
+        .group_by(DelegationLease.resource)
+        .all()
+    )
+    for resource, total in rows:
+        totals[resource] = int(total or 0)
+    return totals
+
+
+def reclaimable_leases(db, swept_grace_sec: float, max_hold_sec: float):
+    """Active leases past their lock that are either swept for longer than swept_grace_sec
+    or held for longer than max_hold_sec (0 = no hold limit)."""
+    now = _utcnow_naive()
+    due = [and_(DelegationLease.swept_at.isnot(None),
+                DelegationLease.swept_at <= now - timedelta(seconds=max(0.0, swept_grace_sec)))]
+    if max_hold_sec > 0:
+        due.append(DelegationLease.started_at <= now - timedelta(seconds=max_hold_sec))
+    return (
+        db.query(DelegationLease)
+        .filter(DelegationLease.status == "active", DelegationLease.lock_until <= now, or_(*due))
+        .order_by(DelegationLease.started_at)
+        .all()
+    )
+
+
+# --- WARM ADDRESS POOL (pre-activated invoice addresses) ---
+def add_warm_address(db, seller_id: int, buyer_group_id: int, derivation_index: int, address: str):
+    """Reserve a pool slot in 'activating' state. Returns None if the slot already exists."""
+    row = WarmAddress(
+        seller_id=int(seller_id), buyer_group_id=int(buyer_group_id), derivation_index=int(derivation_index),
+        address=address, status="activating", created_at=_utcnow_naive(),
+    )
+    db.add(row)
+    try:
+        db.commit()
+        return row
+    except IntegrityError:
+        db.rollback()
+        return None
+
+
+def set_warm_address_ready(db, address: str, cost_sun: int, txid: Optional[str] = None) -> bool:
+    updated = (
+        db.query(WarmAddress)
+        .filter(WarmAddress.address == address, WarmAddress.status == "activating")
+        .update({"status": "ready", "cost_sun": int(cost_sun), "activation_txid": txid,
+                 "activated_at": _utcnow_naive()}, synchronize_session=False)
+    )
+    db.commit()
+    return updated == 1
+
+
+def drop_warm_address(db, address: str) -> bool:
+    """Forget a slot whose activation failed (it is planned again on a later refill)."""
+    deleted = (
+        db.query(WarmAddress)
+        .filter(WarmAddress.address == address, WarmAddress.status == "activating")
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+    return deleted == 1
+
+
+def drop_stale_warm_addresses(db, older_than_sec: float) -> int:
+    """Forget 'activating' slots reserved more than older_than_sec ago (their refill died);
+    they are planned again, and an address already active costs nothing to re-add."""
+    cutoff = _utcnow_naive() - timedelta(seconds=max(0.0, older_than_sec))
+    deleted = (
+        db.query(WarmAddress)
+        .filter(WarmAddress.status == "activating", WarmAddress.created_at < cutoff)
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+    return deleted
+
+
+def list_warm_addresses(db, buyer_group_id: Optional[int] = None, status: Optional[str] = None):
+    q = db.query(WarmAddress)
+    if buyer_group_id is not None:
+        q = q.filter(WarmAddress.buyer_group_id == int(buyer_group_id))
+    if status is not None:
+        q = q.filter(WarmAddress.status == status)
+    return q.order_by(WarmAddress.buyer_group_id, WarmAddress.derivation_index).all()
+
+
+def warm_pool_spent_sun(db, since_sec: float = 86400.0) -> int:
+    """TRX (SUN) spent on warm activations within the last since_sec seconds."""
+    since = _utcnow_naive() - timedelta(seconds=since_sec)
+    total = (
+        db.query(func.sum(WarmAddress.cost_sun))
+        .filter(WarmAddress.activated_at.isnot(None), WarmAddress.activated_at >= since)
+        .scalar()
+    )
+    return int(total or 0)
+
+
+def claim_warm_address(db, buyer_group_id: int, used_indexes=(), candidates: int = 5):
+    """Atomically hand out the lowest ready pool address of a buyer group whose derivation index
+    is not used by an invoice yet. Returns the WarmAddress row or None."""
+    used = {int(i) for i in used_indexes if i is not None}
+    rows = (
+        db.query(WarmAddress)
+        .filter(WarmAddress.buyer_group_id == int(buyer_group_id), WarmAddress.status == "ready")
+        .order_by(WarmAddress.derivation_index)
+        .limit(int(candidates) + len(used))
+        .all()
+    )
+    for row in rows:
+        if row.derivation_index in used:
+            continue
+        updated = (
+            db.query(WarmAddress)
+            .filter(WarmAddress.id == row.id, WarmAddress.status == "ready")
+            .update({"status": "assigned", "assigned_at": _utcnow_naive()}, synchronize_session=False)
+        )
+        db.commit()
+        if updated == 1:
+            return row
+    return None
+
+
+def release_warm_address(db, address: str) -> bool:
+    """Return a claimed slot to 'ready' when no invoice could be created for it."""
+    updated = (
+        db.query(WarmAddress)
+        .filter(WarmAddress.address == address, WarmAddress.status == "assigned")
+        .update({"status": "ready", "assigned_at": None}, synchronize_session=False)
+    )
+    db.commit()
+    return updated == 1
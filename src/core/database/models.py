@@ -68,6 +68,8 @@ class Invoice(Base):
     status = Column(
         String(16), nullable=False, default="pending"
     )  # 'pending', 'paid', 'expired'
+    # Running total of USDT credited via transactions rows (see record_invoice_transfer)
+    received_amount = Column(Float, nullable=False, default=0.0, server_default="0")
     created_at = Column(DateTime, default=lambda: datetime.datetime.now(UTC))
     seller = relationship("Seller", back_populates="invoices")
     buyer_group = relationship("BuyerGroup", back_populates="invoices")
@@ -81,11 +83,16 @@ class Transaction(Base):
     __tablename__ = "transactions"
     id = Column(Integer, primary_key=True)
     invoice_id = Column(Integer, ForeignKey("invoices.id"))
-    tx_hash = Column(Text, unique=True, nullable=False)
+    tx_hash = Column(Text, nullable=False, index=True)
+    # Position of the Transfer log in the transaction; -1 = balance delta without a known log
+    log_index = Column(Integer, nullable=True)
     sender_address = Column(Text, nullable=False)
     amount_received = Column(Float, nullable=False)
     received_at = Column(DateTime, default=lambda: datetime.datetime.now(UTC))
     invoice = relationship("Invoice", back_populates="transactions")
+    __table_args__ = (
+        UniqueConstraint("tx_hash", "log_index", name="uix_transaction_tx_log"),
+    )
 
 
 class GasStation(Base):
@@ -136,3 +143,74 @@ class Wallet(Base):
     __table_args__ = (
         UniqueConstraint("seller_id", "xpub", "account", name="uix_seller_xpub_account"),
     )
+
+
+class KeeperCheckpoint(Base):
+    __tablename__ = "keeper_checkpoints"
+    name = Column(String(64), primary_key=True)  # e.g. 'trc20:<contract>'
+    block_number = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=lambda: datetime.datetime.now(UTC))
+
+
+class KeeperLease(Base):
+    __tablename__ = "keeper_leases"
+    partition = Column(Integer, primary_key=True)  # seller hash partition
+    owner = Column(String(128), nullable=True)  # keeper instance id
+    expires_at = Column(DateTime, nullable=True)  # naive UTC
+    heartbeat_at = Column(DateTime, nullable=True)
+
+
+class KeeperInstance(Base):
+    __tablename__ = "keeper_instances"
+    instance_id = Column(String(128), primary_key=True)
+    expires_at = Column(DateTime, nullable=False)  # naive UTC; live while in the future
+    heartbeat_at = Column(DateTime, nullable=True)
+
+
+class ActivationJobRecord(Base):
+    __tablename__ = "activation_jobs"
+    id = Column(Integer, primary_key=True)
+    invoice_id = Column(Integer, nullable=False, unique=True)  # one live job per invoice
+    address = Column(Text, nullable=False)
+    retries_left = Column(Integer, nullable=False, default=3)
+    backoff_sec = Column(Float, nullable=False, default=5.0)
+    attempts = Column(Integer, nullable=False, default=0)
+    status = Column(String(16), nullable=False, default="queued", index=True)  # queued | running
+    not_before = Column(DateTime, nullable=False, index=True)  # naive UTC; not picked up earlier
+    claimed_by = Column(String(128), nullable=True)
+    claimed_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, nullable=False)  # naive UTC
+    last_error = Column(Text, nullable=True)
+
+
+class DelegationLease(Base):
+    __tablename__ = "delegation_leases"
+    id = Column(Integer, primary_key=True)
+    receiver = Column(Text, nullable=False, index=True)
+    resource = Column(String(16), nullable=False)  # ENERGY | BANDWIDTH
+    amount_sun = Column(Integer, nullable=False)  # staked TRX delegated, in SUN
+    purpose = Column(String(32), nullable=False, default="sweep")  # sweep | free_gas | manual
+    txid = Column(String(80), nullable=True)
+    status = Column(String(16), nullable=False, default="active", index=True)  # active | released
+    started_at = Column(DateTime, nullable=False)  # naive UTC
+    lock_until = Column(DateTime, nullable=False)  # naive UTC; undelegation not possible earlier
+    swept_at = Column(DateTime, nullable=True)  # receiver no longer needs the resources
+    released_at = Column(DateTime, nullable=True)
+
+
+class WarmAddress(Base):
+    __tablename__ = "warm_addresses"
+    id = Column(Integer, primary_key=True)
+    seller_id = Column(Integer, nullable=False, index=True)
+    buyer_group_id = Column(Integer, nullable=False)
+    derivation_index = Column(Integer, nullable=False)
+    address = Column(Text, nullable=False, unique=True)
+    status = Column(String(16), nullable=False, default="activating", index=True)  # activating | ready | assigned
+    activation_txid = Column(String(80), nullable=True)
+    cost_sun = Column(Integer, nullable=False, default=0)  # TRX spent on activation (0 if it already existed)
+    created_at = Column(DateTime, nullable=False)  # naive UTC
+    activated_at = Column(DateTime, nullable=True)
+    assigned_at = Column(DateTime, nullable=True)
+    __table_args__ = (
+        UniqueConstraint("buyer_group_id", "derivation_index", name="uix_warm_group_index"),
+    )
@@ -0,0 +1,192 @@
+# Учёт делегаций gas station: аренда ENERGY/BANDWIDTH адресам, возврат после свипа, свободный стейк
+
+import logging
+import threading
+from typing import Optional
+
+try:
+    from core.config import config
+    from core.database.db_service import (
+        SessionLocal, record_delegation_lease, list_active_leases, renew_leases, mark_leases_swept,
+        release_leases, leased_totals, reclaimable_leases,
+    )
+except ImportError:
+    from src.core.config import config
+    from src.core.database.db_service import (
+        SessionLocal, record_delegation_lease, list_active_leases, renew_leases, mark_leases_swept,
+        release_leases, leased_totals, reclaimable_leases,
+    )
+
+logger = logging.getLogger("gas_station.leases")
+
+RESOURCES = ("ENERGY", "BANDWIDTH")
+
+
+class DelegationLeaseManager:
+    """Inventory of the gas wallet's delegations, kept in the delegation_leases table.
+
+    - record() is called for every delegation that went out (receiver, resource, SUN, purpose,
+      lock expiry); preparing a receiver again renews its existing leases, so capacity already
+      sitting on an address is reused instead of being reclaimed
+    - mark_swept() flags a receiver whose funds are gone; its leases become reclaimable after
+      swept_grace_sec, and any lease becomes reclaimable after max_hold_sec (0 = never)
+    - available_sun() answers "how much can we delegate right now" without RPCs: the owner's
+      undelegated stake from the last sync_capacity(), adjusted by leases opened/closed since
+    """
+
+    def __init__(self, session_factory=SessionLocal, *, swept_grace_sec: float = 600.0, max_hold_sec: float = 86400.0):
+        self._session_factory = session_factory
+        self.swept_grace_sec = max(0.0, float(swept_grace_sec))
+        self.max_hold_sec = max(0.0, float(max_hold_sec))
+        self._lock = threading.Lock()
+        self._free_at_sync: Optional[dict] = None  # resource -> undelegated stake (SUN) at last sync
+        self._leased_at_sync: dict = {}
+
+    def _db(self):
+        return self._session_factory()
+
+    # --- Lease bookkeeping ---
+    def record(self, receiver: str, resource: str, amount_sun: int, purpose: str,
+               txid: Optional[str] = None, lock_sec: float = 0.0) -> None:
+        db = self._db()
+        try:
+            record_delegation_lease(db, receiver, resource, int(amount_sun), purpose, txid=txid, lock_sec=lock_sec)
+        finally:
+            db.close()
+        logger.debug("[leases] %s %s SUN -> %s (%s, txid=%s)", resource, amount_sun, receiver, purpose, txid)
+
+    def renew(self, receiver: str) -> int:
+        db = self._db()
+        try:
+            return renew_leases(db, receiver)
+        finally:
+            db.close()
+
+    def mark_swept(self, receiver: str) -> int:
+        db = self._db()
+        try:
+            return mark_leases_swept(db, receiver)
+        finally:
+            db.close()
+
+    def release(self, receiver: str, resource: Optional[str] = None) -> int:
+        db = self._db()
+        try:
+            return release_leases(db, receiver, resource)
+        finally:
+            db.close()
+
+    def active(self, receiver: Optional[str] = None) -> list[dict]:
+        db = self._db()
+        try:
+            return [
+                {"receiver": l.receiver, "resource": l.resource, "amount_sun": int(l.amount_sun),
+                 "purpose": l.purpose, "txid": l.txid, "started_at": l.started_at,
+                 "lock_until": l.lock_until, "swept_at": l.swept_at}
+                for l in list_active_leases(db, receiver)
+            ]
+        finally:
+            db.close()
+
+    def leased_sun(self, receiver: str, resource: str) -> int:
+        """SUN of one resource currently leased to receiver."""
+        resource = resource.upper()
+        return sum(l["amount_sun"] for l in self.active(receiver) if l["resource"] == resource)
+
+    def totals(self) -> dict:
+        db = self._db()
+        try:
+            return leased_totals(db)
+        finally:
+            db.close()
+
+    def reclaimable_receivers(self) -> list[str]:
+        """Receivers with at least one lease that is past its lock and swept or over-held."""
+        db = self._db()
+        try:
+            leases = reclaimable_leases(db, self.swept_grace_sec, self.max_hold_sec)
+            return list(dict.fromkeys(l.receiver for l in leases))
+        finally:
+            db.close()
+
+    # --- Capacity ---
+    def sync_capacity(self, owner_account: dict) -> dict:
+        """Take the owner's undelegated stake from its getaccount body (frozenV2) as the baseline."""
+        free = {r: 0 for r in RESOURCES}
+        for entry in (owner_account or {}).get("frozenV2") or []:
+            resource = (entry.get("type") or "BANDWIDTH").upper()
+            if resource in free:
+                free[resource] += int(entry.get("amount", 0) or 0)
+        leased = self.totals()
+        with self._lock:
+            self._free_at_sync = free
+            self._leased_at_sync = leased
+        return dict(free)
+
+    def capacity_known(self) -> bool:
+        with self._lock:
+            return self._free_at_sync is not None
+
+    def available_sun(self, resource: str) -> Optional[int]:
+        """Undelegated stake (SUN) for resource, or None before the first sync_capacity()."""
+        resource = resource.upper()
+        with self._lock:
+            if self._free_at_sync is None:
+                return None
+            free = self._free_at_sync.get(resource, 0)
+            leased_then = self._leased_at_sync.get(resource, 0)
+        leased_now = self.totals().get(resource, 0)
+        return max(0, free - (leased_now - leased_then))
+
+    def summary(self) -> dict:
+        totals = self.totals()
+        return {
+            "leased_sun": totals,
+            "available_sun": {r: self.available_sun(r) for r in RESOURCES},
+            "reclaimable_receivers": len(self.reclaimable_receivers()),
+        }
+
+
+class LeaseReclaimer:
+    """Runs a reclaim pass (GasStationManager.reclaim_due_leases) every interval_sec in a daemon thread."""
+
+    def __init__(self, run_pass, interval_sec: float):
+        self._run_pass = run_pass
+        self.interval_sec = max(5.0, float(interval_sec))
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self) -> dict:
+        try:
+            return self._run_pass() or {}
+        except Exception as e:  # a failed pass is retried on the next tick
+            logger.error("[leases] Reclaim pass failed: %s", e)
+            return {}
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="lease-reclaimer", daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval_sec):
+            self.run_once()
+
+    def stop(self):
+        self._stop.set()
+
+
+_manager: Optional[DelegationLeaseManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_lease_manager() -> DelegationLeaseManager:
+    """Shared manager (TRON_LEASE_SWEPT_GRACE_SEC, TRON_LEASE_MAX_HOLD_SEC)."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = DelegationLeaseManager(
+                swept_grace_sec=config.tron.lease_swept_grace_sec,
+                max_hold_sec=config.tron.lease_max_hold_sec,
+            )
+        return _manager
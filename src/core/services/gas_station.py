@@ -6,6 +6,9 @@ from tronpy.keys import PrivateKey
 import time
 import logging
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from functools import partial
 try:
     from core.database.db_service import get_seller_wallet, create_seller_wallet, update_wallet
 except ImportError:
@@ -16,6 +19,26 @@ except ImportError:
     from src.core.config import config
 from bip_utils import Bip44, Bip44Coins, Bip44Changes, Bip39SeedGenerator
 import requests  # added for direct RPC fallback
+try:
+    from core.tron.transport import get_transport
+    from core.tron.endpoint_router import get_endpoint_router
+    from core.tron.confirmations import get_confirmation_watcher
+    from core.tron.chain_cache import get_chain_cache
+    from core.tron.account_snapshot import get_account_snapshots
+    from core.tron import offline_tx
+    from core.tron.usdt_estimator import usdt_transfer_bandwidth, get_usdt_energy_cache
+    from core.services.delegation_leases import get_lease_manager
+    from core.services.prepare_planner import PrepareSnapshot, StepGraph, plan_preparation, get_prepare_snapshots
+except ImportError:
+    from src.core.tron.transport import get_transport
+    from src.core.tron.endpoint_router import get_endpoint_router
+    from src.core.tron.confirmations import get_confirmation_watcher
+    from src.core.tron.chain_cache import get_chain_cache
+    from src.core.tron.account_snapshot import get_account_snapshots
+    from src.core.tron import offline_tx
+    from src.core.tron.usdt_estimator import usdt_transfer_bandwidth, get_usdt_energy_cache
+    from src.core.services.delegation_leases import get_lease_manager
+    from src.core.services.prepare_planner import PrepareSnapshot, StepGraph, plan_preparation, get_prepare_snapshots
 from types import SimpleNamespace
 from sqlalchemy.exc import SQLAlchemyError
 try:
@@ -26,11 +49,41 @@ except ImportError:  # pragma: no cover
 logger = logging.getLogger(__name__)
 GAS_STATION_REV = "r2025-08-13-activation-fallback-v2"
 
+# Confirmation polling: lookups of every wait share one pool (TRON_CONFIRM_POOL_WORKERS), each wait
+# keeps at most TRON_CONFIRM_PROBES_PER_WAIT of them in flight; rounds start 0.3s apart and
+# back off by 1.5x up to 2s (a TRON block is ~3s)
+_confirm_pool: ThreadPoolExecutor | None = None
+_confirm_pool_lock = threading.Lock()
+CONFIRM_BACKOFF_INITIAL_SEC = 0.3
+CONFIRM_BACKOFF_FACTOR = 1.5
+CONFIRM_BACKOFF_MAX_SEC = 2.0
+# Broadcast rejections that prove an offline-built tx never landed, so a node-built tx may replace it
+OFFLINE_REBUILD_CODES = frozenset({"SIGERROR", "CONTRACT_VALIDATE_ERROR", "TAPOS_ERROR",
+                                   "TRANSACTION_EXPIRATION_ERROR", "TOO_BIG_TRANSACTION_ERROR"})
+
+
+class UnclearTxid(str):
+    """Txid of an offline broadcast with no clear outcome (no reply, busy or unknown code).
+    It may still land, so it is truthy like any txid: callers wait on or look it up instead
+    of building a second transaction."""
+
+
+def get_confirm_pool() -> ThreadPoolExecutor:
+    """Process-wide executor for confirmation lookups (lookups cannot be cancelled once running)."""
+    global _confirm_pool
+    with _confirm_pool_lock:
+        if _confirm_pool is None:
+            _confirm_pool = ThreadPoolExecutor(max_workers=max(1, config.tron.confirm_pool_workers),
+                                               thread_name_prefix="tx-confirm")
+        return _confirm_pool
+
+
 class GasStationManager:
     """Manages gas station operations for TRON network"""
     
     def __init__(self):
         self.tron_config = config.tron
+        self.client_endpoint = None  # router endpoint name the client was built for
         self.client = self._get_tron_client()
         self._gas_wallet_address = None  # cache
         self._startup_warnings = []
@@ -43,17 +96,23 @@ class GasStationManager:
             logger.debug("[gas_station] startup env checks skipped: %s", e)
     
     def _get_tron_client(self) -> Tron:
-        """Create and configure TRON client with local node preference"""
-        client = self._try_create_local_client()
+        """Create and configure TRON client on the healthiest endpoint (see EndpointRouter)"""
+        client = None
+        for endpoint in get_endpoint_router().candidates():
+            if endpoint.name == "local":
+                client = self._try_create_local_client()
+            else:
+                client = self._create_remote_client()
+            if client is not None:
+                self.client_endpoint = endpoint.name
+                return client
         # In local-only mode, do not attempt remote
-        if client is None:
-            if getattr(self.tron_config, "local_only", False):
-                logger.warning("Local-only mode enabled but local TRON node unavailable; continuing with uninitialized client")
-                return None
-            logger.info("Local TRON node unavailable, using remote endpoints")
-            client = self._create_remote_client()
-        
-        return client
+        if getattr(self.tron_config, "local_only", False):
+            logger.warning("Local-only mode enabled but local TRON node unavailable; continuing with uninitialized client")
+            return None
+        logger.info("Local TRON node unavailable, using remote endpoints")
+        self.client_endpoint = "remote"
+        return self._create_remote_client()
     
     def _try_create_local_client(self) -> Tron:
         """Try to create a client using local TRON node"""
@@ -61,8 +120,8 @@ class GasStationManager:
             return None
         
         try:
-            # Test local node connection first
-            if not self.tron_config.test_local_node_connection():
+            # Test local node connection first (the outcome feeds the endpoint router)
+            if not get_endpoint_router().check("local"):
                 logger.warning("Local TRON node connection test failed")
                 return None
             
@@ -80,7 +139,7 @@ class GasStationManager:
                     # Fallback probe: direct HTTP to local node
                     try:
                         url = f"{client_config['full_node']}/wallet/getnowblock"
-                        r = requests.get(url, timeout=5)
+                        r = get_transport().get(url, timeout=5)
                         if r.ok:
                             logger.info("Connected to local TRON node at %s (via direct HTTP fallback)", client_config["full_node"])
                             return client
@@ -146,6 +205,7 @@ class GasStationManager:
             
             end_time = time.time()
             latency_ms = round((end_time - start_time) * 1000, 2)
+            get_endpoint_router().record_success(self.client_endpoint, latency_ms)
             
             # Determine node type based on configuration
             client_config = self.tron_config.get_tron_client_config()
@@ -161,11 +221,12 @@ class GasStationManager:
         except (requests.RequestException, ValueError, KeyError, RuntimeError) as e:
             # Fallback: probe the configured node directly via HTTP
             health_info["error"] = str(e)
+            get_endpoint_router().record_failure(self.client_endpoint)
             try:
                 client_config = self.tron_config.get_tron_client_config()
                 url = f"{client_config.get('full_node')}/wallet/getnowblock"
                 t0 = time.time()
-                r = requests.get(url, timeout=5)
+                r = get_transport().get(url, timeout=5)
                 t1 = time.time()
                 if r.ok:
                     data = {}
@@ -399,6 +460,7 @@ class GasStationManager:
             # Fallback: use tronpy broadcast which may accept our signature as well
             try:
                 res = txn_obj.broadcast()
+                self._note_broadcast(txn_obj)
                 return res.get("txid") or res.get("txID") or txid
             except Exception:
                 return None
@@ -409,50 +471,23 @@ class GasStationManager:
     # HTTP helpers: local-first, remote fallback
     # -------------------------------
     def _http_local_remote(self, method: str, path: str, *, payload: dict | None = None, timeout: int = 6) -> tuple[dict | None, str | None]:
-        """Perform an HTTP request to TRON node endpoints using local-first strategy,
-        then fallback to remote endpoints if local is unresponsive or returns non-OK.
+        """Perform an HTTP request to TRON node endpoints via the shared endpoint router:
+        the healthiest endpoint (latency/error EWMA, open circuits skipped) is tried first,
+        then the others.
 
         Returns a tuple: (json_or_none, source), where source is 'local' | 'remote' | None.
+        Broadcasts drop cached account snapshots of the addresses the transaction touches.
         """
-        headers = {"Content-Type": "application/json"}
-        # Local base
-        local_base = None
+        if path.startswith("/wallet/broadcast") and isinstance(payload, dict):
+            get_account_snapshots().invalidate_tx(payload)
+        return get_endpoint_router().request(method, path, payload=payload, timeout=timeout)
+
+    def _note_broadcast(self, txn) -> None:
+        """Drop cached account snapshots for a transaction broadcast through tronpy."""
         try:
-            local_conf = self.tron_config.get_tron_client_config()
-            local_base = local_conf.get("full_node")
-        except Exception:
-            local_base = None
-        if local_base:
-            try:
-                url = f"{local_base}{path}"
-                resp = requests.request(method.upper(), url, json=payload, headers=headers, timeout=timeout)
-                if resp.ok:
-                    try:
-                        return (resp.json() or {}), "local"
-                    except ValueError:
-                        return {}, "local"
-            except requests.RequestException:
-                pass
-        # Remote fallback (disabled when local_only)
-        if getattr(self.tron_config, "local_only", False):
-            return None, None
-        remote_base = getattr(self.tron_config, "remote_full_node", "") or ""
-        if remote_base:
-            try:
-                url = f"{remote_base}{path}"
-                rh = dict(headers)
-                api_key = getattr(self.tron_config, "api_key", "") or ""
-                if api_key:
-                    rh["TRON-PRO-API-KEY"] = api_key
-                resp = requests.request(method.upper(), url, json=payload, headers=rh, timeout=max(6, timeout))
-                if resp.ok:
-                    try:
-                        return (resp.json() or {}), "remote"
-                    except ValueError:
-                        return {}, "remote"
-            except requests.RequestException:
-                pass
-        return None, None
+            get_account_snapshots().invalidate_tx(txn.to_json() if hasattr(txn, "to_json") else txn)
+        except Exception as e:
+            logger.debug("[gas_station] Snapshot invalidation skipped: %s", e)
 
     def _get_owner_and_signer(self):
         """Return tuple (owner_addr, signing_pk-like) suitable for .sign().
@@ -573,35 +608,87 @@ class GasStationManager:
         return txid
 
     # -------------------------------
-    # HTTP resource delegation helpers (node-build + local sign)
+    # Offline build + local sign (single broadcast round trip)
     # -------------------------------
-    def _http_delegate_resource(self, owner_addr: str, receiver_addr: str, amount_sun: int, resource: str, signer_pk: PrivateKey, permission_id: int | None) -> str | None:
-        payload = {
-            "owner_address": owner_addr,
-            "receiver_address": receiver_addr,
-            "balance": int(amount_sun),
-            "resource": resource.upper(),
-            "visible": True,
-        }
-        if permission_id is not None:
-            try:
-                pid = int(permission_id)
-                payload["permission_id"] = pid
-                payload["Permission_id"] = pid
-            except Exception:
-                pass
-        tx, _ = self._http_local_remote("POST", "/wallet/delegateresource", payload=payload, timeout=10)
-        if not tx:
-            return None
-        return self._sign_and_broadcast_node_tx(tx, signer_pk, permission_id)
+    def _broadcast_offline(self, contract, signer_pk: PrivateKey, permission_id: int | None) -> tuple[str | None, bool]:
+        """Build the transaction locally against a cached block reference, sign it and broadcast
+        via /wallet/broadcasthex. Returns (txid, fallback): fallback is True only when the tx
+        was never built or the node rejected it outright (OFFLINE_REBUILD_CODES), so the
+        node-built path may be tried instead without risking a second transfer. A broadcast
+        without a clear outcome returns its txid as UnclearTxid, to be confirmed like any other."""
+        if not getattr(self.tron_config, "offline_tx_enabled", False):
+            return None, True
+        ref = offline_tx.get_ref_block_cache().get()
+        if ref is None:
+            return None, True
+        try:
+            pid = int(permission_id) if permission_id is not None else None
+            tx = offline_tx.build_transaction(contract, ref, permission_id=pid).sign(signer_pk)
+        except Exception as e:
+            logger.debug("[gas_station] Offline build of %s failed: %s", contract.name, e)
+            return None, True
+        get_account_snapshots().invalidate(*contract.addresses)
+        br, src = self._http_local_remote("POST", "/wallet/broadcasthex", payload={"transaction": tx.to_hex()}, timeout=8)
+        if br is None:
+            # No endpoint answered; the tx may still have reached a node, so a rebuilt tx could duplicate it
+            logger.warning("[gas_station] Offline %s broadcast got no response (txid=%s)", contract.name, tx.txid)
+            return UnclearTxid(tx.txid), False
+        code = br.get("code")
+        if br.get("result") is True or code == "DUP_TRANSACTION_ERROR":
+            # DUP: an earlier endpoint accepted it before its reply was lost
+            self.last_broadcast_txid = tx.txid
+            logger.debug("[gas_station] Offline %s broadcast=%s txid=%s", contract.name, src or "?", tx.txid)
+            return tx.txid, False
+        if code in OFFLINE_REBUILD_CODES:
+            logger.info("[gas_station] Offline %s rejected (%s); using node-built tx", contract.name, code)
+            return None, True
+        # Busy/unknown outcome: the tx may still land, so a rebuilt tx could duplicate it
+        logger.warning("[gas_station] Offline %s broadcast inconclusive (%s, txid=%s)", contract.name, code or br, tx.txid)
+        return UnclearTxid(tx.txid), False
+
+    # -------------------------------
+    # HTTP resource delegation helpers (offline build first, node-build + local sign fallback)
+    # -------------------------------
+    def _http_delegate_resource(self, owner_addr: str, receiver_addr: str, amount_sun: int, resource: str, signer_pk: PrivateKey, permission_id: int | None,
+                                *, purpose: str | None = "sweep") -> str | None:
+        """Delegate staked resources; an accepted delegation is recorded as a lease (purpose: sweep | free_gas,
+        None when the caller records it once the delegation is confirmed)."""
+        txid, fallback = self._broadcast_offline(
+            offline_tx.delegate_resource_contract(owner_addr, receiver_addr, int(amount_sun), resource), signer_pk, permission_id)
+        if fallback:
+            payload = {
+                "owner_address": owner_addr,
+                "receiver_address": receiver_addr,
+                "balance": int(amount_sun),
+                "resource": resource.upper(),
+                "visible": True,
+            }
+            if permission_id is not None:
+                try:
+                    pid = int(permission_id)
+                    payload["permission_id"] = pid
+                    payload["Permission_id"] = pid
+                except Exception:
+                    pass
+            tx, _ = self._http_local_remote("POST", "/wallet/delegateresource", payload=payload, timeout=10)
+            if not tx:
+                return None
+            txid = self._sign_and_broadcast_node_tx(tx, signer_pk, permission_id)
+        if txid and purpose is not None:
+            self._record_lease(receiver_addr, resource, amount_sun, purpose, txid)
+        return txid
 
     def _http_freeze_delegate_resource(self, owner_addr: str, receiver_addr: str, amount_sun: int, resource: str, signer_pk: PrivateKey, permission_id: int | None) -> str | None:
         """Freeze (stake) TRX to delegate resources via 3-step process with proper permission_id.
         Step 1: Create unsigned transaction with /wallet/freezebalancev2
         Step 2: Sign transaction locally with gas station key  
         Step 3: Broadcast signed transaction
-        Returns txid or None.
+        Returns txid or None. Tries an offline-built FreezeBalanceV2 first.
         """
+        txid, fallback = self._broadcast_offline(
+            offline_tx.freeze_balance_v2_contract(owner_addr, int(amount_sun), resource), signer_pk, permission_id)
+        if not fallback:
+            return txid
         # Step 1: Create unsigned delegation transaction
         payload_v2 = {
             "owner_address": owner_addr,
@@ -645,6 +732,10 @@ class GasStationManager:
         return self._manual_sign_and_broadcast(tx, signer_pk, permission_id)
 
     def _http_undelegate_resource(self, owner_addr: str, receiver_addr: str, amount_sun: int, resource: str, signer_pk: PrivateKey, permission_id: int | None) -> str | None:
+        txid, fallback = self._broadcast_offline(
+            offline_tx.undelegate_resource_contract(owner_addr, receiver_addr, int(amount_sun), resource), signer_pk, permission_id)
+        if not fallback:
+            return txid
         payload = {
             "owner_address": owner_addr,
             "receiver_address": receiver_addr,
@@ -699,12 +790,19 @@ class GasStationManager:
             return None
 
     def _http_create_account(self, owner_addr: str, new_addr: str, signer_hex: str, permission_id: int | None = None) -> str | None:
-        """Create account by asking the node to construct the transaction with Permission_id,
-        then sign locally and broadcast (modern, secure flow)."""
+        """Create account: offline-built AccountCreateContract first; otherwise ask the node to
+        construct the transaction with Permission_id, then sign locally and broadcast."""
         try:
             pid = int(permission_id) if permission_id is not None else None
         except Exception:
             pid = None
+        try:
+            txid, fallback = self._broadcast_offline(
+                offline_tx.account_create_contract(owner_addr, new_addr), PrivateKey(bytes.fromhex(signer_hex)), pid)
+            if not fallback:
+                return txid
+        except Exception:
+            pass  # invalid signer hex is reported below
         # Ask node to build unsigned tx with proper permission selection
         payload = {"owner_address": owner_addr, "account_address": new_addr, "visible": True}
         if pid is not None:
@@ -796,6 +894,7 @@ class GasStationManager:
         permission_id: int | None = None,
     ) -> str | None:
         """Build, sign (with permission_id), and broadcast a TRX transfer using local signing (modern flow).
+        The transaction is built offline when possible; the node-built path is the fallback.
         Returns txid on success else None.
         """
         try:
@@ -805,6 +904,10 @@ class GasStationManager:
             except Exception as e:
                 logger.error("[gas_station] Invalid control signer hex for transfer: %s", e)
                 return None
+            txid, fallback = self._broadcast_offline(
+                offline_tx.transfer_contract(owner_addr, to_addr, int(amount_sun)), pk, permission_id)
+            if not fallback:
+                return txid
             # Ask node to build unsigned TRX transfer with Permission_id included
             body = {"owner_address": owner_addr, "to_address": to_addr, "amount": int(amount_sun), "visible": True}
             if permission_id is not None:
@@ -870,6 +973,7 @@ class GasStationManager:
             # Fallback: use tronpy broadcast
             try:
                 res = txn_obj.broadcast()
+                self._note_broadcast(txn_obj)
                 return res.get("txid") or res.get("txID")
             except Exception as e:  # noqa: BLE001 - provider-specific
                 logger.warning("[gas_station] tronpy broadcast fallback failed: %s", e)
@@ -895,6 +999,7 @@ class GasStationManager:
         # Final fallback to tronpy broadcast
         try:
             res = txn_obj.broadcast()
+            self._note_broadcast(txn_obj)
             txid = res.get("txid") or res.get("txID")
             if txid:
                 try:
@@ -1011,6 +1116,7 @@ class GasStationManager:
             # Broadcast transaction
             logger.info("[gas_station] Broadcasting permission-based transaction...")
             response = signed_txn.broadcast()
+            self._note_broadcast(signed_txn)
             
             execution_time = time.time() - start_time
             
@@ -1026,7 +1132,7 @@ class GasStationManager:
                 
                 while time.time() - confirmation_start < max_wait:
                     time.sleep(verification_interval)
-                    if self._check_address_exists(target_address):
+                    if self._check_address_exists(target_address, max_age=0):
                         confirmed = True
                         break
                 
@@ -1077,195 +1183,36 @@ class GasStationManager:
                 }
             }
 
-    def delegate_resources_with_permission(self, target_address, energy_amount=None, bandwidth_amount=None):
+    def delegate_resources_with_permission(self, target_address, energy_amount=None, bandwidth_amount=None, *, purpose: str = "free_gas"):
         """
         Delegate resources using permission-based approach (same as activation)
         Uses signer key with Permission ID 2 for consistent authorization
+        ENERGY and BANDWIDTH delegations are broadcast back-to-back and confirmed together
+        Broadcast delegations are recorded as leases with the given purpose
         """
         start_time = time.time()
         
         try:
-            # Get signer private key from environment
-            signer_private_key = os.getenv('SIGNER_WALLET_PRIVATE_KEY')
-            if not signer_private_key:
-                return {
-                    "success": False,
-                    "message": "Signer private key not found in environment",
-                    "method": "permission_based_delegation"
-                }
-            
-            # Connect to TRON network
-            client = self._get_tron_client()
-            if not client:
+            try:
+                client, gas_wallet_address, signer_key = self._permission_delegation_setup()
+            except ValueError as e:
                 return {
                     "success": False,
-                    "message": "Failed to connect to TRON network",
+                    "message": str(e),
                     "method": "permission_based_delegation"
                 }
-            
-            # Get gas wallet address
-            gas_wallet_address = self.get_gas_wallet_address()
             logger.info("[gas_station] Permission-based delegation from %s to %s", 
                        gas_wallet_address, target_address)
             
-            delegation_results = []
-            
-            # Delegate energy if specified
-            if energy_amount and energy_amount > 0:
-                try:
-                    # Calculate TRX needed for energy using correct energy yield per TRX
-                    # According to TRON documentation: ~2.38 energy per TRX (100B daily energy / 42B frozen TRX)
-                    energy_yield_per_trx = 2.38  # Accurate August 2025 ratio
-                    trx_for_energy = max(1, int(energy_amount / energy_yield_per_trx))
-                    
-                    logger.info("[gas_station] Delegating %d TRX (for ~%d energy) using permission (yield: %.2f energy/TRX)", 
-                               trx_for_energy, energy_amount, energy_yield_per_trx)
-                    
-                    # Build delegation transaction with TRX amount in SUN
-                    txn_builder = client.trx.delegate_resource(
-                        owner=gas_wallet_address,
-                        receiver=target_address,
-                        balance=trx_for_energy * 1_000_000,  # TRX to SUN conversion
-                        resource='ENERGY'
-                    ).permission_id(2)  # Use Permission ID 2 for signer authorization
-                    
-                    # Build and sign with signer key
-                    txn = txn_builder.build()
-                    signed_txn = txn.sign(PrivateKey(bytes.fromhex(signer_private_key)))
-                    
-                    # Broadcast transaction
-                    response = signed_txn.broadcast()
-                    
-                    if response.get('result'):
-                        txn_id = response.get('txid')
-                        logger.info("[gas_station] Energy delegation transaction: %s", txn_id)
-                        
-                        # Fast verification like activation check (0.5s intervals)
-                        verification_success = self._verify_delegation_fast(target_address, "energy", energy_amount)
-                        delegation_results.append({
-                            "type": "energy",
-                            "amount": energy_amount,
-                            "trx_delegated": trx_for_energy,
-                            "success": verification_success,
-                            "transaction_id": txn_id
-                        })
-                    else:
-                        logger.error("[gas_station] Energy delegation broadcast failed: %s", response)
-                        delegation_results.append({
-                            "type": "energy",
-                            "amount": energy_amount,
-                            "trx_delegated": trx_for_energy,
-                            "success": False,
-                            "error": "Delegation broadcast failed"
-                        })
-                        
-                except Exception as e:
-                    logger.error("[gas_station] Energy delegation error: %s", str(e))
-                    delegation_results.append({
-                        "type": "energy",
-                        "amount": energy_amount,
-                        "success": False,
-                        "error": str(e)
-                    })
-            
-            # Delegate bandwidth if specified
-            if bandwidth_amount and bandwidth_amount > 0:
-                try:
-                    # Calculate TRX needed for bandwidth (bandwidth amount / bandwidth yield per TRX)
-                    bandwidth_yield_per_trx = 1500  # Conservative estimate  
-                    trx_for_bandwidth = max(1, int(bandwidth_amount / bandwidth_yield_per_trx))
-                    
-                    logger.info("[gas_station] Delegating %d TRX (for ~%d bandwidth) using permission", 
-                               trx_for_bandwidth, bandwidth_amount)
-                    
-                    # Build delegation transaction with TRX amount in SUN
-                    txn_builder = client.trx.delegate_resource(
-                        owner=gas_wallet_address,
-                        receiver=target_address,
-                        balance=trx_for_bandwidth * 1_000_000,  # TRX to SUN conversion
-                        resource='BANDWIDTH'
-                    ).permission_id(2)  # Use Permission ID 2 for signer authorization
-                    
-                    # Build and sign with signer key
-                    txn = txn_builder.build()
-                    signed_txn = txn.sign(PrivateKey(bytes.fromhex(signer_private_key)))
-                    
-                    # Broadcast transaction
-                    response = signed_txn.broadcast()
-                    
-                    if response.get('result'):
-                        txn_id = response.get('txid')
-                        logger.info("[gas_station] Bandwidth delegation transaction: %s", txn_id)
-                        
-                        # Fast verification like activation check (0.5s intervals)
-                        verification_success = self._verify_delegation_fast(target_address, "bandwidth", bandwidth_amount)
-                        delegation_results.append({
-                            "type": "bandwidth",
-                            "amount": bandwidth_amount,
-                            "trx_delegated": trx_for_bandwidth,
-                            "success": verification_success,
-                            "transaction_id": txn_id
-                        })
-                    else:
-                        logger.error("[gas_station] Bandwidth delegation broadcast failed: %s", response)
-                        delegation_results.append({
-                            "type": "bandwidth",
-                            "amount": bandwidth_amount,
-                            "trx_delegated": trx_for_bandwidth,
-                            "success": False,
-                            "error": "Delegation broadcast failed"
-                        })
-                        
-                except Exception as e:
-                    logger.error("[gas_station] Bandwidth delegation error: %s", str(e))
-                    delegation_results.append({
-                        "type": "bandwidth",
-                        "amount": bandwidth_amount,
-                        "success": False,
-                        "error": str(e)
-                    })
-            
-            # Evaluate overall success
-            successful_delegations = [r for r in delegation_results if r.get('success', False)]
-            execution_time = time.time() - start_time
-            
-            if len(successful_delegations) == len(delegation_results) and delegation_results:
-                return {
-                    "success": True,
-                    "message": f"Successfully delegated {len(successful_delegations)} resource types",
-                    "method": "permission_based_delegation",
-                    "execution_time": execution_time,
-                    "details": {
-                        "delegations": delegation_results,
-                        "successful_count": len(successful_delegations),
-                        "total_count": len(delegation_results)
-                    }
-                }
-            elif successful_delegations:
-                return {
-                    "success": False,
-                    "message": f"Partial delegation success: {len(successful_delegations)}/{len(delegation_results)}",
-                    "method": "permission_based_delegation",
-                    "execution_time": execution_time,
-                    "details": {
-                        "delegations": delegation_results,
-                        "successful_count": len(successful_delegations),
-                        "total_count": len(delegation_results),
-                        "partial_success": True
-                    }
-                }
-            else:
-                return {
-                    "success": False,
-                    "message": "All delegations failed",
-                    "method": "permission_based_delegation",
-                    "execution_time": execution_time,
-                    "details": {
-                        "delegations": delegation_results,
-                        "successful_count": 0,
-                        "total_count": len(delegation_results)
-                    }
-                }
+            delegation_results = [
+                self._broadcast_permission_delegation(client, gas_wallet_address, target_address, resource,
+                                                      self._permission_delegation_trx(resource, amount), signer_key,
+                                                      purpose, units=amount)
+                for resource, amount in (("ENERGY", energy_amount), ("BANDWIDTH", bandwidth_amount))
+                if amount and amount > 0
+            ]
+            self._confirm_permission_delegations(delegation_results)
+            return self._delegation_outcome(delegation_results, start_time)
                 
         except Exception as e:
             execution_time = time.time() - start_time
@@ -1282,58 +1229,98 @@ class GasStationManager:
                 }
             }
 
-    def _verify_delegation_fast(self, target_address: str, resource_type: str, expected_amount: int, max_attempts: int = 10, interval: float = 0.5) -> bool:
-        """
-        Fast verification of resource delegation using same approach as activation check.
-        Checks actual account resources with 0.5s intervals (up to 5 seconds for delegation).
-        
-        Args:
-            target_address: Address that should have received resources
-            resource_type: 'energy' or 'bandwidth'
-            expected_amount: Expected minimum amount delegated
-            max_attempts: Maximum verification attempts (default 10 = 5 seconds)
-            interval: Time between checks (default 0.5s like activation)
-        """
-        logger.info(f"[gas_station] Fast verification of {resource_type} delegation: {expected_amount} units to {target_address}")
-        
-        # Get baseline resources before verification
-        baseline_amount = 0
+    def _permission_delegation_setup(self) -> tuple:
+        """(client, gas wallet address, signer key) for Permission ID 2 delegations; ValueError when unavailable."""
+        signer_private_key = os.getenv('SIGNER_WALLET_PRIVATE_KEY')
+        if not signer_private_key:
+            raise ValueError("Signer private key not found in environment")
+        client = self._get_tron_client()
+        if not client:
+            raise ValueError("Failed to connect to TRON network")
+        return client, self.get_gas_wallet_address(), PrivateKey(bytes.fromhex(signer_private_key))
+
+    @staticmethod
+    def _permission_delegation_trx(resource: str, units: int) -> int:
+        """Whole TRX to delegate for units of a resource when no plan is given."""
+        # ~2.38 energy per TRX (100B daily energy / 42B frozen TRX, August 2025); conservative bandwidth estimate
+        yield_per_trx = 2.38 if resource == "ENERGY" else 1500
+        return max(1, int(units / yield_per_trx))
+
+    def _broadcast_permission_delegation(self, client, owner_address: str, target_address: str, resource: str,
+                                         trx_amount: float, signer_key: PrivateKey, purpose: str, *,
+                                         units: int | None = None) -> dict:
+        """Build, sign (Permission ID 2) and broadcast one delegation of trx_amount TRX without waiting for it.
+        units is the resource amount the TRX is meant to cover (reported as the entry's "amount").
+        Returns its delegation result entry; "success" is set by _confirm_permission_delegations."""
+        kind = resource.lower()
+        entry = {"type": kind, "amount": units, "success": False, "trx_delegated": trx_amount}
         try:
-            baseline_resources = self._get_account_resources(target_address)
-            baseline_amount = baseline_resources.get(f'{resource_type}_available', 0)
-            logger.info(f"[gas_station] Baseline {resource_type}: {baseline_amount}")
+            balance_sun = int(round(trx_amount * 1_000_000))
+            logger.info("[gas_station] Delegating %.6f TRX (for ~%s %s) using permission", trx_amount, units, kind)
+            txn = client.trx.delegate_resource(
+                owner=owner_address,
+                receiver=target_address,
+                balance=balance_sun,
+                resource=resource
+            ).permission_id(2).build()  # Use Permission ID 2 for signer authorization
+            signed_txn = txn.sign(signer_key)
+            response = signed_txn.broadcast()
+            self._note_broadcast(signed_txn)
+            if response.get('result'):
+                txn_id = response.get('txid')
+                logger.info("[gas_station] %s delegation transaction: %s", kind.capitalize(), txn_id)
+                self._record_lease(target_address, resource, balance_sun, purpose, txn_id)
+                entry["transaction_id"] = txn_id
+            else:
+                logger.error("[gas_station] %s delegation broadcast failed: %s", kind.capitalize(), response)
+                entry["error"] = "Delegation broadcast failed"
         except Exception as e:
-            logger.warning(f"[gas_station] Could not get baseline resources: {e}")
-            # Continue with baseline = 0 since any delegation should show up
-        
-        # Fast verification loop (same pattern as activation check)
-        for attempt in range(max_attempts):
-            try:
-                start_check = time.time()
-                current_resources = self._get_account_resources(target_address)
-                current_amount = current_resources.get(f'{resource_type}_available', 0)
-                check_time = time.time() - start_check
-                
-                # Check if we have any meaningful increase (any increase is success)
-                increase = current_amount - baseline_amount
-                success = increase > 0  # Accept any positive increase
-                
-                logger.info(f"[gas_station] Attempt {attempt + 1}: {resource_type} {current_amount} (+{increase}) - {'✅ SUCCESS' if success else '⏳ checking...'} (check: {check_time:.3f}s)")
-                
-                if success:
-                    logger.info(f"[gas_station] Delegation verified: {resource_type} increased by {increase} (target was {expected_amount})")
-                    return True
-                
-                if attempt < max_attempts - 1:
-                    time.sleep(interval)
-                    
-            except Exception as e:
-                logger.warning(f"[gas_station] Verification attempt {attempt + 1} failed: {e}")
-                if attempt < max_attempts - 1:
-                    time.sleep(interval)
-        
-        logger.warning(f"[gas_station] Fast verification timeout for {resource_type} delegation after {max_attempts * interval:.1f}s")
-        return False
+            logger.error("[gas_station] %s delegation error: %s", kind.capitalize(), str(e))
+            entry["error"] = str(e)
+        return entry
+
+    def _confirm_permission_delegations(self, entries: list[dict]) -> list[dict]:
+        """Wait for every broadcast delegation in entries at once; marks confirmed ones successful."""
+        txids = {e["transaction_id"]: e["type"] for e in entries if e.get("transaction_id")}
+        confirmed = self._wait_for_many(txids, "Permission delegation")
+        for entry in entries:
+            if entry.get("transaction_id"):
+                entry["success"] = confirmed.get(entry["transaction_id"], False)
+        return entries
+
+    @staticmethod
+    def _delegation_outcome(delegation_results: list[dict], start_time: float) -> dict:
+        """delegate_resources_with_permission result for confirmed delegation entries"""
+        successful_delegations = [r for r in delegation_results if r.get('success', False)]
+        execution_time = time.time() - start_time
+        details = {
+            "delegations": delegation_results,
+            "successful_count": len(successful_delegations),
+            "total_count": len(delegation_results)
+        }
+        if len(successful_delegations) == len(delegation_results) and delegation_results:
+            return {
+                "success": True,
+                "message": f"Successfully delegated {len(successful_delegations)} resource types",
+                "method": "permission_based_delegation",
+                "execution_time": execution_time,
+                "details": details
+            }
+        if successful_delegations:
+            return {
+                "success": False,
+                "message": f"Partial delegation success: {len(successful_delegations)}/{len(delegation_results)}",
+                "method": "permission_based_delegation",
+                "execution_time": execution_time,
+                "details": {**details, "partial_success": True}
+            }
+        return {
+            "success": False,
+            "message": "All delegations failed",
+            "method": "permission_based_delegation",
+            "execution_time": execution_time,
+            "details": details
+        }
 
     def is_permission_based_activation_available(self) -> dict:
         """
@@ -1437,19 +1424,16 @@ class GasStationManager:
     # Permissions inspection helpers
     # -------------------------------
     def _fetch_account_permissions(self, address: str) -> dict:
-        """Fetch and normalize account permissions structure from /wallet/getaccount.
+        """Fetch and normalize account permissions structure from /wallet/getaccount
+        (the cached AccountSnapshot body).
         Returns dict with keys: owner_permission, active_permissions (list).
         """
         if not address:
             return {"owner_permission": None, "active_permissions": []}
-        data, _ = self._http_local_remote(
-            "POST",
-            "/wallet/getaccount",
-            payload={"address": address, "visible": True},
-            timeout=8,
-        )
-        if data is None:
+        snap = get_account_snapshots().get(address)
+        if snap is None:
             return {"owner_permission": None, "active_permissions": []}
+        data = snap.account
 
         def _norm_perm(p: dict | None) -> dict | None:
             if not isinstance(p, dict):
@@ -1776,359 +1760,414 @@ class GasStationManager:
             return False
 
     # -------------------------------------------------
-    # Dry-run helpers (no state changes / no broadcasts)
+    # Batch preparation (many invoices in one pipeline)
     # -------------------------------------------------
-    def dry_run_prepare_for_sweep(self, target_address: str) -> dict:
-        """Return a simulation of what prepare_for_sweep WOULD do without sending txs.
-        Uses modern technique with smart contract probing and precise calculations.
-
-        Output dict keys:
-          exists: bool                -> whether account appears active
-          activation_needed: bool     -> would we attempt activation
-          activation_method: str|None -> 'permission_based' | 'transfer' | 'create_account' | None
-          current: {energy, bandwidth}
-          required: {energy, bandwidth}  (including safety buffers)
-          missing: {energy, bandwidth}
-          simulation: dict            -> smart contract simulation results
-          recipient_analysis: dict    -> destination account balance analysis
-          plan: {
-             energy_trx: float,      -> TRX that would be delegated for ENERGY (0 if none)
-             bandwidth_trx: float,   -> TRX that would be delegated for BANDWIDTH (0 if none)
-             safety_multiplier: float,
-             yields: {energy_per_trx, bandwidth_per_trx},
-             tx_budget_estimate: int,
-             delegation_method: str   -> 'permission_based' | 'traditional'
-          }
-          notes: list[str]           -> any caveats / fallbacks used
+    def _batch_signers(self) -> dict:
+        """Signers for batch operations, resolved as in _prepare_for_sweep_single:
+        - activation: the gas wallet owner key; without it the control signer under its active
+          permission, within the operations that permission allows
+        - delegation: the control signer under its active permission, else the owner key when
+          GAS_CONTROL_FALLBACK_TO_OWNER allows
+        A control signer missing from the gas wallet's active permissions is not used. The
+        activation method follows account_activation_mode ('transfer' | 'create_account').
+
+        Returns {"activation": (key, permission_id, method) | None, "delegation": (key, permission_id) | None}.
         """
-        notes: list[str] = []
         try:
-            # Refresh client (mirrors prepare_for_sweep early behavior)
-            try:
-                self.client = self._get_tron_client()
-            except Exception:  # noqa: BLE001
-                try:
-                    self.reconnect_if_needed()
-                except Exception:  # noqa: BLE001
-                    notes.append("client_reconnect_failed")
-
-            owner_addr = None
-            try:
-                owner_addr = self.get_gas_wallet_address()
-            except Exception:
-                notes.append("owner_address_unavailable")
-
-            # Modern approach: Check account existence and activation status
-            exists = self._check_address_exists(target_address) 
-            activation_needed = not exists
-            
-            # Determine activation method preference (modern: permission-based first)
-            activation_method = None
-            if activation_needed:
-                # Check if permission-based activation is available
-                permission_status = self.is_permission_based_activation_available()
-                if permission_status["available"]:
-                    activation_method = "permission_based"
-                    notes.append("permission_based_activation_available")
-                else:
-                    # Fall back to traditional methods
-                    mode = getattr(self.tron_config, "account_activation_mode", "transfer")
-                    activation_method = mode if mode in {"transfer", "create_account"} else "transfer"
-                    notes.append("permission_based_activation_not_available")
-                    if permission_status.get("issues"):
-                        notes.extend([f"permission_issue: {issue}" for issue in permission_status["issues"][:2]])
-
-            # Current resources using precise account resource checking
-            cur = self._get_account_resources(target_address)
-            cur_e = int(cur.get("energy_available", 0) or 0)
-            cur_bw = int(cur.get("bandwidth_available", 0) or 0)
-
-            # Modern technique: Use smart contract simulation for precise energy/bandwidth calculation
-            simulation = {}
-            recipient_analysis = {}
-            try:
-                # Use the same precise estimation as the main gas-free function
-                # But handle fresh addresses properly - simulation needs existing addresses
-                if exists:
-                    # Address exists - use direct simulation
-                    sim = self.estimate_usdt_energy_precise(target_address, owner_addr, 1.0)
-                    simulation = sim
-                    used_e = int(sim.get("energy_used", 0) or 0)
-                    used_bw = int(sim.get("bandwidth_used", 0) or 0)
-                    notes.append(f"smart_contract_simulation_success: {sim.get('simulation_success', False)}")
-                    
-                    # Analyze recipient account for USDT balance (affects energy cost)
-                    if sim.get("recipient_has_usdt") is not None:
-                        recipient_analysis = {
-                            "has_usdt": sim["recipient_has_usdt"],
-                            "energy_category": "existing_holder" if sim["recipient_has_usdt"] else "new_holder",
-                            "expected_energy": "~32k" if sim["recipient_has_usdt"] else "~65k"
-                        }
-                        notes.append(f"recipient_usdt_status: {'existing' if sim['recipient_has_usdt'] else 'new'}_holder")
-                    else:
-                        recipient_analysis = {"has_usdt": None, "energy_category": "unknown"}
-                        notes.append("recipient_usdt_status_unknown")
-                else:
-                    # Fresh address - use a proxy simulation with gas wallet and analyze recipient
-                    if owner_addr:
-                        # Simulate from gas wallet to target to estimate cost
-                        proxy_sim = self.estimate_usdt_energy_precise(owner_addr, target_address, 1.0)
-                        simulation = proxy_sim
-                        used_e = int(proxy_sim.get("energy_used", 0) or 0)
-                        used_bw = int(proxy_sim.get("bandwidth_used", 0) or 0)
-                        notes.append(f"proxy_simulation_success: {proxy_sim.get('simulation_success', False)}")
-                        
-                        # For fresh addresses, recipient likely doesn't have USDT (new holder = higher energy)
-                        recipient_analysis = {
-                            "has_usdt": False,  # Fresh address unlikely to have USDT
-                            "energy_category": "new_holder",
-                            "expected_energy": "~65k"
-                        }
-                        notes.append("fresh_address_assumed_new_usdt_holder")
-                    else:
-                        # No owner address available for proxy simulation
-                        used_e = 0
-                        used_bw = 0
-                        simulation = {"energy_used": 0, "bandwidth_used": 0, "simulation_success": False}
-                        recipient_analysis = {"has_usdt": False, "energy_category": "new_holder"}
-                        notes.append("proxy_simulation_failed_no_owner")
-                    
-            except Exception as e:  # noqa: BLE001
-                used_e = 0
-                used_bw = 0
-                recipient_analysis = {"error": str(e)}
-                notes.append("smart_contract_simulation_failed")
-                
-            # Fallback to network-appropriate estimates if simulation failed
-            if used_e <= 0:
-                # Use intelligent fallback based on recipient analysis
-                if recipient_analysis.get("energy_category") == "new_holder":
-                    # Fresh addresses are new USDT holders - need more energy (~65k)
-                    used_e = int(getattr(self.tron_config, "usdt_energy_per_transfer_estimate", 65000) or 65000)
-                    notes.append("energy_estimate_fallback_new_holder")
-                else:
-                    # Existing addresses or unknown - use conservative middle estimate
-                    used_e = int(getattr(self.tron_config, "usdt_energy_per_transfer_estimate", 32000) or 32000)
-                    notes.append("energy_estimate_fallback_existing_holder")
-                
-            if used_bw <= 0:
-                used_bw = int(getattr(self.tron_config, "usdt_bandwidth_per_transfer_estimate", 345) or 345)
-                notes.append("bandwidth_estimate_fallback")
-
-            # Safety buffers using modern calculation approach (matches main gas-free function)
-            safety_e = int(max(5000, used_e * 0.15))  # Minimum 5k buffer, 15% of usage
-            safety_bw = int(max(50, used_bw * 0.25))   # Minimum 50 buffer, 25% of usage
-            required_e = used_e + safety_e
-            required_bw = used_bw + safety_bw
+            owner_key = self._get_gas_wallet_private_key()
+        except ValueError:
+            owner_key = None
+        control_key = self._get_control_signer_private_key()
+        control_pid = None
+        if control_key is not None:
+            ok_perm, ctrl_addr, pid_chk = self._control_signer_matches_permission()
+            if ok_perm:
+                control_pid = pid_chk if isinstance(pid_chk, int) else self._resolve_control_permission_id()
+            else:
+                logger.error(
+                    "[gas_station] Control signer %s is not present in any active permission (resolved id=%s). Will NOT use control for batch operations.",
+                    ctrl_addr,
+                    pid_chk,
+                )
+                control_key = None
 
-            # Account for activation bonus bandwidth (modern: more precise estimate)
-            activation_bonus_bw = 1500 if activation_needed else 0  # Updated to realistic value
-            effective_bw = cur_bw + activation_bonus_bw
-            miss_e = max(0, required_e - cur_e)
-            miss_bw = max(0, required_bw - effective_bw)
+        if control_key is not None:
+            delegation = (control_key, control_pid)
+        elif owner_key is not None and getattr(self.tron_config, "gas_control_fallback_to_owner", True):
+            delegation = (owner_key, None)
+        else:
+            delegation = None
 
-            # Modern yield calculations using the same methods as main gas-free function
-            # Account for network type differences (testnet vs mainnet)
-            is_testnet = self.tron_config.network != "mainnet"
-            
+        mode = getattr(self.tron_config, "account_activation_mode", "transfer")
+        activation = None
+        if owner_key is not None:
+            activation = (owner_key, None, "create_account" if mode == "create_account" else "transfer")
+        elif control_key is not None:
             try:
-                # Use get_global_resource_parameters for accurate live yields (same as main function)
-                params = self.get_global_resource_parameters()
-                e_yield = params.get("dailyEnergyPerTrx", 2.38)
-                bw_yield = params.get("dailyBandwidthPerTrx", 1500.0)
-                
-                # Network-specific adjustments for bandwidth yield
-                if is_testnet:
-                    # Testnet often has unusual staking economics with very low bandwidth yields
-                    # Use a reasonable minimum for practical calculations
-                    if bw_yield < 10.0:  # Less than 10 bandwidth per TRX is impractical
-                        config_bw_yield = float(getattr(self.tron_config, "bandwidth_units_per_trx_estimate", 1500.0) or 1500.0)
-                        # For testnet, use a reasonable middle ground
-                        bw_yield = max(50.0, min(config_bw_yield, 200.0))  # 50-200 range for testnet
-                        notes.append(f"testnet_bandwidth_yield_adjusted_from_{params.get('dailyBandwidthPerTrx', 0):.3f}_to_{bw_yield}")
-                    else:
-                        notes.append("testnet_bandwidth_yield_acceptable")
-                else:
-                    # Mainnet: use live values but with sanity check
-                    if bw_yield < 100.0:
-                        config_bw_yield = float(getattr(self.tron_config, "bandwidth_units_per_trx_estimate", 1500.0) or 1500.0)
-                        notes.append(f"mainnet_bandwidth_yield_low_{bw_yield:.3f}_using_config_{config_bw_yield}")
-                        bw_yield = config_bw_yield
-                    else:
-                        notes.append("mainnet_bandwidth_yield_acceptable")
-                
-                notes.append(f"live_network_yields_used_network_{self.tron_config.network}")
-            except Exception:  # noqa: BLE001
-                # Fallback to config estimates with network-appropriate values
-                e_yield = float(getattr(self.tron_config, "energy_units_per_trx_estimate", 2.38) or 2.38)
-                base_bw_yield = float(getattr(self.tron_config, "bandwidth_units_per_trx_estimate", 1500.0) or 1500.0)
-                
-                # Network-specific bandwidth adjustments for fallback
-                if is_testnet:
-                    bw_yield = max(50.0, min(base_bw_yield, 200.0))  # Conservative testnet range
-                    notes.append("testnet_config_yield_fallback")
-                else:
-                    bw_yield = base_bw_yield  # Full mainnet estimate
-                    notes.append("mainnet_config_yield_fallback")
-                    
-            safety_mult = float(getattr(self.tron_config, "delegation_safety_multiplier", 1.1) or 1.1)
-            try:
-                min_trx = max(1.0, float(getattr(self.tron_config, "min_delegate_trx", 1.0) or 1.0))
+                ctrl_flags = (self.get_control_permissions_summary().get("permission", {}).get("operations_decoded", {}).get("flags", {})) or {}
             except Exception:
-                min_trx = 1.0
-                notes.append("min_trx_fallback")
-                
-            max_energy_cap = float(getattr(self.tron_config, "max_energy_delegation_trx_per_invoice", 0.0) or 0.0)
-            max_bw_cap = float(getattr(self.tron_config, "max_bandwidth_delegation_trx_per_invoice", 0.0) or 0.0)
-
-            def _calc(missing_units: int, per_trx_yield: float, cap: float) -> float:
-                if missing_units <= 0 or per_trx_yield <= 0:
-                    return 0.0
-                raw = (missing_units / per_trx_yield) * safety_mult
-                amt = max(min_trx, raw)
-                if cap > 0:
-                    amt = min(amt, cap)
-                return round(amt, 6)
+                ctrl_flags = {}
+            can_transfer = bool(ctrl_flags.get("can_transfer_trx"))
+            can_create = bool(ctrl_flags.get("can_create_account"))
+            if can_create and (mode == "create_account" or not can_transfer):
+                activation = (control_key, control_pid, "create_account")
+            elif can_transfer:
+                activation = (control_key, control_pid, "transfer")
+            else:
+                logger.error("[gas_station] Control signer lacks activation permissions (no Transfer TRX, no Account Create)")
+        if activation is None and delegation is None:
+            logger.error("[gas_station] No signer for batch operations (owner key or control signer)")
+        return {"activation": activation, "delegation": delegation}
+
+    def _batch_activate(self, owner_addr: str, address: str, activation_sun: int, signer: tuple) -> str | None:
+        """Broadcast one activation with a signer from _batch_signers(); returns txid or None."""
+        key, permission_id, method = signer
+        signer_hex = self._pk_to_hex(key)
+        if method == "create_account":
+            return self._http_create_account(owner_addr, address, signer_hex, permission_id)
+        return self._http_transfer_with_permission(owner_addr, address, activation_sun, signer_hex, permission_id)
+
+    def _wait_for_many(self, txids: dict, operation: str) -> dict:
+        """Wait for several transactions at once; returns {txid: confirmed}.
+        Only as many waits run together as the shared lookup pool can serve at their probe limit."""
+        if not txids:
+            return {}
+        parallel = max(1, config.tron.confirm_pool_workers // max(1, config.tron.confirm_probes_per_wait))
+        with ThreadPoolExecutor(max_workers=min(parallel, len(txids)), thread_name_prefix="batch-confirm") as pool:
+            futures = {txid: pool.submit(self._wait_for_transaction, txid, f"{operation} {label}", 40,
+                                         suppress_final_warning=True)
+                       for txid, label in txids.items()}
+            return {txid: bool(f.result()) for txid, f in futures.items()}
+
+    def prepare_batch_for_sweep(self, addresses: list[str]) -> dict:
+        """Prepare many invoice addresses for sweeping in one pipeline.
+
+        1. Account snapshots for all addresses are read concurrently
+        2. Activations and delegations are planned together (USDT transfer needs per address,
+           delegation TRX from the network yield)
+        3. Wave 1 broadcasts every activation plus the delegations to already active accounts,
+           wave 2 the delegations to freshly activated ones; each wave is confirmed together
+        Total time is about two confirmation rounds whatever the number of addresses.
+        Delegations are recorded as leases; addresses whose plan does not fit the free stake
+        (lease manager capacity) are skipped with error "insufficient_stake". Signers are chosen
+        by _batch_signers(); multisig gas stations prepare each address with prepare_for_sweep.
+
+        Returns {address: {"success", "activated", "transaction_ids", "required_energy",
+        "required_bandwidth", "energy_available", "bandwidth_available", "error"?}}.
+        """
+        addresses = list(dict.fromkeys(a for a in addresses if a))
+        results = {a: {"success": False, "activated": False, "transaction_ids": []} for a in addresses}
+        if not addresses:
+            return results
+        if self.tron_config.gas_station_type == "multisig":
+            for addr in addresses:
+                ok = self.prepare_for_sweep(addr)
+                results[addr].update(success=ok, activated=ok)
+            return results
+        signers = self._batch_signers()
+        try:
+            owner_addr = self.get_gas_wallet_address()
+        except ValueError as e:
+            owner_addr = None
+            logger.error("[gas_station] Batch preparation needs the gas wallet address: %s", e)
+        if not owner_addr or (signers["activation"] is None and signers["delegation"] is None):
+            for r in results.values():
+                r["error"] = "no_gas_wallet_address" if not owner_addr else "no_signer"
+            return results
+        snapshots = get_account_snapshots()
+        workers = min(8, len(addresses))
+
+        # 1. State for all addresses
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch-state") as pool:
+            snaps = dict(zip(addresses, pool.map(snapshots.get, addresses)))
+
+        # 2. Plan
+        params = self.get_global_resource_parameters(owner_addr)
+        e_per_trx = float(params.get("dailyEnergyPerTrx") or 0) or float(self.tron_config.energy_units_per_trx_estimate or 2.38)
+        bw_per_trx = float(params.get("dailyBandwidthPerTrx") or 0) or 1500.0
+        activation_sun = int(self.tron_config.auto_activation_amount * 1_000_000)
+        plans = {}
+        for addr in addresses:
+            snap = snaps[addr]
+            if snap is None:
+                results[addr]["error"] = "state_unavailable"
+                continue
+            sim = self.estimate_usdt_energy_precise(addr, owner_addr, 1.0)
+            used_e = int(sim.get("energy_used", 0) or 0) or int(getattr(self.tron_config, "usdt_energy_per_transfer_estimate", 40000) or 40000)
+            used_bw = int(sim.get("bandwidth_used", 0) or 0) or int(getattr(self.tron_config, "usdt_bandwidth_per_transfer_estimate", 345) or 345)
+            required_e = max(int(used_e * 1.15), used_e + 5000)
+            required_bw = max(int(used_bw * 1.25), 350)
+            res = snap.resources()
+            # A new account gets the daily free bandwidth as soon as it exists
+            bonus_bw = 0 if snap.exists else 600
+            miss_e = max(0, required_e - int(res.get("energy_available", 0) or 0))
+            miss_bw = max(0, required_bw - int(res.get("bandwidth_available", 0) or 0) - bonus_bw)
+            delegations = []
+            if miss_e > 0:
+                delegations.append(("ENERGY", max(1.0, miss_e / e_per_trx * 1.2)))
+            if miss_bw > 0:
+                delegations.append(("BANDWIDTH", max(1.0, miss_bw / bw_per_trx * 1.2)))
+            results[addr].update(activated=snap.exists, required_energy=required_e, required_bandwidth=required_bw)
+            if (not snap.exists and signers["activation"] is None) or (delegations and signers["delegation"] is None):
+                results[addr]["error"] = "no_signer"
+                continue
+            plans[addr] = {"activate": not snap.exists, "delegations": delegations}
+
+        # Capacity already leased to an address stays with it; new delegations must fit the free stake
+        leases = get_lease_manager()
+        if not leases.capacity_known():
+            self.sync_lease_capacity()
+        free = {r: leases.available_sun(r) for r in ("ENERGY", "BANDWIDTH")}
+        for addr, plan in list(plans.items()):
+            if not plan["delegations"]:
+                leases.renew(addr)
+                continue
+            need = {}
+            for resource, trx in plan["delegations"]:
+                need[resource] = need.get(resource, 0) + int(round(trx * 1_000_000))
+            if any(free[r] is not None and free[r] < sun for r, sun in need.items()):
+                del plans[addr]
+                results[addr]["error"] = "insufficient_stake"
+                continue
+            for r, sun in need.items():
+                if free[r] is not None:
+                    free[r] -= sun
+
+        def _delegate(addr: str, resource: str, amount_trx: float) -> str | None:
+            key, perm_id = signers["delegation"]
+            return self._http_delegate_resource(owner_addr, addr, int(round(amount_trx * 1_000_000)), resource, key, perm_id)
+
+        def _broadcast_wave(ops: list) -> dict:
+            """ops: [(address, kind, callable)] -> {txid: (address, kind)}; broadcasts are pipelined."""
+            sent = {}
+            with ThreadPoolExecutor(max_workers=min(8, max(1, len(ops))), thread_name_prefix="batch-broadcast") as pool:
+                for (addr, kind, _), txid in zip(ops, pool.map(lambda op: op[2](), ops)):
+                    if txid:
+                        sent[txid] = (addr, kind)
+                        results[addr]["transaction_ids"].append(txid)
+                    else:
+                        results[addr].setdefault("failed_operations", []).append(kind)
+            return sent
+
+        # 3. Wave 1: activations + delegations to existing accounts
+        wave1 = []
+        for addr, plan in plans.items():
+            if plan["activate"]:
+                wave1.append((addr, "activation", lambda a=addr: self._batch_activate(
+                    owner_addr, a, activation_sun, signers["activation"])))
+            else:
+                wave1 += [(addr, resource, lambda a=addr, r=resource, t=trx: _delegate(a, r, t))
+                          for resource, trx in plan["delegations"]]
+        sent = _broadcast_wave(wave1)
+        confirmed = self._wait_for_many({txid: f"{kind} {addr}" for txid, (addr, kind) in sent.items()}, "batch")
+        for txid, (addr, kind) in sent.items():
+            if kind == "activation" and (confirmed.get(txid) or self._is_account_active(addr)):
+                results[addr]["activated"] = True
+
+        # Wave 2: delegations to freshly activated accounts
+        wave2 = [(addr, resource, lambda a=addr, r=resource, t=trx: _delegate(a, r, t))
+                 for addr, plan in plans.items() if plan["activate"] and results[addr]["activated"]
+                 for resource, trx in plan["delegations"]]
+        sent2 = _broadcast_wave(wave2)
+        confirmed.update(self._wait_for_many({txid: f"{kind} {addr}" for txid, (addr, kind) in sent2.items()}, "batch"))
+        sent.update(sent2)
+
+        # Final state for all planned addresses
+        planned = list(plans)
+        if planned:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch-state") as pool:
+                finals = dict(zip(planned, pool.map(lambda a: snapshots.get(a, max_age=0), planned)))
+        else:
+            finals = {}
+        for addr in planned:
+            r = results[addr]
+            final = finals.get(addr)
+            res = final.resources() if final is not None else {}
+            r["energy_available"] = int(res.get("energy_available", 0) or 0)
+            r["bandwidth_available"] = int(res.get("bandwidth_available", 0) or 0)
+            all_confirmed = not r.get("failed_operations") and all(
+                confirmed.get(t, False) for t in r["transaction_ids"])
+            resources_ok = (r["energy_available"] >= r["required_energy"] * 0.9
+                            and r["bandwidth_available"] >= r["required_bandwidth"] * 0.9)
+            r["success"] = bool(r["activated"] and (all_confirmed or resources_ok))
+        ok = sum(1 for r in results.values() if r["success"])
+        logger.info("[gas_station] Batch preparation: %d/%d addresses ready (%d transactions)", ok, len(addresses), len(sent))
+        return results
+
+    def activate_addresses(self, addresses: list[str]) -> dict:
+        """Activate several addresses in one pipeline: TRX transfers are broadcast back-to-back and
+        confirmed together. Returns {address: {"activated", "txid", "cost_sun"}}; accounts that
+        already exist count as activated at zero cost. The signer and activation method come from
+        _batch_signers(); multisig gas stations activate each address with prepare_for_sweep."""
+        addresses = list(dict.fromkeys(a for a in addresses if a))
+        results = {a: {"activated": False, "txid": None, "cost_sun": 0} for a in addresses}
+        if not addresses:
+            return results
+        if self.tron_config.gas_station_type == "multisig":
+            for addr in addresses:
+                results[addr]["activated"] = self.prepare_for_sweep(addr)
+            return results
+        signer = self._batch_signers()["activation"]
+        try:
+            owner_addr = self.get_gas_wallet_address()
+        except ValueError as e:
+            logger.error("[gas_station] Batch activation needs the gas wallet address: %s", e)
+            return results
+        if signer is None:
+            return results
+        snapshots = get_account_snapshots()
+        with ThreadPoolExecutor(max_workers=min(8, len(addresses)), thread_name_prefix="batch-state") as pool:
+            snaps = dict(zip(addresses, pool.map(snapshots.get, addresses)))
+        todo = []
+        for addr, snap in snaps.items():
+            if snap is not None and snap.exists:
+                results[addr]["activated"] = True
+            elif snap is not None:
+                todo.append(addr)
+        if not todo:
+            return results
+        activation_sun = int(self.tron_config.auto_activation_amount * 1_000_000)
+        # create_account only burns the fee; a transfer also moves activation_sun to the account
+        cost_sun = int(self.get_chain_parameters().get("getCreateAccountFee") or 100_000)
+        if signer[2] == "transfer":
+            cost_sun += activation_sun
+        with ThreadPoolExecutor(max_workers=min(8, len(todo)), thread_name_prefix="batch-broadcast") as pool:
+            txids = list(pool.map(lambda a: self._batch_activate(owner_addr, a, activation_sun, signer), todo))
+        sent = {txid: addr for addr, txid in zip(todo, txids) if txid}
+        confirmed = self._wait_for_many({txid: f"activation {addr}" for txid, addr in sent.items()}, "batch")
+        for txid, addr in sent.items():
+            ok = confirmed.get(txid) or self._is_account_active(addr)
+            results[addr].update(activated=bool(ok), txid=txid, cost_sun=cost_sun if ok else 0)
+        logger.info("[gas_station] Batch activation: %d/%d new accounts activated",
+                    sum(1 for a in todo if results[a]["activated"]), len(todo))
+        return results
 
-            energy_trx = _calc(miss_e, e_yield, max_energy_cap)
-            bandwidth_trx = _calc(miss_bw, bw_yield, max_bw_cap)
+    # -------------------------------------------------
+    # Dry-run helpers (no state changes / no broadcasts)
+    # -------------------------------------------------
+    def collect_prepare_snapshot(self, target_address: str, *, max_age: float | None = None) -> PrepareSnapshot:
+        """Read every input of a Free Gas plan in one concurrent fan-out.
+
+        Target, gas wallet and signer account snapshots, permission status, global resource
+        yields and the USDT transfer estimate are fetched together; permission status waits
+        only for the gas wallet snapshot and the estimate only for the target's (its direction
+        depends on whether the target exists). A snapshot of the same target younger than
+        max_age (default TRON_PREPARE_SNAPSHOT_TTL_SEC) is returned as is.
+        """
+        store = get_prepare_snapshots()
+        cached = store.get(target_address, max_age=max_age)
+        if cached is not None:
+            return cached
+        started = time.monotonic()
+        snapshots = get_account_snapshots()
+        try:
+            owner_addr = self.get_gas_wallet_address()
+        except Exception:
+            owner_addr = None
+        signer_addr = None
+        try:
+            from dotenv import load_dotenv
+            load_dotenv()
+            signer_key_hex = os.getenv('SIGNER_WALLET_PRIVATE_KEY')
+            if signer_key_hex:
+                signer_addr = PrivateKey(bytes.fromhex(signer_key_hex)).public_key.to_base58check_address()
+        except Exception as e:
+            logger.debug("[gas_station] Signer key unavailable for prepare snapshot: %s", e)
+
+        with ThreadPoolExecutor(max_workers=7, thread_name_prefix="prepare-snapshot") as pool:
+            target_f = pool.submit(snapshots.get, target_address)
+            owner_f = pool.submit(snapshots.get, owner_addr) if owner_addr else None
+            signer_f = pool.submit(snapshots.get, signer_addr) if signer_addr else None
+            params_f = pool.submit(self.get_global_resource_parameters)
+
+            def _permission():
+                if owner_f is not None:
+                    owner_f.result()  # the permission check reads the same cached getaccount body
+                return self.is_permission_based_activation_available()
+
+            def _simulate():
+                target_snap = target_f.result()
+                if target_snap is not None and target_snap.exists:
+                    return self.estimate_usdt_energy_precise(target_address, owner_addr, 1.0)
+                if owner_addr:
+                    # A fresh address holds no USDT yet: the energy cache answers without a simulation
+                    return self.estimate_usdt_energy_precise(owner_addr, target_address, 1.0, recipient_has_usdt=False)
+                return None
 
-            # Determine delegation method (modern: prefer permission-based)
-            delegation_method = "permission_based"
-            try:
-                signer_key = os.getenv('SIGNER_WALLET_PRIVATE_KEY')
-                if not signer_key:
-                    delegation_method = "traditional"
-                    notes.append("delegation_method_traditional_no_signer")
-                else:
-                    notes.append("delegation_method_permission_based")
-            except Exception:
-                delegation_method = "traditional"
-                notes.append("delegation_method_traditional_fallback")
+            permission_f = pool.submit(_permission)
+            simulation_f = pool.submit(_simulate)
 
-            # Enhanced wallet analysis: signer and gas wallet resource/cost breakdown
-            wallet_analysis = {}
-            try:
-                # Get signer wallet info (authorization provider)
-                signer_info = {}
-                if delegation_method == "permission_based":
-                    try:
-                        from dotenv import load_dotenv
-                        load_dotenv()
-                        signer_key_hex = os.getenv('SIGNER_WALLET_PRIVATE_KEY')
-                        if signer_key_hex:
-                            signer_pk = PrivateKey(bytes.fromhex(signer_key_hex))
-                            signer_address = signer_pk.public_key.to_base58check_address()
-                            signer_resources = self._get_account_resources(signer_address)
-                            
-                            signer_info = {
-                                "address": signer_address,
-                                "role": "authorization_provider",
-                                "current_resources": {
-                                    "energy": signer_resources.get("energy_available", 0),
-                                    "bandwidth": signer_resources.get("bandwidth_available", 0),
-                                    "balance_trx": signer_resources.get("details", {}).get("balance_trx", 0)
-                                },
-                                "estimated_costs": {
-                                    "activation_tx_bandwidth": 270 if activation_needed else 0,
-                                    "delegation_tx_bandwidth": 270 if (miss_e > 0 or miss_bw > 0) else 0,
-                                    "total_bandwidth_needed": (270 if activation_needed else 0) + (270 if (miss_e > 0 or miss_bw > 0) else 0),
-                                    "trx_burned": 0,  # Signer doesn't burn TRX, just signs
-                                    "notes": "Signs transactions but doesn't provide resources"
-                                }
-                            }
-                            notes.append("signer_wallet_analyzed")
-                    except Exception as e:
-                        signer_info = {"error": str(e), "role": "authorization_provider"}
-                        notes.append("signer_wallet_analysis_failed")
-                
-                # Get gas wallet info (resource provider)
-                gas_wallet_info = {}
+            def _result(future, default=None):
                 try:
-                    gas_wallet_address = self.get_gas_wallet_address()
-                    gas_wallet_resources = self._get_account_resources(gas_wallet_address)
-                    
-                    # Calculate actual TRX costs for gas wallet
-                    # Activation: Only the transfer amount (auto_activation_amount), network handles burn automatically
-                    activation_trx = getattr(self.tron_config, 'auto_activation_amount', 1.0) if activation_needed else 0.0
-                    
-                    # Resource delegation: TRX gets FROZEN (not burned) to delegate resources
-                    # The TRX remains in gas wallet but frozen, can be unfrozen later
-                    frozen_energy_trx = energy_trx  # This TRX gets frozen for energy delegation
-                    frozen_bandwidth_trx = bandwidth_trx  # This TRX gets frozen for bandwidth delegation
-                    
-                    # Total TRX impact: activation transfer + frozen amounts
-                    total_trx_sent = activation_trx  # Only this leaves the wallet
-                    total_trx_frozen = frozen_energy_trx + frozen_bandwidth_trx  # This gets frozen in wallet
-                    total_trx_impact = total_trx_sent + total_trx_frozen  # Total balance impact
-                    
-                    gas_wallet_info = {
-                        "address": gas_wallet_address,
-                        "role": "resource_provider",
-                        "current_resources": {
-                            "energy": gas_wallet_resources.get("energy_available", 0),
-                            "bandwidth": gas_wallet_resources.get("bandwidth_available", 0),
-                            "balance_trx": gas_wallet_resources.get("details", {}).get("balance_trx", 0)
-                        },
-                        "estimated_costs": {
-                            "activation_transfer_trx": activation_trx,  # TRX sent to target (gone from wallet)
-                            "energy_delegation_frozen_trx": frozen_energy_trx,  # TRX frozen for energy (stays in wallet)
-                            "bandwidth_delegation_frozen_trx": frozen_bandwidth_trx,  # TRX frozen for bandwidth (stays in wallet)
-                            "total_trx_sent": total_trx_sent,  # Total TRX leaving wallet
-                            "total_trx_frozen": total_trx_frozen,  # Total TRX frozen in wallet
-                            "total_balance_impact": total_trx_impact,  # Total impact on available balance
-                            "sufficient_balance": gas_wallet_resources.get("details", {}).get("balance_trx", 0) >= (total_trx_impact + 1.0),  # +1 TRX buffer
-                            "notes": f"Sends {activation_trx} TRX activation + freezes {total_trx_frozen:.3f} TRX for delegation on {self.tron_config.network}"
-                        }
-                    }
-                    notes.append("gas_wallet_analyzed")
+                    return future.result() if future is not None else default
                 except Exception as e:
-                    gas_wallet_info = {"error": str(e), "role": "resource_provider"}
-                    notes.append("gas_wallet_analysis_failed")
-                
-                wallet_analysis = {
-                    "signer": signer_info,
-                    "gas_wallet": gas_wallet_info,
-                    "operation_summary": {
-                        "total_trx_sent": gas_wallet_info.get("estimated_costs", {}).get("total_trx_sent", 0),
-                        "total_trx_frozen": gas_wallet_info.get("estimated_costs", {}).get("total_trx_frozen", 0),
-                        "total_balance_impact": gas_wallet_info.get("estimated_costs", {}).get("total_balance_impact", 0),
-                        "network_type": self.tron_config.network,
-                        "delegation_method": delegation_method,
-                        "transactions_count": 1 + int(energy_trx > 0) + int(bandwidth_trx > 0),  # activation + delegations
-                        "signer_sufficient_bandwidth": signer_info.get("estimated_costs", {}).get("total_bandwidth_needed", 0) <= signer_info.get("current_resources", {}).get("bandwidth", 0) if signer_info else True,
-                        "gas_wallet_sufficient_balance": gas_wallet_info.get("estimated_costs", {}).get("sufficient_balance", False) if gas_wallet_info else False,
-                        "delegation_explanation": "TRX gets frozen (not burned) for resource delegation and can be unfrozen later"
-                    }
-                }
-                
+                    logger.warning("[gas_station] Prepare snapshot input failed: %s", e)
+                    return default
+
+            target_snap = _result(target_f)
+            owner_snap = _result(owner_f)
+            signer_snap = _result(signer_f)
+            permission = _result(permission_f, {"available": False, "issues": ["permission check failed"], "details": {}})
+            params = _result(params_f)
+            simulation, simulation_error = None, None
+            try:
+                simulation = simulation_f.result()
             except Exception as e:
-                wallet_analysis = {"error": str(e)}
-                notes.append("wallet_analysis_failed")
+                simulation_error = str(e)
+
+        empty = {"energy_available": 0, "bandwidth_available": 0, "details": {}}
+        snap = PrepareSnapshot(
+            target=target_address,
+            owner=owner_addr,
+            network=self.tron_config.network,
+            exists=bool(target_snap and target_snap.exists),
+            target_resources=target_snap.resources() if target_snap is not None else empty,
+            owner_resources=owner_snap.resources() if owner_snap is not None else None,
+            signer_address=signer_addr,
+            signer_resources=signer_snap.resources() if signer_snap is not None else None,
+            permission=permission,
+            params=params,
+            simulation=simulation,
+            simulation_error=simulation_error,
+            fetched_at=time.monotonic(),
+            fetch_ms=(time.monotonic() - started) * 1000.0,
+        )
+        store.put(snap)
+        return snap
 
-            return {
-                "exists": exists,
-                "activation_needed": activation_needed,
-                "activation_method": activation_method,
-                "current": {"energy": cur_e, "bandwidth": cur_bw},
-                "required": {"energy": required_e, "bandwidth": required_bw},
-                "missing": {"energy": miss_e, "bandwidth": miss_bw},
-                "simulation": simulation,
-                "recipient_analysis": recipient_analysis,
-                "wallet_analysis": wallet_analysis,
-                "plan": {
-                    "energy_trx": energy_trx,
-                    "bandwidth_trx": bandwidth_trx,
-                    "safety_multiplier": safety_mult,
-                    "yields": {"energy_per_trx": e_yield, "bandwidth_per_trx": bw_yield},
-                    "tx_budget_estimate": 1 + int(energy_trx > 0) + int(bandwidth_trx > 0),  # activation + delegations
-                    "delegation_method": delegation_method,
-                },
-                "notes": notes,
-            }
+    def dry_run_prepare_for_sweep(self, target_address: str, *, snapshot: PrepareSnapshot | None = None) -> dict:
+        """Return a simulation of what prepare_for_sweep WOULD do without sending txs.
+        Computed by prepare_planner.plan_preparation from one PrepareSnapshot (fetched here
+        unless given), the same plan intelligent_prepare_address_for_usdt executes.
+
+        Output dict keys:
+          exists: bool                -> whether account appears active
+          activation_needed: bool     -> would we attempt activation
+          activation_method: str|None -> 'permission_based' | 'transfer' | 'create_account' | None
+          current: {energy, bandwidth}
+          required: {energy, bandwidth}  (including safety buffers)
+          missing: {energy, bandwidth}
+          transfer_cost: {energy, bandwidth} -> one USDT transfer (simulated or estimated), before buffers
+          simulation: dict            -> smart contract simulation results
+          recipient_analysis: dict    -> destination account balance analysis
+          wallet_analysis: dict       -> signer / gas wallet resources and costs
+          plan: {
+             energy_trx: float,      -> TRX that would be delegated for ENERGY (0 if none)
+             bandwidth_trx: float,   -> TRX that would be delegated for BANDWIDTH (0 if none)
+             safety_multiplier: float,
+             yields: {energy_per_trx, bandwidth_per_trx},
+             tx_budget_estimate: int,
+             delegation_method: str   -> 'permission_based' | 'traditional'
+          }
+          snapshot_ms: float         -> time spent reading the snapshot
+          notes: list[str]           -> any caveats / fallbacks used
+        """
+        try:
+            snap = snapshot or self.collect_prepare_snapshot(target_address)
+            return plan_preparation(snap, self.tron_config)
         except Exception as e:  # noqa: BLE001
-            return {"error": str(e), "notes": notes}
-    
+            return {"error": str(e), "notes": []}
+
     def _prepare_for_sweep_single(self, invoice_address: str) -> bool:
         """Prepare target address for sweeping in single wallet mode.
         Rules:
@@ -2261,6 +2300,7 @@ class GasStationManager:
                                     txb = self.client.trx.transfer(act_addr, invoice_address, amt)
                                     tx = txb.build().sign(act_pk)
                                     res = tx.broadcast()
+                                    self._note_broadcast(tx)
                                     txid = res.get("txid") or res.get("txID")
                                     if txid and self._wait_for_transaction(txid, "TRX activation (separate)", max_attempts=50, suppress_final_warning=True):
                                         time.sleep(2)
@@ -2431,6 +2471,7 @@ class GasStationManager:
                 delegation_signer,
                 activation_bonus_bw=activation_bonus_bw,
                 tx_budget_remaining=tx_budget_remaining,
+                purpose="sweep",
             ):
                 return False
 
@@ -2448,130 +2489,128 @@ class GasStationManager:
         logger.warning("Multisig sweep preparation not implemented yet for %s", invoice_address)
         return False
     
+    @staticmethod
+    def _tx_lookup_status(obj: dict | None) -> bool | None:
+        """Classify a transaction lookup response: True = confirmed SUCCESS,
+        False = definitively failed (non-SUCCESS result), None = not known yet."""
+        if not obj:
+            return None
+        result = (obj.get("receipt") or {}).get("result")
+        if result == "SUCCESS":
+            return True
+        # gettransactionbyid style
+        ret = obj.get("ret")
+        contract_ret = ret[0].get("contractRet") if isinstance(ret, list) and ret and isinstance(ret[0], dict) else None
+        if contract_ret == "SUCCESS":
+            return True
+        if result or contract_ret or obj.get("result") == "FAILED":
+            return False
+        return None
+
+    def _confirmation_probes(self, txid: str) -> list:
+        """(label, callable) lookups for one txid; each callable returns _tx_lookup_status()."""
+        headers = {"Content-Type": "application/json"}
+        local_conf = self.tron_config.get_tron_client_config()
+        local_sol = local_conf.get("solidity_node")
+        local_full = local_conf.get("full_node")
+        remote_sol = self.tron_config.remote_solidity_node
+        rh = dict(headers)
+        if self.tron_config.api_key:
+            rh["TRON-PRO-API-KEY"] = self.tron_config.api_key
+
+        def _http(url: str, hdrs: dict, timeout: float):
+            def _probe():
+                resp = get_transport().post(url, json={"value": txid}, headers=hdrs, timeout=timeout)
+                return self._tx_lookup_status(resp.json() or {}) if resp.ok else None
+            return _probe
+
+        probes = [("tronpy get_transaction_info", lambda: self._tx_lookup_status(self.client.get_transaction_info(txid)))]
+        if local_sol:
+            probes.append(("local walletsolidity/gettransactioninfobyid", _http(f"{local_sol}/walletsolidity/gettransactioninfobyid", headers, 5)))
+            probes.append(("local walletsolidity/gettransactionbyid", _http(f"{local_sol}/walletsolidity/gettransactionbyid", headers, 5)))
+        if remote_sol:
+            probes.append(("remote walletsolidity/gettransactioninfobyid", _http(f"{remote_sol}/walletsolidity/gettransactioninfobyid", rh, 8)))
+            probes.append(("remote walletsolidity/gettransactionbyid", _http(f"{remote_sol}/walletsolidity/gettransactionbyid", rh, 8)))
+        # Fullnode gettransactionbyid (may not be solidified yet)
+        if local_full:
+            probes.append(("local wallet/gettransactionbyid", _http(f"{local_full}/wallet/gettransactionbyid", headers, 5)))
+        return probes
+
     def _wait_for_transaction(self, txid: str, operation: str, max_attempts: int = 40, *, suppress_final_warning: bool = False) -> bool:
-        """Wait for transaction confirmation with resilient polling and multiple fallbacks.
-        Tries tronpy, local solidity gettransactioninfobyid, local solidity gettransactionbyid,
-        and remote equivalents. Treats contractRet SUCCESS as confirmation too.
+        """Wait for transaction confirmation with hedged, concurrent polling.
+        Every round launches the tronpy, local/remote solidity and local fullnode lookups
+        concurrently; the first definitive answer wins (SUCCESS receipt or contractRet, or an
+        explicit failure) and the remaining lookups are cancelled or ignored. A lookup still in
+        flight from an earlier round is not relaunched, so one slow endpoint never delays the
+        others. Rounds are spaced by an adaptive backoff (CONFIRM_BACKOFF_* below). At most
+        TRON_CONFIRM_PROBES_PER_WAIT lookups are in flight; each round launches the next ones in turn.
 
         Notes:
         - JSON parse errors (e.g., empty body) from flaky nodes are logged at DEBUG to avoid noise.
-        - Callers may pass a lower max_attempts for low-risk ops like resource delegation.
-        - Uses fast 0.5s polling interval for improved confirmation speed.
+        - Callers may pass a lower max_attempts (rounds) for low-risk ops like resource delegation.
         """
         logger.info("Waiting for %s transaction: %s", operation, txid)
-        for attempt in range(max_attempts):
-            # 1) Try tronpy client (may raise JSON errors on flaky nodes)
-            try:
-                receipt = self.client.get_transaction_info(txid)
-                if receipt and receipt.get("receipt", {}).get("result") == "SUCCESS":
-                    logger.info("%s successful: %s", operation, txid)
+        if self.tron_config.confirm_watcher_enabled:
+            # Shared block follower: no per-txid polling while the transaction is pending
+            conf = get_confirmation_watcher().wait(txid, timeout=max_attempts * CONFIRM_BACKOFF_MAX_SEC)
+            if conf is not None:
+                if conf.success:
+                    logger.info("%s successful in block %s: %s", operation, conf.block_number, txid)
                     return True
-            except (requests.RequestException, ValueError, RuntimeError) as e:
-                # Treat JSON parse errors (ValueError) as benign and always log at DEBUG
-                if isinstance(e, ValueError):
-                    logger.debug(
-                        "tronpy get_transaction_info JSON parse/empty response (attempt %d/%d): %s",
-                        attempt + 1,
-                        max_attempts,
-                        e,
-                    )
-                else:
-                    # Quiet early errors
-                    if attempt < 5:
-                        logger.debug(
-                            "tronpy get_transaction_info error (attempt %d/%d): %s",
-                            attempt + 1,
-                            max_attempts,
-                            e,
-                        )
-                    else:
-                        logger.warning(
-                            "tronpy get_transaction_info error (attempt %d/%d): %s",
-                            attempt + 1,
-                            max_attempts,
-                            e,
-                        )
-
-            # 2) Fallbacks: local/remote solidity and fullnode endpoints
-            try:
-                headers = {"Content-Type": "application/json"}
-                # Local endpoints
-                local_conf = self.tron_config.get_tron_client_config()
-                local_sol = local_conf.get("solidity_node")
-                local_full = local_conf.get("full_node")
-
-                # Helper to check responses
-                def _is_success_json(obj: dict) -> bool:
-                    if not obj:
-                        return False
-                    if obj.get("receipt", {}).get("result") == "SUCCESS":
-                        return True
-                    # gettransactionbyid style
-                    ret = obj.get("ret")
-                    if isinstance(ret, list) and ret and isinstance(ret[0], dict):
-                        if ret[0].get("contractRet") == "SUCCESS":
-                            return True
-                    return False
-
-                # Local solidity gettransactioninfobyid
-                if local_sol:
-                    url = f"{local_sol}/walletsolidity/gettransactioninfobyid"
-                    resp = requests.post(url, json={"value": txid}, headers=headers, timeout=5)
-                    if resp.ok:
-                        data = resp.json() or {}
-                        if _is_success_json(data):
-                            logger.info("%s successful via local walletsolidity/gettransactioninfobyid", operation)
-                            return True
-                # Local solidity gettransactionbyid (checks contractRet)
-                if local_sol:
-                    url = f"{local_sol}/walletsolidity/gettransactionbyid"
-                    resp = requests.post(url, json={"value": txid}, headers=headers, timeout=5)
-                    if resp.ok:
-                        data = resp.json() or {}
-                        if _is_success_json(data):
-                            logger.info("%s successful via local walletsolidity/gettransactionbyid", operation)
-                            return True
-                # Remote solidity
-                remote_sol = self.tron_config.remote_solidity_node
-                if remote_sol:
-                    rh = dict(headers)
-                    if self.tron_config.api_key:
-                        rh["TRON-PRO-API-KEY"] = self.tron_config.api_key
-                    url = f"{remote_sol}/walletsolidity/gettransactioninfobyid"
-                    resp = requests.post(url, json={"value": txid}, headers=rh, timeout=8)
-                    if resp.ok:
-                        data = resp.json() or {}
-                        if _is_success_json(data):
-                            logger.info("%s successful via remote walletsolidity/gettransactioninfobyid", operation)
-                            return True
-                    url = f"{remote_sol}/walletsolidity/gettransactionbyid"
-                    resp = requests.post(url, json={"value": txid}, headers=rh, timeout=8)
-                    if resp.ok:
-                        data = resp.json() or {}
-                        if _is_success_json(data):
-                            logger.info("%s successful via remote walletsolidity/gettransactionbyid", operation)
-                            return True
-                # As last resort, try fullnode gettransactionbyid (may not be confirmed yet)
-                if local_full:
-                    url = f"{local_full}/wallet/gettransactionbyid"
-                    resp = requests.post(url, json={"value": txid}, headers=headers, timeout=5)
-                    if resp.ok:
-                        data = resp.json() or {}
-                        if _is_success_json(data):
-                            logger.info("%s successful via local wallet/gettransactionbyid", operation)
+                logger.warning("%s failed on-chain (%s) in block %s: %s", operation, conf.contract_ret, conf.block_number, txid)
+                return False
+            # Not seen in followed blocks: finish with a few direct lookups
+            max_attempts = min(max_attempts, 3)
+        probes = self._confirmation_probes(txid)
+        limit = max(1, config.tron.confirm_probes_per_wait)
+        pool = get_confirm_pool()
+        in_flight: dict = {}  # future -> label
+        cursor = 0  # rotates the probe order so capped rounds still reach every endpoint
+        delay = CONFIRM_BACKOFF_INITIAL_SEC
+        try:
+            for attempt in range(max_attempts):
+                running = set(in_flight.values())
+                for i in range(len(probes)):
+                    if len(in_flight) >= limit:
+                        break
+                    label, fn = probes[(cursor + i) % len(probes)]
+                    if label not in running:
+                        in_flight[pool.submit(fn)] = label
+                cursor += 1
+                deadline = time.monotonic() + delay
+                while in_flight:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    done, _ = wait(list(in_flight), timeout=remaining, return_when=FIRST_COMPLETED)
+                    if not done:
+                        break
+                    for fut in done:
+                        label = in_flight.pop(fut)
+                        try:
+                            status = fut.result()
+                        except Exception as e:  # lookups may raise anything (tronpy TransactionNotFound, JSON, network)
+                            # JSON parse errors (ValueError) are benign; quiet early errors
+                            if isinstance(e, ValueError) or attempt < 5:
+                                logger.debug("%s lookup error (attempt %d/%d): %s", label, attempt + 1, max_attempts, e)
+                            else:
+                                logger.warning("%s lookup error (attempt %d/%d): %s", label, attempt + 1, max_attempts, e)
+                            continue
+                        if status is True:
+                            logger.info("%s successful via %s: %s", operation, label, txid)
                             return True
-            except (requests.RequestException, ValueError) as fe:
-                # ValueError here is typically a JSON decode error or empty body: log at DEBUG only
-                if isinstance(fe, ValueError):
-                    logger.debug("Fallback tx lookup JSON parse/empty (attempt %d/%d): %s", attempt + 1, max_attempts, fe)
-                else:
-                    if attempt < 5:
-                        logger.debug("Fallback tx lookup error (attempt %d/%d): %s", attempt + 1, max_attempts, fe)
-                    else:
-                        logger.warning("Fallback tx lookup error (attempt %d/%d): %s", attempt + 1, max_attempts, fe)
-
-            # Fast polling interval for improved confirmation speed (matches timed_activation.py approach)
-            time.sleep(0.5)
+                        if status is False:
+                            logger.warning("%s failed on-chain (%s): %s", operation, label, txid)
+                            return False
+                if attempt < max_attempts - 1:
+                    # Sleep out the rest of the round, then back off for the next one
+                    remaining = deadline - time.monotonic()
+                    if remaining > 0:
+                        time.sleep(remaining)
+                    delay = min(CONFIRM_BACKOFF_MAX_SEC, delay * CONFIRM_BACKOFF_FACTOR)
+        finally:
+            for fut in in_flight:
+                fut.cancel()
 
         # Avoid scary ERROR for delegation/activation operations; nodes sometimes omit tx info even when effects land
         op_lower = (operation or "").lower()
@@ -2584,29 +2623,21 @@ class GasStationManager:
                 logger.error("%s failed or timed out: %s", operation, txid)
         return False
 
-    def _check_address_exists(self, address: str) -> bool:
-        """Check if an address exists (is activated) on the TRON network."""
-        try:
-            account_data, _ = self._http_local_remote("POST", "/wallet/getaccount", 
-                                                    payload={"address": address, "visible": True}, 
-                                                    timeout=5)
-            return bool(account_data and account_data.get("address"))
-        except Exception:
-            return False
+    def _check_address_exists(self, address: str, *, max_age: float | None = None) -> bool:
+        """Check if an address exists (is activated) on the TRON network.
+        Polling loops pass max_age=0 so every check reads the node, not the cached snapshot."""
+        snap = get_account_snapshots().get(address, max_age=max_age)
+        return bool(snap and snap.exists)
 
     def check_account_activated_with_details(self, address: str) -> tuple[bool, dict]:
         """
         Fast account activation check with detailed response (inspired by timed_activation.py).
         Returns (is_activated, account_data) for comprehensive verification.
         """
-        try:
-            account_info = self.client.get_account(address)
-            # Handle TRON API response as dict, not object attributes (corrected approach from timed_activation.py)
-            if account_info and isinstance(account_info, dict) and 'address' in account_info:
-                return True, account_info
-            return False, None
-        except Exception:
-            return False, None
+        snap = get_account_snapshots().get(address)
+        if snap and snap.exists:
+            return True, snap.account
+        return False, None
 
     def get_account_activation_requirements(self, target_address: str) -> dict:
         """Calculate the real costs and benefits of activating a TRON account.
@@ -2708,84 +2739,19 @@ class GasStationManager:
                 "fallback_cost_trx": 0.1  # Conservative estimate
             }
 
-    def _get_account_resources(self, address: str) -> dict:
+    def _get_account_resources(self, address: str, *, max_age: float | None = None) -> dict:
         """Return current account resources: energy/bandwidth available.
         Bandwidth combines free and paid (delegated) bandwidth.
         Accounts the 600 daily free bandwidth for activated accounts.
+        Built from one cached AccountSnapshot (getaccount + getaccountresource);
+        max_age=0 forces a fresh read.
         """
-        try:
-            acc = self.client.get_account_resource(address)
-        except Exception as e:  # tronpy may raise AddressNotFound or requests errors
-            try:
-                from tronpy.exceptions import AddressNotFound  # type: ignore
-                if isinstance(e, AddressNotFound):
-                    return {"energy_available": 0, "bandwidth_available": 0, "_inactive": True}
-            except Exception:
-                pass
-            acc = {}
-        
-        try:
-            energy_limit = int(acc.get("EnergyLimit", 0))
-            energy_used = int(acc.get("EnergyUsed", 0))
-        except (TypeError, ValueError):
-            energy_limit = 0
-            energy_used = 0
-            
-        try:
-            free_limit = int(acc.get("freeNetLimit", 0))
-            free_used = int(acc.get("freeNetUsed", 0))
-            paid_limit = int(acc.get("NetLimit", 0))
-            paid_used = int(acc.get("NetUsed", 0))
-        except (TypeError, ValueError):
-            free_limit = free_used = paid_limit = paid_used = 0
-        
-        # For activated accounts, ensure minimum 600 free bandwidth daily
-        # TRON gives every activated account 600 free bandwidth per day
-        if free_limit == 0 and paid_limit == 0:
-            # Account might not be activated or has no resources
-            # Check if account exists by trying to get basic account info
-            try:
-                account_data, _ = self._http_local_remote("POST", "/wallet/getaccount", 
-                                                        payload={"address": address, "visible": True}, 
-                                                        timeout=3)
-                account_exists = bool(account_data and account_data.get("address"))
-                if account_exists:
-                    # Account exists but may not have used bandwidth yet
-                    # Set minimum 600 free bandwidth for activated accounts
-                    free_limit = max(free_limit, 600)
-            except Exception:
-                pass
-        
-        energy_avail = max(0, energy_limit - energy_used)
-        bandwidth_avail = max(0, (free_limit - free_used) + (paid_limit - paid_used))
-        
-        # Also get TRX balance from account data
-        balance_trx = 0
-        try:
-            account_data, _ = self._http_local_remote("POST", "/wallet/getaccount", 
-                                                    payload={"address": address, "visible": True}, 
-                                                    timeout=3)
-            if account_data and "balance" in account_data:
-                balance_sun = account_data["balance"]
-                balance_trx = balance_sun / 1e6
-        except Exception:
-            pass
-        
-        result = {
-            "energy_available": energy_avail, 
-            "bandwidth_available": bandwidth_avail,
-            "details": {
-                "energy_limit": energy_limit,
-                "energy_used": energy_used,
-                "free_bandwidth_limit": free_limit,
-                "free_bandwidth_used": free_used,
-                "paid_bandwidth_limit": paid_limit,
-                "paid_bandwidth_used": paid_used,
-                "balance_trx": balance_trx
-            }
-        }
-        
-        return result
+        snap = get_account_snapshots().get(address, max_age=max_age)
+        if snap is None:
+            return {"energy_available": 0, "bandwidth_available": 0, "details": {
+                "energy_limit": 0, "energy_used": 0, "free_bandwidth_limit": 0, "free_bandwidth_used": 0,
+                "paid_bandwidth_limit": 0, "paid_bandwidth_used": 0, "balance_trx": 0}}
+        return snap.resources()
 
     def _get_incoming_delegation_summary(self, to_address: str, from_address: str) -> dict:
         """Return summary of incoming delegations to 'to_address' from 'from_address'.
@@ -2828,49 +2794,21 @@ class GasStationManager:
         return {"energy": energy_sum, "bandwidth": bw_sum, "count": count_from_owner}
 
     def _is_account_active(self, address: str) -> bool:
-        """Heuristically determine if a TRON account exists/activated.
-        Tries tronpy get_account, then HTTP getaccount/getaccountresource for balance or freeNetLimit>0."""
-        # tronpy path
+        """Heuristically determine if a TRON account exists/activated:
+        the account snapshot shows the account, a balance, or freeNetLimit>0."""
+        snap = get_account_snapshots().get(address)
+        if snap is None:
+            return False
         try:
-            acc = self.client.get_account(address)
-            if acc:
-                return True
-        except (requests.RequestException, ValueError, RuntimeError):
-            pass
-        # getaccount
-        accj, _ = self._http_local_remote(
-            "POST",
-            "/wallet/getaccount",
-            payload={"address": address, "visible": True},
-            timeout=6,
-        )
-        if accj:
-            try:
-                bal = int(accj.get("balance", 0) or 0)
-            except Exception:
-                bal = 0
-            if bal > 0:
-                return True
-        # getaccountresource
-        resj, _ = self._http_local_remote(
-            "POST",
-            "/wallet/getaccountresource",
-            payload={"address": address, "visible": True},
-            timeout=6,
-        )
-        if resj:
-            try:
-                fnl = int(resj.get("freeNetLimit", 0) or 0)
-            except Exception:
-                fnl = 0
-            if fnl > 0:
-                return True
-        return False
+            fnl = int(snap.resource.get("freeNetLimit", 0) or 0)
+        except (TypeError, ValueError):
+            fnl = 0
+        return snap.exists or snap.balance_sun > 0 or fnl > 0
 
     def _calculate_precise_bandwidth(self, raw_data_hex: str) -> int:
-        """Calculate precise bandwidth points needed for a transaction.
-        Formula: (Length of raw_data_hex string / 2) + 65 bytes
-        The raw_data_hex length is divided by 2 to get bytes, plus 65 bytes for ECDSA signature.
+        """Calculate precise bandwidth points needed for a singly-signed transaction:
+        serialized size (raw_data plus one 65-byte ECDSA signature, with protobuf framing)
+        plus the 64-byte per-contract result allowance the network charges.
         """
         try:
             if not raw_data_hex:
@@ -2882,12 +2820,10 @@ class GasStationManager:
             # Return 0 if no actual hex data after prefix removal
             if not hex_str:
                 return 0
-            # Calculate bytes from hex string length and add signature overhead
-            raw_data_bytes = len(hex_str) // 2
-            signature_bytes = 65
-            total_bandwidth = raw_data_bytes + signature_bytes
-            logger.debug("[gas_station] Precise bandwidth calculation: %d raw bytes + %d signature = %d total", 
-                        raw_data_bytes, signature_bytes, total_bandwidth)
+            raw_data = bytes.fromhex(hex_str)
+            total_bandwidth = offline_tx.transaction_bandwidth(raw_data)
+            logger.debug("[gas_station] Precise bandwidth calculation: %d raw bytes -> %d total",
+                        len(raw_data), total_bandwidth)
             return total_bandwidth
         except Exception as e:
             logger.warning("[gas_station] Failed to calculate precise bandwidth: %s", e)
@@ -2895,11 +2831,11 @@ class GasStationManager:
 
     def _estimate_bandwidth_units_per_trx(self) -> int:
         """Estimate bandwidth units yielded per 1 TRX staked based on live chain parameters.
-        Uses /wallet/getchainparameters to get total net limit and total net weight; returns
-        floor(total_net_limit / total_net_weight) when available, else falls back to config.
+        Uses /wallet/getchainparameters (shared TTL cache) to get total net limit and total net
+        weight; returns floor(total_net_limit / total_net_weight) when available, else falls back to config.
         """
         try:
-            data, _ = self._http_local_remote("GET", "/wallet/getchainparameters", timeout=6)
+            data = get_chain_cache().chain_parameters_raw()
             if not data:
                 est = int(self.tron_config.bandwidth_units_per_trx_estimate or 0)
                 logger.info("[gas_station] BANDWIDTH yield fallback (no node response): %d units/TRX", est)
@@ -2946,7 +2882,7 @@ class GasStationManager:
             return est
 
     def get_global_resource_parameters(self, probe_address: str | None = None) -> dict:
-        """Fetch global resource parameters from /wallet/getaccountresource for correct daily yield calculation."""
+        """Global resource parameters from /wallet/getaccountresource (shared TTL cache) for correct daily yield calculation."""
         base = self.tron_config.get_tron_client_config().get("full_node")
         if not base:
             # Fallback to config estimates (accurate August 2025 values)
@@ -2967,7 +2903,7 @@ class GasStationManager:
             except Exception:
                 addr = self.tron_config.usdt_contract
         try:
-            data, _ = self._http_local_remote("POST", "/wallet/getaccountresource", payload={"address": addr, "visible": True}, timeout=6)
+            data = get_chain_cache().resource_totals(addr)
             if not data:
                 raise ValueError("Node did not return accountresource")
             # Log full account resource response for diagnostics
@@ -3023,13 +2959,9 @@ class GasStationManager:
         Returns dict: { energy_units, bandwidth_units, dailyEnergyPerTrx, dailyBandwidthPerTrx, network: {...} }
         """
         params = self.get_global_resource_parameters(probe_address)
-        # Log full chain parameters for diagnostics
-        try:
-            base = self.tron_config.get_tron_client_config().get("full_node")
-            r_chain = requests.get(f"{base}/wallet/getchainparameters", timeout=8)
-            logger.warning(f"[gas_station] Full chain parameters response: {r_chain.text}")
-        except Exception as e:
-            logger.warning(f"[gas_station] Error fetching chain parameters: {e}")
+        # Chain parameters for diagnostics (cached; DEBUG only)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[gas_station] Chain parameters: %s", self.get_chain_parameters())
         daily_e_per_trx = float(params.get("dailyEnergyPerTrx", 0.0) or 0.0)
         daily_bw_per_trx = float(params.get("dailyBandwidthPerTrx", 0.0) or 0.0)
         try:
@@ -3219,7 +3151,7 @@ class GasStationManager:
             base = self.tron_config.get_tron_client_config().get("full_node")
             owner_addr = self.get_gas_wallet_address()
             # Balance
-            r_acc = requests.post(
+            r_acc = get_transport().post(
                 f"{base}/wallet/getaccount", json={"address": owner_addr, "visible": True}, timeout=6
             )
             if r_acc.ok:
@@ -3230,7 +3162,7 @@ class GasStationManager:
                     available_trx = 0.0
             # Rewards (separate endpoint per TRON docs)
             try:
-                r_reward = requests.post(
+                r_reward = get_transport().post(
                     f"{base}/wallet/getReward", json={"address": owner_addr, "visible": True}, timeout=6
                 )
                 if r_reward.ok:
@@ -3284,37 +3216,37 @@ class GasStationManager:
         base = self.tron_config.get_tron_client_config().get("full_node")
         if not base:
             return {"getEnergyFee": None, "getTransactionFee": None}
-        try:
-            data, _ = self._http_local_remote("GET", "/wallet/getchainparameters", timeout=6)
-            if not data:
-                return {"getEnergyFee": None, "getTransactionFee": None}
-            params = data.get("chainParameter") or data.get("chain_parameter") or []
-            fees = {"getEnergyFee": None, "getTransactionFee": None}
-            for p in params:
-                k = (p.get("key") or "").strip()
-                try:
-                    v = int(p.get("value"))
-                except Exception:
-                    try:
-                        v = int(float(p.get("value")))
-                    except Exception:
-                        v = None
-                if k == "getEnergyFee":
-                    fees["getEnergyFee"] = v
-                elif k == "getTransactionFee":
-                    fees["getTransactionFee"] = v
-            return fees
-        except (requests.RequestException, ValueError):
-            return {"getEnergyFee": None, "getTransactionFee": None}
+        params = self.get_chain_parameters()
+        return {"getEnergyFee": params.get("getEnergyFee"), "getTransactionFee": params.get("getTransactionFee")}
+
+    def get_chain_parameters(self) -> dict:
+        """Chain parameters as {key: int value} from the shared TTL cache (empty if unavailable)."""
+        return get_chain_cache().chain_parameters()
+
+    @staticmethod
+    def _constant_call_succeeded(sim: dict | None) -> bool:
+        """True when a triggerconstantcontract reply ran to completion (result true, no REVERT)."""
+        if not sim or (sim.get("result") or {}).get("result") is not True:
+            return False
+        ret = (sim.get("transaction") or {}).get("ret")
+        for r in ret if isinstance(ret, list) else []:
+            if isinstance(r, dict) and (r.get("contractRet") not in (None, "SUCCESS") or r.get("ret") == "FAILED"):
+                return False
+        return True
+
+    def estimate_usdt_energy_precise(self, from_address: str, to_address: str | None = None, amount_usdt: float = 1.0,
+                                     *, recipient_has_usdt: bool | None = None) -> dict:
+        """Precise energy/bandwidth estimation for a USDT transfer.
+
+        - bandwidth_used: exact, from the transaction encoded locally (no node call)
+        - energy_used: from the energy cache when the recipient's USDT holder status is known
+          (passed in, or remembered from an earlier simulation), else one triggerconstantcontract
+          simulation, whose result is cached (~32k-class: recipient holds USDT, ~65k-class: new holder)
 
-    def estimate_usdt_energy_precise(self, from_address: str, to_address: str | None = None, amount_usdt: float = 1.0) -> dict:
-        """Get precise energy estimation for USDT transfer using triggerconstantcontract simulation.
-        
         Returns dict with:
-        - energy_used: Exact energy needed (32k for existing USDT holders, ~65k for new)
-        - bandwidth_used: Precise bandwidth from transaction size  
+        - energy_used, bandwidth_used
         - recipient_has_usdt: Whether recipient already holds USDT
-        - simulation_success: Whether the simulation was successful
+        - simulation_success: Whether an energy figure was obtained (energy_source: cache | simulation)
         """
         base = self.tron_config.get_tron_client_config().get("full_node")
         if not base or not from_address:
@@ -3326,74 +3258,70 @@ class GasStationManager:
             except Exception:
                 to_address = self.tron_config.usdt_contract
         
-        # Encode USDT transfer parameters per ABI: transfer(address,uint256)
-        to_hex = self._b58_to_hex(to_address) or ""
-        if to_hex.startswith("41"):
-            to_hex_20 = to_hex[2:]  # Remove 41 prefix for contract parameter
-        else:
-            to_hex_20 = to_hex
-        to_hex_20 = (to_hex_20 or "").lower().zfill(64)
-        
         try:
             amount_smallest = int(round(float(amount_usdt) * 1_000_000))  # USDT has 6 decimals
         except (TypeError, ValueError):
             amount_smallest = 1_000_000  # 1 USDT default
-        
-        amount_hex = hex(amount_smallest)[2:].lower().zfill(64)
-        encoded_parameter = to_hex_20 + amount_hex
-        
-        # Use triggerconstantcontract for precise energy estimation
+
+        try:
+            bandwidth_used = usdt_transfer_bandwidth(from_address, to_address, self.tron_config.usdt_contract, amount_smallest)
+        except Exception as e:  # invalid address input
+            logger.debug("[gas_station] Local bandwidth calculation failed: %s", e)
+            bandwidth_used = int(getattr(self.tron_config, "usdt_bandwidth_per_transfer_estimate", 345) or 345)
+
+        energy_cache = get_usdt_energy_cache()
+        if recipient_has_usdt is None:
+            recipient_has_usdt = energy_cache.holder_status(to_address)
+        cached_energy = energy_cache.energy(recipient_has_usdt)
+        result = {
+            "energy_used": 0,
+            "bandwidth_used": bandwidth_used,
+            "recipient_has_usdt": recipient_has_usdt,
+            "simulation_success": False,
+            "energy_source": None,
+            "from_address": from_address,
+            "to_address": to_address,
+            "amount_usdt": amount_usdt
+        }
+        if cached_energy is not None:
+            result.update(energy_used=cached_energy, simulation_success=True, energy_source="cache")
+            return result
+
+        # Encode USDT transfer parameters per ABI: transfer(address,uint256) (selector stripped)
+        try:
+            parameter = offline_tx.trc20_transfer_data(to_address, amount_smallest)[4:].hex()
+        except Exception:
+            to_hex = self._b58_to_hex(to_address) or ""
+            to_hex_20 = to_hex[2:] if to_hex.startswith("41") else to_hex
+            parameter = (to_hex_20 or "").lower().zfill(64) + hex(amount_smallest)[2:].lower().zfill(64)
         payload = {
             "owner_address": from_address,
             "contract_address": self.tron_config.usdt_contract,
             "function_selector": "transfer(address,uint256)",
-            "parameter": encoded_parameter,
+            "parameter": parameter,
             "visible": True,
             "call_value": 0,
         }
-        
-        energy_used = 0
-        bandwidth_used = 0
-        simulation_success = False
-        
         try:
             # Simulate the contract execution
-            result, _ = self._http_local_remote("POST", "/wallet/triggerconstantcontract", payload=payload, timeout=8)
-            if result:
-                energy_used = int(result.get("energy_used", 0) or 0)
-                simulation_success = True
+            sim, _ = self._http_local_remote("POST", "/wallet/triggerconstantcontract", payload=payload, timeout=8)
+            if self._constant_call_succeeded(sim):
+                energy_used = int(sim.get("energy_used", 0) or 0)
+                result.update(energy_used=energy_used, simulation_success=True, energy_source="simulation")
+                has_usdt = energy_cache.record(to_address, energy_used)
+                if has_usdt is not None:
+                    result["recipient_has_usdt"] = has_usdt
                 logger.info("[gas_station] USDT energy simulation: %d energy for %s -> %s", 
                            energy_used, from_address[:8] + "...", to_address[:8] + "...")
-                
-                # Also get precise bandwidth by creating the actual transaction
-                try:
-                    tx_payload = payload.copy()
-                    tx_resp, _ = self._http_local_remote("POST", "/wallet/triggersmartcontract", payload=tx_payload, timeout=8)
-                    if tx_resp and tx_resp.get("transaction") and tx_resp["transaction"].get("raw_data_hex"):
-                        raw_data_hex = tx_resp["transaction"]["raw_data_hex"]
-                        bandwidth_used = self._calculate_precise_bandwidth(raw_data_hex)
-                except Exception as e:
-                    logger.debug("[gas_station] Failed to get precise bandwidth, using fallback: %s", e)
-                    bandwidth_used = int(result.get("transaction", {}).get("net_usage", 0) or 0)
-                    
+            elif sim:
+                # A reverted call burns little energy; caching it would under-delegate every later transfer
+                logger.info("[gas_station] USDT energy simulation reverted for %s -> %s; not cached",
+                            from_address[:8] + "...", to_address[:8] + "...")
         except Exception as e:
             logger.warning("[gas_station] USDT energy simulation failed: %s", e)
-            energy_used = int(getattr(self.tron_config, "usdt_energy_per_transfer_estimate", 32000) or 32000)
-            bandwidth_used = int(getattr(self.tron_config, "usdt_bandwidth_per_transfer_estimate", 345) or 345)
-        
-        # Determine if recipient has USDT (affects energy cost)
-        # ~32k energy = recipient has USDT, ~65k = new USDT holder
-        recipient_has_usdt = energy_used < 50000 if energy_used > 0 else None
-        
-        return {
-            "energy_used": energy_used,
-            "bandwidth_used": bandwidth_used,
-            "recipient_has_usdt": recipient_has_usdt,
-            "simulation_success": simulation_success,
-            "from_address": from_address,
-            "to_address": to_address,
-            "amount_usdt": amount_usdt
-        }
+            result["energy_used"] = int(getattr(self.tron_config, "usdt_energy_per_transfer_estimate", 32000) or 32000)
+        return result
+
     def simulate_usdt_transfer(self, from_address: str, to_address: str | None = None, amount_usdt: float = 1.0) -> dict:
         """Simulate USDT transfer to estimate energy and bandwidth usage and potential burn cost.
         Returns dict with keys: energy_used, bandwidth_used, cost_sun, cost_trx, fees {getEnergyFee, getTransactionFee}.
@@ -3437,7 +3365,7 @@ class GasStationManager:
         """
         try:
             # Get chain parameters for reward information
-            chain_params, _ = self._http_local_remote("GET", "/wallet/getchainparameters", timeout=8)
+            chain_params = get_chain_cache().chain_parameters_raw()
             
             # Get SR list
             witnesses_resp, _ = self._http_local_remote("GET", "/wallet/listwitnesses", timeout=8)
@@ -3631,7 +3559,7 @@ class GasStationManager:
         Args:
             transaction_payload: The payload dict for creating the transaction (e.g., for triggersmartcontract)
         Returns:
-            Precise bandwidth points needed (raw_data_hex_length/2 + 65)
+            Precise bandwidth points needed (see _calculate_precise_bandwidth)
         """
         try:
             # Create the transaction to get raw_data_hex
@@ -3657,8 +3585,11 @@ class GasStationManager:
         include_energy: bool = True,
         include_bandwidth: bool = True,
         tx_budget_remaining: int = 2,
+        purpose: str = "sweep",
     ) -> None:
         """Compute and perform at most one ENERGY and one BANDWIDTH resource provisioning tx.
+        A confirmed (or effect-detected) delegation is recorded as a lease with the given purpose,
+        whichever method sent it.
         Improvements:
           - BANDWIDTH: prefer freeze (stake) first; delegate_resource only moves already staked bandwidth.
           - Yield floor upscale: if optimistic yield suggests <1 TRX but we have zero prior delegation effect, scale using floor.
@@ -3811,13 +3742,15 @@ class GasStationManager:
                             txn = self._pre_sign_embed_permission(txn, perm_id)
                         txn = txn.sign(signing_pk)
                         res_b = txn.broadcast()
+                        self._note_broadcast(txn)
                         txid = res_b.get("txid") or res_b.get("txID")
                     except Exception:
                         txid = None
             # Delegate path (either because not bandwidth or freeze-first failed)
             if not txid:
                 if is_control and perm_id is not None:
-                    txid = self._http_delegate_resource(owner_addr, receiver_addr, amt_sun, resource, signing_pk, perm_id)
+                    txid = self._http_delegate_resource(owner_addr, receiver_addr, amt_sun, resource, signing_pk, perm_id,
+                                                        purpose=None)
                     if txid:
                         method_used = method_used or "http_delegate"
                 if not txid:
@@ -3839,15 +3772,18 @@ class GasStationManager:
                         except TypeError:
                             txn = txn.sign(signing_pk)
                         res_b = txn.broadcast()
+                        self._note_broadcast(txn)
                         txid = res_b.get("txid") or res_b.get("txID")
             # Confirmation / effect-based success
             if txid and self._wait_for_transaction(txid, f"{resource} delegation", max_attempts=25, suppress_final_warning=True):
                 logger.info("[gas_station] %s delegation succeeded (method=%s, txid=%s, amount_trx=%.6f)", resource, method_used, txid, amount_trx)
+                self._record_lease(receiver_addr, resource, amt_sun, purpose, txid)
                 tx_budget_remaining -= 1
                 return
             post_res = self._get_account_resources(receiver_addr)
             if resource.upper() == "ENERGY" and post_res.get("energy_available", 0) > pre_res.get("energy_available", 0):
                 logger.info("[gas_station] ENERGY delegation unconfirmed but effect detected (%d->%d)", pre_res.get("energy_available", 0), post_res.get("energy_available", 0))
+                self._record_lease(receiver_addr, resource, amt_sun, purpose, txid)
                 tx_budget_remaining -= 1
                 return
             if resource.upper() == "BANDWIDTH":
@@ -3858,6 +3794,7 @@ class GasStationManager:
                     threshold = max(25, int(expected_missing_units * 0.5))
                     if delta_bw >= threshold or post_bw >= pre_bw + expected_missing_units:
                         logger.info("[gas_station] BANDWIDTH delegation unconfirmed but effect detected +%d >= threshold %d", delta_bw, threshold)
+                        self._record_lease(receiver_addr, resource, amt_sun, purpose, txid)
                         tx_budget_remaining -= 1
                         return
                     else:
@@ -3879,8 +3816,10 @@ class GasStationManager:
         *,
         activation_bonus_bw: int = 0,
         tx_budget_remaining: int = 2,
+        purpose: str = "sweep",
     ) -> bool:
         """Ensure target address has enough ENERGY & BANDWIDTH for a single USDT transfer.
+        Delegations are recorded as leases with the given purpose.
         1) Read current resources.
         2) Simulate a transfer to estimate usage (fallback to config/defaults if simulation fails).
         3) Delegate missing resources (ENERGY first) within remaining tx budget.
@@ -3962,7 +3901,8 @@ class GasStationManager:
             delegation_result = self.delegate_resources_with_permission(
                 target_addr,
                 energy_amount=missing_e if missing_e > 0 else None,
-                bandwidth_amount=missing_bw if missing_bw > 0 else None
+                bandwidth_amount=missing_bw if missing_bw > 0 else None,
+                purpose=purpose,
             )
             
             logger.info(f"[gas_station] Resource delegation result: success={delegation_result.get('success', False)}")
@@ -4026,15 +3966,13 @@ class GasStationManager:
             return []
         return entries
 
-    def reclaim_resources(self, receiver_addr: str, *, max_ops: int = 4) -> dict:
-        """Undelegate (reclaim) ENERGY/BANDWIDTH previously delegated to receiver.
-        Returns summary: {attempted: int, succeeded: int, txids: [...]}"""
-        summary = {"attempted": 0, "succeeded": 0, "txids": []}
+    def _reclaim_signer(self) -> tuple[str | None, PrivateKey | None, int | None]:
+        """(owner address, signer key, permission id) for undelegations; signer is None when unavailable."""
         try:
             owner_addr = self.get_gas_wallet_address()
         except Exception as e:
-            logger.error("[gas_station] reclaim_resources: cannot resolve owner address: %s", e)
-            return summary
+            logger.error("[gas_station] reclaim: cannot resolve owner address: %s", e)
+            return None, None, None
         signer_pk = self._get_control_signer_private_key() or None
         if signer_pk is None:
             # fallback to owner private key if available
@@ -4043,8 +3981,8 @@ class GasStationManager:
             except Exception:
                 signer_pk = None
         if signer_pk is None:
-            logger.warning("[gas_station] reclaim_resources: no signer available")
-            return summary
+            logger.warning("[gas_station] reclaim: no signer available")
+            return owner_addr, None, None
         perm_id = None
         try:
             signer_addr = signer_pk.public_key.to_base58check_address()
@@ -4052,6 +3990,43 @@ class GasStationManager:
                 perm_id = self._resolve_control_permission_id()
         except Exception:
             perm_id = None
+        return owner_addr, signer_pk, perm_id
+
+    def _owner_delegation_receivers(self, owner_addr: str) -> set[str] | None:
+        """Receivers the owner currently delegates to (one getdelegatedresourceaccountindexv2 call); None if no node answered."""
+        data, _ = self._http_local_remote(
+            "POST", "/wallet/getdelegatedresourceaccountindexv2", payload={"value": owner_addr, "visible": True}, timeout=8)
+        if data is None:
+            return None
+        return set(data.get("toAccounts") or [])
+
+    def _owner_delegation_balances(self, owner_addr: str, receiver_addr: str) -> dict | None:
+        """{resource: (delegated SUN, lock expiry ms)} for owner -> receiver; None if no node answered."""
+        data, _ = self._http_local_remote(
+            "POST", "/wallet/getdelegatedresourcev2",
+            payload={"fromAddress": owner_addr, "toAddress": receiver_addr, "visible": True}, timeout=8)
+        if data is None:
+            return None
+        out = {"ENERGY": (0, 0), "BANDWIDTH": (0, 0)}
+        for item in data.get("delegatedResource") or []:
+            if (item.get("from") or item.get("fromAddress") or owner_addr) != owner_addr:
+                continue
+            for res, suffix in (("ENERGY", "energy"), ("BANDWIDTH", "bandwidth")):
+                bal = int(item.get(f"frozen_balance_for_{suffix}", 0) or 0)
+                if not bal and (item.get("resource") or "").upper() == res:
+                    bal = int(item.get("balance", 0) or 0)
+                expire = int(item.get(f"expire_time_for_{suffix}", 0) or 0)
+                if bal:
+                    out[res] = (out[res][0] + bal, max(out[res][1], expire))
+        return out
+
+    def reclaim_resources(self, receiver_addr: str, *, max_ops: int = 4) -> dict:
+        """Undelegate (reclaim) ENERGY/BANDWIDTH previously delegated to receiver.
+        Returns summary: {attempted: int, succeeded: int, txids: [...]}"""
+        summary = {"attempted": 0, "succeeded": 0, "txids": []}
+        owner_addr, signer_pk, perm_id = self._reclaim_signer()
+        if signer_pk is None:
+            return summary
         delegs = self._list_owner_delegations_to(owner_addr, receiver_addr)
         # Aggregate by resource type (ENERGY/BANDWIDTH)
         agg: dict[str, int] = {"ENERGY": 0, "BANDWIDTH": 0}
@@ -4063,30 +4038,166 @@ class GasStationManager:
                     agg[res] += bal
             except Exception:
                 continue
+        leases = get_lease_manager()
         for res, bal in agg.items():
-            if bal <= 0 or summary["attempted"] >= max_ops:
+            if bal <= 0:
+                # Nothing delegated on chain (already reclaimed elsewhere): close any lease left open
+                self._release_leases(leases, receiver_addr, res)
+                continue
+            if summary["attempted"] >= max_ops:
                 continue
             summary["attempted"] += 1
             txid = self._http_undelegate_resource(owner_addr, receiver_addr, bal, res, signer_pk, perm_id)
             if txid and self._wait_for_transaction(txid, f"{res} undelegation", max_attempts=25, suppress_final_warning=True):
                 summary["succeeded"] += 1
                 summary["txids"].append(txid)
+                self._release_leases(leases, receiver_addr, res)
         logger.info("[gas_station] reclaim_resources summary for %s: %s", receiver_addr, summary)
         return summary
 
-    def intelligent_prepare_address_for_usdt(self, target_address: str, *, probe_first: bool = True) -> dict:
+    # -------------------------------------------------
+    # Delegation leases (inventory of owner -> receiver delegations)
+    # -------------------------------------------------
+    def _record_lease(self, receiver_addr: str, resource: str, amount_sun: int, purpose: str, txid: str | None) -> None:
+        try:
+            get_lease_manager().record(receiver_addr, resource, int(amount_sun), purpose, txid=txid)
+        except Exception as e:  # bookkeeping must never fail a delegation
+            logger.warning("[gas_station] Failed to record delegation lease for %s: %s", receiver_addr, e)
+
+    @staticmethod
+    def _release_leases(leases, receiver_addr: str, resource: str) -> None:
+        try:
+            leases.release(receiver_addr, resource)
+        except Exception as e:
+            logger.warning("[gas_station] Failed to release %s leases of %s: %s", resource, receiver_addr, e)
+
+    def sync_lease_capacity(self) -> dict | None:
+        """Refresh the lease manager's view of the owner's undelegated stake (one account snapshot)."""
+        try:
+            snap = get_account_snapshots().get(self.get_gas_wallet_address())
+        except Exception as e:
+            logger.warning("[gas_station] Cannot read gas wallet account for lease capacity: %s", e)
+            return None
+        if snap is None or not snap.exists:
+            return None
+        return get_lease_manager().sync_capacity(snap.account)
+
+    def _usdt_balance_sun(self, address: str) -> int | None:
+        """USDT balance (smallest units) via balanceOf simulation; None when the node did not answer."""
+        try:
+            parameter = offline_tx.trc20_transfer_data(address, 0)[4:36].hex()
+        except Exception:
+            return None
+        payload = {
+            "owner_address": address,
+            "contract_address": self.tron_config.usdt_contract,
+            "function_selector": "balanceOf(address)",
+            "parameter": parameter,
+            "visible": True,
+        }
+        data, _ = self._http_local_remote("POST", "/wallet/triggerconstantcontract", payload=payload, timeout=8)
+        try:
+            return int((data or {}).get("constant_result")[0] or "0", 16)
+        except (TypeError, IndexError, ValueError):
+            return None
+
+    def _mark_swept_leases(self, leases) -> int:
+        """Mark sweep leases swept once their receiver holds no USDT; returns leases marked."""
+        pending = list(dict.fromkeys(
+            l["receiver"] for l in leases.active() if l["purpose"] == "sweep" and l["swept_at"] is None))
+        if not pending:
+            return 0
+        with ThreadPoolExecutor(max_workers=min(8, len(pending)), thread_name_prefix="lease-probe") as pool:
+            balances = dict(zip(pending, pool.map(self._usdt_balance_sun, pending)))
+        return sum(leases.mark_swept(r) for r, bal in balances.items() if bal == 0)
+
+    def reclaim_due_leases(self, *, max_receivers: int = 50) -> dict:
+        """One reclaim pass over everything the gas wallet delegates.
+
+        1. Sweep leases whose receiver holds no USDT any more are marked swept
+        2. One getdelegatedresourceaccountindexv2 call lists the owner's receivers; leases of
+           receivers no longer listed are closed, due receivers (swept past the grace period,
+           held past the hold limit, or untracked with TRON_RECLAIM_UNTRACKED) are kept
+        3. Delegated amounts and lock expiries are read concurrently; locked resources are skipped
+        4. All undelegations are broadcast back-to-back and confirmed together; confirmed ones
+           close their leases
+        """
+        leases = get_lease_manager()
+        summary = {"swept": 0, "receivers": 0, "undelegated": 0, "locked": 0, "released": 0, "txids": []}
+        summary["swept"] = self._mark_swept_leases(leases)
+        due = leases.reclaimable_receivers()
+        reclaim_untracked = bool(getattr(self.tron_config, "reclaim_untracked", False))
+        if not due and not reclaim_untracked:
+            return summary
+        owner_addr, signer_pk, perm_id = self._reclaim_signer()
+        if signer_pk is None:
+            return summary
+        on_chain = self._owner_delegation_receivers(owner_addr)
+        if on_chain is not None:
+            for receiver in [r for r in due if r not in on_chain]:
+                summary["released"] += leases.release(receiver)
+            due = [r for r in due if r in on_chain]
+            if reclaim_untracked:
+                tracked = {l["receiver"] for l in leases.active()}
+                due += sorted(r for r in on_chain if r not in tracked and r != owner_addr)
+        due = due[:max(1, int(max_receivers))]
+        summary["receivers"] = len(due)
+
+        if due:
+            with ThreadPoolExecutor(max_workers=min(8, len(due)), thread_name_prefix="reclaim-state") as pool:
+                balances = dict(zip(due, pool.map(lambda r: self._owner_delegation_balances(owner_addr, r), due)))
+        else:
+            balances = {}
+        now_ms = int(time.time() * 1000)
+        ops = []
+        for receiver in due:
+            if balances.get(receiver) is None:
+                continue
+            for res, (bal, expire_ms) in balances[receiver].items():
+                if bal <= 0:
+                    summary["released"] += leases.release(receiver, res)
+                elif expire_ms > now_ms:
+                    summary["locked"] += 1
+                else:
+                    ops.append((receiver, res, bal))
+
+        sent = {}
+        if ops:
+            with ThreadPoolExecutor(max_workers=min(8, len(ops)), thread_name_prefix="reclaim-broadcast") as pool:
+                txids = pool.map(lambda op: self._http_undelegate_resource(
+                    owner_addr, op[0], op[2], op[1], signer_pk, perm_id), ops)
+                for (receiver, res, _), txid in zip(ops, txids):
+                    if txid:
+                        sent[txid] = (receiver, res)
+        confirmed = self._wait_for_many({t: f"{res} {r}" for t, (r, res) in sent.items()}, "undelegation")
+        for txid, (receiver, res) in sent.items():
+            if confirmed.get(txid):
+                leases.release(receiver, res)
+                summary["undelegated"] += 1
+                summary["txids"].append(txid)
+        if summary["undelegated"] or summary["released"]:
+            self.sync_lease_capacity()
+        logger.info("[gas_station] Lease reclaim pass: %s", {k: v for k, v in summary.items() if k != "txids"})
+        return summary
+
+    def intelligent_prepare_address_for_usdt(self, target_address: str, *, probe_first: bool = True,
+                                             snapshot: PrepareSnapshot | None = None) -> dict:
         """Intelligent free gas preparation using permission-based activation + precise resource delegation.
         
         This method implements the complete pipeline:
-        1. Probe target address for current activation and resource status
-        2. Simulate USDT transfer to calculate exact energy and bandwidth requirements  
-        3. Use permission-based activation if available (modern method)
-        4. Calculate and delegate precise resources needed based on simulation
-        5. Verify final readiness for USDT transfers
+        1. Plan from one PrepareSnapshot (activation status, resources, permissions, yields and the
+           USDT transfer simulation, read concurrently) - the plan the dry run showed; a snapshot
+           from a dry run within TRON_PREPARE_SNAPSHOT_TTL_SEC is reused instead of probing again
+        2. Activate the address, permission-based if available (modern method)
+        3. Once it exists, broadcast the ENERGY and BANDWIDTH delegations back-to-back and
+           confirm them together (steps 2-3 run as a StepGraph; per-step timings are in
+           details["step_timings"], the total in execution_time)
+        4. Verify final readiness for USDT transfers
         
         Args:
             target_address: Address to prepare for USDT transfers
-            probe_first: Whether to probe current status first (default: True)
+            probe_first: Kept for compatibility; the plan always comes from a snapshot
+            snapshot: PrepareSnapshot to execute (default: collect_prepare_snapshot(target_address))
             
         Returns:
             dict with comprehensive status and execution details:
@@ -4121,151 +4232,117 @@ class GasStationManager:
         try:
             logger.info(f"[gas_station] Starting intelligent preparation for {target_address}")
             
-            # Step 1: Initial probing and simulation
-            if probe_first:
-                logger.info(f"[gas_station] Step 1: Probing current status and simulating USDT transfer")
-                
-                # Store initial state for comparison
-                initial_resources = self._get_account_resources(target_address)
-                initial_energy = int(initial_resources.get("energy_available", 0) or 0)
-                initial_bandwidth = int(initial_resources.get("bandwidth_available", 0) or 0)
-                
-                # Check current account status
-                current_resources = self._get_account_resources(target_address)
-                is_activated = self._check_address_exists(target_address)
-                
-                # Simulate USDT transfer to determine precise requirements
-                simulation = self.simulate_usdt_transfer(target_address)
-                result["simulation_data"] = simulation
-                
-                logger.info(f"[gas_station] Simulation results: {simulation['energy_used']} energy, {simulation['bandwidth_used']} bandwidth needed")
-                
-                # Calculate requirements with safety margins
-                required_energy = int(simulation["energy_used"] * 1.15)  # 15% safety margin
-                required_bandwidth = int(simulation["bandwidth_used"] * 1.25)  # 25% safety margin
-                
-                # Apply reasonable minimums based on estimation, not fixed values
-                # Use simulation-based approach with network-appropriate minimums
-                if simulation["energy_used"] > 0:
-                    # Simulation succeeded - trust it with reasonable minimum
-                    min_energy = max(required_energy, simulation["energy_used"] + 5000)  # Sim + 5k buffer
-                    logger.info(f"[gas_station] Using simulation-based energy: {simulation['energy_used']} + safety → {min_energy}")
-                else:
-                    # Simulation failed - use network-estimated fallback with conservative buffer
-                    fallback_energy = int(getattr(self.tron_config, "usdt_energy_per_transfer_estimate", 40000) or 40000)
-                    min_energy = max(required_energy, fallback_energy)
-                    logger.info(f"[gas_station] Using estimated energy fallback: {fallback_energy}")
-                
-                required_energy = min_energy
-                required_bandwidth = max(required_bandwidth, 350)  # Minimum for transactions
-                
-                result["details"]["required_energy"] = required_energy
-                result["details"]["required_bandwidth"] = required_bandwidth
-                result["details"]["is_activated"] = is_activated
-                result["details"]["current_resources"] = current_resources
+            # Step 1: Plan from one snapshot (reused from a recent dry run of the same address)
+            logger.info(f"[gas_station] Step 1: Reading preparation snapshot and planning")
+            snap = snapshot or self.collect_prepare_snapshot(target_address)
+            plan = plan_preparation(snap, self.tron_config)
+
+            initial_energy = plan["current"]["energy"]
+            initial_bandwidth = plan["current"]["bandwidth"]
+            is_activated = snap.exists
+            required_energy = plan["required"]["energy"]
+            required_bandwidth = plan["required"]["bandwidth"]
+            result["simulation_data"] = {
+                **plan["simulation"],
+                "energy_used": plan["transfer_cost"]["energy"],
+                "bandwidth_used": plan["transfer_cost"]["bandwidth"],
+            }
+            logger.info(f"[gas_station] Plan: {required_energy} energy, {required_bandwidth} bandwidth required "
+                        f"(snapshot {snap.fetch_ms:.0f}ms)")
+
+            result["details"]["required_energy"] = required_energy
+            result["details"]["required_bandwidth"] = required_bandwidth
+            result["details"]["is_activated"] = is_activated
+            result["details"]["current_resources"] = snap.target_resources
+            result["details"]["plan"] = plan["plan"]
+            result["details"]["snapshot_ms"] = plan["snapshot_ms"]
             
-            # Step 2: Permission-based activation if needed
-            activation_bonus_bw = 0
-            if not is_activated:
-                logger.info(f"[gas_station] Step 2: Address needs activation")
-                
-                # Try permission-based activation first
-                permission_status = self.is_permission_based_activation_available()
-                if permission_status["available"]:
+            # Steps 2-3: operations as a dependency graph - activation first, then the ENERGY and
+            # BANDWIDTH delegations broadcast back-to-back and confirmed together
+            logger.info(f"[gas_station] Step 2-3: Activation and resource delegation")
+            missing_energy = plan["missing"]["energy"]
+            missing_bandwidth = plan["missing"]["bandwidth"]
+            logger.info(f"[gas_station] Current: {initial_energy} energy, {initial_bandwidth} bandwidth")
+            logger.info(f"[gas_station] Missing: {missing_energy} energy, {missing_bandwidth} bandwidth")
+
+            def _activate() -> dict:
+                if plan["activation_method"] == "permission_based":
                     logger.info(f"[gas_station] Attempting permission-based activation")
-                    
                     activation_result = self.activate_address_with_permission(target_address)
                     if activation_result["success"]:
-                        result["activation_performed"] = True
-                        result["activation_method"] = "permission_based"
-                        result["transaction_ids"].append(activation_result.get("transaction_id"))
-                        activation_bonus_bw = 1500  # Typical bandwidth bonus from activation
-                        
                         logger.info(f"[gas_station] Permission-based activation successful")
-                    else:
-                        logger.warning(f"[gas_station] Permission-based activation failed: {activation_result.get('message')}")
-                        # Fall back to traditional method
-                        try:
-                            traditional_result = self._activate_address(target_address)
-                            if traditional_result:
-                                result["activation_performed"] = True
-                                result["activation_method"] = "traditional"
-                                activation_bonus_bw = 1500
-                                logger.info(f"[gas_station] Traditional activation successful")
-                        except Exception as e:
-                            logger.error(f"[gas_station] Traditional activation also failed: {e}")
-                            result["details"]["activation_error"] = str(e)
+                        return {"method": "permission_based", "transaction_id": activation_result.get("transaction_id")}
+                    logger.warning(f"[gas_station] Permission-based activation failed: {activation_result.get('message')}")
                 else:
                     logger.info(f"[gas_station] Permission-based activation not available, using traditional")
-                    try:
-                        traditional_result = self._activate_address(target_address)
-                        if traditional_result:
-                            result["activation_performed"] = True
-                            result["activation_method"] = "traditional"
-                            activation_bonus_bw = 1500
-                            logger.info(f"[gas_station] Traditional activation successful")
-                    except Exception as e:
-                        logger.error(f"[gas_station] Traditional activation failed: {e}")
-                        result["details"]["activation_error"] = str(e)
-            
-            # Step 3: Resource delegation based on simulation
-            logger.info(f"[gas_station] Step 3: Calculating and delegating precise resources")
-            
-            # Re-check resources after activation
-            post_activation_resources = self._get_account_resources(target_address)
-            current_energy = int(post_activation_resources.get("energy_available", 0) or 0)
-            current_bandwidth = int(post_activation_resources.get("bandwidth_available", 0) or 0) + activation_bonus_bw
-            
-            # Calculate missing resources
-            missing_energy = max(0, required_energy - current_energy)
-            missing_bandwidth = max(0, required_bandwidth - current_bandwidth)
-            
-            logger.info(f"[gas_station] Current: {current_energy} energy, {current_bandwidth} bandwidth")
-            logger.info(f"[gas_station] Missing: {missing_energy} energy, {missing_bandwidth} bandwidth")
-            
-            # Delegate resources if needed
-            if missing_energy > 0 or missing_bandwidth > 0:
+                if self._activate_address(target_address):
+                    logger.info(f"[gas_station] Traditional activation successful")
+                    return {"method": "traditional", "transaction_id": None}
+                raise RuntimeError("activation failed")
+
+            graph = StepGraph()
+            activation = (graph.add("activation", _activate),) if not is_activated else ()
+            delegation_steps = []
+            delegation_started = time.time()
+            # The plan's TRX amounts: yields from the snapshot, safety multiplier, min_trx and per-invoice caps
+            delegations = [(resource, trx, units) for resource, trx, units in (
+                ("ENERGY", plan["plan"]["energy_trx"], missing_energy),
+                ("BANDWIDTH", plan["plan"]["bandwidth_trx"], missing_bandwidth)) if trx > 0]
+            if delegations:
+                # Always use permission-based delegation with signer key
+                logger.info(f"[gas_station] Using permission-based delegation for resource transfer")
                 try:
-                    # Always use permission-based delegation with signer key
-                    logger.info(f"[gas_station] Using permission-based delegation for resource transfer")
-                    
-                    # Calculate TRX needed for delegation
-                    energy_calc = self.calculate_energy_delegation_needed(target_address, missing_energy) if missing_energy > 0 else {}
-                    
-                    # Use energy calculation for bandwidth estimation (roughly same yield ratios)
-                    bandwidth_trx_needed = 0.0
-                    if missing_bandwidth > 0:
-                        params = self.get_global_resource_parameters()
-                        bandwidth_per_trx = params.get("dailyBandwidthPerTrx", 1500.0)
-                        if bandwidth_per_trx <= 0:
-                            bandwidth_per_trx = 1500.0
-                        bandwidth_trx_needed = (missing_bandwidth / bandwidth_per_trx) * 1.2  # 20% safety margin
-                        bandwidth_trx_needed = max(1.0, bandwidth_trx_needed)
-                    
-                    # Delegate resources with permission-based approach (always use signer key)
-                    delegation_result = self.delegate_resources_with_permission(
-                        target_address,
-                        energy_amount=missing_energy if missing_energy > 0 else None,
-                        bandwidth_amount=missing_bandwidth if missing_bandwidth > 0 else None
-                    )
-                    
+                    client, owner_addr, signer_key = self._permission_delegation_setup()
+                    for resource, trx, units in delegations:
+                        delegation_steps.append(graph.add(
+                            f"delegate_{resource.lower()}",
+                            partial(self._broadcast_permission_delegation, client, owner_addr, target_address,
+                                    resource, trx, signer_key, "free_gas", units=units),
+                            after=activation,
+                        ))
+                    graph.add("confirm_delegations",
+                              lambda: self._confirm_permission_delegations([graph.results[s] for s in delegation_steps]),
+                              after=tuple(delegation_steps))
+                except ValueError as e:
+                    result["details"]["delegation_result"] = {
+                        "success": False, "message": str(e), "method": "permission_based_delegation"}
+            graph.run()
+            result["details"]["step_timings"] = graph.timings
+
+            if activation:
+                if "activation" in graph.results:
+                    activated = graph.results["activation"]
+                    result["activation_performed"] = True
+                    result["activation_method"] = activated["method"]
+                    if activated["transaction_id"]:
+                        result["transaction_ids"].append(activated["transaction_id"])
+                else:
+                    logger.error(f"[gas_station] Activation failed")
+                    result["details"]["activation_error"] = graph.timings["activation"].get("error")
+
+            if delegation_steps:
+                if "confirm_delegations" in graph.results:
+                    delegation_result = self._delegation_outcome(graph.results["confirm_delegations"], delegation_started)
+                    result["transaction_ids"].extend(
+                        e["transaction_id"] for e in graph.results["confirm_delegations"] if e.get("transaction_id"))
                     result["resources_delegated"]["energy"] = missing_energy
                     result["resources_delegated"]["bandwidth"] = missing_bandwidth
-                    result["details"]["energy_delegation_calc"] = energy_calc
-                    result["details"]["bandwidth_trx_needed"] = bandwidth_trx_needed
                     result["details"]["delegation_method"] = "permission_based_signer"
                     result["details"]["delegation_result"] = delegation_result
-                    
                     logger.info(f"[gas_station] Permission-based delegation completed: success={delegation_result.get('success', False)}")
-                    
-                except Exception as e:
-                    logger.error(f"[gas_station] Resource delegation failed: {e}")
-                    result["details"]["delegation_error"] = str(e)
-            
+                else:
+                    result["details"]["delegation_error"] = "skipped: activation failed"
+
+
             # Step 4: Final verification
             logger.info(f"[gas_station] Step 4: Final verification")
             
-            final_resources = self._get_account_resources(target_address)
+            changed = result["activation_performed"] or missing_energy > 0 or missing_bandwidth > 0
+            if changed:
+                get_prepare_snapshots().invalidate(target_address)
+                final_resources = self._get_account_resources(target_address)
+            else:
+                final_resources = snap.target_resources  # nothing was sent: the snapshot is still current
             final_energy = int(final_resources.get("energy_available", 0) or 0)
             final_bandwidth = int(final_resources.get("bandwidth_available", 0) or 0)
             
@@ -4279,7 +4356,7 @@ class GasStationManager:
             made_significant_progress = (energy_gained >= 1000) or (bandwidth_gained >= 200)
             
             # Address is activated if it exists now (even if it didn't before)
-            is_now_activated = self._check_address_exists(target_address)
+            is_now_activated = self._check_address_exists(target_address) if changed else is_activated
             
             # Success criteria: activated + meaningful resources OR significant improvement
             basic_success = is_now_activated and (has_minimum_energy or has_minimum_bandwidth)
@@ -4342,6 +4419,34 @@ def prepare_for_sweep(invoice_address: str) -> bool:
     return bool(res)
 
 
+def prepare_batch_for_sweep(addresses: list[str]) -> dict:
+    """Module-level wrapper: {address: bool} for GasStationManager.prepare_batch_for_sweep"""
+    try:
+        res = gas_station.prepare_batch_for_sweep(addresses)
+    except Exception as e:  # best-effort wrapper
+        logger.error("Batch sweep preparation failed: %s", e)
+        return {a: False for a in addresses}
+    return {a: bool(res.get(a, {}).get("success")) for a in addresses}
+
+
+def activate_addresses(addresses: list[str]) -> dict:
+    """Module-level wrapper for GasStationManager.activate_addresses (warm pool refills)"""
+    try:
+        return gas_station.activate_addresses(addresses)
+    except Exception as e:  # best-effort wrapper
+        logger.error("Batch activation failed: %s", e)
+        return {}
+
+
+def reclaim_idle_delegations() -> dict:
+    """Module-level wrapper for GasStationManager.reclaim_due_leases (background reclaim pass)"""
+    try:
+        return gas_station.reclaim_due_leases()
+    except Exception as e:  # best-effort wrapper
+        logger.error("Delegation reclaim pass failed: %s", e)
+        return {}
+
+
 def auto_activate_on_usdt_receive(invoice_address: str) -> bool:
     """If address is not yet activated, prepare it for sweep; otherwise no-op.
     Returns True if address is active or activation+delegation completed.
@@ -0,0 +1,390 @@
+# Планировщик Free Gas: неизменяемый снимок всех входных данных подготовки адреса и расчёт плана без RPC
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass, field
+from typing import Optional
+
+try:
+    from core.config import config
+except ImportError:
+    from src.core.config import config
+
+# Extra bandwidth a freshly activated account is expected to have for its first transfer
+ACTIVATION_BONUS_BW = 1500
+# Bandwidth of one signer-signed activation/delegation transaction
+SIGNED_TX_BW = 270
+MIN_REQUIRED_BW = 350
+
+
+@dataclass(frozen=True)
+class PrepareSnapshot:
+    """Everything a Free Gas plan depends on, read once (GasStationManager.collect_prepare_snapshot).
+
+    Resource dicts are in the GasStationManager._get_account_resources format; owner/signer
+    entries are None when the address is unknown or could not be read.
+    """
+
+    target: str
+    owner: Optional[str]
+    network: str
+    exists: bool
+    target_resources: dict
+    owner_resources: Optional[dict] = None
+    signer_address: Optional[str] = None
+    signer_resources: Optional[dict] = None
+    permission: dict = field(default_factory=dict)   # is_permission_based_activation_available()
+    params: Optional[dict] = None                     # get_global_resource_parameters(); None if it failed
+    simulation: Optional[dict] = None                 # estimate_usdt_energy_precise(); None if not run
+    simulation_error: Optional[str] = None
+    fetched_at: float = 0.0
+    fetch_ms: float = 0.0
+
+
+def _energy_and_recipient(snap: PrepareSnapshot, tron_config, notes: list) -> tuple[int, int, dict, dict]:
+    """(energy used, bandwidth used, simulation, recipient analysis) of one USDT transfer"""
+    used_e = used_bw = 0
+    simulation: dict = {}
+    if snap.simulation_error is not None:
+        recipient_analysis = {"error": snap.simulation_error}
+        notes.append("smart_contract_simulation_failed")
+    elif snap.exists:
+        simulation = snap.simulation or {}
+        used_e = int(simulation.get("energy_used", 0) or 0)
+        used_bw = int(simulation.get("bandwidth_used", 0) or 0)
+        notes.append(f"smart_contract_simulation_success: {simulation.get('simulation_success', False)}")
+        has_usdt = simulation.get("recipient_has_usdt")
+        if has_usdt is not None:
+            recipient_analysis = {
+                "has_usdt": has_usdt,
+                "energy_category": "existing_holder" if has_usdt else "new_holder",
+                "expected_energy": "~32k" if has_usdt else "~65k",
+            }
+            notes.append(f"recipient_usdt_status: {'existing' if has_usdt else 'new'}_holder")
+        else:
+            recipient_analysis = {"has_usdt": None, "energy_category": "unknown"}
+            notes.append("recipient_usdt_status_unknown")
+    elif snap.simulation is not None:
+        # Fresh address: proxy simulation gas wallet -> target; a fresh address holds no USDT yet
+        simulation = snap.simulation
+        used_e = int(simulation.get("energy_used", 0) or 0)
+        used_bw = int(simulation.get("bandwidth_used", 0) or 0)
+        notes.append(f"proxy_simulation_success: {simulation.get('simulation_success', False)}")
+        recipient_analysis = {"has_usdt": False, "energy_category": "new_holder", "expected_energy": "~65k"}
+        notes.append("fresh_address_assumed_new_usdt_holder")
+    else:
+        simulation = {"energy_used": 0, "bandwidth_used": 0, "simulation_success": False}
+        recipient_analysis = {"has_usdt": False, "energy_category": "new_holder"}
+        notes.append("proxy_simulation_failed_no_owner")
+
+    if used_e <= 0:
+        if recipient_analysis.get("energy_category") == "new_holder":
+            used_e = int(getattr(tron_config, "usdt_energy_per_transfer_estimate", 65000) or 65000)
+            notes.append("energy_estimate_fallback_new_holder")
+        else:
+            used_e = int(getattr(tron_config, "usdt_energy_per_transfer_estimate", 32000) or 32000)
+            notes.append("energy_estimate_fallback_existing_holder")
+    if used_bw <= 0:
+        used_bw = int(getattr(tron_config, "usdt_bandwidth_per_transfer_estimate", 345) or 345)
+        notes.append("bandwidth_estimate_fallback")
+    return used_e, used_bw, simulation, recipient_analysis
+
+
+def _yields(snap: PrepareSnapshot, tron_config, notes: list) -> tuple[float, float]:
+    """(energy, bandwidth) units per delegated TRX, with network-specific bandwidth sanity checks"""
+    is_testnet = snap.network != "mainnet"
+    config_bw_yield = float(getattr(tron_config, "bandwidth_units_per_trx_estimate", 1500.0) or 1500.0)
+    if snap.params is None:
+        e_yield = float(getattr(tron_config, "energy_units_per_trx_estimate", 2.38) or 2.38)
+        if is_testnet:
+            notes.append("testnet_config_yield_fallback")
+            return e_yield, max(50.0, min(config_bw_yield, 200.0))
+        notes.append("mainnet_config_yield_fallback")
+        return e_yield, config_bw_yield
+
+    e_yield = snap.params.get("dailyEnergyPerTrx", 2.38)
+    live_bw_yield = snap.params.get("dailyBandwidthPerTrx", 1500.0)
+    bw_yield = live_bw_yield
+    if is_testnet:
+        # Testnet staking economics can give impractically low bandwidth yields
+        if bw_yield < 10.0:
+            bw_yield = max(50.0, min(config_bw_yield, 200.0))
+            notes.append(f"testnet_bandwidth_yield_adjusted_from_{live_bw_yield or 0:.3f}_to_{bw_yield}")
+        else:
+            notes.append("testnet_bandwidth_yield_acceptable")
+    elif bw_yield < 100.0:
+        notes.append(f"mainnet_bandwidth_yield_low_{bw_yield:.3f}_using_config_{config_bw_yield}")
+        bw_yield = config_bw_yield
+    else:
+        notes.append("mainnet_bandwidth_yield_acceptable")
+    notes.append(f"live_network_yields_used_network_{snap.network}")
+    return e_yield, bw_yield
+
+
+def _resource_view(resources: Optional[dict]) -> dict:
+    resources = resources or {}
+    return {
+        "energy": resources.get("energy_available", 0),
+        "bandwidth": resources.get("bandwidth_available", 0),
+        "balance_trx": resources.get("details", {}).get("balance_trx", 0),
+    }
+
+
+def plan_preparation(snap: PrepareSnapshot, tron_config) -> dict:
+    """Free Gas plan for snap.target (the GasStationManager.dry_run_prepare_for_sweep dict).
+
+    Pure function of the snapshot and config: the dry run shows it and
+    intelligent_prepare_address_for_usdt executes it, so both agree by construction.
+    """
+    notes: list[str] = []
+    if not snap.owner:
+        notes.append("owner_address_unavailable")
+
+    exists = snap.exists
+    activation_needed = not exists
+    activation_method = None
+    if activation_needed:
+        if snap.permission.get("available"):
+            activation_method = "permission_based"
+            notes.append("permission_based_activation_available")
+        else:
+            mode = getattr(tron_config, "account_activation_mode", "transfer")
+            activation_method = mode if mode in {"transfer", "create_account"} else "transfer"
+            notes.append("permission_based_activation_not_available")
+            notes.extend(f"permission_issue: {issue}" for issue in (snap.permission.get("issues") or [])[:2])
+
+    cur_e = int(snap.target_resources.get("energy_available", 0) or 0)
+    cur_bw = int(snap.target_resources.get("bandwidth_available", 0) or 0)
+
+    used_e, used_bw, simulation, recipient_analysis = _energy_and_recipient(snap, tron_config, notes)
+    # Safety buffers: energy +15% (min 5k), bandwidth +25% (min 50), at least MIN_REQUIRED_BW
+    required_e = used_e + int(max(5000, used_e * 0.15))
+    required_bw = max(used_bw + int(max(50, used_bw * 0.25)), MIN_REQUIRED_BW)
+
+    activation_bonus_bw = ACTIVATION_BONUS_BW if activation_needed else 0
+    miss_e = max(0, required_e - cur_e)
+    miss_bw = max(0, required_bw - (cur_bw + activation_bonus_bw))
+
+    e_yield, bw_yield = _yields(snap, tron_config, notes)
+    safety_mult = float(getattr(tron_config, "delegation_safety_multiplier", 1.1) or 1.1)
+    try:
+        min_trx = max(1.0, float(getattr(tron_config, "min_delegate_trx", 1.0) or 1.0))
+    except (TypeError, ValueError):
+        min_trx = 1.0
+        notes.append("min_trx_fallback")
+    max_energy_cap = float(getattr(tron_config, "max_energy_delegation_trx_per_invoice", 0.0) or 0.0)
+    max_bw_cap = float(getattr(tron_config, "max_bandwidth_delegation_trx_per_invoice", 0.0) or 0.0)
+
+    def _calc(missing_units: int, per_trx_yield: float, cap: float) -> float:
+        if missing_units <= 0 or per_trx_yield <= 0:
+            return 0.0
+        amt = max(min_trx, (missing_units / per_trx_yield) * safety_mult)
+        if cap > 0:
+            amt = min(amt, cap)
+        return round(amt, 6)
+
+    energy_trx = _calc(miss_e, e_yield, max_energy_cap)
+    bandwidth_trx = _calc(miss_bw, bw_yield, max_bw_cap)
+    tx_count = 1 + int(energy_trx > 0) + int(bandwidth_trx > 0)  # activation + delegations
+
+    if snap.signer_address:
+        delegation_method = "permission_based"
+        notes.append("delegation_method_permission_based")
+    else:
+        delegation_method = "traditional"
+        notes.append("delegation_method_traditional_no_signer")
+
+    # Signer: authorization provider (signs, spends bandwidth only)
+    signer_info: dict = {}
+    if snap.signer_address:
+        activation_tx_bw = SIGNED_TX_BW if activation_needed else 0
+        delegation_tx_bw = SIGNED_TX_BW if (miss_e > 0 or miss_bw > 0) else 0
+        signer_info = {
+            "address": snap.signer_address,
+            "role": "authorization_provider",
+            "current_resources": _resource_view(snap.signer_resources),
+            "estimated_costs": {
+                "activation_tx_bandwidth": activation_tx_bw,
+                "delegation_tx_bandwidth": delegation_tx_bw,
+                "total_bandwidth_needed": activation_tx_bw + delegation_tx_bw,
+                "trx_burned": 0,
+                "notes": "Signs transactions but doesn't provide resources",
+            },
+        }
+        notes.append("signer_wallet_analyzed")
+
+    # Gas wallet: resource provider. Activation TRX leaves the wallet, delegated TRX stays frozen in it
+    if snap.owner and snap.owner_resources is not None:
+        activation_trx = getattr(tron_config, "auto_activation_amount", 1.0) if activation_needed else 0.0
+        total_trx_frozen = energy_trx + bandwidth_trx
+        total_trx_impact = activation_trx + total_trx_frozen
+        owner_view = _resource_view(snap.owner_resources)
+        gas_wallet_info = {
+            "address": snap.owner,
+            "role": "resource_provider",
+            "current_resources": owner_view,
+            "estimated_costs": {
+                "activation_transfer_trx": activation_trx,
+                "energy_delegation_frozen_trx": energy_trx,
+                "bandwidth_delegation_frozen_trx": bandwidth_trx,
+                "total_trx_sent": activation_trx,
+                "total_trx_frozen": total_trx_frozen,
+                "total_balance_impact": total_trx_impact,
+                "sufficient_balance": owner_view["balance_trx"] >= (total_trx_impact + 1.0),  # +1 TRX buffer
+                "notes": f"Sends {activation_trx} TRX activation + freezes {total_trx_frozen:.3f} TRX for delegation on {snap.network}",
+            },
+        }
+        notes.append("gas_wallet_analyzed")
+    else:
+        gas_wallet_info = {"error": "gas wallet state unavailable", "role": "resource_provider"}
+        notes.append("gas_wallet_analysis_failed")
+
+    gas_costs = gas_wallet_info.get("estimated_costs", {})
+    signer_costs = signer_info.get("estimated_costs", {})
+    wallet_analysis = {
+        "signer": signer_info,
+        "gas_wallet": gas_wallet_info,
+        "operation_summary": {
+            "total_trx_sent": gas_costs.get("total_trx_sent", 0),
+            "total_trx_frozen": gas_costs.get("total_trx_frozen", 0),
+            "total_balance_impact": gas_costs.get("total_balance_impact", 0),
+            "network_type": snap.network,
+            "delegation_method": delegation_method,
+            "transactions_count": tx_count,
+            "signer_sufficient_bandwidth": (signer_costs.get("total_bandwidth_needed", 0)
+                                            <= signer_info["current_resources"]["bandwidth"]) if signer_info else True,
+            "gas_wallet_sufficient_balance": gas_costs.get("sufficient_balance", False),
+            "delegation_explanation": "TRX gets frozen (not burned) for resource delegation and can be unfrozen later",
+        },
+    }
+
+    return {
+        "exists": exists,
+        "activation_needed": activation_needed,
+        "activation_method": activation_method,
+        "current": {"energy": cur_e, "bandwidth": cur_bw},
+        "required": {"energy": required_e, "bandwidth": required_bw},
+        "missing": {"energy": miss_e, "bandwidth": miss_bw},
+        "transfer_cost": {"energy": used_e, "bandwidth": used_bw},  # one USDT transfer, before buffers
+        "simulation": simulation,
+        "recipient_analysis": recipient_analysis,
+        "wallet_analysis": wallet_analysis,
+        "plan": {
+            "energy_trx": energy_trx,
+            "bandwidth_trx": bandwidth_trx,
+            "safety_multiplier": safety_mult,
+            "yields": {"energy_per_trx": e_yield, "bandwidth_per_trx": bw_yield},
+            "tx_budget_estimate": tx_count,
+            "delegation_method": delegation_method,
+        },
+        "snapshot_ms": round(snap.fetch_ms, 1),
+        "notes": notes,
+    }
+
+
+class StepGraph:
+    """Runs the steps of a preparation as a dependency graph.
+
+    A step starts as soon as every step it runs after has finished, so independent steps
+    (e.g. ENERGY and BANDWIDTH delegation broadcasts after an activation) run concurrently.
+    A step that raises fails its dependents, which are skipped. After run(), results holds
+    each step's return value and timings {step: {"status", "started", "duration"}} (seconds,
+    started relative to the start of the run; "error" on failed steps).
+    """
+
+    def __init__(self):
+        self._steps: dict[str, tuple] = {}
+        self.results: dict = {}
+        self.timings: dict[str, dict] = {}
+
+    def add(self, name: str, fn, *, after=()) -> str:
+        """Add step name (fn takes no arguments); dependencies must already be added."""
+        unknown = [dep for dep in after if dep not in self._steps]
+        if unknown or name in self._steps:
+            raise ValueError(f"Invalid step {name!r}: unknown dependencies {unknown}" if unknown else f"Duplicate step {name!r}")
+        self._steps[name] = (fn, tuple(after))
+        return name
+
+    @staticmethod
+    def _call(fn):
+        started = time.monotonic()
+        try:
+            return started, time.monotonic(), fn(), None
+        except Exception as e:  # recorded as a failed step
+            return started, time.monotonic(), None, e
+
+    def run(self, max_workers: int = 4) -> dict:
+        pending = dict(self._steps)
+        running: dict = {}
+        origin = time.monotonic()
+        if not pending:
+            return self.results
+        with ThreadPoolExecutor(max_workers=max(1, int(max_workers)), thread_name_prefix="prepare-step") as pool:
+            while pending or running:
+                # Steps are added after their dependencies, so one ordered pass resolves skip chains
+                for name, (fn, after) in list(pending.items()):
+                    if any(dep in pending or dep in running.values() for dep in after):
+                        continue
+                    del pending[name]
+                    if any(self.timings[dep]["status"] != "ok" for dep in after):
+                        self.timings[name] = {"status": "skipped", "started": None, "duration": 0.0}
+                    else:
+                        running[pool.submit(self._call, fn)] = name
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    started, finished, value, error = future.result()
+                    timing = {"status": "ok" if error is None else "failed",
+                              "started": round(started - origin, 3), "duration": round(finished - started, 3)}
+                    if error is not None:
+                        timing["error"] = str(error)
+                    else:
+                        self.results[name] = value
+                    self.timings[name] = timing
+        return self.results
+
+
+class PrepareSnapshotCache:
+    """Last PrepareSnapshot per target for ttl_sec, so executing a plan right after its
+    dry run (the /free_gas confirm step) reuses the state the user was shown."""
+
+    def __init__(self, ttl_sec: float = 30.0, max_entries: int = 256):
+        self.ttl_sec = max(0.0, float(ttl_sec))
+        self.max_entries = max(1, int(max_entries))
+        self._entries: dict[str, PrepareSnapshot] = {}
+        self._lock = threading.Lock()
+
+    def get(self, target: str, *, max_age: Optional[float] = None) -> Optional[PrepareSnapshot]:
+        max_age = self.ttl_sec if max_age is None else max_age
+        with self._lock:
+            snap = self._entries.get(target)
+        if snap is not None and time.monotonic() - snap.fetched_at < max_age:
+            return snap
+        return None
+
+    def put(self, snap: PrepareSnapshot):
+        with self._lock:
+            self._entries.pop(snap.target, None)
+            self._entries[snap.target] = snap
+            while len(self._entries) > self.max_entries:
+                self._entries.pop(next(iter(self._entries)))
+
+    def invalidate(self, target: str):
+        with self._lock:
+            self._entries.pop(target, None)
+
+
+_cache: Optional[PrepareSnapshotCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_prepare_snapshots() -> PrepareSnapshotCache:
+    """Shared snapshot cache (TRON_PREPARE_SNAPSHOT_TTL_SEC)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = PrepareSnapshotCache(ttl_sec=config.tron.prepare_snapshot_ttl_sec)
+        return _cache
@@ -0,0 +1,163 @@
+# Снимок состояния аккаунта (getaccount + getaccountresource) с коротким TTL-кэшем
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from tronpy.keys import to_base58check_address
+
+try:
+    from core.config import config
+    from core.tron.endpoint_router import get_endpoint_router
+except ImportError:
+    from src.core.config import config
+    from src.core.tron.endpoint_router import get_endpoint_router
+
+logger = logging.getLogger(__name__)
+
+# TRON gives every activated account 600 free bandwidth per day
+FREE_BANDWIDTH_DAILY = 600
+_ADDRESS_FIELDS = ("owner_address", "to_address", "receiver_address", "account_address")
+
+
+def _normalize(address: str) -> str:
+    """Base58 form of a base58/hex address (cache key); unparseable input is used as is."""
+    try:
+        return to_base58check_address(address)
+    except Exception:
+        return str(address)
+
+
+@dataclass
+class AccountSnapshot:
+    """One getaccount + getaccountresource pair for an address."""
+
+    address: str
+    account: dict = field(default_factory=dict)   # {} when the account does not exist
+    resource: dict = field(default_factory=dict)
+    fetched_at: float = 0.0
+
+    @property
+    def exists(self) -> bool:
+        return bool(self.account.get("address"))
+
+    @property
+    def balance_sun(self) -> int:
+        try:
+            return int(self.account.get("balance", 0) or 0)
+        except (TypeError, ValueError):
+            return 0
+
+    def _int(self, key: str) -> int:
+        try:
+            return int(self.resource.get(key, 0) or 0)
+        except (TypeError, ValueError):
+            return 0
+
+    def resources(self) -> dict:
+        """Energy/bandwidth available in the GasStationManager._get_account_resources format.
+        Bandwidth combines free and paid (delegated) bandwidth."""
+        if not self.resource and not self.exists:
+            return {"energy_available": 0, "bandwidth_available": 0, "_inactive": True}
+        energy_limit, energy_used = self._int("EnergyLimit"), self._int("EnergyUsed")
+        free_limit, free_used = self._int("freeNetLimit"), self._int("freeNetUsed")
+        paid_limit, paid_used = self._int("NetLimit"), self._int("NetUsed")
+        if free_limit == 0 and paid_limit == 0 and self.exists:
+            # Account exists but has not used bandwidth yet
+            free_limit = FREE_BANDWIDTH_DAILY
+        return {
+            "energy_available": max(0, energy_limit - energy_used),
+            "bandwidth_available": max(0, (free_limit - free_used) + (paid_limit - paid_used)),
+            "details": {
+                "energy_limit": energy_limit,
+                "energy_used": energy_used,
+                "free_bandwidth_limit": free_limit,
+                "free_bandwidth_used": free_used,
+                "paid_bandwidth_limit": paid_limit,
+                "paid_bandwidth_used": paid_used,
+                "balance_trx": self.balance_sun / 1e6,
+            },
+        }
+
+
+class AccountSnapshotCache:
+    """Per-address AccountSnapshot cache with a short TTL.
+
+    - get() returns a cached snapshot younger than ttl_sec (or max_age), else fetches
+      getaccount + getaccountresource once; failed fetches return None and are not cached
+    - invalidate_tx() drops every address a transaction touches; call it on broadcast
+    """
+
+    def __init__(self, ttl_sec: float = 3.0, request: Optional[Callable] = None, max_entries: int = 1024):
+        self.ttl_sec = max(0.0, float(ttl_sec))
+        self.max_entries = max(1, int(max_entries))
+        self._request = request
+        self._entries: OrderedDict[str, AccountSnapshot] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _fetch(self, address: str) -> Optional[AccountSnapshot]:
+        request = self._request or get_endpoint_router().request
+        payload = {"address": address, "visible": True}
+        try:
+            account, _ = request("POST", "/wallet/getaccount", payload=payload, timeout=5)
+            if account is None:
+                return None
+            resource, _ = request("POST", "/wallet/getaccountresource", payload=payload, timeout=5)
+        except Exception as e:
+            logger.debug("Account snapshot fetch for %s failed: %s", address, e)
+            return None
+        if resource is None:
+            return None
+        return AccountSnapshot(address=address, account=account, resource=resource, fetched_at=time.monotonic())
+
+    def get(self, address: str, *, max_age: Optional[float] = None) -> Optional[AccountSnapshot]:
+        """Snapshot for address; max_age=0 forces a fetch (polling loops)."""
+        key = _normalize(address)
+        max_age = self.ttl_sec if max_age is None else max_age
+        with self._lock:
+            snap = self._entries.get(key)
+            if snap is not None and time.monotonic() - snap.fetched_at < max_age:
+                self._entries.move_to_end(key)
+                return snap
+        snap = self._fetch(key)
+        if snap is not None:
+            with self._lock:
+                self._entries[key] = snap
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return snap
+
+    def invalidate(self, *addresses: str):
+        with self._lock:
+            for address in addresses:
+                if address:
+                    self._entries.pop(_normalize(address), None)
+
+    def invalidate_tx(self, tx: Optional[dict]):
+        """Drop snapshots of the owner/receiver addresses in a transaction's contracts."""
+        try:
+            contracts = (tx or {}).get("raw_data", {}).get("contract") or []
+        except AttributeError:
+            return
+        addresses = []
+        for contract in contracts:
+            value = ((contract or {}).get("parameter") or {}).get("value") or {}
+            addresses += [value[f] for f in _ADDRESS_FIELDS if value.get(f)]
+        self.invalidate(*addresses)
+
+
+_cache: Optional[AccountSnapshotCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_account_snapshots() -> AccountSnapshotCache:
+    """Shared snapshot cache (TRON_ACCOUNT_SNAPSHOT_TTL_SEC)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = AccountSnapshotCache(ttl_sec=config.tron.account_snapshot_ttl_sec)
+        return _cache
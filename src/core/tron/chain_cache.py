@@ -0,0 +1,91 @@
+# TTL-кэш параметров сети: getchainparameters и глобальные Total* из getaccountresource
+
+import logging
+import threading
+import time
+from typing import Callable, Optional
+
+try:
+    from core.config import config
+    from core.tron.endpoint_router import get_endpoint_router
+except ImportError:
+    from src.core.config import config
+    from src.core.tron.endpoint_router import get_endpoint_router
+
+logger = logging.getLogger(__name__)
+
+
+class ChainParamsCache:
+    """Process-wide TTL cache for network-level parameters.
+
+    - chain_parameters_raw(): /wallet/getchainparameters body (fees, rewards, limits)
+    - resource_totals(address): /wallet/getaccountresource body; only its global
+      TotalEnergyLimit/TotalEnergyWeight/TotalNetLimit/TotalNetWeight fields are meant
+      to be read from it, they are the same whichever address is probed
+    Values change at most once per maintenance period, so callers share one copy per
+    ttl_sec. Failed fetches are not cached. refresh() drops everything immediately.
+    """
+
+    def __init__(self, ttl_sec: float = 300.0, request: Optional[Callable] = None):
+        self.ttl_sec = max(0.0, float(ttl_sec))
+        self._request = request
+        self._entries: dict[str, tuple[float, dict]] = {}  # key -> (fetched_at, body)
+        self._lock = threading.Lock()
+
+    def _fetch(self, key: str, method: str, path: str, payload: Optional[dict] = None) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl_sec:
+                return entry[1]
+            # Fetch under the lock: concurrent callers wait for one request instead of all sending it
+            request = self._request or get_endpoint_router().request
+            try:
+                data, _ = request(method, path, payload=payload, timeout=8)
+            except Exception as e:
+                logger.debug("Chain parameter fetch %s failed: %s", path, e)
+                data = None
+            if not data:
+                return entry[1] if entry is not None else None  # stale beats nothing
+            self._entries[key] = (time.monotonic(), data)
+            return data
+
+    def chain_parameters_raw(self) -> Optional[dict]:
+        return self._fetch("chainparameters", "GET", "/wallet/getchainparameters")
+
+    def chain_parameters(self) -> dict:
+        """getchainparameters as {key: int value} (empty if unavailable)."""
+        out: dict = {}
+        data = self.chain_parameters_raw() or {}
+        for p in data.get("chainParameter") or data.get("chain_parameter") or []:
+            key = str(p.get("key", "")).strip()
+            try:
+                out[key] = int(p.get("value"))
+            except (TypeError, ValueError):
+                try:
+                    out[key] = int(float(p.get("value")))
+                except (TypeError, ValueError):
+                    continue
+        return out
+
+    def resource_totals(self, probe_address: str) -> Optional[dict]:
+        return self._fetch("accountresource", "POST", "/wallet/getaccountresource",
+                           {"address": probe_address, "visible": True})
+
+    def refresh(self):
+        """Forget cached values; the next read fetches fresh ones."""
+        with self._lock:
+            self._entries.clear()
+        logger.info("Chain parameter cache refreshed")
+
+
+_cache: Optional[ChainParamsCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_chain_cache() -> ChainParamsCache:
+    """Shared cache used by the gas station, bot and API (TRON_CHAIN_PARAMS_TTL_SEC)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ChainParamsCache(ttl_sec=config.tron.chain_params_ttl_sec)
+        return _cache
@@ -0,0 +1,248 @@
+# Сервис подтверждений: следит за новыми блоками и разрешает futures для зарегистрированных txid
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+try:
+    from core.config import config
+    from core.tron.endpoint_router import get_endpoint_router
+except ImportError:
+    from src.core.config import config
+    from src.core.tron.endpoint_router import get_endpoint_router
+
+logger = logging.getLogger(__name__)
+
+# getblockbylimitnext returns at most this many blocks per call
+_MAX_BLOCKS_PER_REQUEST = 100
+
+
+@dataclass(frozen=True)
+class TxConfirmation:
+    txid: str
+    block_number: int
+    contract_ret: str  # 'SUCCESS', 'REVERT', ... ('' for plain transfers without ret)
+
+    @property
+    def success(self) -> bool:
+        return self.contract_ret in ("SUCCESS", "")
+
+
+class ConfirmationWatcher:
+    """Resolves many pending txids by following blocks instead of polling each txid.
+
+    - register(txid) returns a Future resolved with a TxConfirmation once the txid
+      appears in a block; waiting for solidification is available via wait()
+    - Every caller gets its own Future, so one waiter giving up (forget) never cancels
+      another's; the txid stops being tracked when its last waiter leaves
+    - One background thread reads every new block (in batches) while anything is
+      pending, and sleeps otherwise, so RPC cost scales with blocks, not with txids
+    - Txids seen in recent blocks are remembered, so a late register() resolves at once
+    - depth(txid) reports head - block + 1 for any remembered txid
+    """
+
+    def __init__(self, request: Optional[Callable] = None, poll_interval: float = 1.0,
+                 lookback_blocks: int = 10, seen_capacity: int = 50_000, pending_ttl_sec: float = 600.0):
+        self._request = request
+        self.poll_interval = max(0.1, float(poll_interval))
+        self.lookback_blocks = max(0, int(lookback_blocks))
+        self.seen_capacity = max(100, int(seen_capacity))
+        self.pending_ttl_sec = float(pending_ttl_sec)
+        self._pending: dict[str, tuple[list[Future], float]] = {}  # txid -> (waiters, registered_at)
+        self._solid_waiters: list[tuple[int, Future]] = []  # (block_number, future)
+        self._seen: OrderedDict[str, TxConfirmation] = OrderedDict()
+        self.head: Optional[int] = None
+        self.solid_head: Optional[int] = None
+        self._next_block: Optional[int] = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def _call(self, path: str, payload: Optional[dict] = None, solidity: bool = False) -> Optional[dict]:
+        request = self._request or get_endpoint_router().request
+        data, _ = request("POST", path, payload=payload or {}, timeout=8, solidity=solidity)
+        return data
+
+    # --- caller API -------------------------------------------------------------------
+    def register(self, txid: str) -> Future:
+        """Future resolved with TxConfirmation when txid is included in a block."""
+        with self._lock:
+            seen = self._seen.get(txid)
+            fut: Future = Future()
+            if seen is not None:
+                fut.set_result(seen)
+                return fut
+            self._pending.setdefault(txid, ([], time.monotonic()))[0].append(fut)
+        self._ensure_thread()
+        self._wakeup.set()
+        return fut
+
+    def wait(self, txid: str, timeout: float, solidified: bool = False) -> Optional[TxConfirmation]:
+        """Block until txid is included (or solidified); None on timeout."""
+        deadline = time.monotonic() + timeout
+        included = self.register(txid)
+        try:
+            conf = included.result(timeout=timeout)
+        except Exception:
+            self.forget(txid, included)
+            return None
+        if not solidified:
+            return conf
+        fut: Future = Future()
+        with self._lock:
+            if self.solid_head is not None and self.solid_head >= conf.block_number:
+                return conf
+            self._solid_waiters.append((conf.block_number, fut))
+        self._wakeup.set()
+        try:
+            fut.result(timeout=max(0.0, deadline - time.monotonic()))
+            return conf
+        except Exception:
+            with self._lock:
+                self._solid_waiters = [(b, f) for b, f in self._solid_waiters if f is not fut]
+            return None
+
+    def forget(self, txid: str, fut: Optional[Future] = None):
+        """Stop waiting for a txid: drop the caller's future (or all of them when fut is None);
+        the txid is untracked once no waiter is left."""
+        with self._lock:
+            entry = self._pending.get(txid)
+            if entry is None:
+                return
+            waiters = entry[0]
+            dropped = [f for f in waiters if fut is None or f is fut]
+            waiters[:] = [f for f in waiters if f not in dropped]
+            if not waiters:
+                del self._pending[txid]
+        for f in dropped:
+            f.cancel()
+
+    def depth(self, txid: str) -> Optional[int]:
+        """Confirmations so far (1 = in the head block), or None if not seen."""
+        with self._lock:
+            conf = self._seen.get(txid)
+            if conf is None or self.head is None:
+                return None
+            return max(1, self.head - conf.block_number + 1)
+
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    # --- block following --------------------------------------------------------------
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="tron-confirmations", daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            if not self._pending and not self._solid_waiters:
+                # Idle: no RPCs until something is registered; rescan from head then
+                self._next_block = None
+                self._wakeup.wait(5.0)
+                self._wakeup.clear()
+                continue
+            try:
+                self.poll_once()
+            except Exception as e:
+                logger.debug("Confirmation watcher poll failed: %s", e)
+            self._stop.wait(self.poll_interval)
+
+    def poll_once(self):
+        """Read blocks up to the current head, resolve pending txids, update solid waiters."""
+        now_block = self._call("/wallet/getnowblock")
+        head = _block_number(now_block)
+        if head is None:
+            return
+        with self._lock:
+            self.head = head
+            start = self._next_block if self._next_block is not None else max(0, head - self.lookback_blocks)
+        self._ingest_blocks([now_block])
+        num = start
+        while num < head:
+            end = min(head, num + _MAX_BLOCKS_PER_REQUEST)
+            data = self._call("/wallet/getblockbylimitnext", {"startNum": num, "endNum": end})
+            self._ingest_blocks((data or {}).get("block") or [])
+            num = end
+        self._next_block = head + 1
+        self._expire_pending()
+        if self._solid_waiters:
+            solid = _block_number(self._call("/walletsolidity/getnowblock", solidity=True))
+            if solid is not None:
+                self._resolve_solid(solid)
+
+    def _ingest_blocks(self, blocks: list):
+        resolved: list[tuple[list[Future], TxConfirmation]] = []
+        with self._lock:
+            for block in blocks:
+                number = _block_number(block)
+                if number is None:
+                    continue
+                for tx in block.get("transactions") or []:
+                    txid = tx.get("txID")
+                    if not txid:
+                        continue
+                    ret = tx.get("ret") or [{}]
+                    conf = TxConfirmation(txid, number, (ret[0] or {}).get("contractRet", "") or "")
+                    self._seen[txid] = conf
+                    self._seen.move_to_end(txid)
+                    entry = self._pending.pop(txid, None)
+                    if entry is not None:
+                        resolved.append((entry[0], conf))
+            while len(self._seen) > self.seen_capacity:
+                self._seen.popitem(last=False)
+        for waiters, conf in resolved:
+            for fut in waiters:
+                if not fut.done():
+                    fut.set_result(conf)
+
+    def _resolve_solid(self, solid_head: int):
+        with self._lock:
+            self.solid_head = solid_head
+            ready = [fut for block, fut in self._solid_waiters if block <= solid_head]
+            self._solid_waiters = [(b, f) for b, f in self._solid_waiters if b > solid_head and not f.done()]
+        for fut in ready:
+            if not fut.done():
+                fut.set_result(solid_head)
+
+    def _expire_pending(self):
+        cutoff = time.monotonic() - self.pending_ttl_sec
+        with self._lock:
+            expired = [txid for txid, (_, at) in self._pending.items() if at < cutoff]
+            futures = [fut for txid in expired for fut in self._pending.pop(txid)[0]]
+        for fut in futures:
+            if not fut.done():
+                fut.set_exception(TimeoutError("transaction not seen in blocks"))
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+
+def _block_number(block: Optional[dict]) -> Optional[int]:
+    try:
+        return int(block["block_header"]["raw_data"]["number"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+_watcher: Optional[ConfirmationWatcher] = None
+_watcher_lock = threading.Lock()
+
+
+def get_confirmation_watcher() -> ConfirmationWatcher:
+    """Process-wide watcher shared by every thread waiting for confirmations."""
+    global _watcher
+    with _watcher_lock:
+        if _watcher is None:
+            _watcher = ConfirmationWatcher(
+                poll_interval=config.tron.confirm_watcher_poll_sec,
+                lookback_blocks=config.tron.confirm_watcher_lookback_blocks,
+            )
+        return _watcher
@@ -0,0 +1,233 @@
+# Маршрутизация запросов между локальной и удалённой TRON нодой: EWMA-латентность, circuit breaker, фоновые пробы
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import requests
+
+try:
+    from core.config import config
+    from core.tron.transport import get_transport
+except ImportError:
+    from src.core.config import config
+    from src.core.tron.transport import get_transport
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN = "closed", "open"
+
+
+@dataclass
+class Endpoint:
+    name: str  # 'local' | 'remote'
+    full_node: str
+    solidity_node: str = ""
+    api_key: str = ""
+    priority: int = 0  # tie-breaker: lower wins (local before remote)
+    min_timeout: float = 0.0  # floor for per-call timeouts (remote nodes answer slower than a local one)
+    latency_ms: Optional[float] = None  # EWMA of successful call latency
+    error_rate: float = 0.0  # EWMA of failures (0..1)
+    consecutive_failures: int = 0
+    state: str = CLOSED
+    opened_at: float = 0.0
+
+    def headers(self) -> dict:
+        h = {"Content-Type": "application/json"}
+        if self.api_key:
+            h["TRON-PRO-API-KEY"] = self.api_key
+        return h
+
+    def score(self) -> float:
+        """Lower is healthier: latency inflated by the recent error rate."""
+        return (self.latency_ms or 0.0) * (1.0 + 4.0 * self.error_rate)
+
+    def rank(self) -> tuple:
+        """Sort key for routing. Without a latency sample the score is unknown: an endpoint that
+        has only failed goes after every measured one, an untried one is ordered by priority
+        (and gets the call that measures it)."""
+        if self.latency_ms is None:
+            if self.error_rate > 0 or self.consecutive_failures > 0:
+                return (1, 0.0, self.priority)
+            return (0, 0.0, self.priority)
+        return (0, self.score(), self.priority)
+
+
+class EndpointRouter:
+    """Routes each TRON RPC to the healthiest endpoint.
+
+    - Every call outcome updates the endpoint's EWMA latency and error rate; only transport
+      errors and 5xx replies count as failures
+    - failure_threshold consecutive failures open the circuit: the endpoint gets no
+      traffic until a background probe (at most every open_sec) succeeds again
+    - Closed endpoints are tried in order of rank(); if every circuit is open, all
+      endpoints are tried anyway rather than failing outright
+    """
+
+    def __init__(self, endpoints: list[Endpoint], *, alpha: float = 0.3, failure_threshold: int = 3,
+                 open_sec: float = 30.0, probe_path: str = "/wallet/getnowblock", transport=None):
+        self.endpoints = {ep.name: ep for ep in endpoints}
+        self.alpha = min(1.0, max(0.01, float(alpha)))
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.open_sec = max(0.0, float(open_sec))
+        self.probe_path = probe_path
+        self._transport = transport
+        self._lock = threading.Lock()
+        self._probe_thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def transport(self):
+        return self._transport or get_transport()
+
+    def get(self, name: str) -> Optional[Endpoint]:
+        return self.endpoints.get(name)
+
+    def candidates(self) -> list[Endpoint]:
+        """Endpoints to try, healthiest first (open circuits excluded while any is closed)."""
+        with self._lock:
+            closed = [ep for ep in self.endpoints.values() if ep.state == CLOSED]
+            if closed:
+                return sorted(closed, key=Endpoint.rank)
+            return sorted(self.endpoints.values(), key=lambda ep: (ep.opened_at, ep.priority))
+
+    def best(self) -> Optional[Endpoint]:
+        eps = self.candidates()
+        return eps[0] if eps else None
+
+    def record_success(self, name: str, latency_ms: float):
+        with self._lock:
+            ep = self.endpoints.get(name)
+            if ep is None:
+                return
+            ep.latency_ms = latency_ms if ep.latency_ms is None else (
+                self.alpha * latency_ms + (1 - self.alpha) * ep.latency_ms)
+            ep.error_rate *= (1 - self.alpha)
+            ep.consecutive_failures = 0
+            if ep.state == OPEN:
+                ep.state = CLOSED
+                logger.info("TRON endpoint %s (%s) is healthy again, circuit closed", ep.name, ep.full_node)
+
+    def record_failure(self, name: str):
+        with self._lock:
+            ep = self.endpoints.get(name)
+            if ep is None:
+                return
+            ep.error_rate = self.alpha + (1 - self.alpha) * ep.error_rate
+            ep.consecutive_failures += 1
+            if ep.state == CLOSED and ep.consecutive_failures >= self.failure_threshold:
+                ep.state = OPEN
+                ep.opened_at = time.monotonic()
+                logger.warning("TRON endpoint %s (%s) failed %s times in a row, circuit opened",
+                               ep.name, ep.full_node, ep.consecutive_failures)
+            elif ep.state == OPEN:
+                ep.opened_at = time.monotonic()
+
+    def request(self, method: str, path: str, *, payload: Optional[dict] = None, timeout: float = 6,
+                solidity: bool = False) -> tuple[Optional[dict], Optional[str]]:
+        """Send the call to the healthiest endpoint, falling through to the next on a transport
+        error or 5xx reply; 4xx bodies are returned as they are.
+        Returns (json_or_none, endpoint_name_or_none)."""
+        for ep in self.candidates():
+            base = ep.solidity_node if solidity else ep.full_node
+            if not base:
+                continue
+            started = time.monotonic()
+            try:
+                resp = self.transport.request(method, f"{base}{path}", json=payload, headers=ep.headers(),
+                                              timeout=max(ep.min_timeout, timeout))
+            except requests.RequestException:
+                self.record_failure(ep.name)
+                continue
+            if resp.status_code >= 500:
+                self.record_failure(ep.name)
+                continue
+            # 4xx: the node is healthy and rejected this payload; another endpoint would too
+            self.record_success(ep.name, (time.monotonic() - started) * 1000)
+            try:
+                return (resp.json() or {}), ep.name
+            except ValueError:
+                return {}, ep.name
+        return None, None
+
+    def check(self, name: str, timeout: float = 5) -> bool:
+        """Probe one endpoint now (records the outcome). False for unknown endpoints."""
+        ep = self.endpoints.get(name)
+        if ep is None or not ep.full_node:
+            return False
+        started = time.monotonic()
+        try:
+            resp = self.transport.get(f"{ep.full_node}{self.probe_path}", headers=ep.headers(), timeout=timeout)
+            ok = resp.status_code == 200
+        except requests.RequestException:
+            ok = False
+        if ok:
+            self.record_success(name, (time.monotonic() - started) * 1000)
+        else:
+            self.record_failure(name)
+        return ok
+
+    def probe_open_circuits(self):
+        """Probe endpoints whose circuit has been open for at least open_sec."""
+        now = time.monotonic()
+        with self._lock:
+            due = [ep.name for ep in self.endpoints.values() if ep.state == OPEN and now - ep.opened_at >= self.open_sec]
+        for name in due:
+            self.check(name)
+
+    def start_probing(self, interval: float):
+        if interval <= 0 or self._probe_thread is not None:
+            return
+        def _loop():
+            while not self._stop.wait(interval):
+                try:
+                    self.probe_open_circuits()
+                except Exception as e:  # pragma: no cover - defensive
+                    logger.debug("Endpoint probe failed: %s", e)
+        self._probe_thread = threading.Thread(target=_loop, name="tron-endpoint-probe", daemon=True)
+        self._probe_thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def snapshot(self) -> list[dict]:
+        """Current per-endpoint health, for diagnostics."""
+        with self._lock:
+            return [
+                {"name": ep.name, "url": ep.full_node, "state": ep.state, "latency_ms": ep.latency_ms,
+                 "error_rate": round(ep.error_rate, 3), "consecutive_failures": ep.consecutive_failures}
+                for ep in self.endpoints.values()
+            ]
+
+
+_router: Optional[EndpointRouter] = None
+_router_lock = threading.Lock()
+
+
+def build_endpoints(tron_config) -> list[Endpoint]:
+    """Local node (if enabled) and remote fallback (unless local-only) from TronConfig."""
+    endpoints = []
+    if tron_config.local_node_enabled:
+        endpoints.append(Endpoint("local", tron_config.local_full_node, tron_config.local_solidity_node, priority=0))
+    if not tron_config.local_only:
+        endpoints.append(Endpoint("remote", tron_config.remote_full_node, tron_config.remote_solidity_node,
+                                  api_key=tron_config.api_key or "", priority=1, min_timeout=6))
+    return endpoints
+
+
+def get_endpoint_router() -> EndpointRouter:
+    """Process-wide router shared by the gas station, keeper and direct RPC helpers."""
+    global _router
+    with _router_lock:
+        if _router is None:
+            tron = config.tron
+            _router = EndpointRouter(
+                build_endpoints(tron),
+                alpha=tron.router_ewma_alpha,
+                failure_threshold=tron.router_failure_threshold,
+                open_sec=tron.router_open_sec,
+            )
+            _router.start_probing(tron.router_probe_interval_sec)
+        return _router
@@ -0,0 +1,157 @@
+# Локальная сборка транзакций TRON (protobuf raw_data) без запроса к ноде на построение
+
+import hashlib
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from tronpy.keys import to_hex_address
+
+try:
+    from core.tron.ref_block import RefBlock, get_ref_block_cache  # noqa: F401 - re-exported for builders
+except ImportError:
+    from src.core.tron.ref_block import RefBlock, get_ref_block_cache  # noqa: F401
+
+TYPE_URL_PREFIX = "type.googleapis.com/protocol."
+RESOURCE_CODES = {"BANDWIDTH": 0, "ENERGY": 1}
+DEFAULT_EXPIRATION_MS = 60_000
+SIGNATURE_BYTES = 65
+# java-tron charges each contract's result as if it were this long (Constant.MAX_RESULT_SIZE_IN_TX)
+MAX_RESULT_SIZE_IN_TX = 64
+TRC20_TRANSFER_SELECTOR = bytes.fromhex("a9059cbb")  # transfer(address,uint256)
+
+# Contract.ContractType values (core/Tron.proto)
+ACCOUNT_CREATE = 0
+TRANSFER = 1
+FREEZE_BALANCE_V2 = 54
+TRIGGER_SMART_CONTRACT = 31
+DELEGATE_RESOURCE = 57
+UNDELEGATE_RESOURCE = 58
+
+
+# -------------------------------
+# Minimal protobuf (proto3) wire encoding: fields in number order, default values omitted,
+# i.e. the canonical form java-tron re-serializes when it hashes raw_data
+# -------------------------------
+def _varint(value: int) -> bytes:
+    value &= (1 << 64) - 1  # negative int64 -> two's complement
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _int_field(number: int, value: int) -> bytes:
+    return _varint(number << 3) + _varint(int(value)) if value else b""
+
+
+def _bytes_field(number: int, value: bytes) -> bytes:
+    return _varint((number << 3) | 2) + _varint(len(value)) + value if value else b""
+
+
+def _address(addr: str) -> bytes:
+    return bytes.fromhex(to_hex_address(addr))
+
+
+@dataclass
+class ContractSpec:
+    type: int
+    name: str       # protobuf message name, e.g. "TransferContract"
+    value: bytes    # encoded contract message
+    addresses: tuple = ()
+
+
+def transfer_contract(owner: str, to: str, amount_sun: int) -> ContractSpec:
+    value = _bytes_field(1, _address(owner)) + _bytes_field(2, _address(to)) + _int_field(3, amount_sun)
+    return ContractSpec(TRANSFER, "TransferContract", value, (owner, to))
+
+
+def account_create_contract(owner: str, account: str) -> ContractSpec:
+    value = _bytes_field(1, _address(owner)) + _bytes_field(2, _address(account))
+    return ContractSpec(ACCOUNT_CREATE, "AccountCreateContract", value, (owner, account))
+
+
+def freeze_balance_v2_contract(owner: str, amount_sun: int, resource: str) -> ContractSpec:
+    value = (_bytes_field(1, _address(owner)) + _int_field(2, amount_sun)
+             + _int_field(3, RESOURCE_CODES[resource.upper()]))
+    return ContractSpec(FREEZE_BALANCE_V2, "FreezeBalanceV2Contract", value, (owner,))
+
+
+def delegate_resource_contract(owner: str, receiver: str, balance_sun: int, resource: str,
+                               lock: bool = False, lock_period: int = 0) -> ContractSpec:
+    value = (_bytes_field(1, _address(owner)) + _int_field(2, RESOURCE_CODES[resource.upper()])
+             + _int_field(3, balance_sun) + _bytes_field(4, _address(receiver))
+             + _int_field(5, 1 if lock else 0) + _int_field(6, lock_period))
+    return ContractSpec(DELEGATE_RESOURCE, "DelegateResourceContract", value, (owner, receiver))
+
+
+def undelegate_resource_contract(owner: str, receiver: str, balance_sun: int, resource: str) -> ContractSpec:
+    value = (_bytes_field(1, _address(owner)) + _int_field(2, RESOURCE_CODES[resource.upper()])
+             + _int_field(3, balance_sun) + _bytes_field(4, _address(receiver)))
+    return ContractSpec(UNDELEGATE_RESOURCE, "UnDelegateResourceContract", value, (owner, receiver))
+
+
+def trigger_smart_contract(owner: str, contract_address: str, data: bytes, call_value: int = 0) -> ContractSpec:
+    value = (_bytes_field(1, _address(owner)) + _bytes_field(2, _address(contract_address))
+             + _int_field(3, call_value) + _bytes_field(4, data))
+    return ContractSpec(TRIGGER_SMART_CONTRACT, "TriggerSmartContract", value, (owner,))
+
+
+def trc20_transfer_data(to: str, amount: int) -> bytes:
+    """ABI call data for transfer(address,uint256)."""
+    return TRC20_TRANSFER_SELECTOR + _address(to)[1:].rjust(32, b"\0") + int(amount).to_bytes(32, "big")
+
+
+@dataclass
+class OfflineTransaction:
+    raw_data: bytes
+    contract: ContractSpec
+    signatures: list = field(default_factory=list)
+
+    @property
+    def txid(self) -> str:
+        return hashlib.sha256(self.raw_data).hexdigest()
+
+    def sign(self, pk) -> "OfflineTransaction":
+        """Append a signature over txid (pk: tronpy PrivateKey)."""
+        self.signatures.append(pk.sign_msg_hash(bytes.fromhex(self.txid)).hex())
+        return self
+
+    def bandwidth(self, signatures: int = 1) -> int:
+        return transaction_bandwidth(self.raw_data, signatures)
+
+    def to_hex(self) -> str:
+        """Serialized Transaction message for /wallet/broadcasthex."""
+        body = _bytes_field(1, self.raw_data)
+        for sig in self.signatures:
+            body += _bytes_field(2, bytes.fromhex(sig))
+        return body.hex()
+
+
+def transaction_bandwidth(raw_data: bytes, signatures: int = 1) -> int:
+    """Bandwidth points the network charges for a single-contract transaction: serialized
+    size with `signatures` signatures plus the per-contract result allowance."""
+    size = len(_bytes_field(1, raw_data)) + signatures * len(_bytes_field(2, b"\0" * SIGNATURE_BYTES))
+    return size + MAX_RESULT_SIZE_IN_TX
+
+
+def build_transaction(contract: ContractSpec, ref: RefBlock, *, permission_id: Optional[int] = None,
+                      fee_limit: int = 0, expiration_ms: int = DEFAULT_EXPIRATION_MS,
+                      now_ms: Optional[int] = None) -> OfflineTransaction:
+    """Encode Transaction.raw for one contract against the given block reference."""
+    now_ms = int(time.time() * 1000) if now_ms is None else int(now_ms)
+    any_param = _bytes_field(1, (TYPE_URL_PREFIX + contract.name).encode()) + _bytes_field(2, contract.value)
+    contract_msg = (_int_field(1, contract.type) + _bytes_field(2, any_param)
+                    + _int_field(5, int(permission_id) if permission_id is not None else 0))
+    raw = (_bytes_field(1, ref.ref_block_bytes)
+           + _bytes_field(4, ref.ref_block_hash)
+           + _int_field(8, max(now_ms, ref.timestamp_ms) + int(expiration_ms))
+           + _bytes_field(11, contract_msg)
+           + _int_field(14, now_ms)
+           + _int_field(18, fee_limit))
+    return OfflineTransaction(raw_data=raw, contract=contract)
@@ -0,0 +1,72 @@
+# Ограничение частоты запросов к TRON нодам (token bucket на каждый endpoint)
+
+import threading
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """Thread-safe token bucket.
+    - rate_per_sec: refill rate; <= 0 disables limiting
+    - burst: bucket capacity (defaults to max(1, rate_per_sec))
+    """
+
+    def __init__(self, rate_per_sec: float, burst: Optional[float] = None):
+        self.rate = float(rate_per_sec)
+        self.capacity = float(burst) if burst and burst > 0 else max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Take tokens without waiting; return False if not enough are available."""
+        if self.rate <= 0:
+            return True
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: float = 1.0, timeout: Optional[float] = None) -> bool:
+        """Block until tokens are available (or timeout elapses). Returns True on success."""
+        if self.rate <= 0:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait = (tokens - self._tokens) / self.rate
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+
+_buckets: dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def get_endpoint_bucket(endpoint: str, rate_per_sec: float, burst: Optional[float] = None) -> TokenBucket:
+    """Return the shared bucket for an endpoint (created on first use).
+    All callers talking to the same node share one budget."""
+    key = (endpoint or "").rstrip("/")
+    with _buckets_lock:
+        bucket = _buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(rate_per_sec, burst)
+            _buckets[key] = bucket
+        return bucket
@@ -0,0 +1,139 @@
+# Кэш заголовка последнего блока (ref_block) для локальной сборки транзакций, с фоновым обновлением
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+try:
+    from core.config import config
+    from core.tron.endpoint_router import get_endpoint_router
+except ImportError:
+    from src.core.config import config
+    from src.core.tron.endpoint_router import get_endpoint_router
+
+try:  # tronpy builds offline only with its optional protobuf extra
+    from tronpy.proto import tron_pb2 as _tron_pb2  # noqa: F401
+    from tronpy.tron import Transaction as _TronpyTransaction
+    TRONPY_OFFLINE_BUILD = True
+except ImportError:
+    TRONPY_OFFLINE_BUILD = False
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RefBlock:
+    number: int
+    block_id: str        # 64 hex chars
+    timestamp_ms: int
+    fetched_at: float = 0.0
+
+    @property
+    def ref_block_bytes(self) -> bytes:
+        return int(self.number).to_bytes(8, "big")[6:8]
+
+    @property
+    def ref_block_hash(self) -> bytes:
+        return bytes.fromhex(self.block_id)[8:16]
+
+    @classmethod
+    def from_block(cls, block: dict) -> Optional["RefBlock"]:
+        try:
+            header = block["block_header"]["raw_data"]
+            return cls(number=int(header["number"]), block_id=block["blockID"],
+                       timestamp_ms=int(header["timestamp"]), fetched_at=time.monotonic())
+        except (KeyError, TypeError, ValueError):
+            return None
+
+
+class RefBlockCache:
+    """Latest block header for transaction builders.
+
+    - A background thread (start()) refreshes it every refresh_sec, so get() normally
+      returns immediately even while the node is slow
+    - get() only fetches synchronously when the cached header is older than max_stale_sec
+      (or missing); a failed refresh keeps serving the old header within that bound
+    TAPOS accepts any of the last 65536 blocks, so a header up to a minute old is valid;
+    builders take expiration from max(now, header timestamp).
+    """
+
+    def __init__(self, refresh_sec: float = 10.0, max_stale_sec: float = 60.0, request: Optional[Callable] = None):
+        self.refresh_sec = max(0.0, float(refresh_sec))
+        self.max_stale_sec = max(1.0, float(max_stale_sec))
+        self._request = request
+        self._ref: Optional[RefBlock] = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def refresh(self) -> Optional[RefBlock]:
+        """Fetch the current head block now; returns None (keeping the old header) on failure."""
+        request = self._request or get_endpoint_router().request
+        try:
+            block, _ = request("POST", "/wallet/getnowblock", payload={}, timeout=5)
+        except Exception as e:
+            logger.debug("getnowblock failed: %s", e)
+            block = None
+        ref = RefBlock.from_block(block) if block else None
+        if ref is not None:
+            with self._lock:
+                self._ref = ref
+        return ref
+
+    def age(self) -> Optional[float]:
+        with self._lock:
+            return None if self._ref is None else time.monotonic() - self._ref.fetched_at
+
+    def get(self) -> Optional[RefBlock]:
+        with self._lock:
+            ref = self._ref
+        if ref is not None and time.monotonic() - ref.fetched_at <= self.max_stale_sec:
+            return ref
+        return self.refresh()
+
+    def start(self):
+        if self.refresh_sec <= 0 or self._thread is not None:
+            return
+
+        def _loop():
+            while True:
+                self.refresh()
+                if self._stop.wait(self.refresh_sec):
+                    return
+
+        self._thread = threading.Thread(target=_loop, name="tron-ref-block", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+def build_tronpy(builder, client=None):
+    """builder.build() against the cached block reference, without node calls, when tronpy can
+    build offline (protobuf installed); the regular node-assisted build otherwise.
+    client: Tron instance to attach for broadcast (offline builds come back detached)."""
+    if TRONPY_OFFLINE_BUILD:
+        ref = get_ref_block_cache().get()
+        if ref is not None:
+            txn = builder.build(offline=True, ref_block_id=ref.block_id)
+            if client is None:
+                return txn
+            return _TronpyTransaction.from_json({**txn.to_json(), "permission": None}, client=client)
+    return builder.build()
+
+
+_cache: Optional[RefBlockCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_ref_block_cache() -> RefBlockCache:
+    """Shared cache (TRON_REF_BLOCK_REFRESH_SEC / TRON_REF_BLOCK_MAX_STALE_SEC); refreshes in the background."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = RefBlockCache(refresh_sec=config.tron.ref_block_refresh_sec,
+                                   max_stale_sec=config.tron.ref_block_max_stale_sec)
+            _cache.start()
+        return _cache
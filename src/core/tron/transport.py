@@ -0,0 +1,82 @@
+# Общий HTTP-транспорт для TRON RPC: пул keep-alive соединений на каждый хост
+
+import threading
+from typing import Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    from core.config import config
+except ImportError:
+    from src.core.config import config
+
+
+class TronTransport:
+    """Keep-alive HTTP transport for TRON node RPCs.
+
+    - One requests.Session per host (scheme://host:port), each with its own connection
+      pool of pool_size connections, so repeated calls reuse TCP/TLS connections
+    - timeout passed by callers is the read timeout; connect_timeout caps connection setup
+    - Thread-safe: sessions are created under a lock and shared by all callers
+    """
+
+    def __init__(self, pool_size: int = 10, connect_timeout: float = 3.0, read_timeout: float = 10.0):
+        self.pool_size = max(1, int(pool_size))
+        self.connect_timeout = float(connect_timeout)
+        self.read_timeout = float(read_timeout)
+        self._sessions: dict[str, requests.Session] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _host_key(url: str) -> str:
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+    def session_for(self, url: str) -> requests.Session:
+        key = self._host_key(url)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount(key + "/", adapter)
+                self._sessions[key] = session
+            return session
+
+    def request(self, method: str, url: str, *, timeout: Optional[float] = None, **kwargs) -> requests.Response:
+        """requests.request() over the pooled session for url's host."""
+        read_timeout = self.read_timeout if timeout is None else float(timeout)
+        return self.session_for(url).request(
+            method.upper(), url, timeout=(min(self.connect_timeout, read_timeout), read_timeout), **kwargs
+        )
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def close(self):
+        with self._lock:
+            sessions, self._sessions = list(self._sessions.values()), {}
+        for session in sessions:
+            session.close()
+
+
+_transport: Optional[TronTransport] = None
+_transport_lock = threading.Lock()
+
+
+def get_transport() -> TronTransport:
+    """Process-wide transport configured from TRON_HTTP_* settings."""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = TronTransport(
+                pool_size=config.tron.http_pool_size,
+                connect_timeout=config.tron.http_connect_timeout,
+                read_timeout=config.tron.http_read_timeout,
+            )
+        return _transport
@@ -0,0 +1,80 @@
+# Локальная оценка ресурсов USDT transfer: bandwidth по кодировке транзакции, energy из кэша симуляций
+
+import threading
+import time
+from typing import Optional
+
+try:
+    from core.config import config
+    from core.tron import offline_tx
+except ImportError:
+    from src.core.config import config
+    from src.core.tron import offline_tx
+
+# Energy at or above this means the recipient's balance slot was empty (new USDT holder)
+NEW_HOLDER_ENERGY_THRESHOLD = 50_000
+# Any block reference encodes to the same size; bandwidth estimates need no node call
+_SIZING_REF = offline_tx.RefBlock(number=0, block_id="00" * 32, timestamp_ms=0)
+
+
+def usdt_transfer_bandwidth(owner: str, to: str, contract_address: str, amount: int = 1_000_000,
+                            fee_limit: int = 10_000_000, permission_id: Optional[int] = None) -> int:
+    """Exact bandwidth of a singly-signed TRC20 transfer(address,uint256) transaction, built offline."""
+    contract = offline_tx.trigger_smart_contract(owner, contract_address, offline_tx.trc20_transfer_data(to, amount))
+    tx = offline_tx.build_transaction(contract, _SIZING_REF, permission_id=permission_id, fee_limit=fee_limit)
+    return tx.bandwidth()
+
+
+class UsdtEnergyCache:
+    """Energy of USDT transfers learned from simulations, keyed by whether the recipient
+    already holds USDT (the dominant cost factor: writing an empty balance slot costs more).
+
+    Recipients' holder status is remembered per address as well, so a repeated estimate
+    for a known recipient needs no simulation at all.
+    """
+
+    def __init__(self, ttl_sec: float = 3600.0):
+        self.ttl_sec = max(0.0, float(ttl_sec))
+        self._energy: dict[bool, tuple[float, int]] = {}
+        self._holders: dict[str, tuple[float, bool]] = {}
+        self._lock = threading.Lock()
+
+    def _fresh(self, entry) -> bool:
+        return entry is not None and time.monotonic() - entry[0] < self.ttl_sec
+
+    def energy(self, recipient_has_usdt: Optional[bool]) -> Optional[int]:
+        if recipient_has_usdt is None:
+            return None
+        with self._lock:
+            entry = self._energy.get(bool(recipient_has_usdt))
+            return entry[1] if self._fresh(entry) else None
+
+    def holder_status(self, address: str) -> Optional[bool]:
+        with self._lock:
+            entry = self._holders.get(address)
+            return entry[1] if self._fresh(entry) else None
+
+    def record(self, recipient: Optional[str], energy_used: int) -> Optional[bool]:
+        """Store a simulated energy figure; returns the recipient holder status it implies."""
+        if energy_used <= 0:
+            return None
+        has_usdt = energy_used < NEW_HOLDER_ENERGY_THRESHOLD
+        now = time.monotonic()
+        with self._lock:
+            self._energy[has_usdt] = (now, int(energy_used))
+            if recipient:
+                self._holders[recipient] = (now, has_usdt)
+        return has_usdt
+
+
+_cache: Optional[UsdtEnergyCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_usdt_energy_cache() -> UsdtEnergyCache:
+    """Shared cache (TRON_USDT_ENERGY_CACHE_TTL_SEC)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = UsdtEnergyCache(ttl_sec=config.tron.usdt_energy_cache_ttl_sec)
+        return _cache
@@ -0,0 +1,108 @@
+# Адаптивный планировщик проверок инвойсов (приоритетная очередь по времени следующей проверки)
+
+import heapq
+import time
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+
+@dataclass
+class _Schedule:
+    next_at: float
+    interval: float
+    status: str
+    last_balance: Optional[float] = None
+
+
+class InvoicePollScheduler:
+    """Decides which open invoices are due for a balance check.
+
+    - New invoices (and invoices whose status or balance just changed) are due
+      immediately and then checked every base_interval
+    - Each check that sees no change multiplies the interval by backoff_factor,
+      up to max_interval (the floor rate for stale invoices)
+    - 'partial' invoices use their own fixed partial_interval cadence
+    Next-check times live in a min-heap; superseded heap entries are skipped lazily.
+    Invoices returned by due() but never record()ed (the pass failed before the check)
+    are due again at the next sync().
+    """
+
+    def __init__(self, base_interval: float, max_interval: float, partial_interval: float, backoff_factor: float = 2.0):
+        self.base_interval = max(1.0, float(base_interval))
+        self.max_interval = max(self.base_interval, float(max_interval))
+        self.partial_interval = max(1.0, float(partial_interval))
+        self.backoff_factor = max(1.0, float(backoff_factor))
+        self._entries: dict[int, _Schedule] = {}
+        self._heap: list[tuple[float, int]] = []
+        self._in_flight: set[int] = set()  # popped by due(), not yet record()ed
+
+    def _push(self, invoice_id: int, entry: _Schedule):
+        self._entries[invoice_id] = entry
+        heapq.heappush(self._heap, (entry.next_at, invoice_id))
+
+    def sync(self, invoices: Iterable, now: Optional[float] = None):
+        """Track the current set of open invoices: add new ones, forget closed ones,
+        and make invoices whose status changed due immediately."""
+        now = time.time() if now is None else now
+        seen = set()
+        for inv in invoices:
+            seen.add(inv.id)
+            entry = self._entries.get(inv.id)
+            if entry is None or entry.status != inv.status:
+                interval = self.partial_interval if inv.status == 'partial' else self.base_interval
+                last_balance = entry.last_balance if entry else None
+                self._push(inv.id, _Schedule(next_at=now, interval=interval, status=inv.status, last_balance=last_balance))
+            elif inv.id in self._in_flight:
+                # Handed out by due() but the check never completed: no heap item is left for it
+                entry.next_at = now
+                heapq.heappush(self._heap, (now, inv.id))
+        self._in_flight.clear()
+        for invoice_id in set(self._entries) - seen:
+            del self._entries[invoice_id]
+
+    def due(self, now: Optional[float] = None) -> set[int]:
+        """Pop and return ids of invoices whose next check time has passed."""
+        now = time.time() if now is None else now
+        out: set[int] = set()
+        while self._heap and self._heap[0][0] <= now:
+            next_at, invoice_id = heapq.heappop(self._heap)
+            entry = self._entries.get(invoice_id)
+            if entry is not None and entry.next_at == next_at:
+                out.add(invoice_id)
+        self._in_flight |= out
+        return out
+
+    def record(self, invoice_id: int, balance: Optional[float], now: Optional[float] = None):
+        """Schedule the next check after a balance read (balance None = read failed)."""
+        self._in_flight.discard(invoice_id)
+        entry = self._entries.get(invoice_id)
+        if entry is None:
+            return
+        now = time.time() if now is None else now
+        if balance is None:
+            interval = self.base_interval  # retry soon after an RPC error
+        elif entry.status == 'partial':
+            interval = self.partial_interval
+        elif entry.last_balance is None or balance != entry.last_balance:
+            interval = self.base_interval
+        else:
+            interval = min(self.max_interval, entry.interval * self.backoff_factor)
+        entry.interval = interval
+        if balance is not None:
+            entry.last_balance = balance
+        entry.next_at = now + interval
+        heapq.heappush(self._heap, (entry.next_at, invoice_id))
+
+    def next_check_in(self, now: Optional[float] = None) -> Optional[float]:
+        """Seconds until the earliest tracked invoice is due (None if nothing is tracked)."""
+        now = time.time() if now is None else now
+        while self._heap:
+            next_at, invoice_id = self._heap[0]
+            entry = self._entries.get(invoice_id)
+            if entry is not None and entry.next_at == next_at:
+                return max(0.0, next_at - now)
+            heapq.heappop(self._heap)
+        return None
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,175 @@
+# Asyncio-движок keeper_bot: независимые задачи сканирования, форвардинга, активации и health-check
+
+import asyncio
+import logging
+
+from tronpy import AsyncTron
+from tronpy.providers.async_http import AsyncHTTPProvider
+
+from src.core.config import config
+from src.core.database.db_service import get_db
+
+logger = logging.getLogger("keeper_bot.async")
+
+
+class AsyncKeeperEngine:
+    """Runs KeeperBot work as independent asyncio tasks instead of one serial loop.
+
+    - invoices:   balance/account reads via AsyncTron (bounded by a semaphore and the
+                  per-endpoint token bucket); DB updates are applied serially in a thread
+                  through KeeperBot._apply_invoice_state / handle_invoice_payment
+    - forwarding: KeeperBot.forward_trx_deposits in a thread, on its own interval
+    - activation: N tasks claiming due ActivationJobQueue jobs (queue runs without its own threads)
+    - health:     block-height probe; reconnects the sync client and rebuilds the async one
+
+    A slow activation or a node hiccup in one task no longer delays the others.
+    """
+
+    def __init__(self, keeper, *, invoice_interval: float, forward_interval: float, health_interval: float):
+        self.keeper = keeper
+        self.invoice_interval = max(1.0, float(invoice_interval))
+        self.forward_interval = max(1.0, float(forward_interval))
+        self.health_interval = max(1.0, float(health_interval))
+        self.aclient: AsyncTron | None = None
+        self._stop = asyncio.Event()
+
+    def _build_async_client(self) -> AsyncTron:
+        """Async client pointed at the same endpoint the sync client currently uses"""
+        provider = getattr(self.keeper.client, 'provider', None)
+        endpoint = getattr(provider, 'endpoint_uri', None) or self.keeper.tron_config.remote_full_node
+        api_key = self.keeper.tron_config.api_key or None
+        return AsyncTron(provider=AsyncHTTPProvider(endpoint_uri=endpoint, api_key=api_key))
+
+    async def _acquire_token(self):
+        bucket = self.keeper._rpc_bucket()
+        while not bucket.try_acquire():
+            await asyncio.sleep(1.0 / max(1.0, bucket.rate))
+
+    def stop(self):
+        self._stop.set()
+
+    async def run(self):
+        """Start all tasks and run until stop() is called or the process is interrupted"""
+        self.aclient = self._build_async_client()
+        workers = max(1, int(config.keeper.activation_queue_workers))
+        tasks = [
+            asyncio.create_task(self._every(self.invoice_interval, self.invoice_pass), name="invoices"),
+            asyncio.create_task(self._every(self.forward_interval, self.forward_pass), name="forwarding"),
+            asyncio.create_task(self._every(self.health_interval, self.health_pass), name="health"),
+        ]
+        tasks += [
+            asyncio.create_task(self._activation_worker(), name=f"activation-{i}")
+            for i in range(workers)
+        ]
+        logger.info("Async keeper engine started (%s activation workers)", workers)
+        try:
+            await self._stop.wait()
+        finally:
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self.aclient.close()
+            logger.info("Async keeper engine stopped")
+
+    async def _every(self, interval: float, job):
+        """Run job, then sleep interval; errors are logged and never stop the task"""
+        while not self._stop.is_set():
+            try:
+                await job()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Async keeper task %s failed: %s", getattr(job, '__name__', job), e)
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _fetch_state(self, acontract, invoice, sem: asyncio.Semaphore):
+        """Async counterpart of KeeperBot._fetch_invoice_state"""
+        address = invoice.address
+        async with sem:
+            try:
+                await self._acquire_token()
+                balance = float(await acontract.functions.balanceOf(address)) / 1_000_000
+            except Exception as e:
+                logger.error("Error checking balance for %s: %s", address, e)
+                return None, True, True
+            rpc_error = False
+            try:
+                await self._acquire_token()
+                not_activated = (await self.aclient.get_account(address)) is None
+            except Exception as e:
+                msg = str(e).lower()
+                if 'account not found' not in msg and 'does not exist' not in msg:
+                    logger.error("Error checking TRX account for %s: %s", address, e)
+                    rpc_error = True
+                not_activated = True
+            return balance, not_activated, rpc_error
+
+    async def invoice_pass(self):
+        keeper = self.keeper
+        if keeper.indexer is not None:
+            # Indexer mode is already one request per block; run it as is
+            await asyncio.to_thread(keeper.check_pending_invoices)
+            return
+        keeper.transfer_events.new_cycle()
+        db = next(get_db())
+        try:
+            # Contract first: a failure here must not leave invoices popped from the scheduler
+            acontract = await self.aclient.get_contract(keeper.usdt_contract_address)
+            invoices = await asyncio.to_thread(keeper._load_open_invoices, db)
+            invoices = [inv for inv in invoices if inv.status in ('pending', 'partial', 'activating')]
+            invoices = keeper._select_due_invoices(invoices)
+            if not invoices:
+                return
+            sem = asyncio.Semaphore(max(1, int(config.keeper.balance_scan_concurrency)))
+            states = await asyncio.gather(*(self._fetch_state(acontract, inv, sem) for inv in invoices))
+            for invoice, (balance, _, _) in zip(invoices, states):
+                keeper._record_invoice_check(invoice, balance)
+
+            def _apply():
+                contract = keeper.client.get_contract(keeper.usdt_contract_address)
+                for invoice, (balance, not_activated, _) in zip(invoices, states):
+                    # Lease may have been lost while balances were being fetched
+                    if balance is None or not keeper._owns_seller(invoice.seller_id):
+                        continue
+                    keeper._apply_invoice_state(db, contract, invoice, balance, not_activated)
+
+            await asyncio.to_thread(_apply)
+            if any(rpc_error for _, _, rpc_error in states):
+                await self.health_pass(force_reconnect=True)
+        finally:
+            db.close()
+
+    async def forward_pass(self):
+        await asyncio.to_thread(self.keeper.forward_trx_deposits)
+
+    async def health_pass(self, force_reconnect: bool = False):
+        healthy = not force_reconnect
+        if healthy:
+            try:
+                await self.aclient.get_latest_block_number()
+            except Exception as e:
+                logger.warning("Async client health check failed: %s", e)
+                healthy = False
+        if not healthy:
+            old_endpoint = getattr(getattr(self.keeper.client, 'provider', None), 'endpoint_uri', None)
+            await asyncio.to_thread(self.keeper._reconnect_if_needed)
+            new_endpoint = getattr(getattr(self.keeper.client, 'provider', None), 'endpoint_uri', None)
+            if new_endpoint != old_endpoint:
+                await self.aclient.close()
+                self.aclient = self._build_async_client()
+                logger.info("Async client switched to %s", new_endpoint)
+
+    async def _activation_worker(self):
+        queue = self.keeper.activation_queue
+        while not self._stop.is_set():
+            try:
+                # process_one blocks up to its timeout waiting for a job, so run it off the loop
+                await asyncio.to_thread(queue.process_one, 1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Activation worker error: %s", e)
+                await asyncio.sleep(1.0)
@@ -1,8 +1,8 @@
 # Основной скрипт воркера для мониторинга блокчейна
 
 import time
+import asyncio
 import logging
-from datetime import datetime, timezone
 from tronpy import Tron
 from tronpy.providers import HTTPProvider
 from tronpy.keys import PrivateKey
@@ -11,19 +11,34 @@ from tronpy.keys import PrivateKey
 import sys
 import os
 import re
-from queue import Queue, Empty
-from threading import Thread
+from threading import Thread, Event, current_thread
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 
 # Add project root to Python path
 project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.insert(0, project_root)
 
-from src.core.database.db_service import get_db, get_invoices_by_seller, get_invoice, update_invoice, create_transaction, get_seller, update_seller
+from src.core.database.db_service import get_db, get_invoices_by_seller, get_invoice, update_invoice, credit_seller_gas_deposits
+from src.core.database.db_service import record_invoice_transfer, get_transactions_by_invoice
+from src.core.database.db_service import (
+    SessionLocal, enqueue_activation_job, claim_activation_job, reschedule_activation_job,
+    complete_activation_job, activation_queue_stats,
+)
+from src.core.tron.rate_limit import get_endpoint_bucket
+from src.core.tron.endpoint_router import get_endpoint_router
+from src.core.tron.ref_block import build_tronpy
+from src.services.trc20_indexer import Trc20TransferIndexer
+from src.services.keeper_async import AsyncKeeperEngine
+from src.services.keeper_sharding import ShardLeaseManager
+from src.services.invoice_scheduler import InvoicePollScheduler
+from src.services.warm_pool import WarmAddressPool
+from src.services.transfer_event_cache import TransferEventCache
 from src.core.database.models import Invoice, Wallet
-from src.core.services.gas_station import auto_activate_on_usdt_receive, GasStationManager
+from src.core.services.gas_station import auto_activate_on_usdt_receive, reclaim_idle_delegations, activate_addresses, GasStationManager
+from src.core.services.delegation_leases import LeaseReclaimer
 from src.core.config import config
-from bip_utils import Bip44, Bip44Coins, Bip44Changes, Bip39SeedGenerator
+from src.core.crypto.key_cache import Bip44KeyCache
 import importlib as _importlib
 _SELF_MODULE = _importlib.import_module(__name__)
 
@@ -38,7 +53,7 @@ logging.basicConfig(
 )
 logger = logging.getLogger("keeper_bot")
 
-# --- Lightweight background activation queue (threaded) ---
+# --- Persistent background activation queue (SQLite-backed) ---
 
 @dataclass
 class ActivationJob:
@@ -49,18 +64,37 @@ class ActivationJob:
 
 
 class ActivationJobQueue:
-    """Simple thread-based queue to run activation+delegation asynchronously.
+    """Activation+delegation jobs stored in the activation_jobs table.
     Avoids blocking the main keeper loop when nodes are slow to confirm/poll.
+
+    - Jobs survive restarts; a job whose worker died is re-claimed after stale_after_sec
+    - A failed attempt is rescheduled with not_before = now + backoff, so workers only
+      pick up due jobs and never sleep on backoff
+    - Claims are conditional UPDATEs, so any number of workers (threads or keeper
+      processes sharing the DB) can pull from the queue without duplicating work
     """
 
-    def __init__(self, worker_count: int = 1, default_retries: int = 3, backoff_sec: float = 5.0):
-        self.q: Queue = Queue()
-        self._in_flight: set[int] = set()  # invoice_ids in progress
+    def __init__(
+        self,
+        worker_count: int = 1,
+        default_retries: int = 3,
+        backoff_sec: float = 5.0,
+        start_workers: bool = True,
+        session_factory=SessionLocal,
+        worker_id: str | None = None,
+        stale_after_sec: float = 300.0,
+    ):
+        self._in_flight: set[int] = set()  # invoice_ids run by this process (sync mode / local workers)
         self._workers: list[Thread] = []
         self.sync_mode: bool = False  # when True, run jobs immediately in caller thread
         self._default_retries = default_retries
         self._default_backoff = backoff_sec
-        for i in range(max(1, worker_count)):
+        self._session_factory = session_factory
+        self._worker_id = worker_id or config.keeper.instance_id
+        self._stale_after_sec = float(stale_after_sec)
+        self._wakeup = Event()
+        # start_workers=False: jobs are driven externally via process_one (async engine)
+        for i in range(max(1, worker_count) if start_workers else 0):
             t = Thread(target=self._worker, name=f"activation-worker-{i}", daemon=True)
             t.start()
             self._workers.append(t)
@@ -75,16 +109,20 @@ class ActivationJobQueue:
                 self._handle_job(job)
             finally:
                 self._in_flight.discard(job.invoice_id)
-        else:
-            # Fill defaults if not provided
-            if job.retries_left is None:
-                job.retries_left = self._default_retries
-            if job.backoff_sec is None:
-                job.backoff_sec = self._default_backoff
-            self._in_flight.add(job.invoice_id)
-            self.q.put(job)
+            return
+        retries = self._default_retries if job.retries_left is None else job.retries_left
+        backoff = self._default_backoff if job.backoff_sec is None else job.backoff_sec
+        db = self._session_factory()
+        try:
+            if enqueue_activation_job(db, job.invoice_id, job.address, retries, backoff):
+                self._wakeup.set()
+            else:
+                logger.debug("Activation job for invoice %s is already queued", job.invoice_id)
+        finally:
+            db.close()
 
-    def _handle_job(self, job: ActivationJob):
+    def _handle_job(self, job: ActivationJob) -> bool:
+        """Run one activation attempt and update the invoice. Returns True if it should be retried."""
         ok = False
         try:
             ok = _SELF_MODULE.auto_activate_on_usdt_receive(job.address)
@@ -101,70 +139,189 @@ class ActivationJobQueue:
                 if inv and inv.status == 'activating':
                     update_invoice(db, inv.id, status='pending')
                     logger.info("Activation completed in background for %s (invoice %s)", job.address, job.invoice_id)
+            elif job.retries_left > 0 and not self.sync_mode:
+                logger.info("Activation for %s (invoice %s) rescheduled in %ss, retries left %s",
+                            job.address, job.invoice_id, job.backoff_sec, job.retries_left - 1)
+                return True
             else:
-                # Retry logic with simple backoff
-                if job.retries_left > 0 and not self.sync_mode:
-                    job.retries_left -= 1
-                    logger.info("Requeue activation for %s (invoice %s), retries left %s", job.address, job.invoice_id, job.retries_left)
-                    time.sleep(job.backoff_sec)
-                    self.q.put(job)
-                    return
-                else:
-                    # Give up: move invoice out of 'activating' to allow future attempts
-                    if inv and inv.status == 'activating':
-                        update_invoice(db, inv.id, status='pending')
-                    logger.warning("Activation permanently failed for %s (invoice %s)", job.address, job.invoice_id)
+                # Give up: move invoice out of 'activating' to allow future attempts
+                if inv and inv.status == 'activating':
+                    update_invoice(db, inv.id, status='pending')
+                logger.warning("Activation permanently failed for %s (invoice %s)", job.address, job.invoice_id)
         except Exception as ue:
             logger.error("Failed to update invoice after activation attempt %s: %s", job.invoice_id, ue)
+        return False
+
+    def _claim(self, worker_id: str):
+        db = self._session_factory()
+        try:
+            rec = claim_activation_job(db, worker_id, self._stale_after_sec)
+            if rec is None:
+                return None, None
+            return rec.id, ActivationJob(
+                invoice_id=rec.invoice_id, address=rec.address,
+                retries_left=int(rec.retries_left), backoff_sec=float(rec.backoff_sec),
+            )
+        except Exception as e:
+            logger.error("Failed to claim activation job: %s", e)
+            return None, None
+        finally:
+            db.close()
+
+    def process_one(self, timeout: float = 1.0) -> bool:
+        """Handle at most one due job in the caller thread.
+        Returns False if no job became due within timeout."""
+        # Claims are owned per thread, so sibling workers of one process never finalize each other's jobs
+        worker_id = f"{self._worker_id}/{current_thread().name}"
+        job_id, job = self._claim(worker_id)
+        if job is None:
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+            job_id, job = self._claim(worker_id)
+            if job is None:
+                return False
+        self._in_flight.add(job.invoice_id)
+        try:
+            retry = self._handle_job(job)
+        finally:
+            self._in_flight.discard(job.invoice_id)
+        db = self._session_factory()
+        try:
+            if retry:
+                reschedule_activation_job(db, job_id, worker_id, job.backoff_sec, error="activation failed")
+            else:
+                complete_activation_job(db, job_id, worker_id)
+        except Exception as e:
+            logger.error("Failed to finalize activation job %s: %s", job_id, e)
+        finally:
+            db.close()
+        return True
 
     def _worker(self):
         while True:
-            try:
-                job: ActivationJob = self.q.get(timeout=1.0)  # type: ignore[assignment]
-            except Empty:
-                continue
-            try:
-                self._handle_job(job)
-            finally:
-                self._in_flight.discard(job.invoice_id)
-                self.q.task_done()
+            self.process_one(timeout=1.0)
+
+    def stats(self) -> dict:
+        """Queue depth and age (see activation_queue_stats)."""
+        db = self._session_factory()
+        try:
+            return activation_queue_stats(db)
+        finally:
+            db.close()
 
     def wait_idle(self, timeout: float = 3.0):
-        """Block briefly until the queue has processed current jobs or timeout."""
+        """Block briefly until no job is due or running, or timeout."""
         end = time.time() + max(0.1, timeout)
         while time.time() < end:
-            if self.q.empty() and not self._in_flight:
-                return
+            if not self._in_flight:
+                st = self.stats()
+                if st["due"] == 0 and st["running"] == 0:
+                    return
             time.sleep(0.05)
 
+# Seconds to wait for a broadcast TRX forward to show up on-chain before retrying it
+FORWARD_PENDING_GRACE_SEC = 300
+
+
 class KeeperBot:
     """Blockchain monitoring bot for invoice payments and TRX deposit forwarding"""
     
     def __init__(self):
         self.tron_config = config.tron
+        self.client_endpoint = None  # router endpoint name the client was built for
         self.client = self._get_tron_client()
         self.usdt_contract_address = self.tron_config.usdt_contract
+        # Seed/account-node cache for deposit key derivation (wiped in close())
+        self.key_cache = Bip44KeyCache(
+            self.tron_config.gas_wallet_mnemonic,
+            max_accounts=config.keeper.key_cache_size,
+        ) if self.tron_config.gas_wallet_mnemonic else None
+        # Recipient-indexed transfer events, fetched at most once per invoice pass
+        self.transfer_events = TransferEventCache()
+        # Last seen deposit balances: address -> (balance_sun, seen_at, forward_pending)
+        self._deposit_seen: dict[str, tuple[int, float, bool]] = {}
         # Background queue for activation jobs
         aq_workers = max(1, int(config.keeper.activation_queue_workers))
         self.activation_queue = ActivationJobQueue(
             worker_count=aq_workers,
             default_retries=int(config.keeper.activation_queue_retries),
             backoff_sec=float(config.keeper.activation_queue_backoff_sec),
+            stale_after_sec=float(config.keeper.activation_job_stale_sec),
+            # In async run mode the engine's activation tasks drive the queue
+            start_workers=config.keeper.run_mode != "async",
         )
         # Allow forcing synchronous processing in tests via env
         self.activation_queue.sync_mode = bool(config.keeper.activation_queue_sync)
+        # Optional sharding: this process only handles sellers in partitions it holds a lease for
+        self.shards = None
+        if config.keeper.sharding_enabled:
+            self.shards = ShardLeaseManager(
+                config.keeper.instance_id,
+                partitions=config.keeper.shard_partitions,
+                ttl_sec=config.keeper.lease_ttl_sec,
+            )
+            self.shards.start()
+            logger.info("Sharding enabled: instance %s holds partitions %s of %s",
+                        config.keeper.instance_id, sorted(self.shards.held_partitions()), config.keeper.shard_partitions)
+        # Optional background reclaim of idle gas station delegations
+        self.reclaimer = None
+        if config.keeper.reclaim_interval_sec > 0:
+            self.reclaimer = LeaseReclaimer(self.reclaim_delegations, config.keeper.reclaim_interval_sec)
+            self.reclaimer.start()
+        # Optional warm pool of pre-activated invoice addresses
+        self.warm_pool = None
+        if config.keeper.warm_pool_size > 0:
+            self.warm_pool = WarmAddressPool(
+                activate_addresses,
+                size=config.keeper.warm_pool_size,
+                daily_budget_trx=config.keeper.warm_pool_daily_budget_trx,
+                max_per_pass=config.keeper.warm_pool_max_per_pass,
+                est_cost_sun=int(self.tron_config.auto_activation_amount * 1_000_000) + 100_000,
+                is_quiet=self._activation_queue_idle,
+                owns_seller=self._owns_seller,
+                stale_after_sec=config.keeper.warm_pool_stale_sec,
+            )
+            self.warm_pool.start(config.keeper.warm_pool_interval_sec)
+        # Optional adaptive per-invoice polling cadence (poll mode only)
+        self.scheduler = None
+        if config.keeper.scheduler_enabled:
+            self.scheduler = InvoicePollScheduler(
+                base_interval=config.keeper.scheduler_base_sec,
+                max_interval=config.keeper.scheduler_max_sec,
+                partial_interval=config.keeper.scheduler_partial_sec,
+                backoff_factor=config.keeper.scheduler_backoff_factor,
+            )
+        # Optional block-driven payment detection (see check_pending_invoices_indexed)
+        self.indexer = None
+        self._indexed_invoice_ids: set[int] = set()
+        if config.keeper.invoice_detection == "indexer":
+            self.indexer = Trc20TransferIndexer(
+                self.usdt_contract_address,
+                confirmations=config.keeper.indexer_confirmations,
+                max_blocks_per_scan=config.keeper.indexer_max_blocks_per_cycle,
+            )
+            if self.shards is not None:
+                # Each instance (stable KEEPER_INSTANCE_ID) tracks its own progress and resumes it after
+                # a restart; invoices from taken-over partitions are balance-checked once on first sight,
+                # covering blocks the old owner missed
+                self.indexer.checkpoint_name += f":{config.keeper.instance_id}"
+            try:
+                self.indexer.load_checkpoint(next(get_db()))
+            except Exception as e:
+                logger.warning("Failed to load indexer checkpoint: %s", e)
         logger.info("Keeper bot initialized for %s network", self.tron_config.network)
         logger.info("USDT contract: %s", self.usdt_contract_address)
     
     def _get_tron_client(self) -> Tron:
-        """Create and configure TRON client with local node preference"""
-        client = self._try_create_local_client()
-        
-        if client is None:
-            logger.info("Local TRON node unavailable, using remote endpoints")
-            client = self._create_remote_client()
-        
-        return client
+        """Create and configure TRON client on the healthiest endpoint (see EndpointRouter)"""
+        for endpoint in get_endpoint_router().candidates():
+            client = self._try_create_local_client() if endpoint.name == "local" else self._create_remote_client()
+            if client is not None:
+                self.client_endpoint = endpoint.name
+                return client
+        logger.info("Local TRON node unavailable, using remote endpoints")
+        self.client_endpoint = "remote"
+        return self._create_remote_client()
     
     def _try_create_local_client(self) -> Tron:
         """Try to create a client using local TRON node"""
@@ -172,8 +329,8 @@ class KeeperBot:
             return None
         
         try:
-            # Test local node connection first
-            if not self.tron_config.test_local_node_connection():
+            # Test local node connection first (the outcome feeds the endpoint router)
+            if not get_endpoint_router().check("local"):
                 logger.warning("Local TRON node connection test failed")
                 return None
             
@@ -215,12 +372,16 @@ class KeeperBot:
         return client
     
     def _check_client_health(self) -> bool:
-        """Check if current client connection is healthy"""
+        """Check if current client connection is healthy (the outcome feeds the endpoint router)"""
+        router = get_endpoint_router()
+        started = time.monotonic()
         try:
             self.client.get_latest_block()
+            router.record_success(self.client_endpoint, (time.monotonic() - started) * 1000)
             return True
         except Exception as e:
             logger.warning("Client health check failed: %s", e)
+            router.record_failure(self.client_endpoint)
             return False
     
     def _reconnect_if_needed(self):
@@ -237,74 +398,109 @@ class KeeperBot:
         logger.info("Invoice %s paid: tx=%s, amount=%s", invoice_id, tx_hash, amount)
     # Notification hook placeholder
     
-    def handle_invoice_payment(self, db, contract, inv, address: str, not_activated: bool):
-        """Handle payment for an invoice using a simple balance snapshot.
-        - Reads current USDT balance for the invoice address
-        - Records a single transaction reflecting the observed balance
-        - Updates invoice status to 'partial' or 'paid'
+    def handle_invoice_payment(self, db, contract, inv, address: str, not_activated: bool, current_received: float = None):
+        """Handle payment for an invoice from its on-chain USDT balance.
+        - Reads current USDT balance for the invoice address (unless already fetched by the caller)
+        - Records only the increase over Invoice.received_amount, as one transaction row
+          (log_index=-1); exact Transfer logs are ingested by ingest_invoice_transfers
+        - Updates invoice status to 'partial' or 'paid' from the running total
         Note: Activation, if needed, is handled by process_invoice before calling this.
         """
         # Current on-chain USDT balance
-        try:
-            raw_balance = contract.functions.balanceOf(address)
-            current_received = float(raw_balance) / 1_000_000 if isinstance(raw_balance, (int, float)) else float(raw_balance) / 1_000_000
-        except Exception as e:
-            logger.error("Failed to read USDT balance for %s: %s", address, e)
-            return
-
-        # Determine tx hash from recent transfer events (best effort)
-        last_tx_hash = self._try_get_last_txid(contract, address)
+        if current_received is None:
+            try:
+                raw_balance = contract.functions.balanceOf(address)
+                current_received = float(raw_balance) / 1_000_000 if isinstance(raw_balance, (int, float)) else float(raw_balance) / 1_000_000
+            except Exception as e:
+                logger.error("Failed to read USDT balance for %s: %s", address, e)
+                return
 
-        # Record a single transaction for the observed balance
-        try:
-            tx_hash_to_use = last_tx_hash or f"synthetic:{address}:{int(time.time())}:{int(current_received * 1_000_000)}"
-            create_transaction(
-                db,
-                invoice_id=inv.id,
-                tx_hash=tx_hash_to_use,
-                sender_address='multiple',
-                amount_received=current_received,
-                received_at=datetime.now(timezone.utc),
-            )
-        except Exception as e:
-            logger.debug("Failed to record transaction for invoice %s (may already exist): %s", inv.id, e)
+        recorded = float(getattr(inv, 'received_amount', 0) or 0)
+        total = recorded
+        last_tx_hash = ""
+        delta_sun = int(round(current_received * 1_000_000)) - int(round(recorded * 1_000_000))
+        if delta_sun > 0:
+            # Attribute the increase to the latest transfer txid if it is not recorded yet (best effort)
+            delta = delta_sun / 1_000_000
+            last_tx_hash = self._try_get_last_txid(contract, address)
+            synthetic = f"synthetic:{address}:{int(round(current_received * 1_000_000))}"
+            try:
+                if record_invoice_transfer(db, inv.id, last_tx_hash or synthetic, -1, 'multiple', delta) or (
+                    last_tx_hash and record_invoice_transfer(db, inv.id, synthetic, -1, 'multiple', delta)
+                ):
+                    total = recorded + delta
+            except Exception as e:
+                logger.error("Failed to record transfer for invoice %s: %s", inv.id, e)
 
         # Update invoice status and notify
         try:
-            if current_received >= float(inv.amount):
-                update_invoice(db, inv.id, status='paid')
-                _SELF_MODULE.notify_invoice_paid(inv.id, last_tx_hash, current_received)
-                logger.info("Invoice %s fully paid: received %.6f / required %.6f", inv.id, current_received, float(inv.amount))
-            elif current_received > 0:
+            if total > 0 and total >= float(inv.amount):
+                if inv.status != 'paid':
+                    update_invoice(db, inv.id, status='paid')
+                    _SELF_MODULE.notify_invoice_paid(inv.id, last_tx_hash, total)
+                    logger.info("Invoice %s fully paid: received %.6f / required %.6f", inv.id, total, float(inv.amount))
+            elif total > 0:
                 if inv.status not in ('partial', 'paid'):
                     update_invoice(db, inv.id, status='partial')
-                    logger.info("Invoice %s partially paid: received %.6f / required %.6f (prev status %s)", inv.id, current_received, float(inv.amount), inv.status)
+                    logger.info("Invoice %s partially paid: received %.6f / required %.6f (prev status %s)", inv.id, total, float(inv.amount), inv.status)
         except Exception as e:
             logger.error("Failed to update status for invoice %s: %s", inv.id, e)
 
-    def _try_get_last_txid(self, contract, to_address: str) -> str:
-        """Best-effort derive latest transfer txid to 'to_address' from contract events."""
+    def ingest_invoice_transfers(self, db, inv, transfers, balance: float = None) -> int:
+        """Record exact Transfer logs to an invoice address, one row per (txid, log_index).
+        Transactions already attributed by a balance check are skipped. With balance given,
+        the running total is never credited past it, so funds first counted by a balance
+        check (synthetic row) are not counted twice. Returns rows added."""
         try:
-            events = contract.functions.transferEvent()
-            if not isinstance(events, list):
-                return ""
-            picked = ""
-            for ev in events:
-                to_a = ev.get('to') or ev.get('to_address') or ev.get('toAddress')
-                if to_a == to_address:
-                    picked = ev.get('transaction_id') or ev.get('txID') or ev.get('txid') or picked
-            return picked
-        except Exception:
-            return ""
+            known = {t.tx_hash for t in get_transactions_by_invoice(db, inv.id)}
+        except Exception as e:
+            logger.error("Failed to load transactions for invoice %s: %s", inv.id, e)
+            return 0
+        added = 0
+        running_sun = int(round(float(getattr(inv, 'received_amount', 0) or 0) * 1_000_000))
+        cap_sun = None if balance is None else int(round(balance * 1_000_000))
+        for t in transfers:
+            if t.txid in known:
+                continue
+            credit_sun = t.amount_raw if cap_sun is None else max(0, min(t.amount_raw, cap_sun - running_sun))
+            try:
+                if record_invoice_transfer(db, inv.id, t.txid, t.log_index, t.from_address,
+                                           t.amount_raw / 1_000_000, credit=credit_sun / 1_000_000):
+                    added += 1
+                    running_sun += credit_sun
+                    logger.info("Invoice %s: recorded transfer %s#%s of %.6f USDT",
+                                inv.id, t.txid, t.log_index, t.amount_raw / 1_000_000)
+            except Exception as e:
+                logger.error("Failed to record transfer %s#%s for invoice %s: %s", t.txid, t.log_index, inv.id, e)
+        return added
+
+    def _try_get_last_txid(self, contract, to_address: str) -> str:
+        """Best-effort latest transfer txid to 'to_address' (shared per-cycle event index)."""
+        return self.transfer_events.last_txid(contract, to_address)
     
-    def process_invoice(self, db, contract, invoice):
-        """Process a single invoice for payments"""
-        if invoice.status not in ('pending', 'partial', 'activating'):
-            return
-        
+    def _owns_seller(self, seller_id) -> bool:
+        """True if this keeper is responsible for the seller (always True without sharding)"""
+        return self.shards is None or self.shards.owns_seller(seller_id)
+
+    def _rpc_bucket(self):
+        """Token bucket shared by all callers of the current client's endpoint"""
+        endpoint = getattr(getattr(self.client, 'provider', None), 'endpoint_uri', None)
+        return get_endpoint_bucket(
+            endpoint if isinstance(endpoint, str) else 'default',
+            self.tron_config.rpc_rate_per_sec,
+            self.tron_config.rpc_burst,
+        )
+
+    def _fetch_invoice_state(self, contract, invoice):
+        """Read USDT balance and activation state for an invoice address.
+        Safe to call from worker threads: does not touch the DB or reconnect.
+        Returns (balance, not_activated, rpc_error); balance is None if it could not be read.
+        """
         address = invoice.address
-        
+        bucket = self._rpc_bucket()
+
         try:
+            bucket.acquire()
             raw_balance = contract.functions.balanceOf(address)
             if isinstance(raw_balance, (int, float)):
                 balance = raw_balance / 1_000_000
@@ -317,11 +513,11 @@ class KeeperBot:
                     balance = 0.0
         except Exception as e:
             logger.error("Error checking balance for %s: %s", address, e)
-            # Try to reconnect on balance check failure
-            self._reconnect_if_needed()
-            return
+            return None, True, True
 
+        rpc_error = False
         try:
+            bucket.acquire()
             account_info = self.client.get_account(address)
             not_activated = account_info is None
         except Exception as e:
@@ -331,9 +527,27 @@ class KeeperBot:
                 logger.info("Account not yet activated on-chain for %s (invoice %s)", address, invoice.id)
             else:
                 logger.error("Error checking TRX account for %s: %s", address, e)
-            # Try to reconnect on account check failure
-            self._reconnect_if_needed()
+                rpc_error = True
             not_activated = True
+        return balance, not_activated, rpc_error
+
+    def process_invoice(self, db, contract, invoice):
+        """Process a single invoice for payments.
+        Returns False when the on-chain balance could not be read."""
+        if invoice.status not in ('pending', 'partial', 'activating'):
+            return
+        
+        balance, not_activated, rpc_error = self._fetch_invoice_state(contract, invoice)
+        if rpc_error:
+            # Try to reconnect on balance/account check failure
+            self._reconnect_if_needed()
+        if balance is None:
+            return False
+        return self._apply_invoice_state(db, contract, invoice, balance, not_activated)
+
+    def _apply_invoice_state(self, db, contract, invoice, balance: float, not_activated: bool):
+        """Apply a fetched balance/activation state to an invoice (DB writes, activation, notify)"""
+        address = invoice.address
 
         # Proactive activation & resource delegation BEFORE any USDT arrives
         # so incoming TRC20 transfer will succeed without sender providing TRX.
@@ -353,44 +567,143 @@ class KeeperBot:
                 except Exception as e:
                     logger.error("Activation (on first USDT) failed for %s: %s", address, e)
             # Use the invoice object passed from the query to keep stable IDs for mocks/tests
-            self.handle_invoice_payment(db, contract, invoice, address, not_activated)
+            self.handle_invoice_payment(db, contract, invoice, address, not_activated, current_received=balance)
         elif invoice.status == 'partial':
             # No on-chain balance reported now, keep status until events are processed
             logger.debug("Invoice %s previously partial, waiting for more funds", invoice.id)
+        return True
     
     def check_pending_invoices(self):
-        """Check all pending/activating/partial invoices for payments"""
+        """Check all pending/activating/partial invoices for payments.
+        Balances are fetched in parallel (bounded by KEEPER_BALANCE_SCAN_CONCURRENCY and the
+        per-endpoint token bucket); results are applied to the DB serially in invoice order.
+        """
+        if self.indexer is not None:
+            self.check_pending_invoices_indexed()
+            return
         logger.info("Checking pending invoices...")
+        self.transfer_events.new_cycle()
         
         try:
             contract = self.client.get_contract(self.usdt_contract_address)
             
             db = next(get_db())
-            # Include invoices in pending, activating, or partial states
-            target_statuses = ('pending', 'activating', 'partial')
-            sellers = (
-                db.query(Invoice.seller_id)
-                .filter(Invoice.status.in_(target_statuses))
-                .distinct()
-            )
-            
-            for seller_row in sellers:
-                seller_id = seller_row.seller_id
-                candidate_invoices = [
-                    inv for inv in get_invoices_by_seller(db, seller_id)
-                    if inv.status in target_statuses
-                ]
-                if candidate_invoices:
-                    logger.info(
-                        "Processing %s invoices (statuses in %s) for seller %s",
-                        len(candidate_invoices), target_statuses, seller_id
-                    )
-                    for invoice in candidate_invoices:
-                        self.process_invoice(db, contract, invoice)
-                        time.sleep(0.1)  # Small delay to avoid rate limiting
+            invoices = self._select_due_invoices(self._load_open_invoices(db))
+            rpc_errors = 0
+            for invoice, (balance, not_activated, rpc_error) in self._fetch_invoice_states(contract, invoices):
+                rpc_errors += int(rpc_error)
+                self._record_invoice_check(invoice, balance)
+                # Lease may have been lost while balances were being fetched
+                if balance is None or not self._owns_seller(invoice.seller_id):
+                    continue
+                self._apply_invoice_state(db, contract, invoice, balance, not_activated)
+            if rpc_errors:
+                # Try to reconnect once per pass instead of from every worker
+                self._reconnect_if_needed()
                 
         except Exception as e:
             logger.error("Error in check_pending_invoices: %s", e)
+
+    def _select_due_invoices(self, invoices: list) -> list:
+        """Filter open invoices down to those the scheduler says are due (all, without scheduler)"""
+        if self.scheduler is None:
+            return invoices
+        self.scheduler.sync(invoices)
+        due = self.scheduler.due()
+        if len(due) < len(invoices):
+            logger.info("Scheduler: %s of %s open invoices due for a check", len(due), len(invoices))
+        return [inv for inv in invoices if inv.id in due]
+
+    def _record_invoice_check(self, invoice, balance):
+        if self.scheduler is not None:
+            self.scheduler.record(invoice.id, balance)
+
+    def _fetch_invoice_states(self, contract, invoices):
+        """Yield (invoice, state) pairs in input order, fetching states through a bounded worker pool"""
+        invoices = [inv for inv in invoices if inv.status in ('pending', 'partial', 'activating')]
+        if not invoices:
+            return
+        workers = max(1, min(int(config.keeper.balance_scan_concurrency), len(invoices)))
+        if workers == 1:
+            for inv in invoices:
+                yield inv, self._fetch_invoice_state(contract, inv)
+            return
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="balance-scan") as pool:
+            yield from zip(invoices, pool.map(lambda inv: self._fetch_invoice_state(contract, inv), invoices))
+
+    def _load_open_invoices(self, db) -> list:
+        """Return invoices in pending, activating or partial states, grouped by seller"""
+        # Include invoices in pending, activating, or partial states
+        target_statuses = ('pending', 'activating', 'partial')
+        sellers = (
+            db.query(Invoice.seller_id)
+            .filter(Invoice.status.in_(target_statuses))
+            .distinct()
+        )
+        invoices = []
+        for seller_row in sellers:
+            seller_id = seller_row.seller_id
+            if not self._owns_seller(seller_id):
+                continue
+            candidate_invoices = [
+                inv for inv in get_invoices_by_seller(db, seller_id)
+                if inv.status in target_statuses
+            ]
+            if candidate_invoices:
+                logger.info(
+                    "Processing %s invoices (statuses in %s) for seller %s",
+                    len(candidate_invoices), target_statuses, seller_id
+                )
+                invoices.extend(candidate_invoices)
+        return invoices
+
+    def check_pending_invoices_indexed(self):
+        """Detect payments from USDT Transfer logs instead of polling every invoice.
+        - Each open invoice is balance-checked once when first seen (covers funds that
+          arrived before the checkpoint and triggers proactive activation)
+        - After that, only invoices whose address appears as a Transfer recipient in
+          newly scanned blocks are processed; each Transfer log is stored as its own
+          transaction row keyed by (txid, log_index)
+        - The block checkpoint is committed after the batch has been applied
+        """
+        logger.info("Checking pending invoices (indexer)...")
+        self.transfer_events.new_cycle()
+        try:
+            contract = self.client.get_contract(self.usdt_contract_address)
+            db = next(get_db())
+            invoices = self._load_open_invoices(db)
+            by_address = {inv.address: inv for inv in invoices}
+
+            checked: set[int] = set()
+            for invoice in invoices:
+                if invoice.id not in self._indexed_invoice_ids:
+                    if self.process_invoice(db, contract, invoice) is not False:
+                        checked.add(invoice.id)
+            # Forget closed invoices so the tracking set stays bounded
+            open_ids = {inv.id for inv in invoices}
+            self._indexed_invoice_ids = (self._indexed_invoice_ids & open_ids) | checked
+
+            batch = self.indexer.scan(self.client, by_address.keys())
+            if batch is None:
+                return
+            transfers_by_address: dict[str, list] = {}
+            for t in batch.transfers:
+                transfers_by_address.setdefault(t.to_address, []).append(t)
+            for address, transfers in transfers_by_address.items():
+                invoice = by_address.get(address)
+                if invoice is None:
+                    continue
+                logger.info("Transfer to invoice %s address %s seen in blocks %s..%s",
+                            invoice.id, address, batch.from_block, batch.to_block)
+                balance, not_activated, _ = self._fetch_invoice_state(contract, invoice)
+                if balance is None:
+                    # Leave the checkpoint where it is; the batch is re-read next cycle
+                    raise RuntimeError(f"balance read failed for invoice {invoice.id}")
+                self.ingest_invoice_transfers(db, invoice, transfers, balance=balance)
+                self._apply_invoice_state(db, contract, invoice, balance, not_activated)
+            self.indexer.commit(db, batch.to_block)
+        except Exception as e:
+            logger.error("Error in check_pending_invoices_indexed: %s", e)
     
     def _get_hot_wallet_address(self) -> str:
         """Resolve the gas station hot wallet address from config"""
@@ -404,12 +717,9 @@ class KeeperBot:
                 return pk.public_key.to_base58check_address()
             except Exception:
                 logger.error("Invalid GAS_WALLET_PRIVATE_KEY configured")
-        if self.tron_config.gas_wallet_mnemonic:
+        if self.key_cache is not None:
             try:
-                seed_bytes = Bip39SeedGenerator(self.tron_config.gas_wallet_mnemonic).Generate()
-                bip44_ctx = Bip44.FromSeed(seed_bytes, Bip44Coins.TRON)
-                node = bip44_ctx.Purpose().Coin().Account(0).Change(Bip44Changes.CHAIN_EXT).AddressIndex(0)
-                return node.PublicKey().ToAddress()
+                return self.key_cache.address(0)
             except Exception as e:
                 logger.error("Failed to derive hot wallet address from mnemonic: %s", e)
         # Ownerless without GAS_WALLET_ADDRESS – warn and return empty; caller will skip forwarding
@@ -418,22 +728,49 @@ class KeeperBot:
 
     def _derive_privkey_hex_from_path(self, derivation_path: str) -> str:
         """Derive a private key (hex) for a BIP44 derivation path using master mnemonic"""
-        if not self.tron_config.gas_wallet_mnemonic:
+        if self.key_cache is None:
             raise ValueError("GAS_WALLET_MNEMONIC required to derive deposit private keys")
         m = re.match(r"m/44'/195'/(\d+)'/0/0", derivation_path)
         if not m:
             raise ValueError(f"Unsupported derivation path: {derivation_path}")
-        account = int(m.group(1))
-        seed_bytes = Bip39SeedGenerator(self.tron_config.gas_wallet_mnemonic).Generate()
-        bip44_ctx = Bip44.FromSeed(seed_bytes, Bip44Coins.TRON)
-        node = bip44_ctx.Purpose().Coin().Account(account).Change(Bip44Changes.CHAIN_EXT).AddressIndex(0)
-        return node.PrivateKey().Raw().ToHex()
+        # Seed is generated once per process; account nodes come from the LRU cache
+        return self.key_cache.private_key_hex(int(m.group(1)))
+
+    def _activation_queue_idle(self) -> bool:
+        """Quiet period for background spending: no activation job due or running"""
+        try:
+            stats = self.activation_queue.stats()
+        except Exception:
+            return False
+        return stats.get("due", 0) == 0 and stats.get("running", 0) == 0
+
+    def reclaim_delegations(self) -> dict:
+        """One delegation reclaim pass; with sharding only the holder of partition 0 runs it"""
+        if self.shards is not None and not self.shards.owns_partition(0):
+            return {}
+        return reclaim_idle_delegations()
+
+    def close(self):
+        """Release resources held by the keeper (wipes cached key material)"""
+        if self.reclaimer is not None:
+            self.reclaimer.stop()
+        if self.warm_pool is not None:
+            self.warm_pool.stop()
+        if self.key_cache is not None:
+            self.key_cache.wipe()
+        if self.shards is not None:
+            self.shards.stop()
 
     def forward_trx_deposits(self, min_reserve_sun: int = 200_000, min_threshold_sun: int = 0):
         """Scan seller TRX deposit addresses and forward balances to hot wallet.
+        Runs in two phases:
+        1. Fetch all deposit balances concurrently; wallets whose balance has not changed
+           since the last pass are skipped
+        2. Derive/sign/broadcast the qualifying transfers through a bounded worker pipeline
         - min_reserve_sun: keep this many sun on deposit address to cover bandwidth/fees
         - min_threshold_sun: skip forwarding if balance <= reserve + threshold
-        Also credits the seller's gas_deposit_balance with the forwarded amount.
+        Also credits the sellers' gas_deposit_balance with the forwarded amounts,
+        in a single DB transaction per pass.
         """
         if not getattr(self.tron_config, 'sweep_enabled', True):
             logger.debug("Skipping TRX forwarding (sweep disabled or xpub-only mode)")
@@ -452,45 +789,106 @@ class KeeperBot:
                 wallets = db.query(Wallet).filter(Wallet.deposit_type == 'TRX').all()
                 if not wallets:
                     return
-                for w in wallets:
-                    addr = w.address
-                    try:
-                        acc = self.client.get_account(addr)
-                        balance_sun = int(acc.get('balance', 0) or 0)
-                    except Exception as e:
-                        logger.warning("Failed to fetch TRX balance for %s: %s", addr, e)
+                targets = [
+                    (w.address, w.seller_id, w.derivation_path)
+                    for w in wallets if w.address and self._owns_seller(w.seller_id)
+                ]
+
+                # Phase 1: concurrent balance sweep
+                balances = self._fetch_deposit_balances([addr for addr, _, _ in targets])
+                plan = []
+                for addr, seller_id, derivation_path in targets:
+                    balance_sun = balances.get(addr)
+                    if balance_sun is None or self._deposit_unchanged(addr, balance_sun):
                         continue
+                    self._deposit_seen[addr] = (balance_sun, time.time(), False)
                     if balance_sun <= (min_reserve_sun + min_threshold_sun):
                         continue
-                    amount_sun = balance_sun - min_reserve_sun
-                    try:
-                        if not w.derivation_path:
-                            logger.warning("Wallet %s has no derivation path; cannot derive key", addr)
-                            continue
-                        priv_hex = self._derive_privkey_hex_from_path(w.derivation_path)
-                        pk_obj = PrivateKey(bytes.fromhex(priv_hex))
-                        txn = self.client.trx.transfer(addr, hot_wallet, amount_sun).build().sign(pk_obj)
-                        res = txn.broadcast()
-                        txid = res.get('txid') if isinstance(res, dict) else None
-                        amount_trx = amount_sun / 1_000_000
-                        # Credit seller balance
-                        try:
-                            seller = get_seller(db, w.seller_id)
-                            current = float(seller.gas_deposit_balance or 0)
-                            update_seller(db, w.seller_id, gas_deposit_balance=current + amount_trx)
-                            logger.info(
-                                "Credited %.6f TRX to seller %s after forwarding (tx: %s)",
-                                amount_trx, w.seller_id, txid
-                            )
-                        except Exception as ce:
-                            logger.error("Failed to credit seller %s: %s", w.seller_id, ce)
-                        logger.info("Forwarded %.2f TRX from %s -> %s (tx=%s)", amount_trx, addr, hot_wallet, txid)
-                    except Exception as e:
-                        logger.error("Failed to forward TRX from %s: %s", addr, e)
+                    if not derivation_path:
+                        logger.warning("Wallet %s has no derivation path; cannot derive key", addr)
+                        continue
+                    plan.append((addr, seller_id, derivation_path, balance_sun - min_reserve_sun))
+                if not plan:
+                    return
+
+                # Phase 2: pipelined sign + broadcast (re-check leases right before moving funds)
+                plan = [item for item in plan if self._owns_seller(item[1])]
+                txids = self._broadcast_forwards(plan, hot_wallet)
+                credits: dict[int, float] = {}
+                for (addr, seller_id, _, amount_sun), txid in zip(plan, txids):
+                    if not txid:
+                        # Forget the snapshot so the next pass retries this wallet
+                        self._deposit_seen.pop(addr, None)
                         continue
+                    # Remember the pre-forward balance as 'pending' so an unconfirmed forward is not repeated
+                    self._deposit_seen[addr] = (self._deposit_seen[addr][0], time.time(), True)
+                    amount_trx = amount_sun / 1_000_000
+                    credits[seller_id] = credits.get(seller_id, 0.0) + amount_trx
+                    logger.info("Forwarded %.2f TRX from %s -> %s (tx=%s)", amount_trx, addr, hot_wallet, txid)
+
+                # Credit sellers in one transaction for the whole batch
+                if credits:
+                    try:
+                        credit_seller_gas_deposits(db, credits)
+                        for seller_id, amount_trx in credits.items():
+                            logger.info("Credited %.6f TRX to seller %s after forwarding", amount_trx, seller_id)
+                    except Exception as ce:
+                        logger.error("Failed to credit sellers %s: %s", sorted(credits), ce)
         except Exception as e:
             logger.error("Error in forward_trx_deposits: %s", e)
 
+    def _deposit_unchanged(self, address: str, balance_sun: int) -> bool:
+        """True if the balance equals the last pass (and any forward from it may still be pending)"""
+        seen = self._deposit_seen.get(address)
+        if not seen or seen[0] != balance_sun:
+            return False
+        _, seen_at, forward_pending = seen
+        return not forward_pending or (time.time() - seen_at) < FORWARD_PENDING_GRACE_SEC
+
+    def _fetch_deposit_balances(self, addresses: list) -> dict:
+        """Fetch TRX balances (sun) for deposit addresses through a bounded worker pool.
+        Addresses whose balance could not be read are omitted from the result."""
+        bucket = self._rpc_bucket()
+
+        def _fetch(addr):
+            try:
+                bucket.acquire()
+                acc = self.client.get_account(addr)
+                return addr, int((acc or {}).get('balance', 0) or 0)
+            except Exception as e:
+                msg = str(e).lower()
+                if 'account not found' in msg or 'does not exist' in msg:
+                    return addr, 0
+                logger.warning("Failed to fetch TRX balance for %s: %s", addr, e)
+                return addr, None
+
+        workers = max(1, min(int(config.keeper.balance_scan_concurrency), len(addresses)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="deposit-scan") as pool:
+            return {addr: bal for addr, bal in pool.map(_fetch, addresses) if bal is not None}
+
+    def _broadcast_forwards(self, plan: list, hot_wallet: str) -> list:
+        """Build, sign and broadcast forward transfers concurrently.
+        plan: [(address, seller_id, derivation_path, amount_sun)]; returns txids (None on failure) in plan order."""
+        bucket = self._rpc_bucket()
+
+        def _forward(item):
+            addr, _, derivation_path, amount_sun = item
+            try:
+                priv_hex = self._derive_privkey_hex_from_path(derivation_path)
+                pk_obj = PrivateKey(bytes.fromhex(priv_hex))
+                bucket.acquire()
+                txn = build_tronpy(self.client.trx.transfer(addr, hot_wallet, amount_sun), client=self.client).sign(pk_obj)
+                bucket.acquire()
+                res = txn.broadcast()
+                return (res.get('txid') if isinstance(res, dict) else None) or txn.txid
+            except Exception as e:
+                logger.error("Failed to forward TRX from %s: %s", addr, e)
+                return None
+
+        workers = max(1, min(int(config.keeper.forward_concurrency), len(plan)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="deposit-forward") as pool:
+            return list(pool.map(_forward, plan))
+
     def run(self, check_interval: int = 60):
         """Main loop for the keeper bot"""
         logger.info("Keeper Bot started. Monitoring pending invoices...")
@@ -521,6 +919,7 @@ class KeeperBot:
                 time.sleep(check_interval)
             except KeyboardInterrupt:
                 logger.info("Keeper Bot stopped by user")
+                self.close()
                 break
             except (ConnectionError, ValueError, RuntimeError) as e:
                 logger.error("Unexpected error in keeper bot: %s", e)
@@ -554,7 +953,22 @@ def check_pending_invoices():
 def main():
     """Main entry point"""
     keeper = KeeperBot()
-    keeper.run()
+    try:
+        if config.keeper.run_mode == "async":
+            engine = AsyncKeeperEngine(
+                keeper,
+                invoice_interval=config.keeper.check_interval,
+                forward_interval=config.keeper.forward_interval,
+                health_interval=config.keeper.health_interval,
+            )
+            try:
+                asyncio.run(engine.run())
+            except KeyboardInterrupt:
+                logger.info("Keeper Bot stopped by user")
+        else:
+            keeper.run(check_interval=config.keeper.check_interval)
+    finally:
+        keeper.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,146 @@
+# Шардирование keeper_bot: владение партициями продавцов через lease-таблицу в БД
+
+import logging
+import math
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+
+try:
+    from core.database.db_service import (
+        SessionLocal, ensure_lease_partitions, try_claim_lease, release_lease, list_leases,
+        touch_keeper_instance, remove_keeper_instance, list_live_keeper_instances,
+    )
+except ImportError:
+    from src.core.database.db_service import (
+        SessionLocal, ensure_lease_partitions, try_claim_lease, release_lease, list_leases,
+        touch_keeper_instance, remove_keeper_instance, list_live_keeper_instances,
+    )
+
+logger = logging.getLogger("keeper_bot.sharding")
+
+
+def partition_of(seller_id: int, partitions: int) -> int:
+    """Stable partition for a seller (same result in every keeper process)."""
+    return zlib.crc32(str(int(seller_id)).encode()) % max(1, int(partitions))
+
+
+class ShardLeaseManager:
+    """Claims a fair share of seller partitions via keeper_leases rows.
+
+    Every keeper also heartbeats a keeper_instances row, so an instance that holds
+    no partitions yet still counts when fair shares are computed.
+
+    - heartbeat() renews held leases, takes over free or expired ones up to
+      ceil(partitions / live_owners), and releases extras so a newly started
+      keeper gets work without waiting for anyone to die
+    - owns_seller() is the fencing check: a partition counts as owned only until
+      the local copy of its lease is about to expire (TTL minus a safety margin),
+      so a keeper that stopped heartbeating stops writing before takeover is possible
+    """
+
+    def __init__(self, owner_id: str, partitions: int, ttl_sec: float, session_factory=SessionLocal):
+        self.owner_id = owner_id
+        self.partitions = max(1, int(partitions))
+        self.ttl_sec = max(3.0, float(ttl_sec))
+        self._margin = self.ttl_sec / 3
+        self._session_factory = session_factory
+        self._held: dict[int, float] = {}  # partition -> monotonic deadline for writes
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    def heartbeat(self) -> set[int]:
+        """Renew/claim/release leases once. Returns partitions newly acquired by this call."""
+        db = self._session_factory()
+        try:
+            ensure_lease_partitions(db, self.partitions)
+            touch_keeper_instance(db, self.owner_id, self.ttl_sec)
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+            leases = [lease for lease in list_leases(db) if lease.partition < self.partitions]
+            # Live keepers: registered heartbeats plus owners of unexpired leases
+            live_owners = set(list_live_keeper_instances(db))
+            live_owners |= {l.owner for l in leases if l.owner and l.expires_at and l.expires_at > now}
+            live_owners.add(self.owner_id)
+            fair_share = math.ceil(self.partitions / len(live_owners))
+
+            renewed: dict[int, float] = {}
+            for lease in leases:
+                if lease.owner == self.owner_id:
+                    started = time.monotonic()
+                    if try_claim_lease(db, lease.partition, self.owner_id, self.ttl_sec):
+                        renewed[lease.partition] = started + self.ttl_sec - self._margin
+
+            # Give back partitions above our fair share (highest numbers first)
+            for partition in sorted(renewed, reverse=True)[:max(0, len(renewed) - fair_share)]:
+                if release_lease(db, partition, self.owner_id):
+                    renewed.pop(partition)
+                    logger.info("[shard] %s released partition %s (rebalancing)", self.owner_id, partition)
+
+            acquired: set[int] = set()
+            for lease in leases:
+                if len(renewed) >= fair_share:
+                    break
+                if lease.partition in renewed:
+                    continue
+                expired = lease.owner is None or lease.expires_at is None or lease.expires_at < now
+                if not expired:
+                    continue
+                started = time.monotonic()
+                if try_claim_lease(db, lease.partition, self.owner_id, self.ttl_sec):
+                    renewed[lease.partition] = started + self.ttl_sec - self._margin
+                    acquired.add(lease.partition)
+                    logger.info("[shard] %s acquired partition %s (previous owner %s)",
+                                self.owner_id, lease.partition, lease.owner)
+
+            with self._lock:
+                lost = set(self._held) - set(renewed)
+                self._held = renewed
+            if lost:
+                logger.warning("[shard] %s lost partitions %s", self.owner_id, sorted(lost))
+            return acquired
+        except Exception as e:
+            logger.error("[shard] Heartbeat failed for %s: %s", self.owner_id, e)
+            return set()
+        finally:
+            db.close()
+
+    def owns_partition(self, partition: int) -> bool:
+        with self._lock:
+            deadline = self._held.get(partition)
+        return deadline is not None and time.monotonic() < deadline
+
+    def owns_seller(self, seller_id) -> bool:
+        return self.owns_partition(partition_of(seller_id, self.partitions))
+
+    def held_partitions(self) -> set[int]:
+        now = time.monotonic()
+        with self._lock:
+            return {p for p, deadline in self._held.items() if now < deadline}
+
+    def start(self):
+        """Heartbeat now, then keep heartbeating in a daemon thread every TTL/3"""
+        self.heartbeat()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="keeper-lease-heartbeat", daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        while not self._stop.wait(self.ttl_sec / 3):
+            self.heartbeat()
+
+    def stop(self):
+        """Stop heartbeating and release all held leases so others can take over immediately"""
+        self._stop.set()
+        db = self._session_factory()
+        try:
+            for partition in list(self._held):
+                release_lease(db, partition, self.owner_id)
+            remove_keeper_instance(db, self.owner_id)
+        except Exception as e:
+            logger.warning("[shard] Failed to release leases for %s: %s", self.owner_id, e)
+        finally:
+            db.close()
+            with self._lock:
+                self._held.clear()
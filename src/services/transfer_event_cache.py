@@ -0,0 +1,52 @@
+# Кэш Transfer-событий USDT, индексированный по адресу получателя (одна выборка за цикл keeper)
+
+import logging
+import threading
+
+logger = logging.getLogger("keeper_bot.events")
+
+
+class TransferEventCache:
+    """Latest transfer txid per recipient address, built from one transferEvent() fetch.
+
+    The keeper calls new_cycle() at the start of every invoice pass; the first lookup in
+    a cycle fetches the event list once and indexes it by recipient, later lookups are
+    dict hits. A cycle that never needs a txid issues no fetch at all. A failed fetch
+    leaves the index empty until the next cycle instead of being retried per invoice.
+    """
+
+    def __init__(self):
+        self._by_recipient: dict[str, str] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+        self.fetches = 0
+
+    def new_cycle(self):
+        with self._lock:
+            self._loaded = False
+            self._by_recipient = {}
+
+    def _load(self, contract):
+        self.fetches += 1
+        index: dict[str, str] = {}
+        try:
+            events = contract.functions.transferEvent()
+        except Exception as e:
+            logger.debug("Transfer event fetch failed: %s", e)
+            return index
+        if not isinstance(events, list):
+            return index
+        for ev in events:
+            to_a = ev.get('to') or ev.get('to_address') or ev.get('toAddress')
+            txid = ev.get('transaction_id') or ev.get('txID') or ev.get('txid')
+            if to_a and txid:
+                index[to_a] = txid  # later events win, matching the previous linear scan
+        return index
+
+    def last_txid(self, contract, to_address: str) -> str:
+        """Latest known transfer txid to to_address in this cycle ('' if none)."""
+        with self._lock:
+            if not self._loaded:
+                self._by_recipient = self._load(contract)
+                self._loaded = True
+            return self._by_recipient.get(to_address, "")
@@ -0,0 +1,144 @@
+# Пул заранее активированных адресов инвойсов (следующие K индексов деривации каждой группы покупателя)
+
+import logging
+import threading
+
+try:
+    from core.database.db_service import (
+        SessionLocal, add_warm_address, set_warm_address_ready, drop_warm_address, drop_stale_warm_addresses,
+        list_warm_addresses, warm_pool_spent_sun,
+    )
+    from core.database.models import BuyerGroup, Invoice
+    from core.crypto.hd_wallet_service import generate_address_from_xpub
+    from core.crypto.xpub_validation import is_valid_xpub
+except ImportError:
+    from src.core.database.db_service import (
+        SessionLocal, add_warm_address, set_warm_address_ready, drop_warm_address, drop_stale_warm_addresses,
+        list_warm_addresses, warm_pool_spent_sun,
+    )
+    from src.core.database.models import BuyerGroup, Invoice
+    from src.core.crypto.hd_wallet_service import generate_address_from_xpub
+    from src.core.crypto.xpub_validation import is_valid_xpub
+
+logger = logging.getLogger("keeper_bot.warm_pool")
+
+DAY_SEC = 86400.0
+
+
+class WarmAddressPool:
+    """Keeps the next `size` unused derivation indexes of every buyer group activated.
+
+    Invoice addresses are assigned sequentially (first unused index of the group's xpub/account),
+    so the addresses future invoices will get are known in advance. refill() activates them in
+    one gas station batch (activate(addresses) -> {address: {"activated", "txid", "cost_sun"}})
+    and records them in warm_addresses; invoice creation claims a ready one via claim_warm_address.
+
+    - refills only when is_quiet() says so (e.g. the activation queue has no due or running jobs)
+    - spending is capped by daily_budget_trx over a rolling 24h window and max_per_pass per refill
+    - owns_seller() restricts the pool to sellers this keeper is responsible for (sharding)
+    - slots of a failed refill are dropped at once; 'activating' slots older than stale_after_sec
+      (the refilling process died) are dropped at the start of the next refill
+    """
+
+    def __init__(self, activate, *, size: int, daily_budget_trx: float, max_per_pass: int = 10,
+                 est_cost_sun: int = 1_100_000, is_quiet=None, owns_seller=None, stale_after_sec: float = 900.0,
+                 session_factory=SessionLocal, derive=generate_address_from_xpub):
+        self._activate = activate
+        self.size = max(0, int(size))
+        self.daily_budget_sun = int(float(daily_budget_trx) * 1_000_000)
+        self.max_per_pass = max(1, int(max_per_pass))
+        self.est_cost_sun = max(1, int(est_cost_sun))
+        self.stale_after_sec = float(stale_after_sec)
+        self._is_quiet = is_quiet or (lambda: True)
+        self._owns_seller = owns_seller or (lambda seller_id: True)
+        self._session_factory = session_factory
+        self._derive = derive
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def plan(self, db) -> list[tuple]:
+        """Pool slots still missing: [(seller_id, buyer_group_id, derivation_index, address)]."""
+        missing = []
+        pooled: dict[int, set] = {}
+        for row in list_warm_addresses(db):
+            pooled.setdefault(row.buyer_group_id, set()).add(row.derivation_index)
+        for group in db.query(BuyerGroup).filter(BuyerGroup.xpub.isnot(None)).order_by(BuyerGroup.id).all():
+            if not self._owns_seller(group.seller_id) or not is_valid_xpub(str(group.xpub)):
+                continue
+            used = {i for (i,) in db.query(Invoice.derivation_index).filter(Invoice.buyer_group_id == group.id)}
+            in_pool = pooled.get(group.id, set())
+            index, wanted = 0, 0
+            while wanted < self.size:
+                if index not in used:
+                    wanted += 1
+                    if index not in in_pool:
+                        try:
+                            address = self._derive(group.xpub, account=group.invoices_group, index=index)
+                        except Exception as e:
+                            logger.warning("[warm_pool] Cannot derive index %s of group %s: %s", index, group.id, e)
+                            break
+                        missing.append((group.seller_id, group.id, index, address))
+                index += 1
+        return missing
+
+    def refill(self) -> dict:
+        """Activate missing pool addresses within the budget. Returns {"planned", "activated", "spent_sun"}."""
+        summary = {"planned": 0, "activated": 0, "spent_sun": 0}
+        if self.size <= 0 or not self._is_quiet():
+            return summary
+        db = self._session_factory()
+        try:
+            stale = drop_stale_warm_addresses(db, self.stale_after_sec)
+            if stale:
+                logger.warning("[warm_pool] Dropped %s stale activating slots", stale)
+            missing = self.plan(db)
+            summary["planned"] = len(missing)
+            budget_left = self.daily_budget_sun - warm_pool_spent_sun(db, DAY_SEC)
+            affordable = max(0, budget_left // self.est_cost_sun)
+            batch = []
+            for seller_id, group_id, index, address in missing[:min(self.max_per_pass, affordable)]:
+                if add_warm_address(db, seller_id, group_id, index, address) is not None:
+                    batch.append(address)
+            if len(missing) > affordable:
+                logger.info("[warm_pool] Daily budget allows %s of %s missing activations", affordable, len(missing))
+            if not batch:
+                return summary
+            unresolved = set(batch)
+            try:
+                results = self._activate(batch) or {}
+                for address in batch:
+                    res = results.get(address) or {}
+                    if res.get("activated"):
+                        set_warm_address_ready(db, address, int(res.get("cost_sun", 0) or 0), res.get("txid"))
+                        summary["activated"] += 1
+                        summary["spent_sun"] += int(res.get("cost_sun", 0) or 0)
+                    else:
+                        drop_warm_address(db, address)
+                    unresolved.discard(address)
+            finally:
+                # activate() or a DB write raised: free the reserved slots for the next refill
+                if unresolved:
+                    db.rollback()
+                    for address in unresolved:
+                        drop_warm_address(db, address)
+            logger.info("[warm_pool] Refill: %s", summary)
+            return summary
+        except Exception as e:
+            logger.error("[warm_pool] Refill failed: %s", e)
+            return summary
+        finally:
+            db.close()
+
+    def start(self, interval_sec: float):
+        """Refill every interval_sec in a daemon thread"""
+        if self._thread is None:
+            interval = max(10.0, float(interval_sec))
+            self._thread = threading.Thread(target=self._loop, args=(interval,), name="warm-address-pool", daemon=True)
+            self._thread.start()
+
+    def _loop(self, interval: float):
+        while not self._stop.wait(interval):
+            self.refill()
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,51 @@
+from core.tron.account_snapshot import AccountSnapshotCache
+
+ADDR = "TR7NHqjeKQxGTCi8q8ZY4pL8otSzgjLj6t"
+ADDR_HEX = "41a614f803b6fd780986a42c78ec9c7f77e6ded13c"
+
+
+def _node(calls, account=None, resource=None):
+    def request(method, path, payload=None, timeout=None):
+        calls.append(path)
+        if path == "/wallet/getaccount":
+            return (account if account is not None else {"address": payload["address"], "balance": 2_500_000}), "local"
+        return (resource if resource is not None else {"EnergyLimit": 65000, "EnergyUsed": 1000, "NetLimit": 300}), "local"
+    return request
+
+
+def test_snapshot_is_one_pair_of_calls_and_cached():
+    calls = []
+    cache = AccountSnapshotCache(ttl_sec=60, request=_node(calls))
+    snap = cache.get(ADDR)
+    assert snap.exists and snap.balance_sun == 2_500_000
+    res = snap.resources()
+    assert res["energy_available"] == 64000
+    assert res["bandwidth_available"] == 300
+    assert res["details"]["balance_trx"] == 2.5
+    cache.get(ADDR)
+    assert calls == ["/wallet/getaccount", "/wallet/getaccountresource"]
+
+    cache.get(ADDR, max_age=0)
+    assert len(calls) == 4
+
+
+def test_broadcast_invalidates_touched_addresses():
+    calls = []
+    cache = AccountSnapshotCache(ttl_sec=60, request=_node(calls))
+    cache.get(ADDR)
+    tx = {"raw_data": {"contract": [{"parameter": {"value": {
+        "owner_address": "41" + "00" * 20, "receiver_address": ADDR_HEX}}}]}}
+    cache.invalidate_tx(tx)
+    cache.get(ADDR)
+    assert len(calls) == 4
+
+
+def test_missing_account_and_failed_fetch():
+    cache = AccountSnapshotCache(ttl_sec=60, request=_node([], account={}, resource={}))
+    snap = cache.get(ADDR)
+    assert not snap.exists
+    assert snap.resources().get("_inactive") is True
+
+    failing = AccountSnapshotCache(ttl_sec=60, request=lambda *a, **k: (None, None))
+    assert failing.get(ADDR) is None
+    assert len(failing._entries) == 0
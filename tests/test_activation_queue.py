@@ -0,0 +1,100 @@
+from threading import Thread
+from unittest.mock import MagicMock, patch
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from core.database import models
+from core.database.db_service import claim_activation_job
+from services.keeper_bot import ActivationJob, ActivationJobQueue
+
+
+def _session_factory():
+    engine = create_engine(
+        "sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    models.Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)
+
+
+def _queue(factory, worker_id, backoff_sec=60.0):
+    return ActivationJobQueue(
+        default_retries=2, backoff_sec=backoff_sec, start_workers=False,
+        session_factory=factory, worker_id=worker_id,
+    )
+
+
+@patch("services.keeper_bot.get_db", side_effect=lambda: iter([MagicMock()]))
+@patch("services.keeper_bot.update_invoice")
+@patch("services.keeper_bot.get_invoice")
+@patch("services.keeper_bot.auto_activate_on_usdt_receive")
+def test_failed_job_is_rescheduled_not_slept_on_and_survives_restart(mock_activate, mock_get_invoice, mock_update, _):
+    factory = _session_factory()
+    mock_get_invoice.return_value = MagicMock(id=7, status='activating')
+    mock_activate.return_value = False
+
+    q = _queue(factory, "keeper-a")
+    q.enqueue(ActivationJob(invoice_id=7, address="TAddr7", retries_left=2, backoff_sec=60.0))
+    q.enqueue(ActivationJob(invoice_id=7, address="TAddr7", retries_left=2, backoff_sec=60.0))  # deduplicated
+    assert q.stats()["depth"] == 1
+
+    assert q.process_one(timeout=0.01) is True
+    mock_activate.assert_called_once_with("TAddr7")
+    stats = q.stats()
+    assert (stats["depth"], stats["due"], stats["running"]) == (1, 0, 0)  # waiting for not_before
+    assert q.process_one(timeout=0.01) is False
+
+    # "Restart": a new queue on the same DB sees the job once it is due
+    db = factory()
+    db.query(models.ActivationJobRecord).update({"not_before": models.ActivationJobRecord.created_at})
+    db.commit()
+    db.close()
+    mock_activate.return_value = True
+    restarted = _queue(factory, "keeper-b")
+    assert restarted.process_one(timeout=0.01) is True
+    assert restarted.stats()["depth"] == 0
+    assert mock_update.call_args.args[1:] == (7,) and mock_update.call_args.kwargs == {"status": "pending"}
+
+
+def test_claim_is_exclusive_and_stale_claims_are_recovered():
+    factory = _session_factory()
+    q = _queue(factory, "keeper-a")
+    q.enqueue(ActivationJob(invoice_id=1, address="TAddr1", retries_left=1, backoff_sec=1.0))
+
+    db = factory()
+    try:
+        assert claim_activation_job(db, "worker-1", stale_after_sec=300).invoice_id == 1
+        assert claim_activation_job(db, "worker-2", stale_after_sec=300) is None
+        # worker-1 "died": with a zero stale window the running job is claimable again
+        rec = claim_activation_job(db, "worker-2", stale_after_sec=0)
+        assert (rec.claimed_by, rec.attempts) == ("worker-2", 2)
+    finally:
+        db.close()
+
+
+@patch("services.keeper_bot.get_db", side_effect=lambda: iter([MagicMock()]))
+@patch("services.keeper_bot.update_invoice")
+@patch("services.keeper_bot.get_invoice")
+@patch("services.keeper_bot.auto_activate_on_usdt_receive")
+def test_claims_are_owned_per_worker_thread(mock_activate, mock_get_invoice, _update, _db):
+    factory = _session_factory()
+    claimed_by = []
+
+    def activate(address):
+        db = factory()
+        claimed_by.append(db.query(models.ActivationJobRecord).one().claimed_by)
+        db.close()
+        return False
+
+    mock_activate.side_effect = activate
+    q = _queue(factory, "keeper-a")
+    q.enqueue(ActivationJob(invoice_id=3, address="TAddr3", retries_left=2, backoff_sec=60.0))
+    worker = Thread(target=q.process_one, kwargs={"timeout": 0.01}, name="activation-worker-1")
+    worker.start()
+    worker.join()
+    assert claimed_by == ["keeper-a/activation-worker-1"]
+    db = factory()
+    rec = db.query(models.ActivationJobRecord).one()
+    assert (rec.status, rec.claimed_by) == ("queued", None)  # the owning thread released its claim
+    db.close()
@@ -0,0 +1,57 @@
+from core.tron.chain_cache import ChainParamsCache
+
+
+def _params_body():
+    return {"chainParameter": [{"key": "getEnergyFee", "value": 420}, {"key": "getTransactionFee", "value": 1000}]}
+
+
+def test_chain_parameters_cached_until_refresh():
+    calls = []
+
+    def request(method, path, payload=None, timeout=None):
+        calls.append(path)
+        return _params_body(), "local"
+
+    cache = ChainParamsCache(ttl_sec=600, request=request)
+    assert cache.chain_parameters() == {"getEnergyFee": 420, "getTransactionFee": 1000}
+    cache.chain_parameters()
+    cache.chain_parameters_raw()
+    assert calls == ["/wallet/getchainparameters"]
+
+    cache.refresh()
+    cache.chain_parameters()
+    assert len(calls) == 2
+
+
+def test_resource_totals_shared_across_probe_addresses():
+    calls = []
+
+    def request(method, path, payload=None, timeout=None):
+        calls.append((method, path))
+        return {"TotalEnergyLimit": 90_000_000_000, "TotalEnergyWeight": 10_000_000_000}, "remote"
+
+    cache = ChainParamsCache(ttl_sec=600, request=request)
+    assert cache.resource_totals("TAddrOne")["TotalEnergyLimit"] == 90_000_000_000
+    cache.resource_totals("TAddrTwo")
+    assert calls == [("POST", "/wallet/getaccountresource")]
+
+
+def test_failed_fetch_not_cached_and_stale_value_served():
+    responses = [_params_body(), None, _params_body()]
+
+    def request(method, path, payload=None, timeout=None):
+        data = responses.pop(0)
+        if data is None:
+            raise ConnectionError("node down")
+        return data, "local"
+
+    cache = ChainParamsCache(ttl_sec=0, request=request)
+    assert cache.chain_parameters()["getEnergyFee"] == 420
+    # Expired entry + failed refetch: the last good value is returned
+    assert cache.chain_parameters()["getEnergyFee"] == 420
+    assert cache.chain_parameters()["getEnergyFee"] == 420
+    assert responses == []
+
+    empty = ChainParamsCache(ttl_sec=600, request=lambda *a, **k: (None, None))
+    assert empty.chain_parameters() == {}
+    assert empty.chain_parameters_raw() is None
@@ -0,0 +1,86 @@
+from core.tron.confirmations import ConfirmationWatcher
+
+
+def _block(num, txids, ret="SUCCESS"):
+    return {
+        "block_header": {"raw_data": {"number": num}},
+        "transactions": [{"txID": t, "ret": [{"contractRet": ret}]} for t in txids],
+    }
+
+
+class FakeChain:
+    def __init__(self):
+        self.blocks = {}
+        self.head = 0
+        self.solid = 0
+        self.calls = []
+
+    def add(self, num, txids, ret="SUCCESS"):
+        self.blocks[num] = _block(num, txids, ret)
+        self.head = max(self.head, num)
+
+    def request(self, method, path, payload=None, timeout=None, solidity=False):
+        self.calls.append(path)
+        if path == "/wallet/getnowblock":
+            return self.blocks.get(self.head) or _block(self.head, []), "local"
+        if path == "/walletsolidity/getnowblock":
+            return _block(self.solid, []), "local"
+        if path == "/wallet/getblockbylimitnext":
+            nums = range(payload["startNum"], payload["endNum"])
+            return {"block": [self.blocks.get(n) or _block(n, []) for n in nums]}, "local"
+        raise AssertionError(path)
+
+
+def test_many_txids_resolved_from_blocks_with_depth():
+    chain = FakeChain()
+    chain.add(100, [])
+    w = ConfirmationWatcher(request=chain.request, lookback_blocks=2)
+    w._ensure_thread = lambda: None  # drive polling by hand
+    futures = {t: w.register(t) for t in ("a", "b", "c")}
+
+    chain.add(101, ["a", "x"])
+    chain.add(102, ["b"], ret="REVERT")
+    w.poll_once()
+    assert futures["a"].result(0).block_number == 101
+    assert futures["b"].result(0).success is False
+    assert not futures["c"].done()
+    # one head read + one batched range read, regardless of how many txids are pending
+    assert chain.calls == ["/wallet/getnowblock", "/wallet/getblockbylimitnext"]
+
+    chain.add(105, ["c"])
+    w.poll_once()
+    assert futures["c"].result(0).block_number == 105
+    assert w.depth("a") == 5
+    # already seen txids resolve immediately
+    assert w.register("x").result(0).block_number == 101
+
+
+def test_wait_solidified_uses_solid_head():
+    chain = FakeChain()
+    chain.add(10, ["t"])
+    chain.solid = 10
+    w = ConfirmationWatcher(request=chain.request, poll_interval=0.1, lookback_blocks=1)
+    try:
+        conf = w.wait("t", timeout=3, solidified=True)
+    finally:
+        w.stop()
+    assert conf is not None and conf.block_number == 10
+
+
+def test_timed_out_waiter_leaves_other_waiters_registered():
+    chain = FakeChain()
+    chain.add(100, [])
+    w = ConfirmationWatcher(request=chain.request, lookback_blocks=0)
+    w._ensure_thread = lambda: None  # drive polling by hand
+    patient = w.register("t")
+    assert w.wait("t", timeout=0.01) is None  # a second waiter gives up
+    assert not patient.cancelled() and w.pending_count() == 1
+
+    chain.add(101, ["t"])
+    w.poll_once()
+    assert patient.result(0).block_number == 101
+    assert w.pending_count() == 0
+
+    chain.solid = 100
+    assert w.wait("t", timeout=0.01, solidified=True) is None
+    assert w._solid_waiters == []  # timed-out solidification waiters are not kept around
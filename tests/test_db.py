@@ -4,7 +4,8 @@ from sqlalchemy.orm import sessionmaker
 from core.database import models
 from core.database.db_service import (
     create_seller, get_seller, create_buyer_group, get_buyer_group, get_buyer_groups_by_seller,
-    create_wallet, get_wallet_by_group, create_invoice, get_invoice, get_invoices_by_seller
+    create_wallet, get_wallet_by_group, create_invoice, get_invoice, get_invoices_by_seller,
+    credit_seller_gas_deposits, record_invoice_transfer, get_transactions_by_invoice, migrate_schema,
 )
 
 @pytest.fixture(scope="function")
@@ -48,3 +49,52 @@ def test_invoice_crud(db):
     assert found is not None
     invoices = get_invoices_by_seller(db, 444)
     assert len(invoices) == 1
+
+def test_credit_seller_gas_deposits_is_atomic(db):
+    create_seller(db, telegram_id=555, gas_deposit_balance=1.0)
+    create_seller(db, telegram_id=556)
+    result = credit_seller_gas_deposits(db, {555: 2.5, 556: 1.0})
+    assert result == {555: 3.5, 556: 1.0}
+    with pytest.raises(ValueError):
+        credit_seller_gas_deposits(db, {555: 1.0, 999: 1.0})
+    assert get_seller(db, 555).gas_deposit_balance == 3.5
+
+def test_record_invoice_transfer_is_idempotent_and_keeps_running_total(db):
+    create_seller(db, telegram_id=555)
+    group = create_buyer_group(db, seller_id=555, buyer_id="buyer5", invoices_group=0)
+    inv = create_invoice(db, seller_id=555, buyer_group_id=group.id, derivation_index=0, address="TInv", amount=10)
+    assert inv.received_amount == 0
+
+    assert record_invoice_transfer(db, inv.id, "tx1", 0, "TFrom", 4.0)
+    assert record_invoice_transfer(db, inv.id, "tx1", 1, "TFrom", 3.0)  # second log of the same tx
+    inv.status = "partial"  # caller's pending change must survive a replayed log
+    assert not record_invoice_transfer(db, inv.id, "tx1", 0, "TFrom", 4.0)  # replayed log
+    assert record_invoice_transfer(db, inv.id, "tx2", 0, "TFrom", 5.0, credit=1.0)
+
+    db.refresh(inv)
+    assert inv.received_amount == 8.0
+    assert inv.status == "partial"
+    assert len(get_transactions_by_invoice(db, inv.id)) == 3
+
+
+def test_migrate_schema_upgrades_legacy_tables(tmp_path):
+    from sqlalchemy import text
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.sqlite3'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE invoices (id INTEGER PRIMARY KEY, amount FLOAT NOT NULL)"))
+        conn.execute(text(
+            "CREATE TABLE transactions (id INTEGER PRIMARY KEY, invoice_id INTEGER, tx_hash TEXT NOT NULL UNIQUE, "
+            "sender_address TEXT NOT NULL, amount_received FLOAT NOT NULL, received_at DATETIME)"
+        ))
+        conn.execute(text("INSERT INTO invoices VALUES (1, 10)"))
+        # Legacy balance snapshots: each row holds the whole observed balance
+        conn.execute(text("INSERT INTO transactions VALUES (1, 1, 'synthetic:a', 'multiple', 4.0, NULL)"))
+        conn.execute(text("INSERT INTO transactions VALUES (2, 1, 'synthetic:b', 'multiple', 6.0, NULL)"))
+
+    migrate_schema(engine)
+
+    with engine.begin() as conn:
+        assert conn.execute(text("SELECT received_amount FROM invoices WHERE id = 1")).scalar() == 6.0
+        conn.execute(text("INSERT INTO transactions (invoice_id, tx_hash, log_index, sender_address, amount_received) "
+                          "VALUES (1, 'synthetic:a', 3, 'x', 1.0)"))
+        assert conn.execute(text("SELECT COUNT(*) FROM transactions")).scalar() == 3
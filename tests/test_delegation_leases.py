@@ -0,0 +1,147 @@
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from core.database import models
+from core.services import gas_station
+from core.services.delegation_leases import DelegationLeaseManager
+
+
+def _manager(**kwargs):
+    engine = create_engine(
+        "sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    models.Base.metadata.create_all(engine)
+    return DelegationLeaseManager(sessionmaker(bind=engine), **kwargs)
+
+
+def _age(manager, receiver, **delta):
+    """Move a receiver's lease timestamps into the past."""
+    db = manager._session_factory()
+    for lease in db.query(models.DelegationLease).filter(models.DelegationLease.receiver == receiver):
+        lease.started_at -= timedelta(**delta)
+        lease.lock_until -= timedelta(**delta)
+        if lease.swept_at is not None:
+            lease.swept_at -= timedelta(**delta)
+    db.commit()
+    db.close()
+
+
+def test_available_capacity_is_answered_from_own_state():
+    leases = _manager()
+    assert leases.available_sun("ENERGY") is None
+    leases.record("TA", "ENERGY", 5_000_000, "sweep", txid="t0")  # opened before the sync: already off the stake
+    leases.sync_capacity({"frozenV2": [{"type": "ENERGY", "amount": 100_000_000}, {"amount": 20_000_000},
+                                       {"type": "TRON_POWER", "amount": 7}]})
+    assert leases.available_sun("ENERGY") == 100_000_000
+    assert leases.available_sun("BANDWIDTH") == 20_000_000
+
+    leases.record("TB", "ENERGY", 30_000_000, "free_gas", txid="t1")
+    leases.record("TB", "BANDWIDTH", 1_000_000, "free_gas", txid="t2")
+    assert leases.available_sun("ENERGY") == 70_000_000
+    assert leases.available_sun("BANDWIDTH") == 19_000_000
+    assert leases.leased_sun("TB", "energy") == 30_000_000
+
+    leases.release("TA")  # reclaimed after the sync: back in the pool
+    assert leases.available_sun("ENERGY") == 75_000_000
+    assert leases.totals() == {"ENERGY": 30_000_000, "BANDWIDTH": 1_000_000}
+
+
+def test_leases_become_reclaimable_after_sweep_grace_or_hold_limit_and_reuse_renews():
+    leases = _manager(swept_grace_sec=600, max_hold_sec=3600)
+    leases.record("TSwept", "ENERGY", 1_000_000, "sweep")
+    leases.record("TOld", "ENERGY", 1_000_000, "free_gas")
+    leases.record("TBusy", "ENERGY", 1_000_000, "sweep")
+    assert leases.reclaimable_receivers() == []
+
+    leases.record("TSwept", "BANDWIDTH", 1_000_000, "free_gas")
+    assert leases.mark_swept("TSwept") == 1  # only the sweep lease ends with the sweep
+    assert leases.reclaimable_receivers() == []  # still inside the grace period
+    _age(leases, "TSwept", seconds=601)
+    _age(leases, "TOld", seconds=3601)
+    assert set(leases.reclaimable_receivers()) == {"TSwept", "TOld"}
+
+    # Preparing the swept address again reuses its lease instead of reclaiming it
+    leases.record("TSwept", "BANDWIDTH", 1_000_000, "sweep")
+    assert leases.reclaimable_receivers() == ["TOld"]
+
+
+def test_reclaim_pass_batches_undelegations_and_respects_locks():
+    import time
+
+    leases = _manager(swept_grace_sec=0, max_hold_sec=0)
+    for receiver in ("TEmpty", "TLocked", "TGone"):
+        leases.record(receiver, "ENERGY", 2_000_000, "sweep")
+    leases.record("TEmpty", "BANDWIDTH", 1_000_000, "sweep")
+    leases.record("TFull", "ENERGY", 2_000_000, "sweep")
+    leases.record("TGas", "ENERGY", 2_000_000, "free_gas")
+
+    future_ms = int(time.time() * 1000) + 3_600_000
+    calls, events = [], []
+
+    def node(method, path, *, payload=None, timeout=6):
+        calls.append(path)
+        if path == "/wallet/getdelegatedresourceaccountindexv2":
+            return {"account": "TOwner", "toAccounts": ["TEmpty", "TLocked", "TFull", "TGas", "TManual"]}, "local"
+        entry = {"from": "TOwner", "to": payload["toAddress"], "frozen_balance_for_energy": 2_000_000}
+        if payload["toAddress"] == "TLocked":
+            entry["expire_time_for_energy"] = future_ms
+        return {"delegatedResource": [entry]}, "local"
+
+    gs = gas_station.GasStationManager.__new__(gas_station.GasStationManager)
+    gs.tron_config = MagicMock(reclaim_untracked=False)
+    gs._usdt_balance_sun = lambda addr: 0 if addr != "TFull" else 5_000_000
+    gs.get_gas_wallet_address = lambda: "TOwner"
+    gs._get_control_signer_private_key = lambda: MagicMock()
+    gs._resolve_control_permission_id = lambda: 2
+    gs._http_local_remote = node
+    gs._http_undelegate_resource = lambda owner, receiver, amt, res, pk, pid: events.append(
+        ("undelegate", receiver, res, amt, pid)) or f"u-{receiver}-{res}"
+    gs._wait_for_transaction = lambda txid, *a, **k: events.append(("wait", txid)) or True
+    gs.sync_lease_capacity = MagicMock()
+
+    with patch.object(gas_station, "get_lease_manager", return_value=leases):
+        summary = gs.reclaim_due_leases()
+
+    assert calls.count("/wallet/getdelegatedresourceaccountindexv2") == 1
+    assert [e for e in events if e[0] == "undelegate"] == [("undelegate", "TEmpty", "ENERGY", 2_000_000, 2)]
+    assert summary["swept"] == 4 and summary["locked"] == 1 and summary["undelegated"] == 1
+    # TGone is no longer delegated to; TEmpty's BANDWIDTH has nothing on chain: both leases closed
+    assert summary["released"] == 2
+    assert {(l["receiver"], l["resource"]) for l in leases.active()} == {
+        ("TLocked", "ENERGY"), ("TFull", "ENERGY"), ("TGas", "ENERGY")}
+    gs.sync_lease_capacity.assert_called_once()
+
+
+def test_reclaim_broadcasts_every_undelegation_before_confirming():
+    leases = _manager(swept_grace_sec=0, max_hold_sec=0)
+    for receiver in ("T1", "T2", "T3"):
+        leases.record(receiver, "ENERGY", 1_000_000, "sweep")
+        leases.mark_swept(receiver)
+    events = []
+    gs = gas_station.GasStationManager.__new__(gas_station.GasStationManager)
+    gs.tron_config = MagicMock(reclaim_untracked=False)
+    gs._usdt_balance_sun = lambda addr: 0
+    gs._reclaim_signer = lambda: ("TOwner", MagicMock(), None)
+    gs._owner_delegation_receivers = lambda owner: None  # index unavailable: per-receiver reads decide
+    gs._owner_delegation_balances = lambda owner, r: {"ENERGY": (1_000_000, 0), "BANDWIDTH": (0, 0)}
+    gs._http_undelegate_resource = lambda owner, r, amt, res, pk, pid: events.append("send") or f"u-{r}"
+    gs._wait_for_transaction = lambda txid, *a, **k: events.append("wait") or True
+    gs.sync_lease_capacity = MagicMock()
+
+    with patch.object(gas_station, "get_lease_manager", return_value=leases):
+        summary = gs.reclaim_due_leases()
+
+    assert events == ["send"] * 3 + ["wait"] * 3
+    assert sorted(summary["txids"]) == ["u-T1", "u-T2", "u-T3"]
+    assert leases.active() == []
+
+
+def test_reclaimer_survives_a_failing_pass():
+    from core.services.delegation_leases import LeaseReclaimer
+
+    reclaimer = LeaseReclaimer(MagicMock(side_effect=RuntimeError("node down")), interval_sec=60)
+    assert reclaimer.run_once() == {}
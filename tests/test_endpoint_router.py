@@ -0,0 +1,103 @@
+from unittest.mock import MagicMock
+
+import requests
+
+from core.tron.endpoint_router import Endpoint, EndpointRouter
+
+
+def _router(transport, **kw):
+    return EndpointRouter(
+        [Endpoint("local", "http://local:8090", priority=0), Endpoint("remote", "https://remote", priority=1)],
+        transport=transport, **kw,
+    )
+
+
+def _ok(data):
+    resp = MagicMock(ok=True, status_code=200)
+    resp.json.return_value = data
+    return resp
+
+
+def test_failing_endpoint_opens_circuit_and_recovers_after_probe():
+    transport = MagicMock()
+    local_up = {"value": False}
+
+    def request(method, url, **kw):
+        if url.startswith("http://local") and not local_up["value"]:
+            raise requests.ConnectionError("down")
+        return _ok({"from": url.split("/")[2]})
+
+    transport.request.side_effect = request
+    transport.get.side_effect = lambda url, **kw: request("GET", url, **kw)
+    router = _router(transport, failure_threshold=2, open_sec=0)
+
+    assert router.request("POST", "/wallet/getaccount") == ({"from": "remote"}, "remote")
+    # Local has only failed so far: it ranks after the measured remote and is not retried
+    transport.request.reset_mock()
+    assert router.request("POST", "/wallet/getaccount")[1] == "remote"
+    assert [c.args[1] for c in transport.request.call_args_list] == ["https://remote/wallet/getaccount"]
+    assert router.get("local").state == "closed"
+
+    assert router.check("local") is False
+    assert router.get("local").state == "open"
+
+    # Open circuit: local gets no traffic at all, even once remote is slower
+    router.record_success("remote", 5_000.0)
+    transport.request.reset_mock()
+    router.request("POST", "/wallet/getaccount")
+    assert [c.args[1] for c in transport.request.call_args_list] == ["https://remote/wallet/getaccount"]
+
+    local_up["value"] = True
+    router.probe_open_circuits()
+    assert router.get("local").state == "closed"
+
+
+def test_routes_to_lower_latency_endpoint():
+    router = _router(MagicMock())
+    assert router.best().name == "local"  # no samples yet: priority decides
+    router.record_success("local", 900.0)
+    router.record_success("remote", 80.0)
+    assert [ep.name for ep in router.candidates()] == ["remote", "local"]
+
+
+def test_remote_endpoint_keeps_its_timeout_floor():
+    transport = MagicMock()
+    transport.request.side_effect = [requests.ConnectionError("down"), _ok({})]
+    router = EndpointRouter(
+        [Endpoint("local", "http://local:8090"), Endpoint("remote", "https://remote", priority=1, min_timeout=6)],
+        transport=transport,
+    )
+    router.request("POST", "/wallet/getaccount", timeout=2)
+    assert [c.kwargs["timeout"] for c in transport.request.call_args_list] == [2, 6]
+
+
+def test_client_error_is_returned_without_counting_against_the_endpoint():
+    transport = MagicMock()
+    bad_request = MagicMock(ok=False, status_code=400)
+    bad_request.json.return_value = {"Error": "invalid address"}
+    transport.request.return_value = bad_request
+    router = _router(transport, failure_threshold=1)
+
+    assert router.request("POST", "/wallet/getaccount") == ({"Error": "invalid address"}, "local")
+    assert transport.request.call_count == 1
+    assert router.get("local").state == "closed" and router.get("local").consecutive_failures == 0
+
+
+def test_server_error_falls_through_to_next_endpoint():
+    transport = MagicMock()
+    transport.request.side_effect = [MagicMock(ok=False, status_code=503), _ok({"ok": 1})]
+    router = _router(transport)
+
+    assert router.request("POST", "/wallet/getaccount") == ({"ok": 1}, "remote")
+    assert router.get("local").consecutive_failures == 1
+
+
+def test_endpoint_that_only_failed_ranks_below_measured_healthy_one():
+    router = EndpointRouter(
+        [Endpoint("local", "http://local:8090", priority=1), Endpoint("remote", "https://remote", priority=0)],
+        transport=MagicMock(), failure_threshold=3,
+    )
+    router.record_success("local", 50.0)
+    router.record_failure("remote")  # circuit still closed, but no latency sample yet
+    assert router.get("remote").state == "closed"
+    assert [ep.name for ep in router.candidates()] == ["local", "remote"]
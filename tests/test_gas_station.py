@@ -60,4 +60,333 @@ def test_auto_activate_on_usdt_receive_not_activated(mock_tron):
     with patch('core.services.gas_station.prepare_for_sweep', return_value=True) as mock_prepare:
         result = gas_station.auto_activate_on_usdt_receive('INVOICE_ADDRESS')
         assert result is True
-        mock_prepare.assert_called_once_with('INVOICE_ADDRESS')
\ No newline at end of file
+        mock_prepare.assert_called_once_with('INVOICE_ADDRESS')
+
+def test_wait_for_transaction_hedges_lookups_and_does_not_wait_for_slow_endpoint():
+    import threading
+    import time as _time
+
+    gs = gas_station.GasStationManager.__new__(gas_station.GasStationManager)
+    gs.tron_config = MagicMock(confirm_watcher_enabled=False)
+    release = threading.Event()
+    calls = {"slow": 0, "fast": 0}
+
+    def slow():
+        calls["slow"] += 1
+        release.wait(5)
+        return None
+
+    def fast():
+        calls["fast"] += 1
+        return True if calls["fast"] >= 3 else None
+
+    gs._confirmation_probes = lambda txid: [("slow", slow), ("fast", fast)]
+    started = _time.monotonic()
+    try:
+        assert gs._wait_for_transaction("tx1", "TRX activation", max_attempts=10) is True
+    finally:
+        release.set()
+    assert _time.monotonic() - started < 3
+    assert calls == {"slow": 1, "fast": 3}
+
+
+def test_wait_for_transaction_caps_lookups_in_flight(monkeypatch):
+    import threading
+    import time as _time
+
+    monkeypatch.setattr(gas_station.config.tron, "confirm_probes_per_wait", 2)
+    gs = gas_station.GasStationManager.__new__(gas_station.GasStationManager)
+    gs.tron_config = MagicMock(confirm_watcher_enabled=False)
+    lock = threading.Lock()
+    state = {"running": 0, "peak": 0, "launched": []}
+
+    def probe(label, status):
+        def run():
+            with lock:
+                state["running"] += 1
+                state["peak"] = max(state["peak"], state["running"])
+                state["launched"].append(label)
+            _time.sleep(0.05)
+            with lock:
+                state["running"] -= 1
+            return status
+        return run
+
+    gs._confirmation_probes = lambda txid: [("a", probe("a", None)), ("b", probe("b", None)), ("c", probe("c", True))]
+    assert gs._wait_for_transaction("tx1", "TRX activation", max_attempts=5) is True
+    assert state["peak"] <= 2
+    assert state["launched"][:2] == ["a", "b"] and "c" in state["launched"]  # later rounds rotate to c
+
+def test_tx_lookup_status_classifies_responses():
+    status = gas_station.GasStationManager._tx_lookup_status
+    assert status({"receipt": {"result": "SUCCESS"}}) is True
+    assert status({"ret": [{"contractRet": "SUCCESS"}]}) is True
+    assert status({"receipt": {"result": "REVERT"}}) is False
+    assert status({"id": "abc", "receipt": {"net_usage": 268}}) is None
+    assert status({}) is None
+
+def test_delegate_uses_offline_build_and_falls_back_on_rejection():
+    from core.tron import offline_tx
+    from tronpy.keys import PrivateKey
+
+    gs = gas_station.GasStationManager.__new__(gas_station.GasStationManager)
+    gs.tron_config = MagicMock(offline_tx_enabled=True)
+    gs.last_broadcast_txid = None
+    ref = offline_tx.RefBlock(number=100, block_id="00" * 32, timestamp_ms=1_700_000_000_000)
+    pk = PrivateKey(bytes.fromhex("11" * 32))
+    owner = "TR7NHqjeKQxGTCi8q8ZY4pL8otSzgjLj6t"
+    receiver = "TXYZopYRdj2D9XRtbG411XZZ3kM5VkAeBf"
+    calls = []
+
+    def node(method, path, *, payload=None, timeout=6):
+        calls.append(path)
+        if path == "/wallet/broadcasthex":
+            return reply, "local"
+        if path == "/wallet/delegateresource":
+            return {"txID": "ab" * 32, "raw_data": {}}, "local"
+        return {"result": True}, "local"
+
+    gs._http_local_remote = node
+    gs._record_lease = MagicMock()
+    with patch.object(offline_tx, "get_ref_block_cache", return_value=MagicMock(get=MagicMock(return_value=ref))):
+        reply = {"result": True}
+        txid = gs._http_delegate_resource(owner, receiver, 1_000_000, "ENERGY", pk, 2)
+        assert calls == ["/wallet/broadcasthex"]
+        assert txid == gs.last_broadcast_txid and len(txid) == 64
+        gs._record_lease.assert_called_once_with(receiver, "ENERGY", 1_000_000, "sweep", txid)
+
+        calls.clear()
+        reply = {"result": False, "code": "TAPOS_ERROR"}
+        assert gs._http_delegate_resource(owner, receiver, 1_000_000, "ENERGY", pk, 2) == "ab" * 32
+        assert calls == ["/wallet/broadcasthex", "/wallet/delegateresource", "/wallet/broadcasttransaction"]
+
+        # Already accepted by an endpoint whose reply was lost: same txid, nothing rebuilt
+        calls.clear()
+        reply = {"result": False, "code": "DUP_TRANSACTION_ERROR"}
+        txid = gs._http_delegate_resource(owner, receiver, 1_000_000, "ENERGY", pk, 2)
+        assert txid == gs.last_broadcast_txid and len(txid) == 64
+        assert calls == ["/wallet/broadcasthex"]
+
+        # Inconclusive outcome: the offline txid comes back flagged, no second delegation is built
+        calls.clear()
+        reply = {"result": False, "code": "SERVER_BUSY"}
+        unclear = gs._http_delegate_resource(owner, receiver, 1_000_000, "ENERGY", pk, 2)
+        assert isinstance(unclear, gas_station.UnclearTxid) and len(unclear) == 64
+        assert calls == ["/wallet/broadcasthex"]
+
+def _server_busy_station(owner):
+    """Manager with offline builds on whose node answers every broadcast with SERVER_BUSY."""
+    from core.tron import offline_tx
+
+    gs = gas_station.GasStationManager.__new__(gas_station.GasStationManager)
+    gs.tron_config = MagicMock(
+        offline_tx_enabled=True, auto_activation_amount=1.0, account_activation_mode="transfer",
+        energy_delegation_amount=1.0, bandwidth_delegation_amount=1.0, energy_units_per_trx_estimate=10,
+        delegation_safety_multiplier=1.1, min_delegate_trx=1.0, max_energy_delegation_trx_per_invoice=0.0,
+        max_bandwidth_delegation_trx_per_invoice=0.0,
+    )
+    gs.client = MagicMock()
+    gs.last_broadcast_txid = None
+    broadcasts = []
+
+    def node(method, path, *, payload=None, timeout=6):
+        broadcasts.append(path)
+        return {"result": False, "code": "SERVER_BUSY"}, "local"
+
+    gs._http_local_remote = node
+    gs._wait_for_transaction = MagicMock(return_value=False)
+    gs._record_lease = MagicMock()
+    gs.get_gas_wallet_address = lambda: owner
+    ref = offline_tx.RefBlock(number=100, block_id="00" * 32, timestamp_ms=1_700_000_000_000)
+    return gs, broadcasts, patch.object(offline_tx, "get_ref_block_cache", return_value=MagicMock(get=MagicMock(return_value=ref)))
+
+def test_unclear_activation_broadcast_is_not_sent_again():
+    from tronpy.keys import PrivateKey
+
+    owner, target = "TR7NHqjeKQxGTCi8q8ZY4pL8otSzgjLj6t", "TXYZopYRdj2D9XRtbG411XZZ3kM5VkAeBf"
+    gs, broadcasts, ref_patch = _server_busy_station(owner)
+    control = PrivateKey(bytes.fromhex("11" * 32))
+    gs._get_owner_and_signer = MagicMock(side_effect=ValueError("no owner key"))
+    gs._get_control_signer_private_key = lambda: control
+    gs._control_signer_matches_permission = lambda: (True, control.public_key.to_base58check_address(), 2)
+    gs._pk_to_hex = lambda pk: "11" * 32
+    gs.get_control_permissions_summary = lambda: {"permission": {"operations_decoded": {"flags": {"can_transfer_trx": True}}}}
+    gs.client.get_account.side_effect = ValueError("account not found")
+    gs.client.get_account_balance.return_value = 100.0
+    gs._is_account_active = MagicMock(return_value=False)
+    gs._ensure_minimum_resources_for_usdt = MagicMock(return_value=True)
+    with ref_patch:
+        gs._prepare_for_sweep_single(target)
+    assert broadcasts == ["/wallet/broadcasthex"]
+    gs.client.trx.transfer.assert_not_called()
+    assert isinstance(gs._wait_for_transaction.call_args.args[0], gas_station.UnclearTxid)
+
+def test_unclear_delegation_broadcast_is_not_sent_again():
+    from tronpy.keys import PrivateKey
+
+    owner, target = "TR7NHqjeKQxGTCi8q8ZY4pL8otSzgjLj6t", "TXYZopYRdj2D9XRtbG411XZZ3kM5VkAeBf"
+    gs, broadcasts, ref_patch = _server_busy_station(owner)
+    gs._get_account_resources = MagicMock(return_value={"energy_available": 0, "bandwidth_available": 0})
+    gs._resolve_control_permission_id = lambda: 2
+    with ref_patch:
+        gs._delegate_resources(owner, target, PrivateKey(bytes.fromhex("11" * 32)),
+                               target_energy_units=30_000, include_bandwidth=False)
+    assert broadcasts == ["/wallet/broadcasthex"]
+    gs.client.trx.delegate_resource.assert_not_called()
+
+def test_usdt_estimate_simulates_once_then_uses_energy_cache():
+    from core.tron.usdt_estimator import UsdtEnergyCache
+
+    gs = gas_station.GasStationManager.__new__(gas_station.GasStationManager)
+    gs.tron_config = MagicMock(usdt_contract="TR7NHqjeKQxGTCi8q8ZY4pL8otSzgjLj6t")
+    gs.tron_config.get_tron_client_config.return_value = {"full_node": "http://node"}
+    calls = []
+
+    def node(method, path, *, payload=None, timeout=6):
+        calls.append(path)
+        return {"result": {"result": True}, "energy_used": 64_285, "transaction": {"ret": [{}]}}, "local"
+
+    gs._http_local_remote = node
+    sender, recipient = "TXYZopYRdj2D9XRtbG411XZZ3kM5VkAeBf", "TR7NHqjeKQxGTCi8q8ZY4pL8otSzgjLj6t"
+    with patch.object(gas_station, "get_usdt_energy_cache", return_value=UsdtEnergyCache(ttl_sec=60)):
+        first = gs.estimate_usdt_energy_precise(sender, recipient)
+        assert calls == ["/wallet/triggerconstantcontract"]
+        assert first["energy_source"] == "simulation" and first["recipient_has_usdt"] is False
+        assert first["bandwidth_used"] == 345
+
+        again = gs.estimate_usdt_energy_precise(sender, recipient)
+        fresh = gs.estimate_usdt_energy_precise(sender, "TQn9Y2khEsLJW1ChVWFMSMeRDow5KcbLSE", recipient_has_usdt=False)
+        assert len(calls) == 1
+        assert again["energy_source"] == fresh["energy_source"] == "cache"
+        assert fresh["energy_used"] == 64_285
+
+def test_usdt_estimate_does_not_cache_reverted_simulation():
+    from core.tron.usdt_estimator import UsdtEnergyCache
+
+    gs = gas_station.GasStationManager.__new__(gas_station.GasStationManager)
+    gs.tron_config = MagicMock(usdt_contract="TR7NHqjeKQxGTCi8q8ZY4pL8otSzgjLj6t")
+    gs.tron_config.get_tron_client_config.return_value = {"full_node": "http://node"}
+    # Gas wallet holding no USDT: the proxy transfer reverts after burning little energy
+    gs._http_local_remote = lambda *a, **k: ({"result": {"result": True}, "energy_used": 1_200,
+                                               "transaction": {"ret": [{"ret": "FAILED", "contractRet": "REVERT"}]}}, "local")
+    cache = UsdtEnergyCache(ttl_sec=60)
+    recipient = "TR7NHqjeKQxGTCi8q8ZY4pL8otSzgjLj6t"
+    with patch.object(gas_station, "get_usdt_energy_cache", return_value=cache):
+        res = gs.estimate_usdt_energy_precise("TXYZopYRdj2D9XRtbG411XZZ3kM5VkAeBf", recipient)
+    assert res["simulation_success"] is False and res["energy_used"] == 0
+    assert cache.holder_status(recipient) is None and cache.energy(True) is None
+
+def test_prepare_batch_for_sweep_runs_activations_and_delegations_in_two_waves():
+    from core.tron.account_snapshot import AccountSnapshot
+    from tronpy.keys import PrivateKey
+
+    gs = gas_station.GasStationManager.__new__(gas_station.GasStationManager)
+    gs.client = object()
+    gs.tron_config = MagicMock(auto_activation_amount=1.0, energy_units_per_trx_estimate=10)
+    existing = AccountSnapshot("TExisting", account={"address": "TExisting", "balance": 1}, resource={"freeNetLimit": 600})
+    fresh = AccountSnapshot("TFresh")
+    snaps = MagicMock()
+    snaps.get.side_effect = lambda a, max_age=None: {"TExisting": existing, "TFresh": fresh}.get(a)
+    events = []
+    signer = PrivateKey(bytes.fromhex("11" * 32))
+    gs._batch_signers = lambda: {"activation": (signer, 2, "transfer"), "delegation": (signer, 2)}
+    gs.get_gas_wallet_address = lambda: "TOwner"
+    gs.get_global_resource_parameters = lambda probe=None: {"dailyEnergyPerTrx": 10.0, "dailyBandwidthPerTrx": 1.0}
+    gs.estimate_usdt_energy_precise = lambda *a, **k: {"energy_used": 64_000, "bandwidth_used": 345}
+    gs._http_transfer_with_permission = lambda owner, to, amt, hx, pid: events.append(("activate", to)) or f"act-{to}"
+    gs._http_delegate_resource = lambda owner, to, amt, res, pk, pid: events.append((res, to)) or f"{res}-{to}"
+    gs._wait_for_transaction = lambda txid, op, attempts, suppress_final_warning=False: events.append(("wait", txid)) or True
+    gs._is_account_active = lambda a: True
+
+    with patch.object(gas_station, "get_account_snapshots", return_value=snaps), \
+            patch.object(gas_station, "get_lease_manager", return_value=MagicMock(capacity_known=lambda: True, available_sun=lambda r: None)):
+        results = gs.prepare_batch_for_sweep(["TExisting", "TFresh", "TExisting"])
+
+    assert set(results) == {"TExisting", "TFresh"}
+    assert all(r["success"] for r in results.values())
+    waits = [i for i, e in enumerate(events) if e[0] == "wait"]
+    first_wave = events[:waits[0]]
+    assert set(first_wave) == {("activate", "TFresh"), ("ENERGY", "TExisting")}
+    # Fresh account's delegations only after the first wave is confirmed
+    assert events.index(("ENERGY", "TFresh")) > waits[1]
+    assert ("BANDWIDTH", "TExisting") not in events  # free bandwidth covers it
+    assert results["TFresh"]["transaction_ids"] == ["act-TFresh", "ENERGY-TFresh"]  # activation bonus covers bandwidth
+
+
+def test_batch_signers_resolve_like_single_preparation():
+    from tronpy.keys import PrivateKey
+
+    owner, control = PrivateKey(bytes.fromhex("11" * 32)), PrivateKey(bytes.fromhex("22" * 32))
+    gs = gas_station.GasStationManager.__new__(gas_station.GasStationManager)
+    gs.tron_config = MagicMock(account_activation_mode="create_account", gas_control_fallback_to_owner=True)
+    gs._get_control_signer_private_key = lambda: control
+    gs._control_signer_matches_permission = lambda: (True, "TControl", 3)
+    gs.get_control_permissions_summary = lambda: {"permission": {"operations_decoded": {
+        "flags": {"can_transfer_trx": True, "can_create_account": True}}}}
+
+    gs._get_gas_wallet_private_key = lambda: owner
+    assert gs._batch_signers() == {"activation": (owner, None, "create_account"), "delegation": (control, 3)}
+
+    def no_owner():
+        raise ValueError("GAS_WALLET_PRIVATE_KEY is not set")
+
+    gs._get_gas_wallet_private_key = no_owner
+    assert gs._batch_signers()["activation"] == (control, 3, "create_account")
+    gs.tron_config.account_activation_mode = "transfer"
+    assert gs._batch_signers()["activation"] == (control, 3, "transfer")
+
+    # A control signer outside the active permissions is never used
+    gs._control_signer_matches_permission = lambda: (False, "TControl", 3)
+    assert gs._batch_signers() == {"activation": None, "delegation": None}
+    gs._get_gas_wallet_private_key = lambda: owner
+    assert gs._batch_signers() == {"activation": (owner, None, "transfer"), "delegation": (owner, None)}
+
+
+def test_batch_operations_fall_back_to_per_address_preparation_for_multisig():
+    gs = gas_station.GasStationManager.__new__(gas_station.GasStationManager)
+    gs.client = object()
+    gs.tron_config = MagicMock(gas_station_type="multisig")
+    gs.prepare_for_sweep = MagicMock(side_effect=lambda a: a == "TReady")
+    gs._batch_signers = MagicMock()
+
+    results = gs.prepare_batch_for_sweep(["TReady", "TOther"])
+    assert (results["TReady"]["success"], results["TOther"]["success"]) == (True, False)
+    assert gs.activate_addresses(["TReady"])["TReady"]["activated"] is True
+    gs._batch_signers.assert_not_called()
+
+def test_check_address_exists_can_bypass_the_snapshot_cache():
+    from core.tron.account_snapshot import AccountSnapshotCache
+
+    created = {"value": False}
+
+    def request(method, path, payload=None, timeout=None):
+        if path == "/wallet/getaccount":
+            return ({"address": payload["address"]} if created["value"] else {}), "local"
+        return {}, "local"
+
+    gs = gas_station.GasStationManager.__new__(gas_station.GasStationManager)
+    with patch.object(gas_station, "get_account_snapshots", return_value=AccountSnapshotCache(ttl_sec=60, request=request)):
+        assert gs._check_address_exists("TNewAccount") is False
+        created["value"] = True
+        assert gs._check_address_exists("TNewAccount") is False  # cached snapshot
+        assert gs._check_address_exists("TNewAccount", max_age=0) is True  # polling loops read the node
+
+def test_owner_signed_builder_delegations_are_recorded_as_leases():
+    from tronpy.keys import PrivateKey
+
+    owner_key = PrivateKey(bytes.fromhex("11" * 32))
+    owner, target = owner_key.public_key.to_base58check_address(), "TXYZopYRdj2D9XRtbG411XZZ3kM5VkAeBf"
+    gs, broadcasts, _ = _server_busy_station(owner)
+    gs._get_account_resources = MagicMock(return_value={"energy_available": 0, "bandwidth_available": 0})
+    gs._estimate_bandwidth_units_per_trx = lambda: 1000
+    gs.get_owner_delegated_stake = lambda: {"bandwidth_trx": 10.0}
+    gs._wait_for_transaction = MagicMock(return_value=True)
+    gs.client.trx.delegate_resource.return_value.build.return_value.sign.return_value.broadcast.return_value = {"txid": "e1"}
+    gs.client.trx.freeze_balance.return_value.build.return_value.sign.return_value.broadcast.return_value = {"txid": "b1"}
+
+    gs._delegate_resources(owner, target, owner_key, target_energy_units=100, target_bandwidth_units=500, purpose="free_gas")
+    assert broadcasts == []  # owner signer: tronpy builders, no HTTP helpers
+    assert gs._record_lease.call_args_list == [
+        ((target, "ENERGY", 11_000_000, "free_gas", "e1"),),
+        ((target, "BANDWIDTH", 1_000_000, "free_gas", "b1"),),
+    ]
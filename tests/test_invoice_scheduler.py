@@ -0,0 +1,53 @@
+from types import SimpleNamespace
+
+from services.invoice_scheduler import InvoicePollScheduler
+
+
+def _inv(i, status='pending'):
+    return SimpleNamespace(id=i, status=status)
+
+
+def test_unchanged_invoices_back_off_to_floor_and_reset_on_change():
+    s = InvoicePollScheduler(base_interval=10, max_interval=40, partial_interval=25)
+    s.sync([_inv(1)], now=0)
+    assert s.due(now=0) == {1}
+
+    t, intervals = 0, []
+    for _ in range(5):
+        s.record(1, 0.0, now=t)
+        nxt = t + s.next_check_in(now=t)
+        intervals.append(nxt - t)
+        assert s.due(now=nxt - 1) == set()
+        assert s.due(now=nxt) == {1}
+        t = nxt
+    assert intervals == [10, 20, 40, 40, 40]
+
+    s.record(1, 5.0, now=t)  # balance changed -> back to base cadence
+    assert s.next_check_in(now=t) == 10
+
+
+def test_partial_cadence_new_invoices_and_closed_ones_dropped():
+    s = InvoicePollScheduler(base_interval=10, max_interval=100, partial_interval=25)
+    s.sync([_inv(1), _inv(2)], now=0)
+    assert s.due(now=0) == {1, 2}
+    s.record(1, 0.0, now=0)
+    s.record(2, 0.0, now=0)
+
+    s.sync([_inv(1, 'partial'), _inv(3)], now=5)  # 1 became partial, 2 closed, 3 is new
+    assert s.due(now=5) == {1, 3}
+    s.record(1, 3.0, now=5)
+    s.record(3, 0.0, now=5)
+    assert s.due(now=20) == {3}  # fresh invoice: base cadence
+    assert s.due(now=30) == {1}  # partial: fixed partial cadence
+    assert len(s) == 2
+
+
+def test_invoices_popped_but_not_recorded_are_due_at_next_sync():
+    s = InvoicePollScheduler(base_interval=10, max_interval=100, partial_interval=25)
+    s.sync([_inv(1), _inv(2)], now=0)
+    assert s.due(now=0) == {1, 2}
+    s.record(2, 0.0, now=0)  # the pass failed before invoice 1 was checked
+    assert s.due(now=10000) == {2}
+    s.record(2, 0.0, now=10000)
+    s.sync([_inv(1), _inv(2)], now=10000)
+    assert s.due(now=10000) == {1}
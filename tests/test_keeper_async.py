@@ -0,0 +1,58 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from services.keeper_async import AsyncKeeperEngine
+
+
+def _invoice(i, status='pending'):
+    inv = MagicMock()
+    inv.id, inv.address, inv.status, inv.amount, inv.seller_id = i, f'TAddr{i}', status, 10, 1
+    return inv
+
+
+@pytest.mark.asyncio
+@patch("services.keeper_async.get_db")
+async def test_invoice_pass_fetches_async_and_applies_serially(mock_get_db):
+    mock_get_db.side_effect = lambda: iter([MagicMock()])
+    keeper = MagicMock()
+    keeper.indexer = None
+    keeper._select_due_invoices.side_effect = lambda invoices: invoices
+    keeper._rpc_bucket.return_value.try_acquire.return_value = True
+    keeper._load_open_invoices.return_value = [_invoice(1), _invoice(2), _invoice(3, status='paid')]
+
+    engine = AsyncKeeperEngine(keeper, invoice_interval=5, forward_interval=5, health_interval=5)
+    engine.aclient = MagicMock()
+    acontract = MagicMock()
+    acontract.functions.balanceOf = AsyncMock(side_effect=lambda a: 7_000_000 if a == 'TAddr2' else 0)
+    engine.aclient.get_contract = AsyncMock(return_value=acontract)
+    engine.aclient.get_account = AsyncMock(return_value={'balance': 1})
+
+    await engine.invoice_pass()
+
+    applied = [(c.args[2].id, c.args[3], c.args[4]) for c in keeper._apply_invoice_state.call_args_list]
+    assert applied == [(1, 0.0, False), (2, 7.0, False)]
+
+
+@pytest.mark.asyncio
+@patch("services.keeper_async.get_db")
+async def test_invoice_pass_skips_sellers_lost_during_fetch(mock_get_db):
+    mock_get_db.side_effect = lambda: iter([MagicMock()])
+    keeper = MagicMock()
+    keeper.indexer = None
+    keeper._select_due_invoices.side_effect = lambda invoices: invoices
+    keeper._rpc_bucket.return_value.try_acquire.return_value = True
+    lost = _invoice(2)
+    lost.seller_id = 9
+    keeper._load_open_invoices.return_value = [_invoice(1), lost]
+    keeper._owns_seller.side_effect = lambda seller_id: seller_id != 9
+
+    engine = AsyncKeeperEngine(keeper, invoice_interval=5, forward_interval=5, health_interval=5)
+    engine.aclient = MagicMock()
+    acontract = MagicMock()
+    acontract.functions.balanceOf = AsyncMock(return_value=0)
+    engine.aclient.get_contract = AsyncMock(return_value=acontract)
+    engine.aclient.get_account = AsyncMock(return_value={'balance': 1})
+
+    await engine.invoice_pass()
+
+    assert [c.args[2].id for c in keeper._apply_invoice_state.call_args_list] == [1]
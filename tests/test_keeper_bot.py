@@ -11,13 +11,13 @@ from services.keeper_bot import check_pending_invoices
 @patch("services.keeper_bot.get_invoices_by_seller")
 @patch("services.keeper_bot.get_invoice")
 @patch("services.keeper_bot.update_invoice")
-@patch("services.keeper_bot.create_transaction")
+@patch("services.keeper_bot.record_invoice_transfer")
 @patch("services.keeper_bot.auto_activate_on_usdt_receive")
 @patch("services.keeper_bot.notify_invoice_paid")
 def test_check_pending_invoices_first_usdt_receive(
     mock_notify,
     mock_auto_activate,
-    mock_create_tx,
+    mock_record_transfer,
     mock_update_invoice,
     mock_get_invoice,
     mock_get_invoices_by_seller,
@@ -32,6 +32,7 @@ def test_check_pending_invoices_first_usdt_receive(
     invoice.address = 'TTestAddress'
     invoice.id = 1
     invoice.amount = 10
+    invoice.received_amount = 0
     mock_get_invoices_by_seller.return_value = [invoice]
     mock_db.query.return_value.filter.return_value.distinct.return_value = [MagicMock(seller_id=123)]
 
@@ -54,7 +55,7 @@ def test_check_pending_invoices_first_usdt_receive(
 
     mock_auto_activate.assert_called_once_with('TTestAddress')
     mock_update_invoice.assert_called_once_with(mock_db, invoice.id, status='paid')
-    mock_create_tx.assert_called_once()
+    mock_record_transfer.assert_called_once_with(mock_db, invoice.id, "txid123", -1, "multiple", 20.0)
     mock_notify.assert_called_once_with(invoice.id, 'txid123', 20.0)
 
 # --- Test: Activation does NOT fire if account is activated (even with zero TRX balance) ---
@@ -64,13 +65,13 @@ def test_check_pending_invoices_first_usdt_receive(
 @patch("services.keeper_bot.get_invoices_by_seller")
 @patch("services.keeper_bot.get_invoice")
 @patch("services.keeper_bot.update_invoice")
-@patch("services.keeper_bot.create_transaction")
+@patch("services.keeper_bot.record_invoice_transfer")
 @patch("services.keeper_bot.auto_activate_on_usdt_receive")
 @patch("services.keeper_bot.notify_invoice_paid")
 def test_check_pending_invoices_zero_trx_balance_but_activated(
     mock_notify,
     mock_auto_activate,
-    mock_create_tx,
+    mock_record_transfer,
     mock_update_invoice,
     mock_get_invoice,
     mock_get_invoices_by_seller,
@@ -85,6 +86,7 @@ def test_check_pending_invoices_zero_trx_balance_but_activated(
     invoice.address = 'TTestAddress'
     invoice.id = 3
     invoice.amount = 10
+    invoice.received_amount = 0
     mock_get_invoices_by_seller.return_value = [invoice]
     mock_db.query.return_value.filter.return_value.distinct.return_value = [MagicMock(seller_id=123)]
 
@@ -107,7 +109,7 @@ def test_check_pending_invoices_zero_trx_balance_but_activated(
 
     mock_auto_activate.assert_not_called()
     mock_update_invoice.assert_called_once_with(mock_db, invoice.id, status='paid')
-    mock_create_tx.assert_called_once()
+    mock_record_transfer.assert_called_once_with(mock_db, invoice.id, "txid789", -1, "multiple", 20.0)
     mock_notify.assert_called_once_with(invoice.id, 'txid789', 20.0)
 
 # --- Test: Activation does NOT fire if invoice already paid ---
@@ -117,13 +119,13 @@ def test_check_pending_invoices_zero_trx_balance_but_activated(
 @patch("services.keeper_bot.get_invoices_by_seller")
 @patch("services.keeper_bot.get_invoice")
 @patch("services.keeper_bot.update_invoice")
-@patch("services.keeper_bot.create_transaction")
+@patch("services.keeper_bot.record_invoice_transfer")
 @patch("services.keeper_bot.auto_activate_on_usdt_receive")
 @patch("services.keeper_bot.notify_invoice_paid")
 def test_check_pending_invoices_already_paid(
     mock_notify,
     mock_auto_activate,
-    mock_create_tx,
+    mock_record_transfer,
     mock_update_invoice,
     mock_get_invoice,
     mock_get_invoices_by_seller,
@@ -138,6 +140,7 @@ def test_check_pending_invoices_already_paid(
     invoice.address = 'TTestAddress'
     invoice.id = 2
     invoice.amount = 10
+    invoice.received_amount = 0
     mock_get_invoices_by_seller.return_value = [invoice]
     mock_db.query.return_value.filter.return_value.distinct.return_value = [MagicMock(seller_id=123)]
 
@@ -158,4 +161,102 @@ def test_check_pending_invoices_already_paid(
     mock_tron_instance.get_account.return_value = {'address': 'TTestAddress', 'balance': 100_000_000}
     check_pending_invoices()
 
-    mock_auto_activate.assert_not_called()
\ No newline at end of file
+    mock_auto_activate.assert_not_called()
+# --- Test: Balances fetched in parallel, results applied for every invoice ---
+@patch("services.keeper_bot.Tron")
+@patch("services.keeper_bot.HTTPProvider")
+@patch("services.keeper_bot.get_db")
+@patch("services.keeper_bot.get_invoices_by_seller")
+@patch("services.keeper_bot.get_invoice")
+@patch("services.keeper_bot.update_invoice")
+@patch("services.keeper_bot.record_invoice_transfer")
+@patch("services.keeper_bot.auto_activate_on_usdt_receive")
+@patch("services.keeper_bot.notify_invoice_paid")
+def test_check_pending_invoices_parallel_scan_applies_all(
+    mock_notify,
+    mock_auto_activate,
+    mock_record_transfer,
+    mock_update_invoice,
+    mock_get_invoice,
+    mock_get_invoices_by_seller,
+    mock_get_db,
+    mock_http_provider,
+    mock_tron,
+):
+    mock_db = MagicMock()
+    mock_get_db.return_value = iter([mock_db])
+    invoices = []
+    for i in range(5):
+        inv = MagicMock(spec=Invoice)
+        inv.status = 'pending'
+        inv.address = f'TAddr{i}'
+        inv.id = 100 + i
+        inv.amount = 10
+        inv.received_amount = 0
+        invoices.append(inv)
+    mock_get_invoices_by_seller.return_value = invoices
+    mock_db.query.return_value.filter.return_value.distinct.return_value = [MagicMock(seller_id=123)]
+
+    mock_contract = MagicMock()
+    # Odd invoices are paid, even ones are still empty
+    mock_contract.functions.balanceOf = MagicMock(side_effect=lambda a: 10_000_000 if int(a[-1]) % 2 else 0)
+    mock_contract.functions.transferEvent = MagicMock(return_value=[])
+    mock_tron_instance = mock_tron.return_value
+    mock_tron_instance.get_contract.return_value = mock_contract
+    mock_tron_instance.get_account.return_value = {'address': 'x', 'balance': 1}
+    check_pending_invoices()
+
+    paid_ids = sorted(c.args[1] for c in mock_update_invoice.call_args_list if c.kwargs == {'status': 'paid'})
+    assert paid_ids == [101, 103]
+    assert mock_contract.functions.balanceOf.call_count == 5
+    assert mock_record_transfer.call_count == 2
+
+# --- Test: TRX forwarding skips unchanged wallets and credits sellers in one batch ---
+@patch("services.keeper_bot.credit_seller_gas_deposits")
+@patch("services.keeper_bot.PrivateKey")
+@patch("services.keeper_bot.Tron")
+@patch("services.keeper_bot.HTTPProvider")
+@patch("services.keeper_bot.get_db")
+def test_forward_trx_deposits_two_phase(mock_get_db, mock_http_provider, mock_tron, mock_pk, mock_credit):
+    from services.keeper_bot import KeeperBot
+
+    mock_db = MagicMock()
+    mock_db.__enter__.return_value = mock_db
+    mock_get_db.side_effect = lambda: iter([mock_db])
+    wallets = [
+        MagicMock(address='TDep1', seller_id=1, derivation_path="m/44'/195'/1'/0/0"),
+        MagicMock(address='TDep2', seller_id=2, derivation_path="m/44'/195'/2'/0/0"),
+    ]
+    mock_db.query.return_value.filter.return_value.all.return_value = wallets
+    client = mock_tron.return_value
+    client.get_account.side_effect = lambda a: {'balance': 5_200_000 if a == 'TDep1' else 100_000}
+    txn = client.trx.transfer.return_value.build.return_value.sign.return_value
+    txn.broadcast.return_value = {'txid': 'fwd1'}
+
+    keeper = KeeperBot()
+    keeper.tron_config = MagicMock(sweep_enabled=True, gas_wallet_address='THot', gas_wallet_mnemonic='m')
+    keeper._derive_privkey_hex_from_path = MagicMock(return_value='11' * 32)
+    keeper.forward_trx_deposits()
+    keeper.forward_trx_deposits()  # balances unchanged -> nothing rebroadcast
+
+    client.trx.transfer.assert_called_once_with('TDep1', 'THot', 5_000_000)
+    mock_credit.assert_called_once_with(mock_db, {1: 5.0})
+
+# --- Test: transfer events are fetched once per pass and looked up by recipient ---
+def test_transfer_event_cache_fetches_once_per_cycle():
+    from services.transfer_event_cache import TransferEventCache
+
+    contract = MagicMock()
+    contract.functions.transferEvent = MagicMock(return_value=[
+        {'to': 'TA', 'transaction_id': 'tx-a1'},
+        {'to': 'TB', 'transaction_id': 'tx-b'},
+        {'to': 'TA', 'transaction_id': 'tx-a2'},
+    ])
+    cache = TransferEventCache()
+    cache.new_cycle()
+    assert [cache.last_txid(contract, a) for a in ('TA', 'TB', 'TC')] == ['tx-a2', 'tx-b', '']
+    assert contract.functions.transferEvent.call_count == 1
+
+    cache.new_cycle()
+    cache.last_txid(contract, 'TA')
+    assert contract.functions.transferEvent.call_count == 2
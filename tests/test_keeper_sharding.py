@@ -0,0 +1,37 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from core.database import models
+from core.database.db_service import list_leases
+from services.keeper_sharding import ShardLeaseManager, partition_of
+
+
+def _session_factory():
+    engine = create_engine(
+        "sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    models.Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)
+
+
+def test_partitions_split_between_keepers_and_taken_over_on_release():
+    factory = _session_factory()
+    a = ShardLeaseManager("keeper-a", partitions=4, ttl_sec=30, session_factory=factory)
+    b = ShardLeaseManager("keeper-b", partitions=4, ttl_sec=30, session_factory=factory)
+
+    assert a.heartbeat() == {0, 1, 2, 3}
+    b.heartbeat()          # nothing free yet
+    a.heartbeat()          # a sees b alive and gives back its extra share
+    b.heartbeat()
+    assert a.held_partitions() == {0, 1}
+    assert b.held_partitions() == {2, 3}
+
+    seller = next(s for s in range(100) if partition_of(s, 4) == 3)
+    assert b.owns_seller(seller) and not a.owns_seller(seller)
+
+    b.stop()
+    a.heartbeat()
+    assert a.held_partitions() == {0, 1, 2, 3}
+    db = factory()
+    assert {lease.owner for lease in list_leases(db)} == {"keeper-a"}
@@ -0,0 +1,35 @@
+from unittest.mock import patch
+
+import pytest
+from bip_utils import Bip44, Bip44Coins, Bip44Changes, Bip39SeedGenerator
+
+from core.crypto.key_cache import Bip44KeyCache
+
+MNEMONIC = "abandon abandon abandon abandon abandon abandon abandon abandon abandon abandon abandon about"
+
+
+def _direct_priv_hex(account: int) -> str:
+    seed = Bip39SeedGenerator(MNEMONIC).Generate()
+    node = Bip44.FromSeed(seed, Bip44Coins.TRON).Purpose().Coin().Account(account)
+    return node.Change(Bip44Changes.CHAIN_EXT).AddressIndex(0).PrivateKey().Raw().ToHex()
+
+
+def test_seed_generated_once_and_keys_match_direct_derivation():
+    cache = Bip44KeyCache(MNEMONIC, max_accounts=2)
+    with patch("core.crypto.key_cache.Bip39SeedGenerator", wraps=Bip39SeedGenerator) as gen:
+        keys = [cache.private_key_hex(a) for a in (0, 1, 0, 2, 1)]
+    assert gen.call_count == 1
+    assert keys[0] == keys[2] == _direct_priv_hex(0)
+    assert keys[1] == _direct_priv_hex(1)
+    assert cache.cached_accounts() == 2  # LRU bound
+
+
+def test_wipe_drops_key_material():
+    cache = Bip44KeyCache(MNEMONIC)
+    cache.address(0)
+    seed_ref = cache._seed
+    cache.wipe()
+    assert not any(seed_ref)
+    assert cache.cached_accounts() == 0
+    with pytest.raises(ValueError):
+        cache.private_key_hex(0)
@@ -0,0 +1,77 @@
+import hashlib
+
+from tronpy.keys import PrivateKey, Signature, to_hex_address
+
+from core.tron import offline_tx
+
+OWNER = "TR7NHqjeKQxGTCi8q8ZY4pL8otSzgjLj6t"
+RECEIVER = "TXYZopYRdj2D9XRtbG411XZZ3kM5VkAeBf"
+BLOCK = {
+    "blockID": "0000000003a1b2c3" + "11" * 8 + "22" * 16,
+    "block_header": {"raw_data": {"number": 61_000_387, "timestamp": 1_700_000_000_000}},
+}
+
+
+def _decode(buf: bytes) -> dict:
+    """Tiny protobuf reader for the assertions: {field: [values]} (varints and length-delimited only)."""
+    out, i = {}, 0
+
+    def varint():
+        nonlocal i
+        shift = value = 0
+        while True:
+            b = buf[i]
+            i += 1
+            value |= (b & 0x7F) << shift
+            shift += 7
+            if not b & 0x80:
+                return value
+
+    while i < len(buf):
+        key = varint()
+        number, wire = key >> 3, key & 7
+        if wire == 0:
+            out.setdefault(number, []).append(varint())
+        else:
+            length = varint()
+            out.setdefault(number, []).append(buf[i:i + length])
+            i += length
+    return out
+
+
+def test_delegate_resource_encoding_and_signature():
+    ref = offline_tx.RefBlock.from_block(BLOCK)
+    contract = offline_tx.delegate_resource_contract(OWNER, RECEIVER, 5_000_000, "energy")
+    tx = offline_tx.build_transaction(contract, ref, permission_id=2, now_ms=1_700_000_001_000)
+
+    raw = _decode(tx.raw_data)
+    assert raw[1] == [(61_000_387).to_bytes(8, "big")[6:8]]
+    assert raw[4] == [bytes.fromhex(BLOCK["blockID"])[8:16]]
+    assert raw[8] == [1_700_000_001_000 + 60_000]
+    assert raw[14] == [1_700_000_001_000]
+    c = _decode(raw[11][0])
+    assert c[1] == [57] and c[5] == [2]
+    any_param = _decode(c[2][0])
+    assert any_param[1] == [b"type.googleapis.com/protocol.DelegateResourceContract"]
+    value = _decode(any_param[2][0])
+    assert value[1] == [bytes.fromhex(to_hex_address(OWNER))]
+    assert value[2] == [1] and value[3] == [5_000_000]
+    assert value[4] == [bytes.fromhex(to_hex_address(RECEIVER))]
+
+    pk = PrivateKey(bytes.fromhex("11" * 32))
+    tx.sign(pk)
+    assert tx.txid == hashlib.sha256(tx.raw_data).hexdigest()
+    full = _decode(bytes.fromhex(tx.to_hex()))
+    assert full[1] == [tx.raw_data] and len(full[2]) == 1
+    sig = Signature(full[2][0])
+    assert sig.recover_public_key_from_msg_hash(bytes.fromhex(tx.txid)) == pk.public_key
+
+
+def test_defaults_are_omitted():
+    ref = offline_tx.RefBlock.from_block(BLOCK)
+    # BANDWIDTH (0) and owner permission (None/0) are proto3 defaults and must not be encoded
+    contract = offline_tx.undelegate_resource_contract(OWNER, RECEIVER, 1_000_000, "BANDWIDTH")
+    tx = offline_tx.build_transaction(contract, ref, now_ms=1_700_000_001_000)
+    c = _decode(_decode(tx.raw_data)[11][0])
+    assert 5 not in c
+    assert 2 not in _decode(_decode(c[2][0])[2][0])
@@ -0,0 +1,142 @@
+import threading
+from collections import Counter
+from unittest.mock import MagicMock, patch
+
+import pytest
+from tronpy.keys import PrivateKey
+
+from core.services import gas_station
+from core.services.prepare_planner import PrepareSnapshot, PrepareSnapshotCache, StepGraph, plan_preparation
+from core.tron.account_snapshot import AccountSnapshotCache
+
+OWNER = "TR7NHqjeKQxGTCi8q8ZY4pL8otSzgjLj6t"
+TARGET = "TXYZopYRdj2D9XRtbG411XZZ3kM5VkAeBf"
+SIGNER_KEY = "22" * 32
+SIGNER = PrivateKey(bytes.fromhex(SIGNER_KEY)).public_key.to_base58check_address()
+
+
+def _tron_config(network="mainnet"):
+    return MagicMock(
+        network=network, usdt_energy_per_transfer_estimate=65000, usdt_bandwidth_per_transfer_estimate=345,
+        energy_units_per_trx_estimate=2.38, bandwidth_units_per_trx_estimate=1500.0,
+        delegation_safety_multiplier=1.1, min_delegate_trx=1.0, max_energy_delegation_trx_per_invoice=0.0,
+        max_bandwidth_delegation_trx_per_invoice=0.0, auto_activation_amount=1.0, account_activation_mode="transfer",
+    )
+
+
+def _station(accounts, simulation):
+    """Manager whose node reads are counted per (path, address)."""
+    calls = Counter()
+
+    def request(method, path, *, payload=None, timeout=5):
+        calls[(path, payload["address"])] += 1
+        account, resource = accounts.get(payload["address"], ({}, {}))
+        return (account if path == "/wallet/getaccount" else resource), "local"
+
+    gs = gas_station.GasStationManager.__new__(gas_station.GasStationManager)
+    gs.tron_config = _tron_config()
+    gs.get_gas_wallet_address = lambda: OWNER
+    gs.get_global_resource_parameters = MagicMock(return_value={"dailyEnergyPerTrx": 10.0, "dailyBandwidthPerTrx": 1000.0})
+    gs.is_permission_based_activation_available = MagicMock(return_value={"available": True, "issues": [], "details": {}})
+    gs.estimate_usdt_energy_precise = MagicMock(return_value=simulation)
+    return gs, AccountSnapshotCache(ttl_sec=60, request=request), calls
+
+
+def test_dry_run_and_execution_share_one_snapshot(monkeypatch):
+    monkeypatch.setenv("SIGNER_WALLET_PRIVATE_KEY", SIGNER_KEY)
+    accounts = {
+        TARGET: ({"address": TARGET}, {"EnergyLimit": 100_000, "freeNetLimit": 600}),
+        OWNER: ({"address": OWNER, "balance": 50_000_000}, {"freeNetLimit": 600}),
+        SIGNER: ({"address": SIGNER}, {"freeNetLimit": 600}),
+    }
+    gs, snapshots, calls = _station(accounts, {"energy_used": 30000, "bandwidth_used": 345,
+                                               "recipient_has_usdt": True, "simulation_success": True})
+    with patch.object(gas_station, "get_account_snapshots", return_value=snapshots), \
+            patch.object(gas_station, "get_prepare_snapshots", return_value=PrepareSnapshotCache(ttl_sec=60)):
+        plan = gs.dry_run_prepare_for_sweep(TARGET)
+        result = gs.intelligent_prepare_address_for_usdt(TARGET)
+
+    assert set(calls.values()) == {1} and len(calls) == 6  # getaccount + getaccountresource per address
+    gs.estimate_usdt_energy_precise.assert_called_once_with(TARGET, OWNER, 1.0)
+    gs.get_global_resource_parameters.assert_called_once()
+    gs.is_permission_based_activation_available.assert_called_once()
+    assert plan["required"] == {"energy": 35000, "bandwidth": 431}
+    assert plan["missing"] == {"energy": 0, "bandwidth": 0}
+    assert plan["plan"]["delegation_method"] == "permission_based"
+    assert plan["wallet_analysis"]["gas_wallet"]["current_resources"]["balance_trx"] == 50.0
+    assert result["success"] is True and result["transaction_ids"] == []
+    assert result["details"]["required_energy"] == 35000
+
+
+def test_execution_activates_then_delegates_concurrently(monkeypatch):
+    monkeypatch.delenv("SIGNER_WALLET_PRIVATE_KEY", raising=False)
+    monkeypatch.setattr("dotenv.load_dotenv", lambda *a, **k: False)
+    accounts = {OWNER: ({"address": OWNER, "balance": 50_000_000}, {})}
+    gs, snapshots, calls = _station(accounts, {"energy_used": 64000, "bandwidth_used": 2000,
+                                               "recipient_has_usdt": False, "simulation_success": True})
+    gs.tron_config.max_energy_delegation_trx_per_invoice = 5000.0
+    order, delegated_trx = [], {}
+    both_broadcasting = threading.Barrier(2, timeout=5)
+
+    def activate(target):
+        order.append("activation")
+        return {"success": True, "transaction_id": "t1"}
+
+    def broadcast(client, owner, target, resource, trx, signer_key, purpose, *, units=None):
+        order.append(resource)
+        delegated_trx[resource] = trx
+        both_broadcasting.wait()  # fails unless ENERGY and BANDWIDTH run at the same time
+        return {"type": resource.lower(), "amount": units, "success": False, "transaction_id": f"tx-{resource}"}
+
+    gs.activate_address_with_permission = activate
+    gs._permission_delegation_setup = lambda: ("client", OWNER, "signer")
+    gs._broadcast_permission_delegation = broadcast
+    gs._wait_for_many = MagicMock(side_effect=lambda txids, op: {txid: True for txid in txids})
+    gs._get_account_resources = MagicMock(return_value={"energy_available": 80000, "bandwidth_available": 2600})
+    gs._check_address_exists = MagicMock(return_value=True)
+    with patch.object(gas_station, "get_account_snapshots", return_value=snapshots), \
+            patch.object(gas_station, "get_prepare_snapshots", return_value=PrepareSnapshotCache(ttl_sec=60)):
+        result = gs.intelligent_prepare_address_for_usdt(TARGET)
+
+    gs.estimate_usdt_energy_precise.assert_called_once_with(OWNER, TARGET, 1.0, recipient_has_usdt=False)
+    assert order[0] == "activation" and sorted(order[1:]) == ["BANDWIDTH", "ENERGY"]
+    gs._wait_for_many.assert_called_once_with({"tx-ENERGY": "energy", "tx-BANDWIDTH": "bandwidth"}, "Permission delegation")
+    assert result["resources_delegated"] == {"energy": 73600, "bandwidth": 1000}
+    # The plan's TRX is what gets delegated: energy capped per invoice, bandwidth 1000 / 1000 * 1.1
+    assert delegated_trx == {"ENERGY": 5000.0, "BANDWIDTH": 1.1}
+    assert delegated_trx["ENERGY"] == result["details"]["plan"]["energy_trx"]
+    assert result["details"]["delegation_result"]["success"] is True
+    assert result["transaction_ids"] == ["t1", "tx-ENERGY", "tx-BANDWIDTH"]
+    timings = result["details"]["step_timings"]
+    assert set(timings) == {"activation", "delegate_energy", "delegate_bandwidth", "confirm_delegations"}
+    assert all(t["status"] == "ok" for t in timings.values())
+    assert isinstance(result["execution_time"], float) and result["success"] is True
+    assert result["simulation_data"]["energy_used"] == 64000
+
+
+def test_step_graph_skips_dependents_of_failed_steps():
+    graph = StepGraph()
+    graph.add("activation", lambda: 1 / 0)
+    graph.add("delegate", lambda: "sent", after=("activation",))
+    graph.add("confirm", lambda: "ok", after=("delegate",))
+    graph.add("independent", lambda: "done")
+    assert graph.run() == {"independent": "done"}
+    assert graph.timings["activation"]["status"] == "failed" and "division" in graph.timings["activation"]["error"]
+    assert graph.timings["delegate"]["status"] == graph.timings["confirm"]["status"] == "skipped"
+    with pytest.raises(ValueError):
+        graph.add("late", lambda: None, after=("missing",))
+
+
+def test_plan_adjusts_testnet_yields_and_handles_missing_inputs():
+    snap = PrepareSnapshot(target=TARGET, owner=None, network="testnet", exists=False,
+                           target_resources={"energy_available": 0, "bandwidth_available": 0},
+                           permission={"available": False, "issues": ["no signer"]},
+                           params={"dailyEnergyPerTrx": 10.0, "dailyBandwidthPerTrx": 0.5})
+    plan = plan_preparation(snap, _tron_config("testnet"))
+    assert plan["activation_method"] == "transfer"
+    assert "permission_issue: no signer" in plan["notes"]
+    assert plan["plan"]["yields"]["bandwidth_per_trx"] == 200.0
+    assert plan["transfer_cost"] == {"energy": 65000, "bandwidth": 345}  # estimates without a simulation
+    assert plan["plan"]["energy_trx"] == round(74750 / 10.0 * 1.1, 6)
+    assert plan["wallet_analysis"]["gas_wallet"]["role"] == "resource_provider"
+    assert "gas_wallet_analysis_failed" in plan["notes"]
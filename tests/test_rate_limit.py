@@ -0,0 +1,20 @@
+import time
+
+from core.tron.rate_limit import TokenBucket, get_endpoint_bucket
+
+
+def test_token_bucket_burst_then_refill():
+    bucket = TokenBucket(rate_per_sec=50, burst=2)
+    assert bucket.try_acquire()
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+    start = time.monotonic()
+    assert bucket.acquire(timeout=1.0)
+    assert time.monotonic() - start >= 0.01
+
+
+def test_token_bucket_disabled_and_shared_per_endpoint():
+    assert all(TokenBucket(0).try_acquire() for _ in range(100))
+    a = get_endpoint_bucket("http://node:8090/", 5)
+    b = get_endpoint_bucket("http://node:8090", 5)
+    assert a is b
@@ -0,0 +1,56 @@
+import time
+
+from core.tron.ref_block import RefBlockCache
+
+BLOCK = {
+    "blockID": "0000000003a1b2c3" + "11" * 8 + "22" * 16,
+    "block_header": {"raw_data": {"number": 61_000_387, "timestamp": 1_700_000_000_000}},
+}
+
+
+def test_header_reused_within_staleness_bound():
+    calls = []
+
+    def request(method, path, payload=None, timeout=None):
+        calls.append(path)
+        return BLOCK, "local"
+
+    cache = RefBlockCache(refresh_sec=0, max_stale_sec=60, request=request)
+    ref = cache.get()
+    assert ref.number == 61_000_387
+    assert ref.ref_block_bytes == (61_000_387).to_bytes(8, "big")[6:8]
+    assert ref.ref_block_hash == bytes.fromhex("11" * 8)
+    cache.get()
+    assert calls == ["/wallet/getnowblock"]
+
+
+def test_stale_header_refetched_and_kept_on_failure():
+    responses = [BLOCK, None]
+
+    def request(method, path, payload=None, timeout=None):
+        return responses.pop(0), "local"
+
+    cache = RefBlockCache(refresh_sec=0, max_stale_sec=1, request=request)
+    first = cache.get()
+    first.fetched_at -= 5  # past the bound
+    assert cache.get() is None  # inline refetch failed
+    assert cache.age() >= 5  # old header still held for the next attempt
+
+
+def test_background_refresh():
+    calls = []
+
+    def request(method, path, payload=None, timeout=None):
+        calls.append(path)
+        return BLOCK, "local"
+
+    cache = RefBlockCache(refresh_sec=0.05, max_stale_sec=60, request=request)
+    cache.start()
+    try:
+        deadline = time.time() + 2
+        while len(calls) < 2 and time.time() < deadline:
+            time.sleep(0.01)
+        assert len(calls) >= 2
+        assert cache.get() is not None
+    finally:
+        cache.stop()
@@ -0,0 +1,24 @@
+from unittest.mock import patch
+
+from core.tron.transport import TronTransport
+
+
+def test_sessions_are_shared_per_host_with_pooled_adapter():
+    t = TronTransport(pool_size=7, connect_timeout=2, read_timeout=9)
+    a = t.session_for("http://10.0.0.1:8090/wallet/getaccount")
+    b = t.session_for("http://10.0.0.1:8090/walletsolidity/gettransactioninfobyid")
+    c = t.session_for("https://api.trongrid.io/wallet/getaccount")
+    assert a is b and a is not c
+    adapter = a.get_adapter("http://10.0.0.1:8090/wallet/getaccount")
+    assert adapter._pool_maxsize == 7
+    t.close()
+
+
+def test_request_uses_connect_and_read_timeouts():
+    t = TronTransport(pool_size=1, connect_timeout=2, read_timeout=9)
+    with patch("requests.Session.request") as req:
+        t.post("http://node:8090/wallet/getaccount", json={"address": "T"}, timeout=5)
+        t.get("http://node:8090/wallet/getnowblock")
+    assert req.call_args_list[0].kwargs["timeout"] == (2, 5)
+    assert req.call_args_list[0].args == ("POST", "http://node:8090/wallet/getaccount")
+    assert req.call_args_list[1].kwargs["timeout"] == (2, 9)
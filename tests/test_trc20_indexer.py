@@ -0,0 +1,66 @@
+from unittest.mock import MagicMock, patch
+
+from tronpy.keys import to_hex_address
+
+from services.trc20_indexer import Trc20TransferIndexer, TRANSFER_TOPIC
+
+USDT = "TR7NHqjeKQxGTCi8q8ZY4pL8otSzgjLj6t"
+PAYER = "TJRabPrwbZy45sbavfcjinPJC18kjpRTv8"
+INVOICE_ADDR = "TXLAQ63Xg1NAzckPwKHvzw7CSEmLMEqcdj"
+
+
+def _topic(addr: str) -> str:
+    return "0" * 24 + to_hex_address(addr)[2:]
+
+
+def _transfer_info(txid, to_addr, amount, contract=USDT):
+    return {
+        "id": txid,
+        "blockNumber": 100,
+        "receipt": {"result": "SUCCESS"},
+        "log": [{
+            "address": to_hex_address(contract)[2:],
+            "topics": [TRANSFER_TOPIC, _topic(PAYER), _topic(to_addr)],
+            "data": format(amount, "064x"),
+        }],
+    }
+
+
+def test_fetch_block_transfers_parses_usdt_logs_only():
+    client = MagicMock()
+    client.provider.make_request.return_value = [
+        _transfer_info("tx1", INVOICE_ADDR, 15_000_000),
+        _transfer_info("tx2", INVOICE_ADDR, 1, contract=PAYER),  # other contract
+        {"id": "tx3", "receipt": {"result": "REVERT"}, "log": []},
+    ]
+    indexer = Trc20TransferIndexer(USDT)
+    logs = indexer.fetch_block_transfers(client, 100)
+
+    assert len(logs) == 1
+    assert logs[0].txid == "tx1"
+    assert logs[0].log_index == 0
+    assert logs[0].from_address == PAYER
+    assert logs[0].to_address == INVOICE_ADDR
+    assert logs[0].amount_raw == 15_000_000
+
+
+@patch("services.trc20_indexer.set_checkpoint")
+@patch("services.trc20_indexer.get_checkpoint")
+def test_scan_resumes_from_checkpoint_and_matches_watched(mock_get_cp, mock_set_cp):
+    mock_get_cp.return_value = 99
+    client = MagicMock()
+    client.get_latest_block_number.return_value = 101
+    client.provider.make_request.side_effect = lambda method, params: (
+        [_transfer_info("tx1", INVOICE_ADDR, 5_000_000)] if params["num"] == 100 else {}
+    )
+    indexer = Trc20TransferIndexer(USDT)
+    indexer.load_checkpoint(MagicMock())
+
+    batch = indexer.scan(client, {INVOICE_ADDR})
+
+    assert (batch.from_block, batch.to_block) == (100, 101)
+    assert [t.txid for t in batch.transfers] == ["tx1"]
+    indexer.commit(MagicMock(), batch.to_block)
+    assert mock_set_cp.call_args[0][1:] == (indexer.checkpoint_name, 101)
+    # Nothing new until head advances
+    assert indexer.scan(client, {INVOICE_ADDR}) is None
@@ -0,0 +1,23 @@
+from core.tron.usdt_estimator import UsdtEnergyCache, usdt_transfer_bandwidth
+
+USDT = "TR7NHqjeKQxGTCi8q8ZY4pL8otSzgjLj6t"
+SENDER = "TXYZopYRdj2D9XRtbG411XZZ3kM5VkAeBf"
+
+
+def test_usdt_transfer_bandwidth_matches_network_charge():
+    # A singly-signed USDT transfer is charged 345 bandwidth on chain
+    assert usdt_transfer_bandwidth(SENDER, USDT, USDT) == 345
+    # Owner permission id is a proto3 default and adds nothing; a custom one adds two bytes
+    assert usdt_transfer_bandwidth(SENDER, USDT, USDT, permission_id=2) == 347
+
+
+def test_energy_cache_keyed_by_recipient_holder_status():
+    cache = UsdtEnergyCache(ttl_sec=60)
+    assert cache.energy(True) is None and cache.energy(None) is None
+    assert cache.record("TKnownHolder", 31_895) is True
+    assert cache.record("TNewHolder", 64_895) is False
+    assert cache.energy(True) == 31_895
+    assert cache.energy(False) == 64_895
+    assert cache.holder_status("TKnownHolder") is True
+    assert cache.holder_status("TUnknown") is None
+    assert cache.record("TFailed", 0) is None
@@ -0,0 +1,135 @@
+from unittest.mock import patch
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from core.database import models
+from core.database.db_service import claim_warm_address, list_warm_addresses, release_warm_address
+from services import warm_pool
+from services.warm_pool import WarmAddressPool
+
+
+def _session_factory():
+    engine = create_engine(
+        "sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    models.Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    db = factory()
+    db.add(models.BuyerGroup(id=1, seller_id=100, buyer_id="alice", invoices_group=0, xpub="xpub-a"))
+    db.add(models.BuyerGroup(id=2, seller_id=200, buyer_id="bob", invoices_group=3, xpub="xpub-b"))
+    db.add(models.Invoice(seller_id=100, buyer_group_id=1, derivation_index=0, address="T-xpub-a-0-0", amount=1))
+    db.add(models.Invoice(seller_id=100, buyer_group_id=1, derivation_index=2, address="T-xpub-a-0-2", amount=1))
+    db.commit()
+    db.close()
+    return factory
+
+
+def _derive(xpub, account=None, index=0):
+    return f"T-{xpub}-{account}-{index}"
+
+
+def _pool(factory, activate, **kwargs):
+    kwargs.setdefault("size", 2)
+    kwargs.setdefault("daily_budget_trx", 100)
+    return WarmAddressPool(activate, session_factory=factory, derive=_derive, est_cost_sun=1_100_000, **kwargs)
+
+
+@patch.object(warm_pool, "is_valid_xpub", return_value=True)
+def test_refill_activates_next_unused_indexes_in_one_batch(_):
+    factory = _session_factory()
+    batches = []
+
+    def activate(addresses):
+        batches.append(list(addresses))
+        return {a: {"activated": a != "T-xpub-b-3-1", "txid": f"tx-{a}", "cost_sun": 1_100_000} for a in addresses}
+
+    pool = _pool(factory, activate)
+    summary = pool.refill()
+
+    # Group 1 skips used indexes 0 and 2; group 2 starts at 0
+    assert batches == [["T-xpub-a-0-1", "T-xpub-a-0-3", "T-xpub-b-3-0", "T-xpub-b-3-1"]]
+    assert summary == {"planned": 4, "activated": 3, "spent_sun": 3_300_000}
+    db = factory()
+    assert [r.address for r in list_warm_addresses(db, status="ready")] == [
+        "T-xpub-a-0-1", "T-xpub-a-0-3", "T-xpub-b-3-0"]
+    db.close()
+
+    # Only the failed slot is planned again
+    pool.refill()
+    assert batches[-1] == ["T-xpub-b-3-1"]
+
+
+@patch.object(warm_pool, "is_valid_xpub", return_value=True)
+def test_refill_respects_daily_budget_quiet_periods_and_shards(_):
+    factory = _session_factory()
+    batches = []
+
+    def activate(addresses):
+        batches.append(list(addresses))
+        return {a: {"activated": True, "txid": "t", "cost_sun": 1_100_000} for a in addresses}
+
+    assert _pool(factory, activate, is_quiet=lambda: False).refill()["planned"] == 0
+    assert batches == []
+
+    pool = _pool(factory, activate, daily_budget_trx=2.5, owns_seller=lambda seller_id: seller_id == 100)
+    pool.refill()
+    assert batches == [["T-xpub-a-0-1", "T-xpub-a-0-3"]]
+    pool.size = 4
+    pool.refill()  # 2.2 TRX spent today: no room for another 1.1 TRX activation
+    assert len(batches) == 1
+
+
+def test_claim_hands_out_lowest_ready_unused_address_once():
+    factory = _session_factory()
+    db = factory()
+    for index in (1, 3, 4):
+        db.add(models.WarmAddress(seller_id=100, buyer_group_id=1, derivation_index=index,
+                                  address=f"W{index}", status="ready", created_at=models.datetime.datetime(2026, 1, 1)))
+    db.commit()
+
+    assert claim_warm_address(db, 1, used_indexes={0, 1, 2}).address == "W3"
+    assert claim_warm_address(db, 1, used_indexes={0, 1, 2, 3}).address == "W4"
+    assert claim_warm_address(db, 1, used_indexes={0, 1, 2, 3, 4}) is None
+    assert claim_warm_address(db, 2) is None
+    db.close()
+
+
+def test_released_slot_is_handed_out_again():
+    factory = _session_factory()
+    db = factory()
+    db.add(models.WarmAddress(seller_id=100, buyer_group_id=1, derivation_index=1,
+                              address="W1", status="ready", created_at=models.datetime.datetime(2026, 1, 1)))
+    db.commit()
+
+    assert claim_warm_address(db, 1).address == "W1"
+    assert claim_warm_address(db, 1) is None
+    assert release_warm_address(db, "W1") is True
+    assert release_warm_address(db, "W1") is False  # only assigned slots are released
+    assert claim_warm_address(db, 1).address == "W1"
+    db.close()
+
+
+@patch.object(warm_pool, "is_valid_xpub", return_value=True)
+def test_refill_frees_slots_of_failed_and_abandoned_refills(_):
+    factory = _session_factory()
+
+    def crash(addresses):
+        raise RuntimeError("node down")
+
+    pool = _pool(factory, crash, owns_seller=lambda seller_id: seller_id == 100)
+    assert pool.refill()["activated"] == 0
+    db = factory()
+    assert list_warm_addresses(db) == []  # reserved slots were dropped, not left 'activating'
+
+    # A refill that died mid-flight leaves old 'activating' rows behind
+    db.add(models.WarmAddress(seller_id=100, buyer_group_id=1, derivation_index=1, address="T-xpub-a-0-1",
+                              status="activating", created_at=models.datetime.datetime(2026, 1, 1)))
+    db.commit()
+    db.close()
+    batches = []
+    pool._activate = lambda addresses: batches.append(list(addresses)) or {
+        a: {"activated": True, "txid": "t", "cost_sun": 0} for a in addresses}
+    pool.refill()
+    assert batches == [["T-xpub-a-0-1", "T-xpub-a-0-3"]]